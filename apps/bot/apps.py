@@ -0,0 +1,13 @@
+"""
+Конфигурация приложения Telegram-бота
+"""
+from django.apps import AppConfig
+
+
+class BotConfig(AppConfig):
+    """
+    Конфигурация приложения bot
+    """
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.bot'
+    verbose_name = 'Telegram бот'
@@ -0,0 +1,48 @@
+"""
+Доступ к ORM из асинхронного бота
+
+Синхронные запросы выполняются в отдельном пуле потоков. Каждый поток
+держит свое соединение с БД (CONN_MAX_AGE), устаревшие закрываются перед
+запросом, поэтому цикл событий не блокируется, а соединения переиспользуются.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+
+
+def get_executor():
+    """Пул потоков для запросов к БД (создается при первом обращении)"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BOT_DB_THREADS', 8),
+            thread_name_prefix='bot-db'
+        )
+    return _executor
+
+
+def _call_with_connection(func, *args, **kwargs):
+    close_old_connections()
+    return func(*args, **kwargs)
+
+
+async def run_db(func, *args, **kwargs):
+    """Выполняет синхронную функцию с ORM в пуле потоков"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(),
+        functools.partial(_call_with_connection, func, *args, **kwargs)
+    )
+
+
+def shutdown_executor():
+    """Останавливает пул потоков при завершении бота"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,106 @@
+"""
+Обработчики команд бота
+"""
+from aiogram import Router
+from aiogram.filters import Command, CommandStart
+from aiogram.types import Message
+
+from . import queries
+from .db import run_db
+
+router = Router(name='onboarding')
+
+STATUS_LABELS = {
+    'not_started': 'не начат',
+    'in_progress': 'в процессе',
+    'paused': 'на паузе',
+}
+
+NOT_REGISTERED = (
+    "Вы еще не зарегистрированы в системе онбординга. "
+    "Откройте Mini App, чтобы войти."
+)
+
+
+def _deadline(value):
+    return value.strftime('%d.%m.%Y') if value else 'без срока'
+
+
+def format_progress(flows):
+    if not flows:
+        return "У вас нет активных потоков обучения."
+    lines = ["📊 Ваш прогресс:"]
+    for flow in flows:
+        status = STATUS_LABELS.get(flow['status'], flow['status'])
+        lines.append(
+            f"• {flow['title']} — {flow['progress']}% ({status}), срок: {_deadline(flow['deadline'])}"
+        )
+    return "\n".join(lines)
+
+
+def format_next_steps(steps):
+    if not steps:
+        return "Доступных этапов нет — все пройдено или потоки еще не начаты."
+    lines = ["➡️ Следующие шаги:"]
+    for step in steps:
+        lines.append(f"• {step['flow_title']}: {step['order']}. {step['step_title']}")
+    return "\n".join(lines)
+
+
+def format_mentees(mentees):
+    if not mentees:
+        return "У вас нет подопечных с активными потоками."
+    lines = ["👥 Ваши подопечные:"]
+    for mentee in mentees:
+        lines.append(
+            f"• {mentee['name']} — {mentee['flow_title']}: {mentee['progress']}%, "
+            f"срок: {_deadline(mentee['deadline'])}"
+        )
+    return "\n".join(lines)
+
+
+async def _reply(message, sender, text):
+    await sender.send_message(message.chat.id, text)
+
+
+@router.message(CommandStart())
+async def start_command(message: Message, sender):
+    user = await run_db(queries.get_user, message.from_user.id)
+    if not user:
+        await _reply(message, sender, NOT_REGISTERED)
+        return
+    await _reply(
+        message, sender,
+        f"👋 {user['name']}, добро пожаловать!\n\n"
+        "/progress — мой прогресс\n/next — следующий шаг\n/mentees — мои подопечные"
+    )
+
+
+@router.message(Command('progress'))
+async def progress_command(message: Message, sender):
+    user = await run_db(queries.get_user, message.from_user.id)
+    if not user:
+        await _reply(message, sender, NOT_REGISTERED)
+        return
+    flows = await run_db(queries.get_progress, user['id'])
+    await _reply(message, sender, format_progress(flows))
+
+
+@router.message(Command('next'))
+async def next_step_command(message: Message, sender):
+    user = await run_db(queries.get_user, message.from_user.id)
+    if not user:
+        await _reply(message, sender, NOT_REGISTERED)
+        return
+    steps = await run_db(queries.get_next_steps, user['id'])
+    await _reply(message, sender, format_next_steps(steps))
+
+
+@router.message(Command('mentees'))
+async def mentees_command(message: Message, sender):
+    user = await run_db(queries.get_user, message.from_user.id)
+    if not user:
+        await _reply(message, sender, NOT_REGISTERED)
+        return
+    mentees = await run_db(queries.get_mentees, user['id'])
+    await _reply(message, sender, format_mentees(mentees))
@@ -0,0 +1,40 @@
+"""
+Команда запуска асинхронного Telegram-бота
+"""
+import asyncio
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Запускает процесс бота на aiogram
+    """
+    help = 'Запускает Telegram-бота (читает обновления из Redis Stream)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consumer',
+            default=socket.gethostname(),
+            help='Имя потребителя в группе бота (по умолчанию имя хоста)'
+        )
+        parser.add_argument('--batch', type=int, default=100, help='Размер пачки')
+        parser.add_argument('--block', type=int, default=5000, help='Ожидание новых записей, мс')
+    
+    def handle(self, *args, **options):
+        """Запускает бота"""
+        if not settings.TELEGRAM_BOT_TOKEN:
+            raise CommandError('TELEGRAM_BOT_TOKEN не настроен')
+        if not settings.TELEGRAM_UPDATES_STREAM_ENABLED:
+            # Без потока webhook обрабатывает обновления сам, бот их не увидит
+            raise CommandError('Бот читает обновления из потока: включите TELEGRAM_UPDATES_STREAM_ENABLED')
+        
+        from apps.bot.runtime import run_stream
+        
+        self.stdout.write(self.style.SUCCESS('🤖 Запуск Telegram-бота...'))
+        try:
+            asyncio.run(run_stream(options['consumer'], options['batch'], options['block']))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,111 @@
+"""
+Запросы бота только на чтение
+
+Функции синхронные и возвращают простые словари, чтобы объекты моделей
+не покидали поток пула (см. apps.bot.db.run_db).
+"""
+from django.db.models import Count, Q
+
+from apps.flows.models import UserFlow, UserStepProgress, FlowBuddy
+from apps.users.models import User
+
+ACTIVE_STATUSES = [
+    UserFlow.FlowStatus.NOT_STARTED,
+    UserFlow.FlowStatus.IN_PROGRESS,
+    UserFlow.FlowStatus.PAUSED,
+]
+
+
+def get_user(telegram_id):
+    """Активный пользователь по Telegram ID"""
+    return User.objects.filter(
+        telegram_id=str(telegram_id), is_active=True
+    ).values('id', 'name').first()
+
+
+def _annotate_progress(queryset):
+    return queryset.annotate(
+        completed_steps=Count(
+            'step_progress',
+            filter=Q(step_progress__status=UserStepProgress.StepStatus.COMPLETED),
+            distinct=True
+        ),
+        total_steps=Count(
+            'flow__flow_steps',
+            filter=Q(flow__flow_steps__is_active=True),
+            distinct=True
+        )
+    )
+
+
+def _progress(completed, total):
+    return 100 if not total else round(completed * 100 / total)
+
+
+def get_progress(user_id):
+    """Активные потоки пользователя с прогрессом (один запрос)"""
+    rows = _annotate_progress(
+        UserFlow.objects.filter(user_id=user_id, status__in=ACTIVE_STATUSES)
+    ).values(
+        'flow__title', 'status', 'expected_completion_date',
+        'completed_steps', 'total_steps'
+    ).order_by('expected_completion_date')
+
+    return [
+        {
+            'title': row['flow__title'],
+            'status': row['status'],
+            'deadline': row['expected_completion_date'],
+            'progress': _progress(row['completed_steps'], row['total_steps']),
+        }
+        for row in rows
+    ]
+
+
+def get_next_steps(user_id):
+    """Ближайший доступный этап по каждому активному потоку"""
+    rows = UserStepProgress.objects.filter(
+        user_flow__user_id=user_id,
+        user_flow__status__in=ACTIVE_STATUSES,
+        status__in=[
+            UserStepProgress.StepStatus.AVAILABLE,
+            UserStepProgress.StepStatus.IN_PROGRESS,
+        ],
+        flow_step__is_active=True
+    ).values(
+        'user_flow_id', 'user_flow__flow__title', 'flow_step__title', 'flow_step__order'
+    ).order_by('user_flow_id', 'flow_step__order')
+
+    next_steps = {}
+    for row in rows:
+        next_steps.setdefault(row['user_flow_id'], {
+            'flow_title': row['user_flow__flow__title'],
+            'step_title': row['flow_step__title'],
+            'order': row['flow_step__order'],
+        })
+    return list(next_steps.values())
+
+
+def get_mentees(buddy_user_id):
+    """Подопечные бадди с прогрессом по их потокам"""
+    user_flow_ids = FlowBuddy.objects.filter(
+        buddy_user_id=buddy_user_id, is_active=True
+    ).values('user_flow_id')
+
+    rows = _annotate_progress(
+        UserFlow.objects.filter(id__in=user_flow_ids, status__in=ACTIVE_STATUSES)
+    ).values(
+        'user__name', 'flow__title', 'status', 'expected_completion_date',
+        'completed_steps', 'total_steps'
+    ).order_by('user__name')
+
+    return [
+        {
+            'name': row['user__name'],
+            'flow_title': row['flow__title'],
+            'status': row['status'],
+            'deadline': row['expected_completion_date'],
+            'progress': _progress(row['completed_steps'], row['total_steps']),
+        }
+        for row in rows
+    ]
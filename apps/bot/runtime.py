@@ -0,0 +1,120 @@
+"""
+Запуск асинхронного бота
+
+Бот не получает обновления от Telegram сам (ни getUpdates, ни свой
+webhook): единственный вход — webhook Django, который кладет обновления
+в Redis Stream. Бот читает поток в своей группе потребителей и передает
+обновления диспетчеру aiogram. Группа бота создается с конца потока
+(старые команды не получают ответов после первого развертывания),
+повторы update_id отбрасываются так же, как в dispatch_update.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+
+from apps.users.telegram_updates import (
+    UpdateInProgress, acknowledge, claim_update, ensure_consumer_group, give_up, parse_update,
+    read_batch, release_update,
+)
+from .db import run_db, shutdown_executor
+from .sender import MessageSender
+
+logger = logging.getLogger('apps.bot.runtime')
+
+BOT_CONSUMER_GROUP = 'telegram-bot'
+BOT_DEDUP_SCOPE = 'bot'
+
+
+def create_bot():
+    """Единственный экземпляр Bot с общей aiohttp-сессией"""
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+
+    session = AiohttpSession(limit=getattr(settings, 'BOT_SEND_CONCURRENCY', 20))
+    return Bot(token=settings.TELEGRAM_BOT_TOKEN, session=session)
+
+
+def create_dispatcher(bot):
+    """Диспетчер с роутером команд и общим отправителем"""
+    from aiogram import Dispatcher
+    from .handlers import router
+
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    # Доступен обработчикам как аргумент sender
+    dispatcher['sender'] = MessageSender(bot)
+    dispatcher.shutdown.register(_on_shutdown)
+    return dispatcher
+
+
+async def _on_shutdown():
+    shutdown_executor()
+
+
+async def consume_stream(dispatcher, bot, consumer, count=100, block_ms=5000):
+    """
+    Обрабатывает пачку обновлений из потока
+
+    Обновления пачки обрабатываются параллельно. Запись с ошибкой
+    обработчика остается в ожидании для повторной доставки (см.
+    apps.users.telegram_updates.consume_batch).
+
+    Returns:
+        int: Количество подтвержденных записей
+    """
+    entries = await run_db(read_batch, consumer, BOT_CONSUMER_GROUP, count, block_ms)
+
+    processed = []
+    updates = []
+    for entry_id, raw_update in entries:
+        try:
+            update = parse_update(raw_update)
+        except ValueError as exc:
+            logger.error(f"Нечитаемое обновление {entry_id}: {exc}")
+            processed.append(entry_id)
+            continue
+
+        key = None
+        if update.get('update_id') is not None:
+            try:
+                key = await run_db(claim_update, update['update_id'], BOT_DEDUP_SCOPE)
+            except UpdateInProgress:
+                # Остается в ожидании до снятия маркера обработки
+                continue
+            if key is None:
+                processed.append(entry_id)
+                continue
+        updates.append((entry_id, key, update))
+
+    results = await asyncio.gather(
+        *(dispatcher.feed_raw_update(bot, update) for _, _, update in updates),
+        return_exceptions=True
+    )
+    for (entry_id, key, _), result in zip(updates, results):
+        failed = isinstance(result, Exception)
+        if key:
+            await run_db(release_update, key, not failed)
+        if failed:
+            if not await run_db(give_up, entry_id, BOT_CONSUMER_GROUP):
+                logger.warning(f"Ошибка обработки обновления {entry_id}, будет повтор: {result}")
+                continue
+            logger.error(f"Обновление {entry_id} отброшено после повторов: {result}")
+        processed.append(entry_id)
+    await run_db(acknowledge, processed, BOT_CONSUMER_GROUP)
+    return len(processed)
+
+
+async def run_stream(consumer, count=100, block_ms=5000):
+    """Цикл чтения потока обновлений"""
+    bot = create_bot()
+    dispatcher = create_dispatcher(bot)
+    await run_db(ensure_consumer_group, BOT_CONSUMER_GROUP)
+    await dispatcher.emit_startup(bot=bot, dispatcher=dispatcher)
+    logger.info(f"Бот {consumer} читает поток обновлений")
+    try:
+        while True:
+            await consume_stream(dispatcher, bot, consumer, count, block_ms)
+    finally:
+        await dispatcher.emit_shutdown(bot=bot, dispatcher=dispatcher)
+        await bot.session.close()
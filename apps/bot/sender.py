@@ -0,0 +1,55 @@
+"""
+Отправка исходящих сообщений бота
+
+Все сообщения идут через один экземпляр Bot (одна aiohttp-сессия с пулом
+соединений). Семафор ограничивает число одновременных запросов к Bot API,
+ответ 429 обрабатывается ожиданием retry_after.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger('apps.bot.sender')
+
+
+class MessageSender:
+    """Ограничитель параллельной отправки поверх общего Bot"""
+
+    def __init__(self, bot, concurrency=None, max_retries=3):
+        self.bot = bot
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(
+            concurrency or getattr(settings, 'BOT_SEND_CONCURRENCY', 20)
+        )
+
+    async def send_message(self, chat_id, text, **kwargs):
+        """Отправляет сообщение с учетом лимита и повторов после 429"""
+        from aiogram.exceptions import TelegramRetryAfter
+
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                try:
+                    return await self.bot.send_message(chat_id, text, **kwargs)
+                except TelegramRetryAfter as exc:
+                    if attempt == self.max_retries:
+                        raise
+                    retry_after = exc.retry_after
+            logger.warning(f"Лимит Telegram для чата {chat_id}, повтор через {retry_after} с")
+            await asyncio.sleep(retry_after)
+
+    async def broadcast(self, messages):
+        """
+        Отправляет пачку сообщений [(chat_id, text), ...] параллельно
+
+        Returns:
+            int: Количество успешно отправленных сообщений
+        """
+        results = await asyncio.gather(
+            *(self.send_message(chat_id, text) for chat_id, text in messages),
+            return_exceptions=True
+        )
+        failed = [r for r in results if isinstance(r, Exception)]
+        for exc in failed:
+            logger.error(f"Ошибка отправки сообщения: {exc}")
+        return len(results) - len(failed)
@@ -0,0 +1,186 @@
+"""
+Общие инструменты административной панели для больших таблиц
+"""
+import json
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from django.utils.translation import gettext_lazy as _
+
+from .models import BulkJob
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк по статистике PostgreSQL
+
+    Без фильтров берется reltuples таблицы (с секциями), с фильтрами —
+    оценка планировщика из EXPLAIN. Для других СУБД возвращает None.
+    """
+    if not isinstance(queryset, QuerySet):
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    if not queryset.query.where:
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint FROM pg_class c "
+                "WHERE c.oid = to_regclass(%s) "
+                "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))",
+                [table, table]
+            )
+            return cursor.fetchone()[0]
+
+    plan = json.loads(queryset.select_related(None).order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор, не считающий COUNT(*) по большим таблицам
+
+    Если оценка меньше ADMIN_EXACT_COUNT_LIMIT, выполняется точный подсчет.
+    """
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000):
+            return super().count
+        return estimate
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Фильтр по внешнему ключу с поиском вместо списка всех объектов
+
+    Использование: list_filter = [('user_flow__flow', AutocompleteFilter)].
+    У админки связанной модели должны быть search_fields.
+    """
+    template = 'admin/common/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        self.admin_site = model_admin.admin_site
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': _('All'),
+        }
+
+    @property
+    def widget_id(self):
+        return f'autocomplete-filter-{self.field_path}'
+
+    def render_widget(self):
+        """Поле выбора; из БД читается только выбранный объект"""
+        form_field = forms.ModelChoiceField(
+            self.field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(self.field, self.admin_site),
+            required=False,
+        )
+        return form_field.widget.render(self.lookup_kwarg, self.lookup_val, attrs={'id': self.widget_id})
+
+
+class LargeTableAdminMixin:
+    """
+    Списки для таблиц с миллионами строк: оценка числа строк
+    вместо COUNT(*) и статика для AutocompleteFilter
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(None, self.admin_site).media
+
+
+# ========== Массовые операции ==========
+
+class BulkJobActionForm(ActionForm):
+    """Параметры массовых операций рядом с выбором действия"""
+    reason = forms.CharField(label='Причина', required=False)
+    days = forms.IntegerField(label='Дней', required=False, min_value=1, max_value=365)
+    buddy_id = forms.IntegerField(label='ID бадди', required=False)
+    message = forms.CharField(label='Сообщение', required=False)
+
+
+def bulk_job_action(name, description, params=()):
+    """
+    Действие админки, ставящее BulkJob по выбранным объектам
+
+    params — поля BulkJobActionForm, передаваемые операции.
+    """
+    def action(modeladmin, request, queryset):
+        from .bulk_jobs import submit
+
+        values = {field: request.POST.get(field) for field in params if request.POST.get(field)}
+        try:
+            job = submit(name, queryset, values, request.user)
+        except ValueError as exc:
+            modeladmin.message_user(request, str(exc), messages.ERROR)
+            return
+        url = reverse('admin:common_bulkjob_change', args=[job.pk])
+        modeladmin.message_user(request, format_html(
+            'Операция «{}» поставлена в очередь для {} объектов: <a href="{}">задача #{}</a>',
+            description, job.total, url, job.pk
+        ))
+
+    action.__name__ = f'bulk_{name}'
+    action.short_description = f'{description} (в фоне)'
+    return action
+
+
+@admin.register(BulkJob)
+class BulkJobAdmin(admin.ModelAdmin):
+    """
+    Массовые операции: прогресс, ошибки, отмена
+    """
+    list_display = [
+        'id', 'operation', 'status', 'progress_display', 'processed', 'total',
+        'failed', 'created_by', 'created_at', 'finished_at'
+    ]
+    list_filter = ['status', 'operation']
+    list_select_related = ['created_by']
+    exclude = ['object_ids']
+    readonly_fields = [
+        'operation', 'model_label', 'params', 'status', 'total', 'processed', 'failed',
+        'last_pk', 'errors', 'created_by', 'started_at', 'finished_at', 'created_at'
+    ]
+    actions = ['cancel_jobs']
+    
+    def progress_display(self, obj):
+        return f'{obj.progress_percentage:.1f}%'
+    progress_display.short_description = 'Прогресс'
+    
+    def cancel_jobs(self, request, queryset):
+        cancelled = sum(job.cancel() for job in queryset)
+        self.message_user(request, f'Отменено операций: {cancelled}')
+    cancel_jobs.short_description = 'Отменить выбранные операции'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
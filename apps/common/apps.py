@@ -0,0 +1,19 @@
+"""
+Конфигурация общего приложения
+"""
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    """
+    Конфигурация приложения common
+    """
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.common'
+    verbose_name = 'Общее'
+    
+    def ready(self):
+        """
+        Регистрируем учет соединений с БД по ролям процессов
+        """
+        import apps.common.db_connections  # noqa: F401
@@ -0,0 +1,178 @@
+"""
+Массовые операции в фоне
+
+Операция регистрируется декоратором @operation и получает пачку объектов.
+submit() сохраняет набор как отсортированный список PK (object_ids) в
+BulkJob и ставит задачу run_bulk_job: список не зависит от версии Django
+и кода, в отличие от сериализованного запроса. Задача обрабатывает
+объекты пачками по возрастанию PK,
+после каждой пачки сохраняет прогресс и ошибки, проверяет отмену и
+по истечении BULK_JOB_TIME_SLICE секунд перезапускает себя с last_pk.
+"""
+import bisect
+import logging
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BulkJob
+
+logger = logging.getLogger('apps.common.bulk_jobs')
+
+
+@dataclass
+class BulkOperation:
+    """
+    handler(objects, params, user) обрабатывает пачку и возвращает
+    список ошибок [(pk, текст)]; остальные объекты считаются успешными.
+    """
+    name: str
+    model_label: str
+    title: str
+    handler: Callable
+    select_related: tuple = ()
+    validate: Optional[Callable] = None
+
+
+OPERATIONS = {}
+
+
+def operation(name, model_label, title, select_related=(), validate=None):
+    """Регистрирует обработчик массовой операции"""
+    def decorator(handler):
+        OPERATIONS[name] = BulkOperation(
+            name=name, model_label=model_label, title=title, handler=handler,
+            select_related=tuple(select_related), validate=validate
+        )
+        return handler
+    return decorator
+
+
+def get_operation(name):
+    # Операции регистрируются в модулях bulk_operations приложений
+    from django.utils.module_loading import autodiscover_modules
+    autodiscover_modules('bulk_operations')
+    return OPERATIONS.get(name)
+
+
+def get_chunk_size():
+    return getattr(settings, 'BULK_JOB_CHUNK_SIZE', 200)
+
+
+def submit(name, queryset, params=None, user=None):
+    """
+    Создает BulkJob для набора и ставит его в очередь после коммита
+
+    Raises:
+        ValueError: Неизвестная операция, чужая модель или неверные параметры
+    """
+    from .tasks import run_bulk_job
+
+    op = get_operation(name)
+    if op is None:
+        raise ValueError(f'Неизвестная операция: {name}')
+    if queryset.model._meta.label != op.model_label:
+        raise ValueError(f'Операция {name} применяется к {op.model_label}')
+    params = dict(params or {})
+    if op.validate:
+        params = op.validate(params)
+
+    object_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    job = BulkJob.objects.create(
+        operation=name,
+        model_label=op.model_label,
+        object_ids=object_ids,
+        params=params,
+        total=len(object_ids),
+        created_by=user if user and user.is_authenticated else None,
+    )
+    transaction.on_commit(partial(run_bulk_job.delay, job.id))
+    return job
+
+
+def get_queryset(job):
+    return apps.get_model(job.model_label)._default_manager.all()
+
+
+def next_chunk(job):
+    """Следующие PK набора после last_pk"""
+    start = 0 if job.last_pk is None else bisect.bisect_right(job.object_ids, job.last_pk)
+    return job.object_ids[start:start + get_chunk_size()]
+
+
+def run(job_id, time_slice=None):
+    """
+    Выполняет операцию до конца набора, отмены или истечения time_slice
+
+    Returns:
+        str: Статус BulkJob после запуска ('running' — нужно продолжить)
+    """
+    if time_slice is None:
+        time_slice = getattr(settings, 'BULK_JOB_TIME_SLICE', 60)
+
+    started = BulkJob.objects.filter(pk=job_id, status__in=[
+        BulkJob.Status.PENDING, BulkJob.Status.RUNNING
+    ]).update(status=BulkJob.Status.RUNNING)
+    if not started:
+        return None
+    job = BulkJob.objects.get(pk=job_id)
+    if not job.started_at:
+        job.started_at = timezone.now()
+        job.save(update_fields=['started_at'])
+
+    op = get_operation(job.operation)
+    queryset = get_queryset(job)
+    if op.select_related:
+        queryset = queryset.select_related(*op.select_related)
+    user = job.created_by
+    deadline = time.monotonic() + time_slice
+
+    while True:
+        chunk = next_chunk(job)
+        if not chunk:
+            BulkJob.objects.filter(pk=job.pk, status=BulkJob.Status.RUNNING).update(
+                status=BulkJob.Status.COMPLETED, finished_at=timezone.now()
+            )
+            break
+
+        objects = list(queryset.filter(pk__in=chunk).order_by('pk'))
+        found = {obj.pk for obj in objects}
+        try:
+            failures = list(op.handler(objects, job.params, user) or []) if objects else []
+        except Exception as exc:
+            logger.exception(f"Массовая операция {job.operation} #{job.pk} прервана")
+            BulkJob.objects.filter(pk=job.pk).update(
+                status=BulkJob.Status.FAILED, finished_at=timezone.now(),
+                errors=(job.errors + [{'pk': None, 'error': str(exc)}])[:BulkJob.MAX_ERRORS]
+            )
+            break
+
+        # Объекты, удаленные после постановки операции
+        failures += [(pk, 'Объект удален') for pk in chunk if pk not in found]
+        job.last_pk = chunk[-1]
+        job.errors = (job.errors + [
+            {'pk': pk, 'error': str(error)} for pk, error in failures
+        ])[:BulkJob.MAX_ERRORS]
+        # Счетчики через F: отмена не перезаписывается, статус не трогаем
+        BulkJob.objects.filter(pk=job.pk).update(
+            processed=F('processed') + len(chunk),
+            failed=F('failed') + len(failures),
+            last_pk=job.last_pk,
+            errors=job.errors,
+        )
+
+        if BulkJob.objects.filter(pk=job.pk, status=BulkJob.Status.CANCELLED).exists():
+            break
+        if time.monotonic() >= deadline:
+            break
+
+    status = BulkJob.objects.values_list('status', flat=True).get(pk=job.pk)
+    logger.info(f"Массовая операция {job.operation} #{job.pk}: {status}")
+    return status
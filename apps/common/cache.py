@@ -1,100 +1,336 @@
 """
 Утилиты для кэширования
+
+Двухуровневый кэш: локальный LRU процесса перед общим кэшем Django (Redis).
+Инвалидация выполняется через версии тегов: ключ включает текущие версии
+своих тегов, поэтому сброс тега — это один INCR, без сканирования ключей.
 """
+from django.conf import settings
 from django.core.cache import cache
+from django.db import models
 from functools import wraps
+from collections import Counter, OrderedDict, defaultdict
+import datetime
+import decimal
 import hashlib
 import json
-from typing import Any, Optional, Callable
+import threading
+import time
+import uuid
+from typing import Any, Optional, Callable, Iterable
+
+
+TAG_KEY_PREFIX = 'cache:tag'
+LOCK_KEY_PREFIX = 'cache:lock'
 
 
-def cache_result(timeout: int = 300, key_prefix: Optional[str] = None, vary_on_user: bool = False):
+class Uncacheable(Exception):
     """
-    Декоратор для кэширования результатов функций/методов
-    
+    Поднимается производителем значения, если результат нельзя кэшировать.
+    Значение пробрасывается вызывающему коду без записи в кэш.
+    """
+    def __init__(self, value: Any = None):
+        super().__init__('uncacheable result')
+        self.value = value
+
+
+# ========== Построение ключей ==========
+
+def _normalize(value: Any) -> Any:
+    """Приводит значение к стабильному JSON-представлению"""
+    if isinstance(value, models.Model):
+        return f"{value._meta.label_lower}:{value.pk}"
+    if isinstance(value, models.QuerySet):
+        return {
+            'model': value.model._meta.label_lower,
+            'db': value.db,
+            'sql': str(value.query),
+        }
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items(), key=lambda i: str(i[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(str(_normalize(v)) for v in value)
+    if isinstance(value, (datetime.date, datetime.time, decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    """
+    Формирует стабильный ключ кэша
+
+    Модели представляются как `app.model:pk`, QuerySet — через SQL-запрос.
+    """
+    if not parts:
+        return namespace
+    payload = json.dumps(_normalize(list(parts)), sort_keys=True)
+    digest = hashlib.md5(payload.encode()).hexdigest()[:16]
+    return f"{namespace}:{digest}"
+
+
+# ========== Локальный LRU ==========
+
+class LocalLRUCache:
+    """Потокобезопасный LRU-кэш процесса с ограничением по времени жизни"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, timeout: float):
+        if timeout <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LocalLRUCache(getattr(settings, 'CACHE_LOCAL_MAXSIZE', 1024))
+
+
+def _local_timeout() -> float:
+    return getattr(settings, 'CACHE_LOCAL_TIMEOUT', 5)
+
+
+# ========== Счетчики ==========
+
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def _record(namespace: str, event: str):
+    with _stats_lock:
+        _stats[namespace][event] += 1
+
+
+def get_cache_stats() -> dict:
+    """
+    Возвращает счетчики процесса по пространствам имен:
+    local_hits, hits, misses, lock_waits
+    """
+    with _stats_lock:
+        return {namespace: dict(counter) for namespace, counter in _stats.items()}
+
+
+def reset_cache_stats():
+    """Сбрасывает счетчики"""
+    with _stats_lock:
+        _stats.clear()
+
+
+# ========== Теги ==========
+
+def _tag_key(tag: str) -> str:
+    return f"{TAG_KEY_PREFIX}:{tag}"
+
+
+def get_tag_versions(tags: Iterable[str]) -> list:
+    """
+    Возвращает текущие версии тегов
+
+    Версии кэшируются локально на CACHE_LOCAL_TIMEOUT секунд, поэтому
+    другие процессы видят инвалидацию с задержкой не больше этого интервала.
+    """
+    tags = list(tags)
+    versions = {}
+    missing = []
+    for tag in tags:
+        version = local_cache.get(_tag_key(tag))
+        if version is None:
+            missing.append(tag)
+        else:
+            versions[tag] = version
+
+    if missing:
+        stored = cache.get_many([_tag_key(tag) for tag in missing])
+        for tag in missing:
+            key = _tag_key(tag)
+            version = stored.get(key)
+            if version is None:
+                version = time.time_ns()
+                if not cache.add(key, version, None):
+                    version = cache.get(key, version)
+            versions[tag] = version
+            local_cache.set(key, version, _local_timeout())
+
+    return [versions[tag] for tag in tags]
+
+
+def invalidate_tags(*tags: str):
+    """Инвалидирует все значения, помеченные указанными тегами"""
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+        local_cache.delete(key)
+
+
+# ========== Основная операция ==========
+
+def get_or_set(
+    key: str,
+    producer: Callable[[], Any],
+    timeout: int = 300,
+    tags: Iterable[str] = (),
+    lock_timeout: int = 30,
+    lock_wait: float = 5.0,
+) -> Any:
+    """
+    Возвращает значение из кэша или вычисляет его
+
+    Порядок поиска: локальный LRU, затем общий кэш. При промахе значение
+    вычисляет только владелец блокировки, остальные ждут его результата
+    не дольше lock_wait секунд.
+    """
+    namespace = key.split(':', 1)[0]
+    tags = tuple(tags)
+    if tags:
+        versions = '.'.join(str(v) for v in get_tag_versions(tags))
+        full_key = f"{key}:v{versions}"
+    else:
+        full_key = key
+
+    # Значения хранятся в кортеже, чтобы отличать закэшированный None от промаха
+    wrapped = local_cache.get(full_key)
+    if wrapped is not None:
+        _record(namespace, 'local_hits')
+        return wrapped[0]
+
+    wrapped = cache.get(full_key)
+    if wrapped is not None:
+        _record(namespace, 'hits')
+        local_cache.set(full_key, wrapped, min(timeout, _local_timeout()))
+        return wrapped[0]
+
+    _record(namespace, 'misses')
+    lock_key = f"{LOCK_KEY_PREFIX}:{full_key}"
+    if not cache.add(lock_key, 1, lock_timeout):
+        # Значение уже вычисляет другой процесс
+        _record(namespace, 'lock_waits')
+        deadline = time.monotonic() + lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            wrapped = cache.get(full_key)
+            if wrapped is not None:
+                local_cache.set(full_key, wrapped, min(timeout, _local_timeout()))
+                return wrapped[0]
+        return producer()
+
+    try:
+        value = producer()
+        wrapped = (value,)
+        cache.set(full_key, wrapped, timeout)
+        local_cache.set(full_key, wrapped, min(timeout, _local_timeout()))
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+# ========== Декораторы ==========
+
+def cache_result(
+    timeout: int = 300,
+    key_prefix: Optional[str] = None,
+    vary_on_user: bool = False,
+    tags: Iterable[str] = (),
+):
+    """
+    Декоратор для кэширования результатов методов
+
+    Первый аргумент (self/cls) в ключ не входит.
+
     Args:
         timeout: Время жизни кэша в секундах
         key_prefix: Префикс для ключа кэша
         vary_on_user: Различать кэш для разных пользователей
+        tags: Теги для групповой инвалидации
     """
     def decorator(func: Callable) -> Callable:
+        prefix = key_prefix or f"{func.__module__}.{func.__name__}"
+        # Собственный тег функции позволяет сбросить все ее значения разом
+        all_tags = (f"func:{prefix}",) + tuple(tags)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Формируем ключ кэша
-            cache_key_parts = [
-                key_prefix or f"{func.__module__}.{func.__name__}",
-            ]
-            
-            # Добавляем user_id если нужно
-            if vary_on_user and hasattr(args[0], 'user'):
-                cache_key_parts.append(f"user_{args[0].user.id}")
-            
-            # Добавляем аргументы функции
-            if args[1:]:  # Пропускаем self/cls
-                args_str = hashlib.md5(
-                    json.dumps(args[1:], sort_keys=True).encode()
-                ).hexdigest()[:8]
-                cache_key_parts.append(args_str)
-            
-            if kwargs:
-                kwargs_str = hashlib.md5(
-                    json.dumps(kwargs, sort_keys=True).encode()
-                ).hexdigest()[:8]
-                cache_key_parts.append(kwargs_str)
-            
-            cache_key = ":".join(cache_key_parts)
-            
-            # Пытаемся получить из кэша
-            result = cache.get(cache_key)
-            if result is not None:
-                return result
-            
-            # Вычисляем результат
-            result = func(*args, **kwargs)
-            
-            # Сохраняем в кэш
-            cache.set(cache_key, result, timeout)
-            
-            return result
-        
-        # Добавляем метод для инвалидации кэша
-        def invalidate(*args, **kwargs):
-            cache_key_parts = [
-                key_prefix or f"{func.__module__}.{func.__name__}",
-            ]
-            # Формируем паттерн для удаления
-            pattern = ":".join(cache_key_parts) + "*"
-            cache.delete_pattern(pattern)
-        
+            key_parts = list(args[1:]) + [kwargs]  # Пропускаем self/cls
+            if vary_on_user and args and hasattr(args[0], 'user'):
+                key_parts.insert(0, f"user_{args[0].user.id}")
+            cache_key = make_key(prefix, *key_parts)
+            return get_or_set(cache_key, lambda: func(*args, **kwargs), timeout, all_tags)
+
+        def invalidate():
+            invalidate_tags(all_tags[0])
+
         wrapper.invalidate = invalidate
         return wrapper
     return decorator
 
 
-def cache_page_data(timeout: int = 300):
-    """Декоратор для кэширования данных страниц ViewSet"""
-    def decorator(viewset_method: Callable) -> Callable:
-        @wraps(viewset_method)
+def cache_page_data(timeout: int = 300, tags: Iterable[str] = (), vary_on_user: bool = True):
+    """
+    Декоратор для кэширования данных GET-обработчиков представлений
+
+    Кэшируются только данные ответа (response.data), а не объект Response.
+    Теги могут содержать подстановки из kwargs представления, например 'flow:{pk}'.
+    """
+    # DRF нужен только представлениям; воркеры импортируют кэш без него
+    from rest_framework.response import Response
+
+    def decorator(view_method: Callable) -> Callable:
+        @wraps(view_method)
         def wrapper(self, request, *args, **kwargs):
-            # Формируем ключ с учетом параметров запроса
-            cache_key = f"view:{request.path}:{request.query_params.urlencode()}"
-            
-            if request.user.is_authenticated:
-                cache_key += f":user_{request.user.id}"
-            
-            # Пытаемся получить из кэша
-            cached_response = cache.get(cache_key)
-            if cached_response is not None:
-                return cached_response
-            
-            # Получаем ответ
-            response = viewset_method(self, request, *args, **kwargs)
-            
-            # Кэшируем только успешные GET запросы
-            if request.method == 'GET' and response.status_code == 200:
-                cache.set(cache_key, response, timeout)
-            
-            return response
+            if request.method != 'GET':
+                return view_method(self, request, *args, **kwargs)
+
+            key_parts = [request.path, request.query_params.urlencode()]
+            if vary_on_user and request.user.is_authenticated:
+                key_parts.append(f"user_{request.user.id}")
+            cache_key = make_key(f"view.{self.__class__.__name__}", *key_parts)
+            view_tags = [tag.format(**kwargs) for tag in tags]
+
+            def produce():
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    raise Uncacheable(response)
+                return response.data
+
+            try:
+                data = get_or_set(cache_key, produce, timeout, view_tags)
+            except Uncacheable as exc:
+                return exc.value
+            return Response(data)
         return wrapper
     return decorator
 
@@ -102,29 +338,28 @@ def cache_page_data(timeout: int = 300):
 def cache_model_method(timeout: int = 300):
     """Декоратор для кэширования методов моделей"""
     def decorator(method: Callable) -> Callable:
+        def _key(instance):
+            return f"model:{instance._meta.label_lower}:{instance.pk}:{method.__name__}"
+
         @wraps(method)
         def wrapper(self, *args, **kwargs):
-            # Формируем ключ кэша
-            cache_key = f"model:{self.__class__.__name__}:{self.id}:{method.__name__}"
-            
-            # Пытаемся получить из кэша
-            result = cache.get(cache_key)
-            if result is not None:
-                return result
-            
-            # Вычисляем результат
-            result = method(self, *args, **kwargs)
-            
-            # Сохраняем в кэш
-            cache.set(cache_key, result, timeout)
-            
-            return result
-        
+            cache_key = _key(self)
+            if args or kwargs:
+                cache_key = make_key(cache_key, *args, kwargs)
+            return get_or_set(
+                cache_key, lambda: method(self, *args, **kwargs), timeout,
+                tags=[f"{self._meta.label_lower}:{self.pk}"]
+            )
+
         # Добавляем метод для инвалидации кэша
         def invalidate(self):
-            cache_key = f"model:{self.__class__.__name__}:{self.id}:{method.__name__}"
-            cache.delete(cache_key)
-        
+            invalidate_tags(f"{self._meta.label_lower}:{self.pk}")
+
         wrapper.invalidate = invalidate
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
+
+
+def clear_local_cache():
+    """Очищает локальный уровень кэша (используется в тестах)"""
+    local_cache.clear()
@@ -0,0 +1,86 @@
+"""
+Учет соединений с БД по ролям процессов
+
+Каждое новое соединение увеличивает счетчик роли процесса (PROCESS_ROLE)
+в кэше; Postgres видит роль в application_name. pool_status собирает
+занятость соединений из pg_stat_activity для команды db_pool_status.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('apps.common.db_connections')
+
+APPLICATION_PREFIX = 'onboarding-'
+
+
+def process_role():
+    return getattr(settings, 'PROCESS_ROLE', 'web')
+
+
+def _counter_key(role, alias):
+    return f'db:connections:{role}:{alias}'
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    """Счетчик открытых соединений роли (сбой кэша не мешает работе с БД)"""
+    key = _counter_key(process_role(), connection.alias)
+    try:
+        cache.add(key, 0, None)
+        cache.incr(key)
+    except Exception as exc:
+        logger.warning(f"Не удалось учесть соединение {key}: {exc}")
+
+
+def connection_counters(alias=DEFAULT_DB_ALIAS):
+    """{роль: соединений открыто} по известным ролям"""
+    roles = list(getattr(settings, 'DB_ROLE_CONN_MAX_AGE', {})) or [process_role()]
+    values = cache.get_many([_counter_key(role, alias) for role in roles])
+    return {role: values.get(_counter_key(role, alias), 0) for role in roles}
+
+
+def reset_counters(alias=DEFAULT_DB_ALIAS):
+    cache.delete_many([_counter_key(role, alias) for role in connection_counters(alias)])
+
+
+def pool_status(alias=DEFAULT_DB_ALIAS):
+    """
+    Занятость соединений PostgreSQL по ролям
+
+    Returns:
+        dict | None: {'max_connections', 'reserved', 'used', 'roles': {роль: {состояние: число}}};
+        None для других СУБД
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT current_setting('max_connections')::int, "
+            "current_setting('superuser_reserved_connections')::int"
+        )
+        max_connections, reserved = cursor.fetchone()
+        cursor.execute(
+            "SELECT application_name, COALESCE(state, 'unknown'), count(*) "
+            "FROM pg_stat_activity WHERE backend_type = 'client backend' "
+            "GROUP BY 1, 2"
+        )
+        rows = cursor.fetchall()
+
+    roles = {}
+    for application, state, count in rows:
+        role = application[len(APPLICATION_PREFIX):] if application.startswith(APPLICATION_PREFIX) else 'other'
+        roles.setdefault(role, {})
+        roles[role][state] = roles[role].get(state, 0) + count
+    return {
+        'max_connections': max_connections,
+        'reserved': reserved,
+        'used': sum(count for _, _, count in rows),
+        'roles': roles,
+    }
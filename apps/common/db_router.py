@@ -0,0 +1,125 @@
+"""
+Чтение с реплики
+
+Запросы идут в основную БД, кроме явно помеченных участков: аналитика,
+выгрузки и списки для модераторов читают с алиаса replica внутри
+use_replica() (декоратор replica_reads для обработчиков DRF). Запись
+всегда уходит в default.
+
+Чтобы пользователь не увидел устаревший прогресс, после записи он
+«прилипает» к основной БД на DB_REPLICA_STICKY_SECONDS (флаг в кэше
+ставит ReplicaStickinessMiddleware); внутри запроса после первой записи
+чтение тоже идет в default. Без алиаса replica в DATABASES или при
+DB_REPLICA_READS=False все читается из основной БД.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_wrote = ContextVar('db_wrote', default=False)
+
+
+def _sticky_key(user_id):
+    return f'db:sticky:{user_id}'
+
+
+def replica_available():
+    """Настроена ли реплика и разрешено ли чтение с нее"""
+    return getattr(settings, 'DB_REPLICA_READS', True) and REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def mark_sticky(user_id):
+    """Направляет чтение пользователя в основную БД на время задержки репликации"""
+    if user_id:
+        cache.set(_sticky_key(user_id), 1, getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 10))
+
+
+def is_sticky(user_id):
+    return bool(user_id) and cache.get(_sticky_key(user_id)) is not None
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Чтение внутри блока идет с реплики (если она доступна)"""
+    token = _replica_reads.set(enabled and replica_available())
+    wrote = _wrote.set(False)
+    try:
+        yield
+    finally:
+        _wrote.reset(wrote)
+        _replica_reads.reset(token)
+
+
+def read_alias(user_id=None):
+    """Алиас для чтения вне use_replica (например, для ленивых выгрузок)"""
+    if replica_available() and not is_sticky(user_id):
+        return REPLICA_DB_ALIAS
+    return DEFAULT_DB_ALIAS
+
+
+def replica_reads(func):
+    """
+    Декоратор обработчика DRF (функции или метода представления)
+
+    Безопасные запросы читают с реплики, если пользователь недавно не писал.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if hasattr(arg, 'method'))
+        user_id = getattr(request.user, 'pk', None)
+        enabled = request.method in ('GET', 'HEAD', 'OPTIONS') and not is_sticky(user_id)
+        with use_replica(enabled):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Роутер БД: запись в default, чтение с реплики внутри use_replica()
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and not _wrote.get():
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная БД
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Отмечает пользователей, которые писали в БД за время запроса
+
+    Записью считается любой небезопасный метод HTTP или запись через ORM.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get() or request.method not in ('GET', 'HEAD', 'OPTIONS')
+        finally:
+            _wrote.reset(token)
+        user = getattr(request, 'user', None)
+        if wrote and user is not None and user.is_authenticated:
+            mark_sticky(user.pk)
+        return response
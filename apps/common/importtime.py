@@ -0,0 +1,146 @@
+"""
+Аудит времени импорта при старте процессов
+
+Старт веб-процесса, воркера Celery и бота запускается в отдельном
+интерпретаторе с `python -X importtime`; вывод разбирается в записи
+модулей с собственным и накопленным временем и цепочкой импортеров.
+Команда import_audit показывает самые тяжелые модули и сравнивает
+медианное время старта с бюджетом STARTUP_BUDGET_MS.
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+# Код, который выполняет каждый процесс при старте
+STARTUP_TARGETS = {
+    'web': (
+        'import django; django.setup(); '
+        'import onboarding.wsgi, onboarding.urls'
+    ),
+    'celery': (
+        'import django; django.setup(); '
+        'from onboarding.celery import app; app.loader.import_default_modules()'
+    ),
+    'bot': (
+        'import django; django.setup(); '
+        'import apps.bot.handlers'
+    ),
+}
+
+# Окружение процесса как в entrypoint.sh
+TARGET_ENV = {
+    'celery': {'CELERY_SKIP_CHECKS': '1'},
+}
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+
+class ImportAuditError(Exception):
+    """Процесс старта завершился с ошибкой"""
+
+
+@dataclass
+class ImportRecord:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+    chain: tuple = field(default=())
+
+    @property
+    def cumulative_ms(self):
+        return self.cumulative_us / 1000
+
+    @property
+    def self_ms(self):
+        return self.self_us / 1000
+
+
+def parse_importtime(output):
+    """
+    Разбирает вывод `-X importtime`
+
+    Python печатает модуль после его вложенных импортов, поэтому импортер
+    модуля — ближайшая следующая строка с меньшим отступом.
+
+    Returns:
+        list[ImportRecord]: записи в порядке вывода с цепочкой импортеров
+    """
+    rows = []
+    for line in output.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+
+    records = []
+    parents = []  # стек (глубина, имя) еще не закрытых импортеров
+    for name, self_us, cumulative_us, depth in reversed(rows):
+        while parents and parents[-1][0] >= depth:
+            parents.pop()
+        records.append(ImportRecord(
+            name=name,
+            self_us=self_us,
+            cumulative_us=cumulative_us,
+            depth=depth,
+            chain=tuple(parent for _, parent in parents),
+        ))
+        parents.append((depth, name))
+    records.reverse()
+    return records
+
+
+def heaviest(records, top=20):
+    """Модули с наибольшим накопленным временем"""
+    return sorted(records, key=lambda record: record.cumulative_us, reverse=True)[:top]
+
+
+def find_module(records, name):
+    """Записи модуля и его подмодулей (name или name.*), самые тяжелые первыми"""
+    return heaviest(
+        [record for record in records if record.name == name or record.name.startswith(f'{name}.')],
+        top=None,
+    )
+
+
+def _run(target, importtime=True):
+    if target not in STARTUP_TARGETS:
+        raise ImportAuditError(f"Неизвестный процесс: {target}")
+
+    env = {**os.environ, **TARGET_ENV.get(target, {})}
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'onboarding.settings')
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', STARTUP_TARGETS[target]]
+
+    started = time.perf_counter()
+    result = subprocess.run(
+        command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if result.returncode:
+        raise ImportAuditError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else target)
+    return result.stderr, elapsed_ms
+
+
+def audit(target):
+    """Записи импорта при старте процесса"""
+    output, _ = _run(target)
+    return parse_importtime(output)
+
+
+def benchmark(target, repeat=5):
+    """Медианное время старта процесса в миллисекундах (без -X importtime)"""
+    return statistics.median(_run(target, importtime=False)[1] for _ in range(repeat))
+
+
+def startup_budget(target):
+    """Бюджет старта процесса из STARTUP_BUDGET_MS (None — без ограничения)"""
+    return getattr(settings, 'STARTUP_BUDGET_MS', {}).get(target)
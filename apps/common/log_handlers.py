@@ -0,0 +1,21 @@
+"""
+Обработчики логов
+"""
+import logging
+import os
+
+
+class LazyFileHandler(logging.FileHandler):
+    """
+    Файловый обработчик, который открывает файл при первой записи
+
+    Импорт настроек не создает каталогов и файлов: воркер или команда,
+    которые ничего не пишут в лог, стартуют без обращения к диску.
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, delay=True, errors=None):
+        super().__init__(filename, mode=mode, encoding=encoding, delay=delay, errors=errors)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
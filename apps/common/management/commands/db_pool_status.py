@@ -0,0 +1,58 @@
+"""
+Команда отчета о занятости соединений с БД
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.common.db_connections import connection_counters, pool_status, reset_counters
+
+
+class Command(BaseCommand):
+    """
+    Показывает соединения по ролям процессов и долю занятых max_connections
+    """
+    help = 'Отчет о насыщении пула соединений PostgreSQL по ролям процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Алиас БД')
+        parser.add_argument(
+            '--warn-percent',
+            type=int,
+            default=getattr(settings, 'DB_POOL_WARN_PERCENT', 80),
+            help='Порог предупреждения, % от доступных соединений'
+        )
+        parser.add_argument('--reset', action='store_true', help='Обнулить счетчики открытых соединений')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        counters = connection_counters(alias)
+        status = pool_status(alias)
+
+        self.stdout.write(f"🔌 Открыто соединений с запуска счетчиков ({alias}):")
+        for role, opened in counters.items():
+            self.stdout.write(f"   {role}: {opened}")
+
+        if status is None:
+            self.stdout.write(self.style.WARNING('⚠️ Занятость доступна только для PostgreSQL'))
+        else:
+            available = status['max_connections'] - status['reserved']
+            percent = status['used'] / available * 100 if available else 100
+            self.stdout.write(f"📊 Занято {status['used']} из {available} ({percent:.0f}%):")
+            for role, states in sorted(status['roles'].items()):
+                details = ', '.join(f"{state} {count}" for state, count in sorted(states.items()))
+                self.stdout.write(f"   {role}: {sum(states.values())} ({details})")
+                idle_in_transaction = states.get('idle in transaction', 0)
+                if idle_in_transaction:
+                    self.stdout.write(self.style.WARNING(
+                        f"   ⚠️ {role}: {idle_in_transaction} соединений простаивают в транзакции"
+                    ))
+            if percent >= options['warn_percent']:
+                self.stdout.write(self.style.ERROR(
+                    f"❌ Пул близок к исчерпанию: {percent:.0f}% ≥ {options['warn_percent']}%"
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS('✅ Запас соединений есть'))
+
+        if options['reset']:
+            reset_counters(alias)
+            self.stdout.write('🧹 Счетчики обнулены')
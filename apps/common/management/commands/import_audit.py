@@ -0,0 +1,64 @@
+"""
+Команда аудита времени импорта при старте процессов
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.common.importtime import (
+    STARTUP_TARGETS, ImportAuditError, audit, benchmark, find_module, heaviest, startup_budget,
+)
+
+
+class Command(BaseCommand):
+    """
+    Показывает самые тяжелые импорты при старте и проверяет бюджет времени старта
+    """
+    help = 'Аудит импорта при старте web, celery и bot (python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', nargs='?', default='web', choices=sorted(STARTUP_TARGETS))
+        parser.add_argument('--top', type=int, default=20, help='Сколько модулей показать')
+        parser.add_argument('--module', help='Показать, кто импортирует модуль и его подмодули')
+        parser.add_argument('--benchmark', action='store_true', help='Замерить время старта и сравнить с бюджетом')
+        parser.add_argument('--repeat', type=int, default=5, help='Число запусков для замера')
+        parser.add_argument('--max-ms', type=int, help='Бюджет старта, мс (по умолчанию STARTUP_BUDGET_MS)')
+
+    def handle(self, *args, **options):
+        target = options['target']
+        try:
+            if options['benchmark']:
+                self.check_budget(target, options['repeat'], options['max_ms'])
+            else:
+                self.report(target, audit(target), options['top'], options['module'])
+        except ImportAuditError as exc:
+            raise CommandError(f"Старт {target} завершился с ошибкой: {exc}")
+
+    def report(self, target, records, top, module):
+        if module:
+            found = find_module(records, module)
+            if not found:
+                self.stdout.write(self.style.SUCCESS(f"✅ {module} не импортируется при старте {target}"))
+                return
+            self.stdout.write(f"🔎 {module} при старте {target}:")
+            for record in found[:top]:
+                chain = ' ← '.join(reversed(record.chain)) or 'верхний уровень'
+                self.stdout.write(f"   {record.cumulative_ms:8.1f} мс  {record.name} ← {chain}")
+            return
+
+        self.stdout.write(f"📦 Самые тяжелые импорты при старте {target}:")
+        for record in heaviest(records, top):
+            self.stdout.write(
+                f"   {record.cumulative_ms:8.1f} мс (свои {record.self_ms:6.1f})  {record.name}"
+            )
+        total = sum(record.self_us for record in records) / 1000
+        self.stdout.write(f"⏱️ Всего на импорт: {total:.0f} мс, модулей: {len(records)}")
+
+    def check_budget(self, target, repeat, max_ms):
+        budget = max_ms or startup_budget(target)
+        elapsed = benchmark(target, repeat)
+        self.stdout.write(f"⏱️ Старт {target}: {elapsed:.0f} мс (медиана {repeat} запусков)")
+        if budget is None:
+            self.stdout.write(self.style.WARNING(f"⚠️ Бюджет для {target} не задан"))
+        elif elapsed > budget:
+            raise CommandError(f"❌ Старт {target} дольше бюджета: {elapsed:.0f} мс > {budget} мс")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ В пределах бюджета {budget} мс"))
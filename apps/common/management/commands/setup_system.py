@@ -2,6 +2,7 @@
 Django команда для первоначальной настройки системы
 """
 import os
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.contrib.auth import get_user_model
@@ -13,6 +14,10 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('🚀 Настройка системы...'))
         
+        # Каталоги статики и медиа (настройки их больше не создают при импорте)
+        for directory in (*settings.STATICFILES_DIRS, settings.MEDIA_ROOT):
+            os.makedirs(directory, exist_ok=True)
+        
         success_count = 0
         
         # Создание ролей
@@ -111,7 +116,9 @@ class Command(BaseCommand):
                 {'name': 'Проверка просроченных потоков', 'task': 'apps.flows.tasks.check_overdue_flows', 'interval': daily},
                 {'name': 'Отправка напоминаний', 'task': 'apps.flows.tasks.send_flow_reminders', 'interval': hourly},
                 {'name': 'Генерация статистики', 'task': 'apps.flows.tasks.generate_daily_statistics', 'interval': daily},
-                {'name': 'Очистка сессий', 'task': 'apps.users.tasks.cleanup_expired_sessions', 'interval': daily}
+                {'name': 'Очистка сессий', 'task': 'apps.users.tasks.cleanup_expired_sessions', 'interval': daily},
+                {'name': 'Очистка данных потоков', 'task': 'apps.flows.tasks.cleanup_old_flow_data', 'interval': daily},
+                {'name': 'Очистка просмотров статей', 'task': 'apps.guides.tasks.cleanup_article_views', 'interval': daily}
             ]
             
             created_count = 0
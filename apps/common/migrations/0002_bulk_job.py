@@ -0,0 +1,132 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("common", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BulkJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        db_index=True,
+                        help_text="Автоматически устанавливается при создании записи",
+                        verbose_name="Дата создания",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        db_index=True,
+                        help_text="Автоматически обновляется при изменении записи",
+                        verbose_name="Дата обновления",
+                    ),
+                ),
+                ("operation", models.CharField(max_length=50, verbose_name="Операция")),
+                (
+                    "model_label",
+                    models.CharField(max_length=100, verbose_name="Модель"),
+                ),
+                ("query", models.BinaryField(verbose_name="Запрос")),
+                (
+                    "params",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Параметры"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "В очереди"),
+                            ("running", "Выполняется"),
+                            ("completed", "Завершена"),
+                            ("failed", "Ошибка"),
+                            ("cancelled", "Отменена"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "total",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Всего объектов"
+                    ),
+                ),
+                (
+                    "processed",
+                    models.PositiveIntegerField(default=0, verbose_name="Обработано"),
+                ),
+                (
+                    "failed",
+                    models.PositiveIntegerField(default=0, verbose_name="С ошибкой"),
+                ),
+                (
+                    "last_pk",
+                    models.BigIntegerField(
+                        blank=True, null=True, verbose_name="Последний обработанный PK"
+                    ),
+                ),
+                (
+                    "errors",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        help_text='Первые ошибки: [{"pk": ..., "error": ...}]',
+                        verbose_name="Ошибки",
+                    ),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Начало"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Завершение"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="bulk_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Создал",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Массовая операция",
+                "verbose_name_plural": "Массовые операции",
+                "db_table": "bulk_jobs",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:10
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_unfinished_jobs(apps, schema_editor):
+    """
+    Незавершенные операции хранили сериализованный запрос: его не
+    распаковываем, операцию нужно поставить заново
+    """
+    db_alias = schema_editor.connection.alias
+    BulkJob = apps.get_model("common", "BulkJob")
+    BulkJob.objects.using(db_alias).filter(status__in=["pending", "running"]).update(
+        status="failed",
+        finished_at=timezone.now(),
+        errors=[{"pk": None, "error": "Операция поставлена до обновления, запустите ее заново"}],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("common", "0002_bulk_job"),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_unfinished_jobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="bulkjob",
+            name="query",
+        ),
+        migrations.AddField(
+            model_name="bulkjob",
+            name="object_ids",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="Отсортированный набор операции",
+                verbose_name="PK объектов",
+            ),
+        ),
+    ]
@@ -7,6 +7,16 @@ from django.db.models import Q
 from django.utils import timezone
 from django.core.exceptions import PermissionDenied
 
+from .db_router import replica_reads
+
+
+class ReplicaReadMixin:
+    """
+    Миксин для списков: GET читает с реплики (apps.common.db_router)
+    """
+    def get(self, request, *args, **kwargs):
+        return replica_reads(super().get)(request, *args, **kwargs)
+
 
 class TimestampMixin:
     """
@@ -224,32 +234,47 @@ class AuditMixin:
 
 class CacheMixin:
     """
-    Миксин для кеширования ответов
+    Миксин для кеширования GET-ответов через apps.common.cache
     """
     cache_timeout = 300  # 5 минут по умолчанию
     cache_key_prefix = 'api'
+    cache_tags = ()
+    cache_vary_on_user = True
     
     def get_cache_key(self):
         """Генерирует ключ кеша"""
-        path = self.request.path
-        query_params = self.request.query_params.urlencode()
-        user_id = self.request.user.id if self.request.user.is_authenticated else 'anonymous'
+        from apps.common.cache import make_key
         
-        return f"{self.cache_key_prefix}:{user_id}:{path}:{query_params}"
-    
-    def get_cached_response(self):
-        """Получает ответ из кеша"""
-        from django.core.cache import cache
+        user_id = None
+        if self.cache_vary_on_user and self.request.user.is_authenticated:
+            user_id = self.request.user.id
         
-        cache_key = self.get_cache_key()
-        return cache.get(cache_key)
+        return make_key(
+            f"{self.cache_key_prefix}.{self.__class__.__name__}",
+            self.request.path, self.request.query_params.urlencode(), user_id
+        )
+    
+    def get_cache_tags(self):
+        """Теги кеша с подстановкой kwargs представления"""
+        return [tag.format(**self.kwargs) for tag in self.cache_tags]
     
-    def set_cached_response(self, response_data):
-        """Сохраняет ответ в кеш"""
-        from django.core.cache import cache
+    def get(self, request, *args, **kwargs):
+        """Отдает данные из кеша, кешируя только успешные ответы"""
+        from apps.common.cache import get_or_set, Uncacheable
         
-        cache_key = self.get_cache_key()
-        cache.set(cache_key, response_data, self.cache_timeout)
+        def produce():
+            response = super(CacheMixin, self).get(request, *args, **kwargs)
+            if response.status_code != 200:
+                raise Uncacheable(response)
+            return response.data
+        
+        try:
+            data = get_or_set(
+                self.get_cache_key(), produce, self.cache_timeout, self.get_cache_tags()
+            )
+        except Uncacheable as exc:
+            return exc.value
+        return Response(data)
 
 
 class ErrorHandlingMixin:
@@ -148,4 +148,74 @@ class WorkingCalendar(models.Model):
         ordering = ['date']
     
     def __str__(self):
-        return f"{self.date} - {'Рабочий' if self.is_working_day else 'Выходной'}"
\ No newline at end of file
+        return f"{self.date} - {'Рабочий' if self.is_working_day else 'Выходной'}"
+
+class BulkJob(TimestampedModel):
+    """
+    Фоновая массовая операция над набором объектов
+    
+    Набор хранится как сериализованный запрос и обрабатывается
+    пачками по возрастанию PK; last_pk — точка продолжения.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        COMPLETED = 'completed', 'Завершена'
+        FAILED = 'failed', 'Ошибка'
+        CANCELLED = 'cancelled', 'Отменена'
+    
+    FINAL_STATUSES = (Status.COMPLETED, Status.FAILED, Status.CANCELLED)
+    MAX_ERRORS = 100
+    
+    operation = models.CharField('Операция', max_length=50)
+    model_label = models.CharField('Модель', max_length=100)
+    object_ids = models.JSONField('PK объектов', default=list, blank=True, help_text='Отсортированный набор операции')
+    params = models.JSONField('Параметры', default=dict, blank=True)
+    status = models.CharField(
+        'Статус',
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True
+    )
+    total = models.PositiveIntegerField('Всего объектов', default=0)
+    processed = models.PositiveIntegerField('Обработано', default=0)
+    failed = models.PositiveIntegerField('С ошибкой', default=0)
+    last_pk = models.BigIntegerField('Последний обработанный PK', null=True, blank=True)
+    errors = models.JSONField(
+        'Ошибки',
+        default=list,
+        blank=True,
+        help_text='Первые ошибки: [{"pk": ..., "error": ...}]'
+    )
+    created_by = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='bulk_jobs',
+        verbose_name='Создал'
+    )
+    started_at = models.DateTimeField('Начало', null=True, blank=True)
+    finished_at = models.DateTimeField('Завершение', null=True, blank=True)
+    
+    class Meta:
+        db_table = 'bulk_jobs'
+        verbose_name = 'Массовая операция'
+        verbose_name_plural = 'Массовые операции'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.operation} #{self.pk} ({self.get_status_display()})"
+    
+    @property
+    def progress_percentage(self):
+        if not self.total:
+            return 100 if self.status == self.Status.COMPLETED else 0
+        return min(self.processed / self.total * 100, 100)
+    
+    def cancel(self):
+        """Отменяет операцию; выполняющаяся остановится после текущей пачки"""
+        return BulkJob.objects.filter(pk=self.pk).exclude(
+            status__in=self.FINAL_STATUSES
+        ).update(status=self.Status.CANCELLED, finished_at=timezone.now()) > 0
@@ -0,0 +1,15 @@
+"""
+Общий клиент Redis для структур, которых нет в API кэша Django
+(sorted set, streams)
+"""
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=1)
+def get_redis():
+    """Возвращает клиент Redis по REDIS_URL (один пул соединений на процесс)"""
+    import redis
+
+    return redis.Redis.from_url(settings.REDIS_URL)
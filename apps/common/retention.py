@@ -0,0 +1,182 @@
+"""
+Очистка устаревших данных по политикам хранения
+
+Политика описывает модель, поле возраста, срок хранения и дополнительный
+фильтр. Записи удаляются пачками по диапазонам первичного ключа, каждая
+пачка — отдельный короткий запрос. Если у модели нет каскадов и сигналов
+удаления, используется _raw_delete (один DELETE без сборщика Django).
+before_delete политики вызывается в той же транзакции, что и удаление
+пачки, и поправляет зависящие от записей счетчики.
+Последний обработанный PK сохраняется в кэше, прерванный запуск
+продолжается с него.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import Q
+from django.db.models.deletion import Collector
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('apps.common.retention')
+
+CHECKPOINT_KEY_PREFIX = 'retention:checkpoint'
+CHECKPOINT_TIMEOUT = 60 * 60 * 24 * 7
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Политика хранения
+
+    days_setting — имя настройки со сроком хранения в днях (days — значение
+    по умолчанию); записи с age_field раньше now - days удаляются.
+    before_delete — путь к функции, которая получает queryset пачки
+    перед удалением.
+    """
+    name: str
+    model: str
+    age_field: str
+    days: int
+    days_setting: Optional[str] = None
+    extra_filter: Optional[Q] = None
+    before_delete: Optional[str] = None
+
+    def get_model(self):
+        return apps.get_model(self.model)
+
+    def get_days(self):
+        if self.days_setting:
+            return getattr(settings, self.days_setting, self.days)
+        return self.days
+
+    def queryset(self, now=None):
+        cutoff = (now or timezone.now()) - timedelta(days=self.get_days())
+        queryset = self.get_model()._base_manager.filter(**{f'{self.age_field}__lt': cutoff})
+        if self.extra_filter is not None:
+            queryset = queryset.filter(self.extra_filter)
+        return queryset.order_by()
+
+
+POLICIES = {
+    policy.name: policy for policy in (
+        RetentionPolicy(
+            name='flow_actions',
+            model='flows.FlowAction',
+            age_field='performed_at',
+            days=365,
+            days_setting='FLOW_ACTION_RETENTION_DAYS',
+        ),
+        RetentionPolicy(
+            name='quiz_answers',
+            model='flows.UserQuizAnswer',
+            age_field='answered_at',
+            days=180,
+            days_setting='QUIZ_ANSWER_RETENTION_DAYS',
+            extra_filter=Q(user_flow__status='completed'),
+            before_delete='apps.flows.quiz_stats.forget_answers',
+        ),
+        RetentionPolicy(
+            name='telegram_sessions',
+            model='users.TelegramSession',
+            age_field='expires_at',
+            days=0,
+        ),
+        RetentionPolicy(
+            name='article_views',
+            model='guides.ArticleView',
+            age_field='viewed_at',
+            days=730,
+            days_setting='ARTICLE_VIEW_RETENTION_DAYS',
+        ),
+    )
+}
+
+
+def checkpoint_key(name):
+    return f'{CHECKPOINT_KEY_PREFIX}:{name}'
+
+
+def run_policy(policy, batch_size=None, pause=None, max_seconds=None, now=None):
+    """
+    Удаляет устаревшие записи политики
+
+    Args:
+        policy (RetentionPolicy | str): Политика или ее имя
+        batch_size (int): Записей в пачке
+        pause (float): Пауза между пачками, секунд
+        max_seconds (float): Ограничение времени; по истечении запуск
+            останавливается, прогресс остается в контрольной точке
+
+    Returns:
+        dict: Число удаленных записей, пачек, скорость и признак завершения
+    """
+    if isinstance(policy, str):
+        policy = POLICIES[policy]
+    if batch_size is None:
+        batch_size = getattr(settings, 'RETENTION_BATCH_SIZE', 5000)
+    if pause is None:
+        pause = getattr(settings, 'RETENTION_BATCH_PAUSE', 0.1)
+
+    model = policy.get_model()
+    using = router.db_for_write(model)
+    queryset = policy.queryset(now).using(using)
+    fast = Collector(using=using).can_fast_delete(queryset)
+    before_delete = import_string(policy.before_delete) if policy.before_delete else None
+    key = checkpoint_key(policy.name)
+    last_pk = cache.get(key)
+
+    started = time.monotonic()
+    deleted = batches = 0
+    finished = False
+    while True:
+        pending = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        ids = list(pending.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            finished = True
+            break
+
+        batch = queryset.filter(pk__gte=ids[0], pk__lte=ids[-1])
+        with transaction.atomic(using=using):
+            if before_delete:
+                before_delete(batch)
+            if fast:
+                deleted += batch._raw_delete(using)
+            else:
+                deleted += model._base_manager.using(using).filter(pk__in=ids).delete()[0]
+        batches += 1
+        last_pk = ids[-1]
+        cache.set(key, last_pk, CHECKPOINT_TIMEOUT)
+
+        if len(ids) < batch_size:
+            finished = True
+            break
+        if max_seconds is not None and time.monotonic() - started >= max_seconds:
+            break
+        if pause:
+            time.sleep(pause)
+
+    if finished:
+        cache.delete(key)
+
+    seconds = time.monotonic() - started
+    report = {
+        'policy': policy.name,
+        'deleted': deleted,
+        'batches': batches,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(deleted / seconds, 1) if seconds else deleted,
+        'finished': finished,
+    }
+    logger.info(
+        f"Очистка {policy.name}: удалено {deleted} записей за {batches} пачек, "
+        f"{report['rows_per_second']} строк/с{'' if finished else ', будет продолжено'}"
+    )
+    return report
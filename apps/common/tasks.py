@@ -1,7 +1,7 @@
 """
-Базовые классы для Celery задач
+Базовые классы и общие задачи Celery
 """
-from celery import Task
+from celery import Task, shared_task
 from django.core.cache import cache
 import logging
 from typing import Any, Optional, Dict
@@ -84,4 +84,22 @@ class PeriodicTask(BaseTask):
                 return None
         else:
             logger.debug(f"Task {self.name} skipped - too soon")
-            return None 
\ No newline at end of file
+            return None 
+
+
+@shared_task(bind=True)
+def run_bulk_job(self, job_id):
+    """
+    Выполняет массовую операцию; по истечении кванта времени ставит продолжение
+    """
+    from .bulk_jobs import run
+    from .models import BulkJob
+    
+    try:
+        status = run(job_id)
+        if status == BulkJob.Status.RUNNING:
+            run_bulk_job.apply_async(args=[job_id])
+        return {'job_id': job_id, 'status': status}
+    except Exception as e:
+        logger.error(f"Error in bulk job {job_id}: {e}")
+        raise
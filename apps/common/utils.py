@@ -5,6 +5,7 @@ import hashlib
 import hmac
 import secrets
 import string
+from functools import lru_cache
 from datetime import datetime, timedelta, date
 from typing import List, Dict, Any, Optional
 from django.utils import timezone
@@ -50,6 +51,16 @@ def generate_secure_token(length: int = 32) -> str:
     return secrets.token_hex(length)
 
 
+@lru_cache(maxsize=8)
+def get_telegram_secret_key(bot_token: str) -> bytes:
+    """
+    Возвращает секретный ключ для проверки подписи Telegram
+    
+    Ключ зависит только от токена бота, поэтому вычисляется один раз на процесс.
+    """
+    return hashlib.sha256(bot_token.encode()).digest()
+
+
 def validate_telegram_data(data: Dict[str, Any], bot_token: str) -> bool:
     """
     Валидирует данные от Telegram WebApp
@@ -69,12 +80,9 @@ def validate_telegram_data(data: Dict[str, Any], bot_token: str) -> bool:
     # Создаем строку для проверки
     data_check_string = '\n'.join([f"{k}={v}" for k, v in sorted(data.items()) if v])
     
-    # Создаем секретный ключ
-    secret_key = hashlib.sha256(bot_token.encode()).digest()
-    
     # Вычисляем ожидаемый хеш
     expected_hash = hmac.new(
-        secret_key,
+        get_telegram_secret_key(bot_token),
         data_check_string.encode(),
         hashlib.sha256
     ).hexdigest()
@@ -2,13 +2,17 @@
 Административная панель для потоков обучения
 """
 from django.contrib import admin
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django.urls import reverse
-from django.db.models import Count
+from django.db.models import Count, OuterRef
 
+from apps.common.admin import (
+    AutocompleteFilter, BulkJobActionForm, LargeTableAdminMixin, bulk_job_action
+)
+from .managers import count_subquery
 from .models import (
     Flow, FlowStep, Task, Quiz, QuizQuestion, QuizAnswer,
-    UserFlow, FlowBuddy, UserStepProgress, UserQuizAnswer, FlowAction
+    UserFlow, FlowBuddy, UserStepProgress, UserQuizAnswer, FlowAction, FlowDepartmentRule
 )
 
 
@@ -23,6 +27,15 @@ class FlowStepInline(admin.TabularInline):
     ordering = ['order']
 
 
+class FlowDepartmentRuleInline(admin.TabularInline):
+    """
+    Отделы, сотрудникам которых поток назначается автоматически
+    """
+    model = FlowDepartmentRule
+    extra = 0
+    fields = ['department']
+
+
 @admin.register(Flow)
 class FlowAdmin(admin.ModelAdmin):
     """
@@ -41,7 +54,7 @@ class FlowAdmin(admin.ModelAdmin):
             'fields': ('title', 'description')
         }),
         ('Настройки', {
-            'fields': ('is_mandatory', 'auto_assign_departments', 'is_active')
+            'fields': ('is_mandatory', 'is_active')
         }),
         ('Статистика', {
             'fields': ('total_steps',),
@@ -53,26 +66,43 @@ class FlowAdmin(admin.ModelAdmin):
         }),
     )
     
-    inlines = [FlowStepInline]
+    inlines = [FlowDepartmentRuleInline, FlowStepInline]
+    actions = ['sync_departments']
     
     def total_steps_display(self, obj):
-        return obj.total_steps
+        return obj.steps_count
     total_steps_display.short_description = 'Всего этапов'
-    
+    total_steps_display.admin_order_field = 'steps_count'
     
     def assignments_count(self, obj):
         """Количество назначений потока"""
-        count = obj.user_flows.count()
+        count = obj.user_flows_count
         if count > 0:
             url = reverse('admin:flows_userflow_changelist') + f'?flow__id__exact={obj.id}'
             return format_html('<a href="{}">{}</a>', url, count)
         return 0
     assignments_count.short_description = 'Назначений'
+    assignments_count.admin_order_field = 'user_flows_count'
     
     def get_queryset(self, request):
+        # Подзапросы вместо Count по двум JOIN-ам, которые перемножают строки
         return super().get_queryset(request).annotate(
-            assignments_count=Count('user_flows')
+            steps_count=count_subquery(FlowStep.objects.filter(flow=OuterRef('pk')), 'flow'),
+            user_flows_count=count_subquery(UserFlow.objects.filter(flow=OuterRef('pk')), 'flow'),
+        )
+    
+    def sync_departments(self, request, queryset):
+        """Досоздает назначения сотрудникам отделов выбранных потоков"""
+        from .assignment import departments_for_flows
+        from .tasks import sync_department_flows
+        
+        departments = departments_for_flows(queryset.values_list('id', flat=True))
+        for department in departments:
+            sync_department_flows.delay(department)
+        self.message_user(
+            request, f"Синхронизация поставлена в очередь для отделов: {', '.join(departments) or 'нет'}"
         )
+    sync_departments.short_description = 'Назначить потоки сотрудникам отделов'
 
 
 class TaskInline(admin.StackedInline):
@@ -191,7 +221,7 @@ class QuizAdmin(admin.ModelAdmin):
     ]
     list_filter = ['flow_step__flow', 'passing_score_percentage', 'is_active']
     search_fields = ['title', 'description', 'flow_step__title']
-    readonly_fields = ['created_at', 'updated_at', 'total_questions']
+    readonly_fields = ['created_at', 'updated_at', 'total_questions', 'item_statistics']
     
     fieldsets = (
         ('Основная информация', {
@@ -201,7 +231,7 @@ class QuizAdmin(admin.ModelAdmin):
             'fields': ('passing_score_percentage', 'shuffle_questions', 'shuffle_answers', 'is_active')
         }),
         ('Статистика', {
-            'fields': ('total_questions',)
+            'fields': ('total_questions', 'item_statistics')
         }),
         ('Временные метки', {
             'fields': ('created_at', 'updated_at'),
@@ -215,6 +245,32 @@ class QuizAdmin(admin.ModelAdmin):
         return f"{obj.flow_step.flow.title} - {obj.flow_step.title}"
     flow_step_title.short_description = 'Этап'
     
+    def item_statistics(self, obj):
+        """Таблица по вопросам из счетчиков, без чтения ответов"""
+        if not obj.pk:
+            return '-'
+        from .quiz_stats import quiz_item_stats
+        
+        rows = []
+        for item in quiz_item_stats(obj)['questions']:
+            distractors = ', '.join(
+                f"{option['text'][:30]}: {option['picks']}"
+                for option in item['options'] if not option['is_correct']
+            )
+            rows.append((
+                item['order'], item['text'][:80], item['attempts'],
+                '-' if item['correct_rate'] is None else f"{item['correct_rate']}%",
+                distractors or '-'
+            ))
+        if not rows:
+            return '-'
+        return format_html(
+            '<table><tr><th>#</th><th>Вопрос</th><th>Ответов</th><th>Правильных</th>'
+            '<th>Выборы неправильных вариантов</th></tr>{}</table>',
+            format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>', rows)
+        )
+    item_statistics.short_description = 'Анализ вопросов'
+    
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('flow_step__flow')
 
@@ -283,7 +339,7 @@ class UserStepProgressInline(admin.TabularInline):
 
 
 @admin.register(UserFlow)
-class UserFlowAdmin(admin.ModelAdmin):
+class UserFlowAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """
     Административная панель для прохождения потоков
     """
@@ -291,10 +347,24 @@ class UserFlowAdmin(admin.ModelAdmin):
         'user_name', 'flow_title', 'status', 'progress_display',
         'is_overdue_display', 'started_at', 'expected_completion_date'
     ]
-    list_filter = ['status', 'flow', 'expected_completion_date', 'started_at']
+    list_filter = [
+        'status', ('flow', AutocompleteFilter), ('user', AutocompleteFilter),
+        'expected_completion_date', 'started_at'
+    ]
     search_fields = ['user__name', 'user__email', 'flow__title']
+    autocomplete_fields = ['user', 'flow', 'current_step', 'paused_by']
+    
+    # Выполняются в фоне (BulkJob), параметры — в форме действия
+    action_form = BulkJobActionForm
+    actions = [
+        bulk_job_action('pause', 'Приостановить', params=('reason',)),
+        bulk_job_action('resume', 'Возобновить', params=('reason',)),
+        bulk_job_action('extend_deadline', 'Продлить дедлайн', params=('days', 'reason')),
+        bulk_job_action('reassign_buddy', 'Назначить бадди', params=('buddy_id', 'reason')),
+        bulk_job_action('renotify', 'Повторно уведомить', params=('message',)),
+    ]
     readonly_fields = [
-        'created_at', 'updated_at', 'progress_percentage', 'is_overdue'
+        'created_at', 'updated_at', 'progress_percentage', 'is_overdue', 'paused_intervals'
     ]
     
     fieldsets = (
@@ -302,7 +372,10 @@ class UserFlowAdmin(admin.ModelAdmin):
             'fields': ('user', 'flow', 'status', 'current_step')
         }),
         ('Управление', {
-            'fields': ('paused_by', 'paused_at', 'pause_reason', 'expected_completion_date')
+            'fields': (
+                'paused_by', 'paused_at', 'pause_reason', 'paused_intervals',
+                'expected_completion_date', 'deadline_is_manual'
+            )
         }),
         ('Прогресс', {
             'fields': ('progress_percentage', 'is_overdue', 'started_at', 'completed_at')
@@ -326,16 +399,19 @@ class UserFlowAdmin(admin.ModelAdmin):
     flow_title.admin_order_field = 'flow__title'
     
     def progress_display(self, obj):
-        progress = obj.progress_percentage
+        # Как progress_percentage, но из аннотаций get_queryset
+        total = obj.total_steps_count
+        progress = (obj.completed_steps_count / total * 100) if total else 100
         if progress >= 100:
             color = 'green'
         elif progress >= 50:
             color = 'orange'
         else:
             color = 'red'
+        # format_html экранирует аргументы в строки, число форматируем заранее
         return format_html(
-            '<span style="color: {};">{:.1f}%</span>',
-            color, progress
+            '<span style="color: {};">{}%</span>',
+            color, f'{progress:.1f}'
         )
     progress_display.short_description = 'Прогресс'
     
@@ -345,12 +421,30 @@ class UserFlowAdmin(admin.ModelAdmin):
         return '-'
     is_overdue_display.short_description = 'Просрочка'
     
+    def save_model(self, request, obj, form, change):
+        # Исправленный вручную дедлайн больше не пересчитывается
+        if change and 'expected_completion_date' in form.changed_data:
+            obj.deadline_is_manual = True
+        super().save_model(request, obj, form, change)
+    
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'flow', 'current_step')
+        return super().get_queryset(request).select_related(
+            'user', 'flow', 'current_step'
+        ).annotate(
+            completed_steps_count=count_subquery(
+                UserStepProgress.objects.filter(
+                    user_flow=OuterRef('pk'), status=UserStepProgress.StepStatus.COMPLETED
+                ),
+                'user_flow'
+            ),
+            total_steps_count=count_subquery(
+                FlowStep.objects.filter(flow=OuterRef('flow_id')), 'flow'
+            ),
+        )
 
 
 @admin.register(FlowAction)
-class FlowActionAdmin(admin.ModelAdmin):
+class FlowActionAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """
     Административная панель для действий с потоками
     """
@@ -358,7 +452,10 @@ class FlowActionAdmin(admin.ModelAdmin):
         'action_type', 'user_flow_display', 'performed_by_name', 
         'performed_at', 'reason_preview'
     ]
-    list_filter = ['action_type', 'performed_at', 'user_flow__flow']
+    list_filter = [
+        'action_type', 'performed_at',
+        ('user_flow__flow', AutocompleteFilter), ('performed_by', AutocompleteFilter)
+    ]
     search_fields = ['user_flow__user__name', 'performed_by__name', 'reason']
     readonly_fields = ['performed_at', 'created_at']
     
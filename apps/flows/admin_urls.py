@@ -4,7 +4,9 @@ URL для административных функций (/api/admin/)
 from django.urls import path
 from apps.flows.views import (
     AdminFlowListView, AdminFlowDetailView, AdminFlowStepListView,
-    AdminFlowStepDetailView, AdminAnalyticsOverviewView,
+    AdminFlowStepDetailView, AdminAnalyticsOverviewView, FlowCohortAnalyticsView,
+    AdminQuizStatsView, AdminExportView, AdminExportDownloadView,
+    AdminBulkJobListView, AdminBulkJobDetailView, AdminBulkJobCancelView,
     flow_statistics, problem_users_report
 )
 
@@ -20,7 +22,18 @@ urlpatterns = [
     # Аналитика и отчеты
     path('analytics/overview/', AdminAnalyticsOverviewView.as_view(), name='admin-analytics-overview'),
     path('analytics/flows/', flow_statistics, name='admin-analytics-flows'),
+    path('analytics/flows/<int:flow_id>/cohorts/', FlowCohortAnalyticsView.as_view(), name='admin-analytics-flow-cohorts'),
+    path('quizzes/<int:quiz_id>/stats/', AdminQuizStatsView.as_view(), name='admin-quiz-stats'),
     path('analytics/users/', flow_statistics, name='admin-analytics-users'),  # Алиас
     path('reports/completion/', flow_statistics, name='admin-reports-completion'),  # Алиас
     path('reports/problems/', problem_users_report, name='admin-reports-problems'),
+    
+    # Выгрузки
+    path('exports/download/<str:token>/', AdminExportDownloadView.as_view(), name='admin-export-download'),
+    path('exports/<str:dataset>/', AdminExportView.as_view(), name='admin-export'),
+    
+    # Массовые операции над прохождениями
+    path('bulk-jobs/', AdminBulkJobListView.as_view(), name='admin-bulk-jobs'),
+    path('bulk-jobs/<int:pk>/', AdminBulkJobDetailView.as_view(), name='admin-bulk-job-detail'),
+    path('bulk-jobs/<int:pk>/cancel/', AdminBulkJobCancelView.as_view(), name='admin-bulk-job-cancel'),
 ]
\ No newline at end of file
@@ -0,0 +1,273 @@
+"""
+Когортная аналитика по потокам
+
+Отчет строится по одному потоку и когорте (отдел, месяц найма) из
+сгруппированных агрегатов: воронка по этапам с оконной функцией LAG для
+оттока, медиана и p90 времени этапа, доля правильных ответов по вопросам
+и разбивка по когортам. Результат кэшируется на (поток, когорта, день).
+"""
+import statistics
+from datetime import date
+
+from django.db import connection
+from django.db.models import (
+    Aggregate, Count, DurationField, Exists, ExpressionWrapper, F, FloatField,
+    OuterRef, Q, Window
+)
+from django.db.models.functions import Extract, Lag, TruncMonth
+from django.utils import timezone
+
+from apps.common.cache import get_or_set, make_key
+from .models import UserFlow, UserStepProgress, UserQuizAnswer
+from .snapshot_models import QuizSnapshot, UserQuizAnswerSnapshot
+
+COHORT_CACHE_TIMEOUT = 60 * 60 * 24
+COHORT_CACHE_TAGS = ('flow_content',)
+
+# Сколько этапов с наибольшим оттоком показывать отдельно
+DROP_OFF_TOP = 3
+
+
+class PercentileCont(Aggregate):
+    """PERCENTILE_CONT(fraction) WITHIN GROUP (ORDER BY expr) — только PostgreSQL"""
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+def parse_hire_month(value):
+    """'YYYY-MM' -> date первого дня месяца; ValueError при неверном формате"""
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+def _month_range(month_start):
+    if month_start.month == 12:
+        return month_start, date(month_start.year + 1, 1, 1)
+    return month_start, date(month_start.year, month_start.month + 1, 1)
+
+
+def cohort_filter(prefix='', department=None, hire_month=None):
+    """
+    Условие на когорту для модели, связанной с UserFlow через prefix
+
+    Месяц найма задается диапазоном, чтобы работал индекс по hire_date.
+    """
+    condition = Q()
+    if department:
+        condition &= Q(**{f'{prefix}user__department': department})
+    if hire_month:
+        start, end = _month_range(hire_month)
+        condition &= Q(**{
+            f'{prefix}user__hire_date__gte': start,
+            f'{prefix}user__hire_date__lt': end,
+        })
+    return condition
+
+
+# ========== Части отчета ==========
+
+def step_funnel(flow_id, department=None, hire_month=None):
+    """
+    Воронка по этапам: сколько дошло, начало и завершило каждый этап
+
+    drop_off — сколько завершивших предыдущий этап не завершили этот
+    (LAG по порядку этапов внутри одного сгруппированного запроса).
+    """
+    completed = Count('id', filter=Q(status=UserStepProgress.StepStatus.COMPLETED))
+    rows = UserStepProgress.objects.filter(
+        cohort_filter('user_flow__', department, hire_month),
+        flow_step__flow_id=flow_id,
+        flow_step__is_active=True,
+        user_flow__is_deleted=False,
+    ).values(
+        'flow_step_id', 'flow_step__order', 'flow_step__title'
+    ).annotate(
+        reached=Count('id', filter=~Q(status=UserStepProgress.StepStatus.LOCKED)),
+        started=Count('id', filter=Q(status__in=[
+            UserStepProgress.StepStatus.IN_PROGRESS, UserStepProgress.StepStatus.COMPLETED
+        ])),
+        completed=completed,
+    ).annotate(
+        prev_completed=Window(Lag('completed'), order_by=F('flow_step__order').asc()),
+    ).order_by('flow_step__order')
+
+    funnel = []
+    for row in rows:
+        base = row['prev_completed'] if row['prev_completed'] is not None else row['reached']
+        drop_off = max(base - row['completed'], 0)
+        funnel.append({
+            'step_id': row['flow_step_id'],
+            'order': row['flow_step__order'],
+            'title': row['flow_step__title'],
+            'reached': row['reached'],
+            'started': row['started'],
+            'completed': row['completed'],
+            'drop_off': drop_off,
+            'drop_off_rate': round(drop_off / base * 100, 2) if base else 0,
+        })
+    return funnel
+
+
+def step_durations(flow_id, department=None, hire_month=None):
+    """
+    Медиана и p90 времени прохождения этапа в секундах
+
+    В PostgreSQL считается агрегатом PERCENTILE_CONT, в остальных СУБД
+    (тесты, локальная разработка) — по выгруженным длительностям.
+    """
+    completed = UserStepProgress.objects.filter(
+        cohort_filter('user_flow__', department, hire_month),
+        flow_step__flow_id=flow_id,
+        user_flow__is_deleted=False,
+        status=UserStepProgress.StepStatus.COMPLETED,
+        started_at__isnull=False,
+        completed_at__isnull=False,
+    )
+    duration = ExpressionWrapper(F('completed_at') - F('started_at'), output_field=DurationField())
+
+    if connection.vendor == 'postgresql':
+        seconds = Extract(duration, 'epoch')
+        rows = completed.values('flow_step_id').annotate(
+            median=PercentileCont(seconds, 0.5),
+            p90=PercentileCont(seconds, 0.9),
+        ).order_by()
+        return {
+            row['flow_step_id']: {'median_seconds': row['median'], 'p90_seconds': row['p90']}
+            for row in rows
+        }
+
+    samples = {}
+    for step_id, value in completed.annotate(duration=duration).values_list('flow_step_id', 'duration'):
+        samples.setdefault(step_id, []).append(value.total_seconds())
+
+    result = {}
+    for step_id, values in samples.items():
+        values.sort()
+        if len(values) == 1:
+            p90 = values[0]
+        else:
+            p90 = statistics.quantiles(values, n=10, method='inclusive')[-1]
+        result[step_id] = {'median_seconds': statistics.median(values), 'p90_seconds': p90}
+    return result
+
+
+def question_pass_rates(flow_id, department=None, hire_month=None):
+    """
+    Доля правильных ответов по вопросам квизов потока
+
+    Завершенные попытки берутся из снапшотов (переживают очистку ответов),
+    незавершенные — из UserQuizAnswer, если снапшота по этапу еще нет.
+    """
+    snapshot_rows = UserQuizAnswerSnapshot.objects.filter(
+        cohort_filter('quiz_snapshot__user_step_progress__user_flow__', department, hire_month),
+        quiz_snapshot__user_step_progress__flow_step__flow_id=flow_id,
+    ).values(
+        question_id=F('question_snapshot__original_question_id')
+    ).annotate(
+        answers=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True)),
+    ).order_by()
+
+    has_snapshot = QuizSnapshot.objects.filter(
+        user_step_progress__user_flow_id=OuterRef('user_flow_id'),
+        user_step_progress__flow_step_id=OuterRef('question__quiz__flow_step_id'),
+    )
+    live_rows = UserQuizAnswer.objects.filter(
+        cohort_filter('user_flow__', department, hire_month),
+        ~Exists(has_snapshot),
+        question__quiz__flow_step__flow_id=flow_id,
+    ).values(
+        'question_id'
+    ).annotate(
+        answers=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True)),
+    ).order_by()
+
+    totals = {}
+    for row in list(snapshot_rows) + list(live_rows):
+        item = totals.setdefault(row['question_id'], {'answers': 0, 'correct': 0})
+        item['answers'] += row['answers']
+        item['correct'] += row['correct']
+
+    return [
+        {
+            'question_id': question_id,
+            'answers': item['answers'],
+            'correct': item['correct'],
+            'pass_rate': round(item['correct'] / item['answers'] * 100, 2),
+        }
+        for question_id, item in sorted(totals.items())
+    ]
+
+
+def cohort_breakdown(flow_id, department=None, hire_month=None):
+    """Участники и завершения по отделам и месяцам найма"""
+    rows = UserFlow.objects.active().filter(
+        cohort_filter('', department, hire_month),
+        flow_id=flow_id,
+    ).values(
+        'user__department', hire_month=TruncMonth('user__hire_date')
+    ).annotate(
+        participants=Count('id'),
+        completed=Count('id', filter=Q(status=UserFlow.FlowStatus.COMPLETED)),
+    ).order_by('user__department', 'hire_month')
+
+    return [
+        {
+            'department': row['user__department'],
+            'hire_month': row['hire_month'].strftime('%Y-%m') if row['hire_month'] else None,
+            'participants': row['participants'],
+            'completed': row['completed'],
+            'completion_rate': round(row['completed'] / row['participants'] * 100, 2),
+        }
+        for row in rows
+    ]
+
+
+# ========== Отчет целиком ==========
+
+def build_cohort_report(flow_id, department=None, hire_month=None):
+    """Собирает отчет по потоку и когорте без кэша"""
+    funnel = step_funnel(flow_id, department, hire_month)
+    durations = step_durations(flow_id, department, hire_month)
+    for step in funnel:
+        step.update(durations.get(step['step_id'], {'median_seconds': None, 'p90_seconds': None}))
+
+    cohorts = cohort_breakdown(flow_id, department, hire_month)
+    drop_off_points = sorted(
+        (step for step in funnel if step['drop_off']),
+        key=lambda step: (-step['drop_off_rate'], step['order'])
+    )[:DROP_OFF_TOP]
+
+    return {
+        'flow_id': flow_id,
+        'cohort': {
+            'department': department,
+            'hire_month': hire_month.strftime('%Y-%m') if hire_month else None,
+        },
+        'participants': sum(c['participants'] for c in cohorts),
+        'steps': funnel,
+        'drop_off_points': [step['step_id'] for step in drop_off_points],
+        'questions': question_pass_rates(flow_id, department, hire_month),
+        'cohorts': cohorts,
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def get_cohort_report(flow_id, department=None, hire_month=None):
+    """
+    Отчет из кэша на (поток, когорта, день)
+
+    Изменение структуры потоков сбрасывает кэш через тег flow_content.
+    """
+    key = make_key('analytics.cohort', flow_id, department, hire_month, timezone.localdate())
+    return get_or_set(
+        key,
+        lambda: build_cohort_report(flow_id, department, hire_month),
+        timeout=COHORT_CACHE_TIMEOUT,
+        tags=COHORT_CACHE_TAGS,
+    )
@@ -0,0 +1,213 @@
+"""
+Автоназначение потоков пользователям
+
+Назначение идет наборами: для каждого потока недостающие пары
+(пользователь, поток) находятся одним запросом с NOT EXISTS, прохождения,
+прогресс по этапам и записи журнала создаются bulk_create без сигналов
+post_save, уведомление уходит одной пачкой. Пачка создается под
+блокировкой строки потока, созданными считаются только пары, которых
+не было под блокировкой, поэтому параллельные и повторные запуски
+ничего не создают и не уведомляют дважды.
+
+Какие потоки положены отделу, решает кэшированная карта маршрутизации
+(обязательные потоки и правила FlowDepartmentRule), сбрасываемая
+тегом flow_routing при изменении потоков и правил.
+"""
+import logging
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from apps.common.cache import get_or_set, invalidate_tags
+from .models import Flow, FlowAction, FlowDepartmentRule, UserFlow, UserStepProgress
+
+logger = logging.getLogger('apps.flows.assignment')
+
+ROUTES_CACHE_TIMEOUT = 60 * 60
+
+
+def get_batch_size():
+    return getattr(settings, 'AUTO_ASSIGN_BATCH_SIZE', 1000)
+
+
+def _build_routes():
+    active = Flow.objects.active()
+    departments = defaultdict(list)
+    rules = FlowDepartmentRule.objects.filter(flow__in=active).values_list('department', 'flow_id')
+    for department, flow_id in rules.order_by('flow_id'):
+        departments[department].append(flow_id)
+    return {
+        'mandatory': list(active.filter(is_mandatory=True).values_list('id', flat=True)),
+        'departments': dict(departments),
+    }
+
+
+def get_routes():
+    """
+    Карта маршрутизации: {'mandatory': [id], 'departments': {отдел: [id]}}
+    """
+    return get_or_set(
+        'flows:routes', _build_routes, timeout=ROUTES_CACHE_TIMEOUT, tags=('flow_routing',)
+    )
+
+
+def auto_flow_ids(department=None):
+    """ID обязательных потоков и потоков отдела"""
+    routes = get_routes()
+    flow_ids = set(routes['mandatory'])
+    if department:
+        flow_ids.update(routes['departments'].get(department, ()))
+    return flow_ids
+
+
+def departments_for_flows(flow_ids):
+    """Отделы, которым назначаются указанные потоки"""
+    return sorted(set(FlowDepartmentRule.objects.filter(
+        flow_id__in=flow_ids
+    ).values_list('department', flat=True)))
+
+
+def _missing_user_ids(users, flow_id):
+    """Пользователи набора без прохождения потока (анти-соединение)"""
+    return list(users.exclude(
+        Exists(UserFlow.objects.filter(user=OuterRef('pk'), flow_id=flow_id))
+    ).values_list('pk', flat=True))
+
+
+def _lock_flow(flow):
+    """Блокировка до конца транзакции на назначение потока (FK-вставки не ждут)"""
+    Flow.objects.select_for_update(no_key=True).filter(pk=flow.pk).exists()
+
+
+def _create_for_flow(flow, user_ids, deadline, steps):
+    """
+    Создает прохождения потока и прогресс по этапам
+
+    Вызывается в транзакции под _lock_flow.
+
+    Returns:
+        list: Созданные UserFlow (id, user_id)
+    """
+    first_step = steps[0] if steps else None
+    existing = set(UserFlow.objects.filter(
+        flow=flow, user_id__in=user_ids
+    ).values_list('user_id', flat=True))
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if not missing:
+        return []
+
+    UserFlow.objects.bulk_create([
+        UserFlow(
+            user_id=user_id, flow=flow, status=UserFlow.FlowStatus.NOT_STARTED,
+            current_step=first_step, expected_completion_date=deadline
+        )
+        for user_id in missing
+    ], ignore_conflicts=True)
+
+    # При ignore_conflicts id не возвращаются; созданы пары, которых не было под блокировкой
+    created = list(UserFlow.objects.filter(
+        flow=flow, user_id__in=missing
+    ).only('id', 'user_id', 'flow_id'))
+
+    UserStepProgress.objects.bulk_create([
+        UserStepProgress(
+            user_flow=user_flow, flow_step=step,
+            status=(
+                UserStepProgress.StepStatus.AVAILABLE if step is first_step
+                else UserStepProgress.StepStatus.LOCKED
+            )
+        )
+        for user_flow in created
+        for step in steps
+    ], ignore_conflicts=True)
+    return created
+
+
+def assign_flows(users, flow_ids, reason='Поток назначен автоматически', notify=True):
+    """
+    Назначает потоки всем пользователям набора, у кого их еще нет
+
+    Args:
+        users (QuerySet): Пользователи
+        flow_ids (Iterable[int]): Потоки
+        reason (str): Причина для журнала
+        notify (bool): Отправить пользователям одно сообщение о новых потоках
+
+    Returns:
+        dict: {'assigned': число созданных прохождений, 'users': затронуто пользователей}
+    """
+    from .bot_card import schedule_rebuild
+
+    flows = list(Flow.objects.active().filter(id__in=flow_ids).order_by('id'))
+    batch_size = get_batch_size()
+    new_titles = defaultdict(list)
+    assigned = 0
+
+    for flow in flows:
+        steps = list(flow.flow_steps.filter(is_active=True).order_by('order'))
+        deadline = flow.calculate_expected_completion_date()
+        pending = _missing_user_ids(users, flow.pk)
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            with transaction.atomic():
+                _lock_flow(flow)
+                created = _create_for_flow(flow, chunk, deadline, steps)
+                FlowAction.objects.bulk_create([
+                    FlowAction(
+                        user_flow_id=user_flow.pk,
+                        action_type=FlowAction.ActionType.STARTED,
+                        performed_by_id=user_flow.user_id,
+                        reason=reason,
+                        metadata={'auto_assigned': True},
+                    )
+                    for user_flow in created
+                ])
+            for user_flow in created:
+                new_titles[user_flow.user_id].append(flow.title)
+            assigned += len(created)
+
+    if assigned:
+        invalidate_tags('user_flows')
+        for user_id in new_titles:
+            schedule_rebuild(user_id)
+        if notify:
+            _notify(new_titles)
+
+    logger.info(f"Автоназначение: создано прохождений {assigned}, пользователей {len(new_titles)}")
+    return {'assigned': assigned, 'users': len(new_titles)}
+
+
+def _notify(new_titles):
+    """Одно сообщение каждому пользователю, одна задача на всю пачку"""
+    from apps.users.models import User
+    from apps.users.tasks import send_telegram_batch
+
+    recipients = User.objects.filter(
+        id__in=list(new_titles), is_active=True
+    ).exclude(telegram_id__isnull=True).exclude(telegram_id='').values_list('id', 'telegram_id')
+    messages = [
+        (user_id, telegram_id,
+         "📚 Вам назначены потоки обучения:\n" + "\n".join(f"• {title}" for title in new_titles[user_id]))
+        for user_id, telegram_id in recipients
+    ]
+    if messages:
+        transaction.on_commit(partial(send_telegram_batch.delay, messages, 'flow_assigned', True))
+
+
+def assign_to_user(user):
+    """Обязательные потоки и потоки отдела одному пользователю"""
+    from apps.users.models import User
+
+    return assign_flows(User.objects.filter(pk=user.pk), auto_flow_ids(user.department))
+
+
+def sync_department(department):
+    """Досоздает назначения всем активным сотрудникам отдела"""
+    from apps.users.models import User
+
+    users = User.objects.filter(department=department, is_active=True)
+    return assign_flows(users, auto_flow_ids(department))
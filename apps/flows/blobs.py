@@ -0,0 +1,166 @@
+"""
+Хранилище текстов снапшотов с адресацией по содержимому
+
+Текст хранится один раз в ContentBlob под своим SHA-256 и сжимается zlib,
+снапшоты ссылаются на него по хэшу. Один и тот же текст статьи или вопроса
+у тысяч пользователей занимает одну строку. Содержимое по хэшу неизменно,
+поэтому прочитанные тексты кэшируются в процессе без инвалидации.
+"""
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.apps import apps
+
+LOCAL_CACHE_SIZE = 2048
+QUERY_BATCH_SIZE = 500
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def encode(text):
+    """Возвращает (данные, сжаты ли): короткие тексты zlib только увеличивает"""
+    raw = text.encode('utf-8')
+    packed = zlib.compress(raw, 6)
+    if len(packed) < len(raw):
+        return packed, True
+    return raw, False
+
+
+def decode(data, is_compressed):
+    data = bytes(data)
+    return (zlib.decompress(data) if is_compressed else data).decode('utf-8')
+
+
+def _remember(hash_value, text):
+    with _local_lock:
+        _local[hash_value] = text
+        _local.move_to_end(hash_value)
+        while len(_local) > LOCAL_CACHE_SIZE:
+            _local.popitem(last=False)
+
+
+def _blob_model():
+    return apps.get_model('flows', 'ContentBlob')
+
+
+def put_many(texts):
+    """
+    Сохраняет тексты, которых еще нет в хранилище
+
+    Пустые строки не сохраняются, им соответствует None.
+
+    Returns:
+        dict: {текст: хэш}
+    """
+    ContentBlob = _blob_model()
+    hashes = {text: content_hash(text) for text in set(texts) if text}
+    by_hash = {hash_value: text for text, hash_value in hashes.items()}
+    pending = list(by_hash)
+
+    for start in range(0, len(pending), QUERY_BATCH_SIZE):
+        chunk = pending[start:start + QUERY_BATCH_SIZE]
+        existing = set(ContentBlob.objects.filter(hash__in=chunk).values_list('hash', flat=True))
+        blobs = []
+        for hash_value in chunk:
+            if hash_value in existing:
+                continue
+            text = by_hash[hash_value]
+            data, is_compressed = encode(text)
+            blobs.append(ContentBlob(
+                hash=hash_value, data=data, is_compressed=is_compressed, size=len(text)
+            ))
+        # Параллельная запись того же текста дает ту же строку
+        ContentBlob.objects.bulk_create(blobs, ignore_conflicts=True)
+
+    for hash_value, text in by_hash.items():
+        _remember(hash_value, text)
+    return hashes
+
+
+def get_many(hashes):
+    """
+    Тексты по хэшам одним запросом на пачку (без уже прочитанных)
+
+    Returns:
+        dict: {хэш: текст}
+    """
+    wanted = {hash_value for hash_value in hashes if hash_value}
+    result = {}
+    with _local_lock:
+        for hash_value in wanted:
+            if hash_value in _local:
+                result[hash_value] = _local[hash_value]
+
+    missing = list(wanted - result.keys())
+    ContentBlob = _blob_model()
+    for start in range(0, len(missing), QUERY_BATCH_SIZE):
+        rows = ContentBlob.objects.filter(
+            hash__in=missing[start:start + QUERY_BATCH_SIZE]
+        ).values_list('hash', 'data', 'is_compressed')
+        for hash_value, data, is_compressed in rows:
+            result[hash_value] = decode(data, is_compressed)
+            _remember(hash_value, result[hash_value])
+    return result
+
+
+def resolve(instances):
+    """
+    Загружает тексты для набора снапшотов (любых моделей) одним проходом
+    """
+    instances = [instance for instance in instances if instance is not None]
+    refs = set()
+    for instance in instances:
+        for attname in instance.blob_fields.values():
+            refs.add(getattr(instance, attname))
+    texts = get_many(refs)
+    for instance in instances:
+        instance._blob_texts = {
+            name: texts.get(getattr(instance, attname), '')
+            for name, attname in instance.blob_fields.items()
+        }
+    return instances
+
+
+def blob_text(name, attname):
+    """
+    Свойство-текст поверх ссылки на ContentBlob
+
+    Чтение берет текст из resolve() или загружает его отдельно,
+    запись запоминает текст до save() и сразу выставляет хэш.
+    """
+    def getter(instance):
+        texts = instance.__dict__.setdefault('_blob_texts', {})
+        if name not in texts:
+            hash_value = getattr(instance, attname)
+            texts[name] = get_many([hash_value]).get(hash_value, '') if hash_value else ''
+        return texts[name]
+
+    def setter(instance, value):
+        value = value or ''
+        instance.__dict__.setdefault('_blob_texts', {})[name] = value
+        setattr(instance, attname, content_hash(value) if value else None)
+
+    return property(getter, setter)
+
+
+class BlobTextsMixin:
+    """
+    Снапшот с текстами в ContentBlob
+
+    blob_fields — {имя свойства: attname внешнего ключа}. Перед save()
+    недостающие тексты записываются в хранилище; для bulk_create их
+    нужно сохранить заранее через put_many().
+    """
+    blob_fields = {}
+
+    def save(self, *args, **kwargs):
+        texts = getattr(self, '_blob_texts', {})
+        put_many(texts[name] for name in self.blob_fields if name in texts)
+        super().save(*args, **kwargs)
@@ -0,0 +1,187 @@
+"""
+Карточка пользователя для бота (read model)
+
+Карточка пересобирается целиком для одного пользователя по событиям
+прогресса, назначения и бадди и хранится в кэше (Redis) с копией в БД.
+Чтение — один запрос к кэшу, при промахе — один запрос к таблице.
+У деактивированных пользователей карточки нет. Изменение потока
+пересобирает карточки участников пачками по user_id.
+"""
+import logging
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from apps.users.models import User
+from .models import UserFlow, UserStepProgress, FlowBuddy, UserBotCard
+
+logger = logging.getLogger('apps.flows.bot_card')
+
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+FLOW_REBUILD_BATCH_SIZE = 200
+ACTIVE_STATUSES = [
+    UserFlow.FlowStatus.NOT_STARTED,
+    UserFlow.FlowStatus.IN_PROGRESS,
+]
+
+
+def _cache_key(telegram_id):
+    return f"bot_card:{telegram_id}"
+
+
+def _pending_key(user_id):
+    return f"bot_card:pending:{user_id}"
+
+
+def build_card(user):
+    """Собирает документ карточки (три запроса)"""
+    user_flows = list(
+        UserFlow.objects.filter(user=user, status__in=ACTIVE_STATUSES)
+        .select_related('flow', 'current_step')
+        .annotate(
+            completed_steps=Count(
+                'step_progress',
+                filter=Q(step_progress__status=UserStepProgress.StepStatus.COMPLETED),
+                distinct=True
+            ),
+            total_steps=Count(
+                'flow__flow_steps',
+                filter=Q(flow__flow_steps__is_active=True),
+                distinct=True
+            )
+        )
+        .order_by('expected_completion_date', 'id')
+    )
+
+    buddies = {}
+    for row in FlowBuddy.objects.filter(
+        user_flow__in=[uf.id for uf in user_flows], is_active=True
+    ).values('user_flow_id', 'buddy_user_id', 'buddy_user__name', 'buddy_user__telegram_username'):
+        buddies.setdefault(row['user_flow_id'], []).append({
+            'id': row['buddy_user_id'],
+            'name': row['buddy_user__name'],
+            'telegram_username': row['buddy_user__telegram_username'],
+        })
+
+    active_flows = []
+    for uf in user_flows:
+        total = uf.total_steps
+        current_step = None
+        if uf.current_step_id:
+            current_step = {
+                'id': uf.current_step.id,
+                'title': uf.current_step.title,
+                'order': uf.current_step.order,
+            }
+        active_flows.append({
+            'id': uf.id,
+            'flow_id': uf.flow_id,
+            'flow_title': uf.flow.title,
+            'status': uf.status,
+            'progress_percentage': 100 if total == 0 else (uf.completed_steps / total) * 100,
+            'completed_steps': uf.completed_steps,
+            'total_steps': total,
+            'current_step': current_step,
+            'expected_completion_date': (
+                uf.expected_completion_date.isoformat() if uf.expected_completion_date else None
+            ),
+            'buddies': buddies.get(uf.id, []),
+        })
+
+    return {
+        'user': {
+            'id': user.id,
+            'name': user.name,
+            'email': user.email,
+            'position': user.position,
+            'department': user.department,
+        },
+        'active_flows': active_flows,
+        'built_at': timezone.now().isoformat(),
+    }
+
+
+def rebuild_card(user_id):
+    """Пересобирает карточку пользователя и сохраняет в БД и кэш"""
+    user = User.objects.filter(id=user_id).first()
+    if not user or not user.telegram_id:
+        return None
+    if not user.is_active:
+        drop_card(user)
+        return None
+
+    data = build_card(user)
+    UserBotCard.objects.update_or_create(
+        user=user,
+        defaults={'telegram_id': user.telegram_id, 'data': data}
+    )
+    cache.set(_cache_key(user.telegram_id), data, CARD_CACHE_TIMEOUT)
+    return data
+
+
+def drop_card(user):
+    """Удаляет карточку из БД и кэша"""
+    UserBotCard.objects.filter(user=user).delete()
+    cache.delete(_cache_key(user.telegram_id))
+
+
+def participant_batch(flow_id, after_user_id=0):
+    """
+    Следующая пачка участников потока с активным прохождением
+
+    Returns:
+        list: ID пользователей больше after_user_id по возрастанию
+    """
+    return list(
+        UserFlow.objects.filter(
+            flow_id=flow_id, status__in=ACTIVE_STATUSES, user_id__gt=after_user_id
+        ).order_by('user_id').values_list('user_id', flat=True)[:FLOW_REBUILD_BATCH_SIZE]
+    )
+
+
+def get_card(telegram_id):
+    """
+    Карточка по Telegram ID: кэш, затем таблица, затем сборка
+    
+    Returns:
+        dict | None: None, если пользователь не найден
+    """
+    telegram_id = str(telegram_id).strip()
+    data = cache.get(_cache_key(telegram_id))
+    if data is not None:
+        return data
+
+    data = UserBotCard.objects.filter(telegram_id=telegram_id).values_list('data', flat=True).first()
+    if data is not None:
+        cache.set(_cache_key(telegram_id), data, CARD_CACHE_TIMEOUT)
+        return data
+
+    user_id = User.objects.filter(
+        telegram_id=telegram_id, is_active=True
+    ).values_list('id', flat=True).first()
+    return rebuild_card(user_id) if user_id else None
+
+
+def schedule_rebuild(user_id):
+    """
+    Планирует пересборку после фиксации транзакции
+
+    Серия событий одного пользователя схлопывается в одну задачу,
+    пока предыдущая не начала выполняться.
+    """
+    transaction.on_commit(partial(_enqueue_rebuild, user_id))
+
+
+def _enqueue_rebuild(user_id):
+    from .tasks import rebuild_bot_card
+
+    if cache.add(_pending_key(user_id), 1, 60):
+        rebuild_bot_card.delay(user_id)
+
+
+def clear_pending(user_id):
+    """Снимает флаг ожидания перед сборкой"""
+    cache.delete(_pending_key(user_id))
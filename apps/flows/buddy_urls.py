@@ -5,7 +5,7 @@ from django.urls import path
 from apps.flows.views import (
     BuddyFlowListView, BuddyUserListView, BuddyFlowStartView,
     BuddyMyFlowsView, BuddyFlowManageView, BuddyFlowPauseView,
-    BuddyFlowResumeView
+    BuddyFlowResumeView, FlowCohortAnalyticsView
 )
 
 urlpatterns = [
@@ -19,4 +19,7 @@ urlpatterns = [
     path('flows/<int:pk>/', BuddyFlowManageView.as_view(), name='buddy-flow-detail'),
     path('flows/<int:pk>/pause/', BuddyFlowPauseView.as_view(), name='buddy-flow-pause'),
     path('flows/<int:pk>/resume/', BuddyFlowResumeView.as_view(), name='buddy-flow-resume'),
+    
+    # Аналитика по когортам
+    path('analytics/flows/<int:flow_id>/cohorts/', FlowCohortAnalyticsView.as_view(), name='buddy-analytics-flow-cohorts'),
 ]
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Массовые операции над прохождениями потоков (см. apps.common.bulk_jobs)
+"""
+from datetime import timedelta
+from functools import partial
+
+from django.db import transaction
+
+from apps.common.bulk_jobs import operation
+from .models import FlowAction, FlowBuddy, UserFlow
+
+USER_FLOW = 'flows.UserFlow'
+
+
+def _log_actions(user_flows, action_type, user, reason=None, metadata=None):
+    """Записи в журнал одной вставкой на пачку"""
+    if user is None or not user_flows:
+        return
+    FlowAction.objects.bulk_create([
+        FlowAction(
+            user_flow=user_flow, action_type=action_type, performed_by=user,
+            reason=reason, metadata=metadata or {}
+        )
+        for user_flow in user_flows
+    ])
+
+
+def _apply(objects, change):
+    """
+    Применяет change(user_flow) к каждому объекту в своей точке сохранения
+
+    change возвращает текст ошибки, если объект пропущен.
+
+    Returns:
+        tuple: (измененные объекты, [(pk, ошибка)])
+    """
+    changed, failures = [], []
+    for user_flow in objects:
+        try:
+            with transaction.atomic():
+                error = change(user_flow)
+        except Exception as exc:
+            error = str(exc)
+        if error:
+            failures.append((user_flow.pk, error))
+        else:
+            changed.append(user_flow)
+    return changed, failures
+
+
+def _validate_days(params):
+    try:
+        days = int(params.get('days'))
+    except (TypeError, ValueError):
+        raise ValueError('days должен быть целым числом')
+    if not 1 <= days <= 365:
+        raise ValueError('days должен быть от 1 до 365')
+    return {**params, 'days': days}
+
+
+def _validate_buddy(params):
+    from apps.users.models import User
+
+    try:
+        buddy = User.objects.get(pk=int(params.get('buddy_id')), is_active=True)
+    except (TypeError, ValueError, User.DoesNotExist):
+        raise ValueError('buddy_id: активный пользователь не найден')
+    if not buddy.has_role('buddy'):
+        raise ValueError('buddy_id: у пользователя нет роли бадди')
+    return {**params, 'buddy_id': buddy.pk}
+
+
+@operation('pause', USER_FLOW, 'Приостановить')
+def pause_user_flows(objects, params, user):
+    reason = params.get('reason')
+
+    def change(user_flow):
+        if user_flow.status != UserFlow.FlowStatus.IN_PROGRESS:
+            return f'Статус {user_flow.status}: приостановить нельзя'
+        user_flow.pause(paused_by=user, reason=reason)
+
+    changed, failures = _apply(objects, change)
+    _log_actions(changed, FlowAction.ActionType.PAUSED, user, reason)
+    return failures
+
+
+@operation('resume', USER_FLOW, 'Возобновить')
+def resume_user_flows(objects, params, user):
+    def change(user_flow):
+        if user_flow.status != UserFlow.FlowStatus.PAUSED:
+            return f'Статус {user_flow.status}: возобновить нельзя'
+        user_flow.resume()
+
+    changed, failures = _apply(objects, change)
+    _log_actions(changed, FlowAction.ActionType.RESUMED, user, params.get('reason'))
+    return failures
+
+
+@operation('extend_deadline', USER_FLOW, 'Продлить дедлайн', validate=_validate_days)
+def extend_user_flow_deadlines(objects, params, user):
+    days = params['days']
+
+    def change(user_flow):
+        if not user_flow.expected_completion_date:
+            return 'Дедлайн не установлен'
+        if user_flow.status == UserFlow.FlowStatus.COMPLETED:
+            return 'Поток уже завершен'
+        user_flow.expected_completion_date += timedelta(days=days)
+        # Продленный дедлайн не пересчитывается по календарю
+        user_flow.deadline_is_manual = True
+        user_flow.save(update_fields=['expected_completion_date', 'deadline_is_manual', 'updated_at'])
+
+    changed, failures = _apply(objects, change)
+    _log_actions(
+        changed, FlowAction.ActionType.EXTENDED_DEADLINE, user,
+        params.get('reason'), {'days': days}
+    )
+    return failures
+
+
+@operation('reassign_buddy', USER_FLOW, 'Назначить бадди', validate=_validate_buddy)
+def reassign_user_flow_buddy(objects, params, user):
+    buddy_id = params['buddy_id']
+    ids = [user_flow.pk for user_flow in objects]
+
+    with transaction.atomic():
+        # Прежние бадди отключаются, новый активируется или создается
+        FlowBuddy.objects.filter(user_flow_id__in=ids, is_active=True).exclude(
+            buddy_user_id=buddy_id
+        ).update(is_active=False)
+        FlowBuddy.objects.filter(user_flow_id__in=ids, buddy_user_id=buddy_id).update(is_active=True)
+        existing = set(FlowBuddy.objects.filter(
+            user_flow_id__in=ids, buddy_user_id=buddy_id
+        ).values_list('user_flow_id', flat=True))
+        FlowBuddy.objects.bulk_create([
+            FlowBuddy(user_flow_id=pk, buddy_user_id=buddy_id, assigned_by=user)
+            for pk in ids if pk not in existing
+        ])
+        _log_actions(
+            objects, FlowAction.ActionType.BUDDY_ASSIGNED, user,
+            params.get('reason'), {'buddy_id': buddy_id}
+        )
+    return []
+
+
+@operation('renotify', USER_FLOW, 'Повторно уведомить', select_related=('user', 'flow', 'current_step'))
+def renotify_user_flows(objects, params, user):
+    from apps.users.tasks import send_telegram_batch
+
+    extra = params.get('message')
+    messages, failures = [], []
+    for user_flow in objects:
+        if user_flow.status not in (UserFlow.FlowStatus.NOT_STARTED, UserFlow.FlowStatus.IN_PROGRESS):
+            failures.append((user_flow.pk, f'Статус {user_flow.status}: уведомление не нужно'))
+            continue
+        if not user_flow.user.is_active:
+            failures.append((user_flow.pk, 'Пользователь неактивен'))
+            continue
+        if not user_flow.user.telegram_id:
+            failures.append((user_flow.pk, 'Пользователь не привязан к Telegram'))
+            continue
+        text = f"📚 Напоминание о потоке обучения '{user_flow.flow.title}'"
+        if user_flow.current_step:
+            text += f"\nТекущий этап: {user_flow.current_step.title}"
+        if user_flow.expected_completion_date:
+            text += f"\nСрок: {user_flow.expected_completion_date:%d.%m.%Y}"
+        if extra:
+            text += f"\n\n{extra}"
+        messages.append((user_flow.user_id, user_flow.user.telegram_id, text))
+
+    if messages:
+        transaction.on_commit(partial(send_telegram_batch.delay, messages, 'flow_reminder', True))
+    return failures
@@ -0,0 +1,265 @@
+"""
+Расчет дедлайнов прохождений по рабочему календарю
+
+Трудоемкость этапа берется из истории прохождений (среднее время от
+начала до завершения), затем из времени чтения статьи, иначе — час.
+Сумма переводится в рабочие дни (DEADLINE_MINUTES_PER_DAY минут в день)
+и откладывается от даты старта по WorkingCalendar; рабочие дни внутри
+пауз добавляются сверху. Календарь диапазона читается одним запросом,
+дальше арифметика идет по отсортированному списку рабочих дней.
+"""
+import bisect
+import logging
+import math
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F
+from django.utils import timezone
+
+from apps.common.models import WorkingCalendar
+
+logger = logging.getLogger('apps.flows.deadlines')
+
+# Поток без дедлайна по расписанию: завершенные и заблокированные не пересчитываются
+RECALCULATED_STATUSES = ('not_started', 'in_progress', 'paused')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class WorkingDays:
+    """
+    Рабочие дни диапазона в памяти
+
+    Даты из WorkingCalendar переопределяют правило пн-пт. Диапазон
+    расширяется по мере необходимости (одним запросом на расширение).
+    """
+
+    def __init__(self, start, end):
+        self.start = self.end = None
+        self._days = []
+        self._load(start, end)
+
+    def _load(self, start, end):
+        if self.start is not None:
+            start, end = min(start, self.start), max(end, self.end)
+        overrides = dict(WorkingCalendar.objects.filter(
+            date__range=(start, end)
+        ).values_list('date', 'is_working_day'))
+        days = []
+        current = start
+        while current <= end:
+            if overrides.get(current, current.weekday() < 5):
+                days.append(current.toordinal())
+            current += timedelta(days=1)
+        self.start, self.end, self._days = start, end, days
+
+    def _cover(self, start, end):
+        if start < self.start or end > self.end:
+            self._load(start, end)
+
+    def count(self, start, end):
+        """Число рабочих дней в [start, end]"""
+        if end < start:
+            return 0
+        self._cover(start, end)
+        return (
+            bisect.bisect_right(self._days, end.toordinal())
+            - bisect.bisect_left(self._days, start.toordinal())
+        )
+
+    def add(self, start, working_days):
+        """Дата через working_days рабочих дней после start (как add_working_days)"""
+        if working_days <= 0:
+            return start
+        while True:
+            self._cover(start, start)
+            index = bisect.bisect_right(self._days, start.toordinal()) + working_days - 1
+            if index < len(self._days):
+                return date.fromordinal(self._days[index])
+            # Запас с учетом выходных и праздников
+            self._load(self.start, self.end + timedelta(days=working_days * 2 + 30))
+
+
+def estimate_step_minutes(flow_ids):
+    """
+    Оценка трудоемкости активных этапов потоков
+
+    Returns:
+        dict: {flow_id: {step_id: минуты}}
+    """
+    from .models import FlowStep, UserStepProgress
+
+    min_samples = _setting('DEADLINE_HISTORY_MIN_SAMPLES', 5)
+    max_minutes = _setting('DEADLINE_STEP_MAX_MINUTES', 240)
+    history = {
+        row['flow_step_id']: row['duration']
+        for row in UserStepProgress.objects.filter(
+            flow_step__flow_id__in=flow_ids,
+            status=UserStepProgress.StepStatus.COMPLETED,
+            started_at__isnull=False,
+            completed_at__isnull=False,
+        ).values('flow_step_id').annotate(
+            samples=Count('id'),
+            duration=Avg(ExpressionWrapper(
+                F('completed_at') - F('started_at'), output_field=DurationField()
+            )),
+        ).filter(samples__gte=min_samples)
+    }
+
+    estimates = {flow_id: {} for flow_id in flow_ids}
+    steps = FlowStep.objects.filter(flow_id__in=flow_ids, is_active=True).values_list(
+        'id', 'flow_id', 'article__reading_time_minutes'
+    )
+    for step_id, flow_id, reading_minutes in steps:
+        if history.get(step_id) is not None:
+            minutes = min(history[step_id].total_seconds() / 60, max_minutes)
+        elif reading_minutes:
+            minutes = reading_minutes + _setting('DEADLINE_STEP_EXTRA_MINUTES', 30)
+        else:
+            minutes = _setting('DEADLINE_DEFAULT_STEP_MINUTES', 60)
+        estimates[flow_id][step_id] = minutes
+    return estimates
+
+
+def effort_working_days(step_minutes):
+    """Рабочие дни на прохождение, минимум один"""
+    total = sum(step_minutes.values())
+    return max(1, math.ceil(total / _setting('DEADLINE_MINUTES_PER_DAY', 120)))
+
+
+def flow_effort_days(flow_ids):
+    """{flow_id: рабочих дней на прохождение}"""
+    return {
+        flow_id: effort_working_days(steps)
+        for flow_id, steps in estimate_step_minutes(list(flow_ids)).items()
+    }
+
+
+def paused_intervals(user_flow, today=None):
+    """
+    Интервалы пауз [(начало, возобновление)) — день возобновления рабочий;
+    текущая пауза длится до сегодняшнего дня
+    """
+    today = today or timezone.localdate()
+    intervals = [
+        (date.fromisoformat(start), date.fromisoformat(end))
+        for start, end in user_flow.paused_intervals or []
+    ]
+    if user_flow.status == 'paused' and user_flow.paused_at:
+        intervals.append((timezone.localdate(user_flow.paused_at), today))
+    return intervals
+
+
+def compute_deadline(start_date, effort_days, pauses, calendar):
+    """Дедлайн: effort_days рабочих дней от старта плюс рабочие дни пауз"""
+    paused_days = sum(calendar.count(start, end - timedelta(days=1)) for start, end in pauses)
+    return calendar.add(start_date, effort_days + paused_days)
+
+
+def expected_completion_date(flow, start_date=None):
+    """Дедлайн нового прохождения потока"""
+    start_date = start_date or timezone.localdate()
+    effort_days = flow_effort_days([flow.pk])[flow.pk]
+    calendar = WorkingDays(start_date, start_date + timedelta(days=effort_days * 2 + 30))
+    return calendar.add(start_date, effort_days)
+
+
+def shift_for_pause(deadline, paused_from, resumed_on):
+    """Дедлайн, сдвинутый на рабочие дни паузы [paused_from, resumed_on)"""
+    calendar = WorkingDays(min(paused_from, deadline), max(resumed_on, deadline))
+    return compute_deadline(deadline, 0, [(paused_from, resumed_on)], calendar)
+
+
+def _start_date(user_flow):
+    return timezone.localdate(user_flow.started_at or user_flow.created_at)
+
+
+def recalculate(flow_ids=None, batch_size=None):
+    """
+    Пересчитывает дедлайны прохождений (кроме заданных вручную)
+
+    Проход по PK пачками; изменившиеся даты сохраняются bulk_update.
+
+    Returns:
+        dict: {'checked': ..., 'updated': ...}
+    """
+    from .models import UserFlow
+
+    batch_size = batch_size or _setting('DEADLINE_RECALC_BATCH_SIZE', 1000)
+    queryset = UserFlow.objects.filter(
+        status__in=RECALCULATED_STATUSES, deadline_is_manual=False
+    ).only(
+        'id', 'flow_id', 'status', 'started_at', 'created_at',
+        'paused_at', 'paused_intervals', 'expected_completion_date'
+    ).order_by('pk')
+    if flow_ids is not None:
+        queryset = queryset.filter(flow_id__in=flow_ids)
+
+    today = timezone.localdate()
+    efforts = {}
+    calendar = None
+    checked = updated = 0
+    last_pk = 0
+
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        missing = {user_flow.flow_id for user_flow in batch} - efforts.keys()
+        if missing:
+            efforts.update(flow_effort_days(missing))
+        start = min(_start_date(user_flow) for user_flow in batch)
+        if calendar is None:
+            calendar = WorkingDays(start, today + timedelta(days=60))
+
+        changed = []
+        for user_flow in batch:
+            deadline = compute_deadline(
+                _start_date(user_flow), efforts[user_flow.flow_id],
+                paused_intervals(user_flow, today), calendar
+            )
+            if deadline != user_flow.expected_completion_date:
+                user_flow.expected_completion_date = deadline
+                changed.append(user_flow)
+
+        with transaction.atomic():
+            UserFlow.objects.bulk_update(changed, ['expected_completion_date'], batch_size=batch_size)
+        checked += len(batch)
+        updated += len(changed)
+
+    logger.info(f"Пересчет дедлайнов (потоки: {flow_ids or 'все'}): проверено {checked}, изменено {updated}")
+    return {'checked': checked, 'updated': updated}
+
+
+def _pending_key(flow_id):
+    return f'deadlines:recalc_pending:{flow_id or "all"}'
+
+
+def schedule_recalculation(flow_id=None):
+    """
+    Планирует пересчет после фиксации транзакции
+
+    Серия изменений (например, загрузка праздников) схлопывается в одну
+    задачу, пока предыдущая не начала выполняться.
+    """
+    transaction.on_commit(lambda: _enqueue_recalculation(flow_id))
+
+
+def _enqueue_recalculation(flow_id):
+    from .tasks import recalculate_deadlines
+
+    delay = _setting('DEADLINE_RECALC_DELAY', 60)
+    if cache.add(_pending_key(flow_id), 1, delay + 60):
+        recalculate_deadlines.apply_async(args=[flow_id], countdown=delay)
+
+
+def clear_pending(flow_id=None):
+    """Снимает флаг ожидания перед пересчетом"""
+    cache.delete(_pending_key(flow_id))
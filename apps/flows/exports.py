@@ -0,0 +1,276 @@
+"""
+Потоковая выгрузка прогресса и журнала действий
+
+Строки читаются через values_list(...).iterator(chunk_size=...): в
+PostgreSQL это серверный курсор, в памяти держится только текущий чанк.
+Счетчики прогресса берутся коррелированными подзапросами
+(UserFlowManager.with_step_counts), без запросов на каждую строку. CSV отдается через StreamingHttpResponse, XLSX
+пишется в файл фоновой задачей (openpyxl в режиме write_only).
+Чтение идет с реплики, если она настроена (apps.common.db_router). При
+DB_POOL_MODE=transaction серверные курсоры отключены и набор читается целиком.
+
+Файлы фоновых выгрузок содержат персональные данные: они лежат в
+EXPORT_ROOT вне MEDIA_ROOT (nginx их не раздает) и скачиваются по
+подписанной ссылке, которая действует EXPORT_LINK_TTL секунд.
+"""
+import csv
+import datetime
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import FlowAction, UserFlow, UserStepProgress
+from .snapshot_models import QuizSnapshot
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+DOWNLOAD_SALT = 'flows.exports.download'
+
+# Начало ячейки, которое Excel и LibreOffice считают формулой
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def get_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _progress(completed, total):
+    return 100 if not total else round(completed / total * 100, 1)
+
+
+@dataclass
+class ExportDataset:
+    """
+    Описание выгрузки
+
+    fields — пути для values_list, headers — заголовки колонок;
+    transform может пересчитать строку (например, процент из счетчиков).
+    """
+    title: str
+    queryset: Callable
+    headers: list
+    fields: list
+    flow_field: str
+    date_field: str
+    transform: Optional[Callable] = None
+
+    def rows(self, flow_id=None, date_from=None, date_to=None, using=None):
+        queryset = self.queryset()
+        if using:
+            queryset = queryset.using(using)
+        if flow_id:
+            queryset = queryset.filter(**{self.flow_field: flow_id})
+        if date_from:
+            queryset = queryset.filter(**{f'{self.date_field}__date__gte': date_from})
+        if date_to:
+            queryset = queryset.filter(**{f'{self.date_field}__date__lte': date_to})
+        queryset = queryset.order_by('pk')
+
+        for row in queryset.values_list(*self.fields).iterator(chunk_size=get_chunk_size()):
+            yield self.transform(row) if self.transform else row
+
+
+def _user_flow_transform(row):
+    *head, completed, total = row
+    return (*head, completed, total, _progress(completed, total))
+
+
+DATASETS = {
+    'user_flows': ExportDataset(
+        title='Прохождения потоков',
+        queryset=lambda: UserFlow.objects.with_step_counts(),
+        headers=[
+            'ID', 'ID пользователя', 'Имя', 'Email', 'Отдел', 'Поток', 'Статус',
+            'Начат', 'Завершен', 'Дедлайн', 'Этапов завершено', 'Этапов всего', 'Прогресс, %'
+        ],
+        fields=[
+            'id', 'user_id', 'user__name', 'user__email', 'user__department', 'flow__title',
+            'status', 'started_at', 'completed_at', 'expected_completion_date',
+            'completed_steps', 'total_steps'
+        ],
+        transform=_user_flow_transform,
+        flow_field='flow_id',
+        date_field='created_at',
+    ),
+    'step_progress': ExportDataset(
+        title='Прогресс по этапам',
+        queryset=lambda: UserStepProgress.objects.filter(user_flow__is_deleted=False),
+        headers=[
+            'ID', 'ID прохождения', 'ID пользователя', 'Имя', 'Поток', 'Этап', 'Порядок',
+            'Статус', 'Начат', 'Завершен', 'Правильных в квизе', 'Вопросов в квизе'
+        ],
+        fields=[
+            'id', 'user_flow_id', 'user_flow__user_id', 'user_flow__user__name',
+            'user_flow__flow__title', 'flow_step__title', 'flow_step__order', 'status',
+            'started_at', 'completed_at', 'quiz_correct_answers', 'quiz_total_questions'
+        ],
+        flow_field='flow_step__flow_id',
+        date_field='updated_at',
+    ),
+    'quiz_results': ExportDataset(
+        title='Результаты квизов',
+        queryset=lambda: QuizSnapshot.objects.all(),
+        headers=[
+            'ID', 'ID пользователя', 'Имя', 'Поток', 'Квиз', 'Вопросов', 'Правильных',
+            'Результат, %', 'Проходной, %', 'Пройден', 'Дата'
+        ],
+        fields=[
+            'id', 'user_step_progress__user_flow__user_id',
+            'user_step_progress__user_flow__user__name',
+            'user_step_progress__user_flow__flow__title', 'quiz_title', 'total_questions',
+            'correct_answers', 'score_percentage', 'passing_score_percentage', 'is_passed',
+            'snapshot_created_at'
+        ],
+        flow_field='user_step_progress__flow_step__flow_id',
+        date_field='snapshot_created_at',
+    ),
+    'flow_actions': ExportDataset(
+        title='Журнал действий',
+        queryset=lambda: FlowAction.objects.all(),
+        headers=[
+            'ID', 'ID прохождения', 'ID пользователя', 'Пользователь', 'Поток', 'Действие',
+            'Выполнил', 'Причина', 'Метаданные', 'Время'
+        ],
+        fields=[
+            'id', 'user_flow_id', 'user_flow__user_id', 'user_flow__user__name',
+            'user_flow__flow__title', 'action_type', 'performed_by__name', 'reason',
+            'metadata', 'performed_at'
+        ],
+        flow_field='user_flow__flow_id',
+        date_field='performed_at',
+    ),
+}
+
+
+# ========== Форматы ==========
+
+def _cell(value):
+    """
+    Значение ячейки: локальное время без tz, пустая строка вместо None
+
+    Строки, похожие на формулу, экранируются апострофом (CSV injection).
+    """
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return f"'{value}" if value.startswith(FORMULA_PREFIXES) else value
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        return value.replace(microsecond=0)
+    if isinstance(value, (dict, list)):
+        return _cell(json.dumps(value, ensure_ascii=False))
+    return value
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи"""
+    def write(self, value):
+        return value
+
+
+def iter_csv(dataset, **filters):
+    """Генератор строк CSV (первая — с BOM для Excel)"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(dataset.headers)
+    for row in dataset.rows(**filters):
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def write_xlsx(dataset, path, **filters):
+    """Пишет XLSX построчно; возвращает число строк"""
+    try:
+        from openpyxl import Workbook
+    except ImportError as exc:
+        raise RuntimeError('Для выгрузки в XLSX требуется пакет openpyxl') from exc
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(dataset.title[:31])
+    sheet.append(dataset.headers)
+    count = 0
+    for row in dataset.rows(**filters):
+        sheet.append([_cell(value) for value in row])
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def write_csv(dataset, path, **filters):
+    """Пишет CSV в файл; возвращает число строк"""
+    count = -1
+    with open(path, 'w', encoding='utf-8', newline='') as output:
+        for line in iter_csv(dataset, **filters):
+            output.write(line)
+            count += 1
+    return count
+
+
+def get_export_storage():
+    """Закрытое хранилище файлов выгрузок"""
+    return FileSystemStorage(location=settings.EXPORT_ROOT)
+
+
+def export_to_storage(name, fmt='csv', **filters):
+    """
+    Выгружает набор во временный файл и сохраняет его в хранилище выгрузок
+
+    Returns:
+        tuple: (имя файла в хранилище, число строк)
+    """
+    dataset = DATASETS[name]
+    writer = write_xlsx if fmt == 'xlsx' else write_csv
+    fd, tmp_path = tempfile.mkstemp(suffix=f'.{fmt}')
+    os.close(fd)
+    try:
+        count = writer(dataset, tmp_path, **filters)
+        stamp = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+        with open(tmp_path, 'rb') as tmp:
+            stored = get_export_storage().save(f'{name}-{stamp}.{fmt}', File(tmp))
+    finally:
+        os.unlink(tmp_path)
+    return stored, count
+
+
+def download_url(stored):
+    """Подписанная ссылка на скачивание файла выгрузки"""
+    token = signing.dumps(stored, salt=DOWNLOAD_SALT)
+    path = reverse('admin-export-download', args=[token])
+    return f"{settings.SITE_URL.rstrip('/')}{path}"
+
+
+def resolve_download(token):
+    """
+    Имя файла по ссылке на скачивание
+
+    Raises:
+        signing.BadSignature: ссылка подделана или истекла (SignatureExpired)
+    """
+    return signing.loads(token, salt=DOWNLOAD_SALT, max_age=settings.EXPORT_LINK_TTL)
+
+
+def cleanup_exports(max_age_hours=None):
+    """
+    Удаляет файлы выгрузок старше EXPORT_TTL_HOURS
+
+    Returns:
+        int: Количество удаленных файлов
+    """
+    storage = get_export_storage()
+    if not os.path.isdir(storage.location):
+        return 0
+    hours = max_age_hours if max_age_hours is not None else settings.EXPORT_TTL_HOURS
+    cutoff = timezone.now() - datetime.timedelta(hours=hours)
+    deleted = 0
+    for name in storage.listdir('')[1]:
+        if storage.get_modified_time(name) < cutoff:
+            storage.delete(name)
+            deleted += 1
+    return deleted
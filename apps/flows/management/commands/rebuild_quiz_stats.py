@@ -0,0 +1,29 @@
+"""
+Команда пересчета статистики вопросов квизов
+"""
+from django.core.management.base import BaseCommand
+
+from apps.flows.quiz_stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    """
+    Пересобирает счетчики QuizQuestionStats/QuizAnswerStats из ответов пользователей
+    """
+    help = 'Пересчитывает статистику вопросов и вариантов ответов квизов'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quiz',
+            type=int,
+            action='append',
+            dest='quiz_ids',
+            help='ID квиза (можно указать несколько раз); по умолчанию все квизы'
+        )
+    
+    def handle(self, *args, **options):
+        """Выполняет пересчет"""
+        questions, answers = rebuild_stats(options['quiz_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f'📊 Статистика пересчитана: вопросов {questions}, вариантов {answers}'
+        ))
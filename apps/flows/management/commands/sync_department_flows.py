@@ -0,0 +1,35 @@
+"""
+Команда синхронизации автоназначаемых потоков по отделам
+"""
+from django.core.management.base import BaseCommand
+
+from apps.flows.assignment import sync_department
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Досоздает назначения обязательных потоков и потоков отдела его сотрудникам
+    """
+    help = 'Назначает сотрудникам отделов недостающие потоки по правилам автоназначения'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'departments',
+            nargs='*',
+            help='Отделы; по умолчанию все отделы активных пользователей'
+        )
+    
+    def handle(self, *args, **options):
+        """Выполняет синхронизацию"""
+        departments = options['departments'] or sorted(set(
+            User.objects.filter(is_active=True).exclude(department__isnull=True).exclude(
+                department=''
+            ).values_list('department', flat=True)
+        ))
+        total = 0
+        for department in departments:
+            result = sync_department(department)
+            total += result['assigned']
+            self.stdout.write(f"🏢 {department}: назначено {result['assigned']}, пользователей {result['users']}")
+        self.stdout.write(self.style.SUCCESS(f'✅ Синхронизация завершена: назначено потоков {total}'))
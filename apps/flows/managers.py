@@ -2,9 +2,24 @@
 Менеджеры для моделей потоков обучения
 """
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 
+def count_subquery(queryset, group_field):
+    """
+    Число строк queryset (отфильтрованного по OuterRef) коррелированным подзапросом
+    
+    Не размножает строки внешнего запроса JOIN-ами, 0 при отсутствии строк.
+    """
+    return Coalesce(models.Subquery(
+        queryset.order_by().values(group_field).annotate(
+            total=models.Count('id')
+        ).values('total')[:1],
+        output_field=models.IntegerField()
+    ), 0)
+
+
 class FlowManager(models.Manager):
     """
     Менеджер для модели Flow
@@ -39,9 +54,7 @@ class FlowManager(models.Manager):
         Returns:
             QuerySet: Потоки для указанного отдела
         """
-        return self.active().filter(
-            auto_assign_departments__contains=[department]
-        )
+        return self.active().filter(department_rules__department=department)
     
     def available_for_user(self, user):
         """
@@ -53,17 +66,13 @@ class FlowManager(models.Manager):
         Returns:
             QuerySet: Доступные потоки
         """
-        # Получаем обязательные потоки
-        available_flows = self.mandatory()
+        from .assignment import auto_flow_ids
         
-        # Добавляем потоки для отдела пользователя
-        if user.department:
-            department_flows = self.for_department(user.department)
-            available_flows = available_flows.union(department_flows)
-        
-        # Исключаем уже назначенные потоки
+        # Обязательные потоки и потоки отдела — из кэшированной карты маршрутизации
         assigned_flow_ids = user.user_flows.values_list('flow_id', flat=True)
-        return available_flows.exclude(id__in=assigned_flow_ids)
+        return self.active().filter(
+            id__in=auto_flow_ids(user.department)
+        ).exclude(id__in=assigned_flow_ids)
     
     def with_statistics(self):
         """
@@ -158,6 +167,22 @@ class UserFlowManager(models.Manager):
         """
         return self.active().filter(status='paused')
     
+    def due_for_reminder(self, now=None):
+        """
+        Возвращает потоки, по которым наступил срок напоминания
+        
+        Выборка идет по частичному индексу user_flows_reminder_due_idx,
+        поэтому стоимость зависит от числа наступивших сроков, а не от
+        числа потоков в процессе.
+        
+        Returns:
+            QuerySet: Потоки к напоминанию, старые сроки первыми
+        """
+        return self.active().filter(
+            status='in_progress',
+            next_reminder_at__lte=now or timezone.now()
+        ).order_by('next_reminder_at')
+    
     def for_buddy(self, buddy_user):
         """
         Возвращает потоки, где пользователь является бадди
@@ -213,6 +238,32 @@ class UserFlowManager(models.Manager):
             current_step_order=models.F('current_step__order')
         )
     
+    def with_step_counts(self):
+        """
+        Возвращает потоки со счетчиками этапов из коррелированных подзапросов
+        
+        В отличие от with_progress не размножает строки JOIN-ами, поэтому
+        подходит для выгрузок и отчетов по большому числу потоков.
+        
+        Returns:
+            QuerySet: Потоки с completed_steps и total_steps
+        """
+        from .models import FlowStep, UserStepProgress
+        
+        return self.active().annotate(
+            completed_steps=count_subquery(
+                UserStepProgress.objects.filter(
+                    user_flow=models.OuterRef('pk'),
+                    status=UserStepProgress.StepStatus.COMPLETED
+                ),
+                'user_flow'
+            ),
+            total_steps=count_subquery(
+                FlowStep.objects.filter(flow=models.OuterRef('flow_id'), is_active=True),
+                'flow'
+            )
+        )
+    
     def statistics_by_flow(self):
         """
         Возвращает статистику по потокам
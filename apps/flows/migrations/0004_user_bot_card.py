@@ -0,0 +1,58 @@
+# Generated by Django 4.2.16 on 2026-10-19 08:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("flows", "0003_remove_flow_estimated_duration_hours_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserBotCard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "telegram_id",
+                    models.CharField(
+                        max_length=50, unique=True, verbose_name="Telegram ID"
+                    ),
+                ),
+                (
+                    "data",
+                    models.JSONField(default=dict, verbose_name="Данные карточки"),
+                ),
+                (
+                    "built_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Собрана"),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="bot_card",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Карточка пользователя для бота",
+                "verbose_name_plural": "Карточки пользователей для бота",
+                "db_table": "user_bot_cards",
+            },
+        ),
+    ]
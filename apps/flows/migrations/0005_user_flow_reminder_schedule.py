@@ -0,0 +1,54 @@
+# Generated by Django 4.2.16 on 2026-10-19 08:37
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def schedule_in_progress_flows(apps, schema_editor):
+    """Потоки в процессе получают первое напоминание от последнего изменения"""
+    db_alias = schema_editor.connection.alias
+    UserFlow = apps.get_model("flows", "UserFlow")
+    UserFlow.objects.using(db_alias).filter(status="in_progress").update(
+        next_reminder_at=models.F("updated_at") + timedelta(days=3)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flows", "0004_user_bot_card"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userflow",
+            name="next_reminder_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Когда отправить напоминание, если пользователь не проявит активности",
+                null=True,
+                verbose_name="Следующее напоминание",
+            ),
+        ),
+        migrations.AddField(
+            model_name="userflow",
+            name="reminders_sent",
+            field=models.PositiveSmallIntegerField(
+                default=0,
+                help_text="Напоминаний подряд без активности пользователя",
+                verbose_name="Отправлено напоминаний",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userflow",
+            index=models.Index(
+                condition=models.Q(
+                    ("next_reminder_at__isnull", False), ("status", "in_progress")
+                ),
+                fields=["next_reminder_at"],
+                name="user_flows_reminder_due_idx",
+            ),
+        ),
+        migrations.RunPython(schedule_in_progress_flows, migrations.RunPython.noop),
+    ]
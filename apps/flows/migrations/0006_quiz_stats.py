@@ -0,0 +1,104 @@
+# Generated by Django 4.2.16 on 2026-10-19 08:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    """Начальные значения счетчиков из существующих ответов"""
+    db_alias = schema_editor.connection.alias
+    UserQuizAnswer = apps.get_model("flows", "UserQuizAnswer")
+    QuizQuestionStats = apps.get_model("flows", "QuizQuestionStats")
+    QuizAnswerStats = apps.get_model("flows", "QuizAnswerStats")
+
+    questions = UserQuizAnswer.objects.using(db_alias).values("question_id").annotate(
+        attempts=models.Count("id"),
+        correct=models.Count("id", filter=models.Q(is_correct=True)),
+    ).order_by()
+    QuizQuestionStats.objects.using(db_alias).bulk_create(
+        [QuizQuestionStats(**row) for row in questions], batch_size=1000
+    )
+
+    answers = UserQuizAnswer.objects.using(db_alias).values("selected_answer_id").annotate(
+        picks=models.Count("id")
+    ).order_by()
+    QuizAnswerStats.objects.using(db_alias).bulk_create(
+        [
+            QuizAnswerStats(answer_id=row["selected_answer_id"], picks=row["picks"])
+            for row in answers
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flows", "0005_user_flow_reminder_schedule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuizAnswerStats",
+            fields=[
+                (
+                    "answer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="flows.quizanswer",
+                        verbose_name="Вариант ответа",
+                    ),
+                ),
+                (
+                    "picks",
+                    models.PositiveIntegerField(default=0, verbose_name="Выборов"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлено"),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика варианта ответа",
+                "verbose_name_plural": "Статистика вариантов ответов",
+                "db_table": "quiz_answer_stats",
+            },
+        ),
+        migrations.CreateModel(
+            name="QuizQuestionStats",
+            fields=[
+                (
+                    "question",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="flows.quizquestion",
+                        verbose_name="Вопрос",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="Ответов"),
+                ),
+                (
+                    "correct",
+                    models.PositiveIntegerField(default=0, verbose_name="Правильных"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлено"),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика вопроса",
+                "verbose_name_plural": "Статистика вопросов",
+                "db_table": "quiz_question_stats",
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
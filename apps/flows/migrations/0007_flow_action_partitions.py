@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def partition_flow_actions(apps, schema_editor):
+    """PostgreSQL: месячные секции и BRIN-индекс, иначе обычный индекс по performed_at"""
+    from apps.flows.partitions import convert_to_partitioned, create_fallback_index
+
+    connection = schema_editor.connection
+    if not convert_to_partitioned(connection):
+        create_fallback_index(connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flows", "0006_quiz_stats"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_flow_actions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,247 @@
+# Generated by Django 4.2.16 on 2026-10-19 08:58
+
+import hashlib
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# {модель: [(текстовое поле, ссылка на ContentBlob)]}
+BLOB_FIELDS = {
+    "ArticleSnapshot": [("article_content", "article_content_blob_id")],
+    "QuizQuestionSnapshot": [
+        ("question_text", "question_text_blob_id"),
+        ("explanation", "explanation_blob_id"),
+    ],
+    "QuizAnswerSnapshot": [
+        ("answer_text", "answer_text_blob_id"),
+        ("explanation", "explanation_blob_id"),
+    ],
+}
+BATCH_SIZE = 1000
+
+
+# Копии apps.flows.blobs на момент миграции: изменения модуля не должны
+# менять уже примененные данные
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode(text):
+    raw = text.encode("utf-8")
+    packed = zlib.compress(raw, 6)
+    if len(packed) < len(raw):
+        return packed, True
+    return raw, False
+
+
+def decode(data, is_compressed):
+    data = bytes(data)
+    return (zlib.decompress(data) if is_compressed else data).decode("utf-8")
+
+
+def _batches(queryset):
+    batch = []
+    for row in queryset.order_by("pk").iterator(chunk_size=BATCH_SIZE):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def fill_blobs(apps, schema_editor):
+    """Переносит тексты снапшотов в ContentBlob и проставляет ссылки"""
+    db_alias = schema_editor.connection.alias
+    ContentBlob = apps.get_model("flows", "ContentBlob")
+    for model_name, fields in BLOB_FIELDS.items():
+        model = apps.get_model("flows", model_name)
+        text_fields = [text_field for text_field, _ in fields]
+        for batch in _batches(model.objects.using(db_alias).only("pk", *text_fields)):
+            blobs = {}
+            for row in batch:
+                for text_field, attname in fields:
+                    text = getattr(row, text_field) or ""
+                    hash_value = content_hash(text) if text else None
+                    setattr(row, attname, hash_value)
+                    if hash_value and hash_value not in blobs:
+                        data, is_compressed = encode(text)
+                        blobs[hash_value] = ContentBlob(
+                            hash=hash_value, data=data, is_compressed=is_compressed, size=len(text)
+                        )
+            ContentBlob.objects.using(db_alias).bulk_create(blobs.values(), ignore_conflicts=True)
+            model.objects.using(db_alias).bulk_update(batch, [attname for _, attname in fields])
+
+
+def restore_texts(apps, schema_editor):
+    """Обратный перенос: тексты из ContentBlob в поля снапшотов"""
+    db_alias = schema_editor.connection.alias
+    ContentBlob = apps.get_model("flows", "ContentBlob")
+    for model_name, fields in BLOB_FIELDS.items():
+        model = apps.get_model("flows", model_name)
+        attnames = [attname for _, attname in fields]
+        for batch in _batches(model.objects.using(db_alias).only("pk", *attnames)):
+            hashes = {getattr(row, attname) for row in batch for attname in attnames}
+            texts = {
+                hash_value: decode(data, is_compressed)
+                for hash_value, data, is_compressed in ContentBlob.objects.using(db_alias).filter(
+                    hash__in=hashes
+                ).values_list("hash", "data", "is_compressed")
+            }
+            for row in batch:
+                for text_field, attname in fields:
+                    setattr(row, text_field, texts.get(getattr(row, attname), ""))
+            model.objects.using(db_alias).bulk_update(batch, [text_field for text_field, _ in fields])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flows", "0007_flow_action_partitions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContentBlob",
+            fields=[
+                (
+                    "hash",
+                    models.CharField(
+                        max_length=64,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="SHA-256",
+                    ),
+                ),
+                ("data", models.BinaryField(verbose_name="Данные")),
+                (
+                    "is_compressed",
+                    models.BooleanField(default=True, verbose_name="Сжато zlib"),
+                ),
+                (
+                    "size",
+                    models.PositiveIntegerField(default=0, verbose_name="Длина текста"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Текст снапшота",
+                "verbose_name_plural": "Тексты снапшотов",
+                "db_table": "content_blobs",
+            },
+        ),
+        migrations.AddField(
+            model_name="articlesnapshot",
+            name="article_content_blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="flows.contentblob",
+                verbose_name="Содержание статьи",
+            ),
+        ),
+        migrations.AddField(
+            model_name="quizanswersnapshot",
+            name="answer_text_blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="flows.contentblob",
+                verbose_name="Текст ответа",
+            ),
+        ),
+        migrations.AddField(
+            model_name="quizanswersnapshot",
+            name="explanation_blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="flows.contentblob",
+                verbose_name="Объяснение ответа",
+            ),
+        ),
+        migrations.AddField(
+            model_name="quizquestionsnapshot",
+            name="explanation_blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="flows.contentblob",
+                verbose_name="Объяснение",
+            ),
+        ),
+        migrations.AddField(
+            model_name="quizquestionsnapshot",
+            name="question_text_blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="flows.contentblob",
+                verbose_name="Текст вопроса",
+            ),
+        ),
+        # Старые поля временно допускают NULL: при откате они добавляются
+        # пустыми, заполняются restore_texts и только затем снова NOT NULL
+        migrations.AlterField(
+            model_name="articlesnapshot",
+            name="article_content",
+            field=models.TextField(null=True, verbose_name="Содержание статьи"),
+        ),
+        migrations.AlterField(
+            model_name="quizanswersnapshot",
+            name="answer_text",
+            field=models.TextField(null=True, verbose_name="Текст ответа"),
+        ),
+        migrations.AlterField(
+            model_name="quizanswersnapshot",
+            name="explanation",
+            field=models.TextField(blank=True, null=True, verbose_name="Объяснение ответа"),
+        ),
+        migrations.AlterField(
+            model_name="quizquestionsnapshot",
+            name="explanation",
+            field=models.TextField(blank=True, null=True, verbose_name="Объяснение"),
+        ),
+        migrations.AlterField(
+            model_name="quizquestionsnapshot",
+            name="question_text",
+            field=models.TextField(null=True, verbose_name="Текст вопроса"),
+        ),
+        migrations.RunPython(fill_blobs, restore_texts),
+        migrations.RemoveField(
+            model_name="articlesnapshot",
+            name="article_content",
+        ),
+        migrations.RemoveField(
+            model_name="quizanswersnapshot",
+            name="answer_text",
+        ),
+        migrations.RemoveField(
+            model_name="quizanswersnapshot",
+            name="explanation",
+        ),
+        migrations.RemoveField(
+            model_name="quizquestionsnapshot",
+            name="explanation",
+        ),
+        migrations.RemoveField(
+            model_name="quizquestionsnapshot",
+            name="question_text",
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flows", "0008_snapshot_content_blobs"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="flowaction",
+            index=models.Index(
+                fields=["action_type", "performed_at"],
+                name="flow_action_action__e12a11_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flows", "0009_flow_action_type_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userflow",
+            name="deadline_is_manual",
+            field=models.BooleanField(
+                default=False,
+                help_text="Такой дедлайн не пересчитывается при изменении календаря и потока",
+                verbose_name="Дедлайн задан вручную",
+            ),
+        ),
+        migrations.AddField(
+            model_name="userflow",
+            name="paused_intervals",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text='Завершенные паузы: [["YYYY-MM-DD", "YYYY-MM-DD"], ...]',
+                verbose_name="Интервалы пауз",
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def rules_from_json(apps, schema_editor):
+    """Список отделов потока -> строки FlowDepartmentRule"""
+    db_alias = schema_editor.connection.alias
+    Flow = apps.get_model('flows', 'Flow')
+    FlowDepartmentRule = apps.get_model('flows', 'FlowDepartmentRule')
+    rules = []
+    for flow_id, departments in Flow.objects.using(db_alias).values_list('id', 'auto_assign_departments'):
+        for department in dict.fromkeys(departments or []):
+            if isinstance(department, str) and department.strip():
+                rules.append(FlowDepartmentRule(flow_id=flow_id, department=department.strip()))
+    FlowDepartmentRule.objects.using(db_alias).bulk_create(rules, batch_size=1000, ignore_conflicts=True)
+
+
+def json_from_rules(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Flow = apps.get_model('flows', 'Flow')
+    FlowDepartmentRule = apps.get_model('flows', 'FlowDepartmentRule')
+    departments = {}
+    for flow_id, department in FlowDepartmentRule.objects.using(db_alias).values_list('flow_id', 'department'):
+        departments.setdefault(flow_id, []).append(department)
+    for flow_id, values in departments.items():
+        Flow.objects.using(db_alias).filter(pk=flow_id).update(auto_assign_departments=values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flows", "0010_user_flow_deadline_tracking"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FlowDepartmentRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "department",
+                    models.CharField(
+                        db_index=True,
+                        help_text="Название отдела, как в профиле пользователя",
+                        max_length=255,
+                        verbose_name="Отдел",
+                    ),
+                ),
+                (
+                    "flow",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="department_rules",
+                        to="flows.flow",
+                        verbose_name="Поток",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Правило автоназначения",
+                "verbose_name_plural": "Правила автоназначения",
+                "db_table": "flow_department_rules",
+                "ordering": ["department"],
+                "unique_together": {("flow", "department")},
+            },
+        ),
+        migrations.RunPython(rules_from_json, json_from_rules),
+        migrations.RemoveField(
+            model_name="flow",
+            name="auto_assign_departments",
+        ),
+    ]
@@ -10,7 +10,7 @@ from apps.common.models import BaseModel, ActiveModel, OrderedModel, StatusChoic
 from apps.users.models import User
 from .managers import FlowManager, UserFlowManager
 from .snapshot_models import TaskSnapshot, QuizSnapshot, QuizQuestionSnapshot
-from apps.common.utils import add_working_days
+from .read_models import UserBotCard, QuizQuestionStats, QuizAnswerStats
 
 
 class Flow(BaseModel, ActiveModel):
@@ -34,15 +34,12 @@ class Flow(BaseModel, ActiveModel):
         default=False,
         help_text='Обязателен ли поток для всех новых сотрудников'
     )
-    auto_assign_departments = models.JSONField(
-        'Автоназначение отделам',
-        default=list,
-        blank=True,
-        help_text='Список отделов для автоматического назначения потока'
-    )
     
     objects = FlowManager()
     
+    # Отделы, заданные до сохранения (см. auto_assign_departments)
+    _pending_departments = None
+    
     class Meta:
         db_table = 'flows'
         verbose_name = 'Поток обучения'
@@ -52,6 +49,41 @@ class Flow(BaseModel, ActiveModel):
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self._pending_departments is not None:
+            self.set_departments(self._pending_departments)
+    
+    @property
+    def auto_assign_departments(self):
+        """Отделы для автоматического назначения потока (FlowDepartmentRule)"""
+        if self._pending_departments is not None:
+            return list(self._pending_departments)
+        if not self.pk:
+            return []
+        return sorted(rule.department for rule in self.department_rules.all())
+    
+    @auto_assign_departments.setter
+    def auto_assign_departments(self, departments):
+        # Применяется при save(), чтобы работало и для несохраненного потока
+        self._pending_departments = list(dict.fromkeys(
+            department.strip() for department in departments or [] if department and department.strip()
+        ))
+    
+    def set_departments(self, departments):
+        """Заменяет правила автоназначения потока"""
+        from apps.common.cache import invalidate_tags
+        
+        departments = set(departments)
+        self.department_rules.exclude(department__in=departments).delete()
+        FlowDepartmentRule.objects.bulk_create([
+            FlowDepartmentRule(flow=self, department=department) for department in departments
+        ], ignore_conflicts=True)
+        self._pending_departments = None
+        if hasattr(self, '_prefetched_objects_cache'):
+            self._prefetched_objects_cache.pop('department_rules', None)
+        invalidate_tags('flow_routing')
+    
     @property
     def total_steps(self):
         """Общее количество этапов в потоке"""
@@ -64,7 +96,8 @@ class Flow(BaseModel, ActiveModel):
 
     def calculate_expected_completion_date(self, start_date=None):
         """
-        Рассчитывает ожидаемую дату завершения на основе сложности этапов
+        Рассчитывает ожидаемую дату завершения по трудоемкости этапов
+        и рабочему календарю (см. deadlines.py)
         
         Args:
             start_date (date, optional): Дата начала. По умолчанию - сегодня
@@ -72,24 +105,36 @@ class Flow(BaseModel, ActiveModel):
         Returns:
             date: Ожидаемая дата завершения
         """
-        if not start_date:
-            start_date = timezone.now().date()
-        
-        # Для упрощения считаем, что каждый этап занимает около часа
-        total_minutes = self.flow_steps.filter(is_active=True).count() * 60
-        
-        # Переводим минуты в рабочие дни (считаем, что в день сотрудник 
-        # может уделить примерно 2 часа на обучение)
-        hours_per_day = 2
-        minutes_per_day = hours_per_day * 60
-        
-        working_days_needed = (total_minutes + minutes_per_day - 1) // minutes_per_day  # округляем вверх
-        
-        # Минимум 1 рабочий день
-        working_days_needed = max(1, working_days_needed)
-        
-        # Добавляем рабочие дни к текущей дате
-        return add_working_days(start_date, working_days_needed)
+        from .deadlines import expected_completion_date
+        return expected_completion_date(self, start_date)
+
+
+class FlowDepartmentRule(models.Model):
+    """
+    Правило автоназначения: поток назначается сотрудникам отдела
+    """
+    flow = models.ForeignKey(
+        Flow,
+        on_delete=models.CASCADE,
+        related_name='department_rules',
+        verbose_name='Поток'
+    )
+    department = models.CharField(
+        'Отдел',
+        max_length=255,
+        db_index=True,
+        help_text='Название отдела, как в профиле пользователя'
+    )
+    
+    class Meta:
+        db_table = 'flow_department_rules'
+        verbose_name = 'Правило автоназначения'
+        verbose_name_plural = 'Правила автоназначения'
+        unique_together = [('flow', 'department')]
+        ordering = ['department']
+    
+    def __str__(self):
+        return f"{self.department} → {self.flow_id}"
 
 
 class FlowStep(BaseModel, OrderedModel, ActiveModel):
@@ -378,6 +423,17 @@ class UserFlow(BaseModel):
         blank=True,
         help_text='Дедлайн для завершения потока'
     )
+    deadline_is_manual = models.BooleanField(
+        'Дедлайн задан вручную',
+        default=False,
+        help_text='Такой дедлайн не пересчитывается при изменении календаря и потока'
+    )
+    paused_intervals = models.JSONField(
+        'Интервалы пауз',
+        default=list,
+        blank=True,
+        help_text='Завершенные паузы: [["YYYY-MM-DD", "YYYY-MM-DD"], ...]'
+    )
     started_at = models.DateTimeField(
         'Время начала',
         null=True,
@@ -389,6 +445,19 @@ class UserFlow(BaseModel):
         blank=True
     )
     
+    # Расписание напоминаний (см. reminders.py)
+    next_reminder_at = models.DateTimeField(
+        'Следующее напоминание',
+        null=True,
+        blank=True,
+        help_text='Когда отправить напоминание, если пользователь не проявит активности'
+    )
+    reminders_sent = models.PositiveSmallIntegerField(
+        'Отправлено напоминаний',
+        default=0,
+        help_text='Напоминаний подряд без активности пользователя'
+    )
+    
     objects = UserFlowManager()
     
     class Meta:
@@ -400,11 +469,44 @@ class UserFlow(BaseModel):
             models.Index(fields=['user', 'status']),
             models.Index(fields=['flow', 'status']),
             models.Index(fields=['expected_completion_date']),
+            # Только строки, по которым ждется напоминание
+            models.Index(
+                fields=['next_reminder_at'],
+                name='user_flows_reminder_due_idx',
+                condition=models.Q(status='in_progress', next_reminder_at__isnull=False)
+            ),
         ]
     
     def __str__(self):
         return f"{self.user.name} - {self.flow.title}"
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'status' in update_fields:
+            if self._sync_reminder_schedule() and update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'next_reminder_at'}
+        super().save(*args, **kwargs)
+    
+    def _sync_reminder_schedule(self):
+        """
+        Напоминания ждут только потоки в процессе
+        
+        Returns:
+            bool: Изменилось ли время следующего напоминания
+        """
+        from .reminders import next_reminder_time
+        
+        if self.status != self.FlowStatus.IN_PROGRESS:
+            next_at = None
+        elif self.next_reminder_at is None and self.reminders_sent == 0:
+            next_at = next_reminder_time(0)
+        else:
+            return False
+        
+        changed = next_at != self.next_reminder_at
+        self.next_reminder_at = next_at
+        return changed
+    
     @property
     def is_overdue(self):
         """Проверяет, просрочено ли прохождение потока"""
@@ -446,14 +548,28 @@ class UserFlow(BaseModel):
             self.save()
     
     def resume(self):
-        """Возобновляет прохождение потока"""
+        """Возобновляет прохождение потока, сдвигая дедлайн на рабочие дни паузы"""
         if self.status == self.FlowStatus.PAUSED:
+            if self.paused_at:
+                self._record_pause(timezone.localdate(self.paused_at), timezone.localdate())
             self.status = self.FlowStatus.IN_PROGRESS
             self.paused_by = None
             self.paused_at = None
             self.pause_reason = None
+            self.reminders_sent = 0
             self.save()
     
+    def _record_pause(self, paused_from, resumed_on):
+        from .deadlines import shift_for_pause
+        
+        self.paused_intervals = [
+            *(self.paused_intervals or []), [paused_from.isoformat(), resumed_on.isoformat()]
+        ]
+        if self.expected_completion_date:
+            self.expected_completion_date = shift_for_pause(
+                self.expected_completion_date, paused_from, resumed_on
+            )
+    
     def complete(self):
         """Завершает прохождение потока"""
         if self.status in [self.FlowStatus.IN_PROGRESS, self.FlowStatus.PAUSED]:
@@ -707,6 +823,9 @@ class UserQuizAnswer(BaseModel):
 class FlowAction(BaseModel):
     """
     История действий с потоком (для аудита)
+    
+    Журнал только дополняется. В PostgreSQL таблица секционирована
+    по месяцам performed_at (см. partitions.py).
     """
     class ActionType(models.TextChoices):
         STARTED = 'started', 'Запущен'
@@ -764,6 +883,8 @@ class FlowAction(BaseModel):
         indexes = [
             models.Index(fields=['user_flow', 'action_type']),
             models.Index(fields=['performed_by', 'performed_at']),
+            # Фильтр по типу в админке с сортировкой по времени
+            models.Index(fields=['action_type', 'performed_at']),
         ]
     
     def __str__(self):
@@ -0,0 +1,260 @@
+"""
+Секционирование журнала действий (flow_actions)
+
+В PostgreSQL таблица секционирована по месяцам поля performed_at
+(flow_actions_yYYYYmMM плюс секция по умолчанию) и имеет BRIN-индекс
+по performed_at. Хранение ограничивается удалением целых секций.
+В остальных СУБД таблица обычная, старые записи удаляются пачками
+(apps.common.retention).
+"""
+import logging
+import re
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('apps.flows.partitions')
+
+TABLE = 'flow_actions'
+DEFAULT_PARTITION = f'{TABLE}_default'
+BRIN_INDEX = f'{TABLE}_performed_at_brin'
+BTREE_INDEX = f'{TABLE}_performed_at_idx'
+PARTITION_RE = re.compile(rf'^{TABLE}_y(\d{{4}})m(\d{{2}})$')
+
+
+def month_start(value):
+    """Первый день месяца для даты или datetime"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count=1):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_y{month.year:04d}m{month.month:02d}'
+
+
+def _bound(month):
+    """Граница секции в текущем часовом поясе (как у timestamptz-значений)"""
+    return timezone.make_aware(datetime.combine(month, time.min)).isoformat()
+
+
+def _supports_partitioning(conn=None):
+    conn = conn or connection
+    return conn.vendor == 'postgresql' and conn.pg_version >= 110000
+
+
+def is_partitioned(conn=None):
+    """Секционирована ли таблица журнала"""
+    conn = conn or connection
+    if conn.vendor != 'postgresql':
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(conn=None):
+    """Месячные секции: {первый день месяца: имя}"""
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)", [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def _create_partition(cursor, month):
+    """
+    Создает секцию месяца
+
+    Строки месяца, уже попавшие в секцию по умолчанию, не дают создать
+    секцию: секция по умолчанию отсоединяется, строки переносятся в новую
+    секцию, и секция по умолчанию присоединяется обратно.
+    """
+    name = partition_name(month)
+    start, end = _bound(month), _bound(add_months(month))
+    create = (
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{TABLE}" '
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+    cursor.execute(
+        f'SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE performed_at >= %s AND performed_at < %s LIMIT 1',
+        [start, end]
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(create)
+        return name
+
+    cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{DEFAULT_PARTITION}"')
+    cursor.execute(create)
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+        f'WHERE performed_at >= %s AND performed_at < %s RETURNING *) '
+        f'INSERT INTO "{TABLE}" SELECT * FROM moved', [start, end]
+    )
+    # Отложенные проверки внешних ключей перенесенных строк выполняются до ATTACH
+    cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+    cursor.execute(f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT')
+    logger.info(f"Строки {name} перенесены из {DEFAULT_PARTITION}")
+    return name
+
+
+def ensure_partitions(months_ahead=None, conn=None):
+    """
+    Создает секции с текущего месяца на months_ahead вперед
+
+    Returns:
+        list: Имена созданных или уже существующих секций
+    """
+    conn = conn or connection
+    if not is_partitioned(conn):
+        return []
+    if months_ahead is None:
+        months_ahead = getattr(settings, 'FLOW_ACTION_PARTITIONS_AHEAD', 3)
+
+    first = month_start(timezone.localdate())
+    existing = list_partitions(conn)
+    names = []
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            month = add_months(first, offset)
+            names.append(existing.get(month) or _create_partition(cursor, month))
+    return names
+
+
+def drop_partitions_before(cutoff, conn=None):
+    """
+    Удаляет секции, целиком лежащие до cutoff, и старые строки секции по умолчанию
+
+    Returns:
+        list: Имена удаленных секций
+    """
+    conn = conn or connection
+    limit = month_start(cutoff)
+    dropped = []
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        for month, name in sorted(list_partitions(conn).items()):
+            if add_months(month) > limit:
+                continue
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+            dropped.append(name)
+        cursor.execute(
+            f'DELETE FROM "{DEFAULT_PARTITION}" WHERE performed_at < %s', [_bound(limit)]
+        )
+    return dropped
+
+
+def apply_retention():
+    """
+    Ограничивает историю журнала действий сроком хранения
+
+    Returns:
+        dict: dropped_partitions (PostgreSQL) или отчет run_policy
+    """
+    from apps.common.retention import POLICIES, run_policy
+
+    policy = POLICIES['flow_actions']
+    if is_partitioned():
+        # Граница — начало месяца, поэтому хранится не меньше срока хранения
+        cutoff = timezone.now() - timedelta(days=policy.get_days())
+        dropped = drop_partitions_before(timezone.localtime(cutoff))
+        logger.info(f"Удалены секции журнала: {dropped}")
+        return {'dropped_partitions': dropped, 'deleted': 0}
+
+    return run_policy(policy)
+
+
+# ========== Миграция ==========
+
+def convert_to_partitioned(conn):
+    """
+    Переносит flow_actions в секционированную таблицу (только PostgreSQL 11+)
+
+    Имена индексов и внешних ключей сохраняются, первичный ключ становится
+    (id, performed_at), как того требует секционирование.
+    """
+    if not _supports_partitioning(conn) or is_partitioned(conn):
+        return False
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s",
+            [TABLE, f'{TABLE}_pkey']
+        )
+        index_defs = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT is_identity FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'id'",
+            [TABLE]
+        )
+        is_identity = cursor.fetchone()[0] == 'YES'
+
+        legacy = f'{TABLE}_legacy'
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{legacy}"')
+        cursor.execute(f'ALTER TABLE "{legacy}" RENAME CONSTRAINT "{TABLE}_pkey" TO "{legacy}_pkey"')
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (performed_at)'
+        )
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, performed_at)')
+        if not is_identity:
+            # serial: последовательность переходит к новой таблице
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [legacy])
+            sequence = cursor.fetchone()[0]
+            if sequence:
+                cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY "{TABLE}".id')
+
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+        cursor.execute(f'SELECT MIN(performed_at) FROM "{legacy}"')
+        oldest = cursor.fetchone()[0]
+        month = month_start(timezone.localtime(oldest) if oldest else timezone.localdate())
+        last = add_months(month_start(timezone.localdate()), 3)
+        while month <= last:
+            _create_partition(cursor, month)
+            month = add_months(month)
+
+        cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{legacy}"')
+        if is_identity:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                f'FROM "{TABLE}"', [TABLE]
+            )
+        cursor.execute(f'DROP TABLE "{legacy}"')
+
+        for _, definition in index_defs:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
+        cursor.execute(f'CREATE INDEX "{BRIN_INDEX}" ON "{TABLE}" USING brin (performed_at)')
+    return True
+
+
+def create_fallback_index(conn):
+    """Для несекционированной таблицы — обычный индекс по performed_at"""
+    if conn.vendor == 'postgresql' and is_partitioned(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS "{BTREE_INDEX}" ON "{TABLE}" (performed_at)')
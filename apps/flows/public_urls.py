@@ -4,7 +4,7 @@ URL для публичных эндпоинтов потоков (/api/flows/)
 from django.urls import path
 from apps.flows.views import (
     FlowDetailView, FlowStepListView, FlowStepReadView,
-    FlowStepTaskView, FlowStepQuizView, QuizQuestionAnswerView
+    FlowStepTaskView, FlowStepQuizView, QuizQuestionAnswerView, QuizSubmitView
 )
 
 urlpatterns = [
@@ -20,5 +20,6 @@ urlpatterns = [
     path('<int:flow_id>/steps/<int:step_id>/quiz/', FlowStepQuizView.as_view(), name='flow-step-quiz'),
     
     # Ответы на квизы
+    path('<int:flow_id>/steps/<int:step_id>/quiz/submit/', QuizSubmitView.as_view(), name='quiz-submit'),
     path('<int:flow_id>/steps/<int:step_id>/quiz/<int:question_id>/', QuizQuestionAnswerView.as_view(), name='quiz-question-answer'),
 ]
\ No newline at end of file
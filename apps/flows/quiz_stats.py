@@ -0,0 +1,173 @@
+"""
+Статистика вопросов квизов
+
+Счетчики по вопросам (ответов, правильных) и по вариантам (выборов)
+хранятся в read_models и отражают текущие ответы пользователей.
+Сохранение ответа меняет их одним UPDATE на строку, очистка старых
+ответов вычитает удаленные пачки, команда rebuild_quiz_stats
+пересчитывает их из таблицы ответов.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import QuizAnswer, QuizQuestion, UserQuizAnswer
+from .read_models import QuizAnswerStats, QuizQuestionStats
+
+
+def _bump(model, pk, **deltas):
+    """Атомарно прибавляет deltas к счетчикам строки, создавая ее при отсутствии"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(pk=pk).update(updated_at=timezone.now(), **changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(pk=pk, **{field: max(delta, 0) for field, delta in deltas.items()})
+    except IntegrityError:
+        # Строку успели создать параллельно
+        model.objects.filter(pk=pk).update(updated_at=timezone.now(), **changes)
+
+
+def record_answer(question_id, answer_id, is_correct, previous=None):
+    """
+    Учитывает сохраненный ответ пользователя
+
+    Args:
+        question_id (int): ID вопроса
+        answer_id (int): ID выбранного варианта
+        is_correct (bool): Правильный ли ответ
+        previous (tuple): (answer_id, is_correct) прежнего ответа, если он был
+    """
+    if previous is None:
+        _bump(QuizQuestionStats, question_id, attempts=1, correct=int(is_correct))
+        _bump(QuizAnswerStats, answer_id, picks=1)
+        return
+
+    previous_answer_id, previous_correct = previous
+    if previous_answer_id == answer_id:
+        return
+    _bump(QuizQuestionStats, question_id, correct=int(is_correct) - int(previous_correct))
+    _bump(QuizAnswerStats, previous_answer_id, picks=-1)
+    _bump(QuizAnswerStats, answer_id, picks=1)
+
+
+def forget_answers(queryset):
+    """
+    Вычитает из счетчиков ответы, которые удаляет политика хранения
+
+    Вызывается в транзакции удаления пачки; строки пачки блокируются,
+    чтобы счетчики и удаление видели одни и те же ответы.
+    """
+    attempts, correct, picks = Counter(), Counter(), Counter()
+    rows = queryset.select_for_update(of=('self',)).values_list('question_id', 'selected_answer_id', 'is_correct')
+    for question_id, answer_id, is_correct in rows:
+        attempts[question_id] += 1
+        correct[question_id] += int(is_correct)
+        picks[answer_id] += 1
+
+    now = timezone.now()
+    for question_id, count in attempts.items():
+        QuizQuestionStats.objects.filter(pk=question_id).update(
+            attempts=Greatest(F('attempts') - count, 0),
+            correct=Greatest(F('correct') - correct[question_id], 0),
+            updated_at=now,
+        )
+    for answer_id, count in picks.items():
+        QuizAnswerStats.objects.filter(pk=answer_id).update(
+            picks=Greatest(F('picks') - count, 0), updated_at=now
+        )
+
+
+def rebuild_stats(quiz_ids=None):
+    """
+    Пересчитывает счетчики из таблицы ответов двумя сгруппированными запросами
+
+    Returns:
+        tuple: (число вопросов, число вариантов)
+    """
+    questions = QuizQuestion.objects.all()
+    answers = QuizAnswer.objects.all()
+    user_answers = UserQuizAnswer.objects.all()
+    if quiz_ids is not None:
+        questions = questions.filter(quiz_id__in=quiz_ids)
+        answers = answers.filter(question__quiz_id__in=quiz_ids)
+        user_answers = user_answers.filter(question__quiz_id__in=quiz_ids)
+
+    question_counts = {
+        row['question_id']: row
+        for row in user_answers.values('question_id').annotate(
+            attempts=Count('id'),
+            correct=Count('id', filter=Q(is_correct=True)),
+        ).order_by()
+    }
+    answer_counts = dict(
+        user_answers.values('selected_answer_id').annotate(picks=Count('id'))
+        .order_by().values_list('selected_answer_id', 'picks')
+    )
+
+    question_ids = list(questions.values_list('id', flat=True))
+    answer_ids = list(answers.values_list('id', flat=True))
+
+    with transaction.atomic():
+        QuizQuestionStats.objects.filter(question_id__in=question_ids).delete()
+        QuizAnswerStats.objects.filter(answer_id__in=answer_ids).delete()
+        QuizQuestionStats.objects.bulk_create([
+            QuizQuestionStats(
+                question_id=question_id,
+                attempts=question_counts.get(question_id, {}).get('attempts', 0),
+                correct=question_counts.get(question_id, {}).get('correct', 0),
+            )
+            for question_id in question_ids
+        ], batch_size=1000)
+        QuizAnswerStats.objects.bulk_create([
+            QuizAnswerStats(answer_id=answer_id, picks=answer_counts.get(answer_id, 0))
+            for answer_id in answer_ids
+        ], batch_size=1000)
+
+    return len(question_ids), len(answer_ids)
+
+
+def quiz_item_stats(quiz):
+    """
+    Анализ вопросов квиза только по таблицам счетчиков (два запроса)
+    """
+    questions = QuizQuestion.objects.filter(quiz=quiz).select_related('stats').order_by('order')
+    answers = QuizAnswer.objects.filter(question__quiz=quiz).select_related('stats').order_by('order')
+
+    options = {}
+    for answer in answers:
+        options.setdefault(answer.question_id, []).append(answer)
+
+    items = []
+    for question in questions:
+        stats = getattr(question, 'stats', None)
+        attempts = stats.attempts if stats else 0
+        correct = stats.correct if stats else 0
+        item_options = []
+        for answer in options.get(question.id, []):
+            picks = answer.stats.picks if hasattr(answer, 'stats') else 0
+            item_options.append({
+                'answer_id': answer.id,
+                'text': answer.answer_text,
+                'is_correct': answer.is_correct,
+                'picks': picks,
+                'pick_rate': round(picks / attempts * 100, 2) if attempts else None,
+            })
+        items.append({
+            'question_id': question.id,
+            'text': question.question,
+            'order': question.order,
+            'attempts': attempts,
+            'correct': correct,
+            'correct_rate': round(correct / attempts * 100, 2) if attempts else None,
+            'distractor_picks': attempts - correct,
+            'options': item_options,
+        })
+
+    return {'quiz_id': quiz.id, 'title': quiz.title, 'questions': items}
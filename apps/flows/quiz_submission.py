@@ -0,0 +1,383 @@
+"""
+Прием ответов на квизы
+
+Ответы одного прохождения на один квиз сериализуются: в PostgreSQL —
+транзакционной advisory-блокировкой по (прохождение, квиз), в других
+СУБД — select_for_update строки прохождения. Под блокировкой ответ
+сохраняется, итог квиза считается одним агрегатным запросом, а снапшот
+пересобирается только если ответы изменились. Повтор того же ответа
+(двойное нажатие в Mini App) ничего не пишет.
+
+Клиент может передать заголовок Idempotency-Key: ответ на запрос с
+уже обработанным ключом возвращается из кэша без обращения к квизу.
+Ключ действует в пределах квиза (и вопроса для одиночного ответа).
+
+Пакетная отправка (submit_answers) проверяет все ответы по одному
+загруженному дереву квиза, пишет их bulk_create/bulk_update и завершает
+квиз в той же транзакции.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from django.utils import timezone
+
+from .blobs import put_many
+from .models import FlowStep, Quiz, QuizQuestion, UserFlow, UserQuizAnswer, UserStepProgress
+from .quiz_stats import record_answer
+from .reminders import reset_schedule
+from .snapshot_models import (
+    QuizAnswerSnapshot, QuizQuestionSnapshot, QuizSnapshot, UserQuizAnswerSnapshot
+)
+
+logger = logging.getLogger('apps.flows.quiz_submission')
+
+# Ключи pg_advisory_xact_lock(int4, int4)
+LOCK_KEY_MODULO = 2 ** 31
+
+
+def _idempotency_key(user_flow_id, scope, key):
+    return f'quiz:submit:{user_flow_id}:{scope}:{key}'
+
+
+def submission_scope(quiz, question=None):
+    """Область Idempotency-Key: квиз, для одиночного ответа — и вопрос"""
+    return f'{quiz.pk}:{question.pk}' if question else str(quiz.pk)
+
+
+def lock_submission(user_flow, quiz):
+    """Блокировка до конца транзакции на ответы прохождения в квизе"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s, %s)',
+                [user_flow.pk % LOCK_KEY_MODULO, quiz.pk % LOCK_KEY_MODULO]
+            )
+    else:
+        UserFlow.objects.select_for_update().filter(pk=user_flow.pk).exists()
+
+
+def quiz_result(user_flow, quiz):
+    """
+    Итог квиза одним запросом
+
+    Returns:
+        dict: {'total': вопросов, 'answered': отвечено, 'correct': верно}
+    """
+    answers = UserQuizAnswer.objects.filter(user_flow=user_flow, question=OuterRef('pk'))
+    return QuizQuestion.objects.filter(quiz=quiz).aggregate(
+        total=Count('id'),
+        answered=Count('id', filter=Exists(answers)),
+        correct=Count('id', filter=Exists(answers.filter(is_correct=True))),
+    )
+
+
+def is_passed(quiz, result):
+    if not result['total']:
+        return False
+    return result['correct'] / result['total'] * 100 >= quiz.passing_score_percentage
+
+
+def save_answer(user_flow, question, answer):
+    """
+    Сохраняет ответ пользователя на вопрос
+
+    Returns:
+        bool: Изменился ли ответ (False — повтор того же варианта)
+    """
+    current = UserQuizAnswer.objects.filter(user_flow=user_flow, question=question).first()
+    if current and current.selected_answer_id == answer.id:
+        return False
+
+    previous = (current.selected_answer_id, current.is_correct) if current else None
+    user_answer = current or UserQuizAnswer(user_flow=user_flow, question=question)
+    user_answer.selected_answer = answer
+    user_answer.is_correct = answer.is_correct
+    user_answer.answered_at = timezone.now()
+    # Завершение квиза считается здесь, обработчик post_save его не повторяет
+    user_answer.completion_handled = True
+    user_answer.save()
+
+    record_answer(question.id, answer.id, answer.is_correct, previous)
+    return True
+
+
+def complete_quiz_step(user_flow, step, questions=None):
+    """
+    Завершение этапа с квизом с созданием полного снапшота
+
+    Args:
+        questions (list): Вопросы квиза с вариантами, если уже загружены
+
+    Returns:
+        bool: Пройден ли квиз
+    """
+    quiz = step.quiz
+
+    step_progress, _ = UserStepProgress.objects.get_or_create(
+        user_flow=user_flow,
+        flow_step=step
+    )
+
+    QuizSnapshot.objects.filter(user_step_progress=step_progress).delete()
+
+    if questions is None:
+        questions = list(quiz.questions.prefetch_related('answers').order_by('order'))
+    answers_by_question = {
+        answer.question_id: answer
+        for answer in UserQuizAnswer.objects.filter(user_flow=user_flow, question__quiz=quiz)
+    }
+    total_questions = len(questions)
+    correct_count = sum(1 for answer in answers_by_question.values() if answer.is_correct)
+    score_percentage = (correct_count / total_questions * 100) if total_questions > 0 else 0
+    passed = score_percentage >= quiz.passing_score_percentage
+
+    quiz_snapshot = QuizSnapshot.objects.create(
+        user_step_progress=step_progress,
+        quiz_title=quiz.title,
+        quiz_description=quiz.description or '',
+        passing_score_percentage=quiz.passing_score_percentage,
+        total_questions=total_questions,
+        correct_answers=correct_count,
+        score_percentage=int(score_percentage),
+        is_passed=passed
+    )
+
+    # Тексты пишутся в хранилище один раз, снапшоты ссылаются на них по хэшу
+    texts = []
+    for question in questions:
+        texts += [question.question, question.explanation or '']
+        for answer in question.answers.all():
+            texts += [answer.answer_text, answer.explanation or '']
+    put_many(texts)
+
+    # Снапшоты вопросов и всех вариантов ответов
+    question_snapshots = QuizQuestionSnapshot.objects.bulk_create([
+        QuizQuestionSnapshot(
+            quiz_snapshot=quiz_snapshot,
+            original_question_id=question.id,
+            question_text=question.question,
+            question_order=question.order,
+            explanation=question.explanation or ''
+        )
+        for question in questions
+    ])
+    answer_snapshots = QuizAnswerSnapshot.objects.bulk_create([
+        QuizAnswerSnapshot(
+            question_snapshot=question_snapshot,
+            original_answer_id=answer.id,
+            answer_text=answer.answer_text,
+            is_correct=answer.is_correct,
+            answer_order=answer.order,
+            explanation=answer.explanation or ''
+        )
+        for question, question_snapshot in zip(questions, question_snapshots)
+        for answer in sorted(question.answers.all(), key=lambda item: item.order)
+    ])
+    snapshot_by_answer = {snapshot.original_answer_id: snapshot for snapshot in answer_snapshots}
+
+    # Снапшоты ответов пользователя
+    UserQuizAnswerSnapshot.objects.bulk_create([
+        UserQuizAnswerSnapshot(
+            quiz_snapshot=quiz_snapshot,
+            question_snapshot=question_snapshot,
+            selected_answer_snapshot=snapshot_by_answer[user_answer.selected_answer_id],
+            is_correct=user_answer.is_correct,
+            answered_at=user_answer.answered_at
+        )
+        for question, question_snapshot in zip(questions, question_snapshots)
+        for user_answer in [answers_by_question.get(question.id)]
+        if user_answer
+    ])
+
+    # Обновляем прогресс по этапу
+    step_progress.quiz_completed_at = timezone.now()
+    step_progress.quiz_correct_answers = correct_count
+    step_progress.quiz_total_questions = total_questions
+
+    if passed:
+        step_progress.status = UserStepProgress.StepStatus.COMPLETED
+        step_progress.completed_at = step_progress.quiz_completed_at
+        _unlock_next_step(user_flow, step)
+
+    step_progress.save()
+    return passed
+
+
+def _unlock_next_step(user_flow, current_step):
+    """Разблокирует следующий этап"""
+    next_step = FlowStep.objects.filter(
+        flow=current_step.flow,
+        order=current_step.order + 1,
+        is_active=True
+    ).first()
+
+    if next_step:
+        next_progress, _ = UserStepProgress.objects.get_or_create(
+            user_flow=user_flow,
+            flow_step=next_step,
+            defaults={'status': UserStepProgress.StepStatus.AVAILABLE}
+        )
+        if next_progress.status == UserStepProgress.StepStatus.LOCKED:
+            next_progress.status = UserStepProgress.StepStatus.AVAILABLE
+            next_progress.save()
+
+
+def finalize(user_flow, step, changed, questions=None):
+    """
+    Итог квиза после сохранения ответов
+
+    Снапшот собирается, когда ответы даны на все вопросы и либо изменились,
+    либо квиз еще не завершался.
+
+    Returns:
+        bool: Пройден ли квиз (False, пока есть вопросы без ответа)
+    """
+    quiz = step.quiz
+    result = quiz_result(user_flow, quiz)
+    if result['answered'] < result['total']:
+        return False
+
+    if changed or not UserStepProgress.objects.filter(
+        user_flow=user_flow, flow_step=step, quiz_completed_at__isnull=False
+    ).exists():
+        return complete_quiz_step(user_flow, step, questions)
+    return is_passed(quiz, result)
+
+
+def _feedback(question, answer):
+    data = {'is_correct': answer.is_correct}
+    if not answer.is_correct:
+        correct = next((item for item in question.answers.all() if item.is_correct), None)
+        if correct:
+            data['correct_answer'] = {
+                'id': correct.id,
+                'text': correct.answer_text,
+                'explanation': correct.explanation,
+            }
+    return data
+
+
+def cached_response(user_flow, scope, key):
+    """Ответ на ранее обработанный запрос с тем же Idempotency-Key"""
+    if not key:
+        return None
+    return cache.get(_idempotency_key(user_flow.pk, scope, key))
+
+
+def remember_response(user_flow, scope, key, data):
+    """Сохраняет ответ для повторов запроса после фиксации транзакции"""
+    if key:
+        timeout = getattr(settings, 'QUIZ_IDEMPOTENCY_TTL', 600)
+        cache_key = _idempotency_key(user_flow.pk, scope, key)
+        transaction.on_commit(lambda: cache.set(cache_key, data, timeout))
+
+
+def submit_answer(user_flow, step, question, answer, idempotency_key=None):
+    """
+    Принимает ответ на вопрос квиза
+
+    Returns:
+        dict: Тело ответа API (is_correct, correct_answer, is_completed)
+    """
+    with transaction.atomic():
+        lock_submission(user_flow, step.quiz)
+        scope = submission_scope(step.quiz, question)
+        data = cached_response(user_flow, scope, idempotency_key)
+        if data is not None:
+            return data
+
+        changed = save_answer(user_flow, question, answer)
+        data = {'message': 'Ответ сохранен', **_feedback(question, answer)}
+        data['is_completed'] = finalize(user_flow, step, changed)
+        remember_response(user_flow, scope, idempotency_key, data)
+
+    if not changed:
+        logger.debug(f"Повтор ответа: прохождение {user_flow.pk}, вопрос {question.pk}")
+    return data
+
+
+def load_quiz(quiz_id):
+    """Квиз с вопросами и вариантами ответов (три запроса)"""
+    return Quiz.objects.prefetch_related(Prefetch(
+        'questions',
+        queryset=QuizQuestion.objects.order_by('order').prefetch_related('answers'),
+    )).get(pk=quiz_id)
+
+
+def save_answers(user_flow, pairs):
+    """
+    Сохраняет пакет ответов: новые — bulk_create, измененные — bulk_update
+
+    Args:
+        pairs (list): [(вопрос, выбранный вариант)]
+
+    Returns:
+        bool: Изменился ли хотя бы один ответ
+    """
+    current = {
+        user_answer.question_id: user_answer
+        for user_answer in UserQuizAnswer.objects.filter(
+            user_flow=user_flow, question__in=[question for question, _ in pairs]
+        )
+    }
+    now = timezone.now()
+    created, updated = [], []
+    for question, answer in pairs:
+        user_answer = current.get(question.id)
+        if user_answer and user_answer.selected_answer_id == answer.id:
+            continue
+        previous = (user_answer.selected_answer_id, user_answer.is_correct) if user_answer else None
+        if user_answer is None:
+            user_answer = UserQuizAnswer(user_flow=user_flow, question=question)
+            created.append(user_answer)
+        else:
+            user_answer.updated_at = now
+            updated.append(user_answer)
+        user_answer.selected_answer = answer
+        user_answer.is_correct = answer.is_correct
+        user_answer.answered_at = now
+        record_answer(question.id, answer.id, answer.is_correct, previous)
+
+    UserQuizAnswer.objects.bulk_create(created)
+    UserQuizAnswer.objects.bulk_update(
+        updated, ['selected_answer', 'is_correct', 'answered_at', 'updated_at']
+    )
+    if created or updated:
+        # bulk-операции не шлют post_save, напоминание откладываем сами
+        reset_schedule(user_flow.pk)
+    return bool(created or updated)
+
+
+def submit_answers(user_flow, step, quiz, pairs, idempotency_key=None):
+    """
+    Принимает ответы на несколько вопросов квиза одним запросом
+
+    Args:
+        quiz (Quiz): Квиз из load_quiz, по которому проверены ответы
+        pairs (list): [(вопрос, выбранный вариант)]
+
+    Returns:
+        dict: Тело ответа API (results по вопросам, is_completed)
+    """
+    with transaction.atomic():
+        lock_submission(user_flow, quiz)
+        scope = submission_scope(quiz)
+        data = cached_response(user_flow, scope, idempotency_key)
+        if data is not None:
+            return data
+
+        changed = save_answers(user_flow, pairs)
+        questions = list(quiz.questions.all())
+        data = {
+            'message': 'Ответы сохранены',
+            'results': [
+                {'question_id': question.id, 'answer_id': answer.id, **_feedback(question, answer)}
+                for question, answer in pairs
+            ],
+            'is_completed': finalize(user_flow, step, changed, questions),
+        }
+        remember_response(user_flow, scope, idempotency_key, data)
+    return data
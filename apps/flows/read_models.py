@@ -0,0 +1,87 @@
+"""
+Денормализованные модели для чтения
+"""
+from django.db import models
+
+
+class UserBotCard(models.Model):
+    """
+    Карточка пользователя для бота: один JSON-документ с активными
+    потоками, прогрессом, текущими этапами, сроками и бадди.
+    Основная копия хранится в кэше, таблица служит запасным источником.
+    """
+    user = models.OneToOneField(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='bot_card',
+        verbose_name='Пользователь'
+    )
+    telegram_id = models.CharField(
+        'Telegram ID',
+        max_length=50,
+        unique=True
+    )
+    data = models.JSONField('Данные карточки', default=dict)
+    built_at = models.DateTimeField('Собрана', auto_now=True)
+    
+    class Meta:
+        db_table = 'user_bot_cards'
+        verbose_name = 'Карточка пользователя для бота'
+        verbose_name_plural = 'Карточки пользователей для бота'
+    
+    def __str__(self):
+        return f"Карточка {self.telegram_id}"
+
+
+class QuizQuestionStats(models.Model):
+    """
+    Счетчики ответов на вопрос квиза (по текущим ответам пользователей).
+    Обновляются при сохранении ответа и очистке старых ответов,
+    пересобираются командой rebuild_quiz_stats.
+    """
+    question = models.OneToOneField(
+        'flows.QuizQuestion',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Вопрос'
+    )
+    attempts = models.PositiveIntegerField('Ответов', default=0)
+    correct = models.PositiveIntegerField('Правильных', default=0)
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+    
+    class Meta:
+        db_table = 'quiz_question_stats'
+        verbose_name = 'Статистика вопроса'
+        verbose_name_plural = 'Статистика вопросов'
+    
+    def __str__(self):
+        return f"Вопрос {self.question_id}: {self.correct}/{self.attempts}"
+    
+    @property
+    def correct_rate(self):
+        """Доля правильных ответов в процентах"""
+        return round(self.correct / self.attempts * 100, 2) if self.attempts else None
+
+
+class QuizAnswerStats(models.Model):
+    """
+    Сколько раз выбран вариант ответа (для неправильных — выборы дистрактора)
+    """
+    answer = models.OneToOneField(
+        'flows.QuizAnswer',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Вариант ответа'
+    )
+    picks = models.PositiveIntegerField('Выборов', default=0)
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+    
+    class Meta:
+        db_table = 'quiz_answer_stats'
+        verbose_name = 'Статистика варианта ответа'
+        verbose_name_plural = 'Статистика вариантов ответов'
+    
+    def __str__(self):
+        return f"Вариант {self.answer_id}: {self.picks}"
@@ -0,0 +1,47 @@
+"""
+Расписание напоминаний по прохождениям потоков
+
+У каждого UserFlow в процессе есть next_reminder_at. Задача напоминаний
+выбирает только строки с наступившим сроком (частичный индекс), после
+отправки срок сдвигается с нарастающим интервалом, а активность
+обучающегося сбрасывает расписание к первому интервалу.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+# Интервалы в днях: первый — от последней активности, далее — между напоминаниями
+DEFAULT_BACKOFF_DAYS = (3, 5, 10)
+
+
+def get_backoff_days():
+    return tuple(getattr(settings, 'FLOW_REMINDER_BACKOFF_DAYS', DEFAULT_BACKOFF_DAYS))
+
+
+def next_reminder_time(reminders_sent, now=None):
+    """
+    Время следующего напоминания после reminders_sent отправленных
+
+    None — напоминания исчерпаны до следующей активности пользователя.
+    """
+    backoff = get_backoff_days()
+    if reminders_sent >= len(backoff):
+        return None
+    return (now or timezone.now()) + timedelta(days=backoff[reminders_sent])
+
+
+def reset_schedule(user_flow_id, now=None):
+    """
+    Сбрасывает расписание после активности обучающегося (один UPDATE)
+
+    Возвращает новое время напоминания или None, если поток не в процессе.
+    """
+    from .models import UserFlow
+
+    next_at = next_reminder_time(0, now)
+    updated = UserFlow.objects.filter(
+        pk=user_flow_id,
+        status=UserFlow.FlowStatus.IN_PROGRESS
+    ).update(next_reminder_at=next_at, reminders_sent=0)
+    return next_at if updated else None
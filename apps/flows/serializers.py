@@ -15,6 +15,8 @@ from .snapshot_models import (
     TaskSnapshot, QuizSnapshot, QuizQuestionSnapshot,
     QuizAnswerSnapshot, UserQuizAnswerSnapshot
 )
+from .blobs import resolve as resolve_blobs
+from apps.common.models import BulkJob
 from apps.users.serializers import UserListSerializer
 from apps.guides.serializers import ArticleBasicSerializer
 
@@ -171,19 +173,27 @@ class QuizSerializer(BaseUserApiSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
     def to_representation(self, instance):
-        data = super().to_representation(instance)
-        questions = data.get('questions', [])
+        return shuffle_quiz(super().to_representation(instance))
+
+
+def shuffle_quiz(data):
+    """
+    Перемешивает вопросы и варианты сериализованного квиза по его настройкам
+
+    Вызывается и для данных из кэша, чтобы порядок не замораживался.
+    """
+    questions = data.get('questions', [])
+    
+    if data.get('shuffle_questions'):
+        random.shuffle(questions)
         
-        if instance.shuffle_questions:
-            random.shuffle(questions)
-            
-        if instance.shuffle_answers:
-            for question in questions:
-                if 'answers' in question:
-                    random.shuffle(question['answers'])
-                    
-        data['questions'] = questions
-        return data
+    if data.get('shuffle_answers'):
+        for question in questions:
+            if 'answers' in question:
+                random.shuffle(question['answers'])
+                
+    data['questions'] = questions
+    return data
 
 
 class FlowStepSerializer(BaseUserApiSerializer):
@@ -237,7 +247,7 @@ class UserQuizAnswerSnapshotSerializer(serializers.ModelSerializer):
 class QuizQuestionSnapshotSerializer(serializers.ModelSerializer):
     """Сериализатор снапшота вопроса квиза"""
     answer_options = QuizAnswerSnapshotSerializer(many=True, read_only=True)
-    user_answers = UserQuizAnswerSnapshotSerializer(many=True, read_only=True)
+    user_answers = UserQuizAnswerSnapshotSerializer(source='user_answer', many=True, read_only=True)
     
     class Meta:
         model = QuizQuestionSnapshot
@@ -247,17 +257,71 @@ class QuizQuestionSnapshotSerializer(serializers.ModelSerializer):
         ]
 
 
+def resolve_quiz_snapshots(quiz_snapshots):
+    """
+    Подгружает вопросы и варианты снапшотов квизов и их тексты
+    одним проходом по хранилищу на весь набор
+    """
+    quiz_snapshots = [
+        snapshot for snapshot in quiz_snapshots
+        if snapshot is not None and not getattr(snapshot, '_blobs_resolved', False)
+    ]
+    if not quiz_snapshots:
+        return
+    models.prefetch_related_objects(
+        quiz_snapshots, 'questions__answer_options',
+        'questions__user_answer__selected_answer_snapshot'
+    )
+    snapshots = []
+    for quiz_snapshot in quiz_snapshots:
+        for question in quiz_snapshot.questions.all():
+            snapshots.append(question)
+            snapshots.extend(question.answer_options.all())
+            snapshots.extend(answer.selected_answer_snapshot for answer in question.user_answer.all())
+        quiz_snapshot._blobs_resolved = True
+    resolve_blobs(snapshots)
+
+
+def resolve_progress_snapshots(step_progress):
+    """
+    Снапшоты квизов набора прогрессов по этапам одним проходом
+
+    Returns:
+        list: Прогрессы с загруженными снапшотами
+    """
+    step_progress = list(step_progress)
+    models.prefetch_related_objects(step_progress, 'quiz_snapshot')
+    resolve_quiz_snapshots(getattr(progress, 'quiz_snapshot', None) for progress in step_progress)
+    return step_progress
+
+
+class QuizSnapshotListSerializer(serializers.ListSerializer):
+    """Тексты всех снапшотов списка загружаются одним проходом"""
+    
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        quiz_snapshots = list(iterable)
+        resolve_quiz_snapshots(quiz_snapshots)
+        return super().to_representation(quiz_snapshots)
+
+
 class QuizSnapshotSerializer(serializers.ModelSerializer):
     """Сериализатор снапшота квиза"""
     questions = QuizQuestionSnapshotSerializer(many=True, read_only=True)
     
     class Meta:
         model = QuizSnapshot
+        list_serializer_class = QuizSnapshotListSerializer
         fields = [
             'id', 'quiz_title', 'quiz_description', 'passing_score_percentage',
             'total_questions', 'correct_answers', 'score_percentage', 'is_passed',
             'questions', 'created_at'
         ]
+    
+    def to_representation(self, instance):
+        # Вопросы и варианты подгружаются заранее, их тексты — одним запросом к хранилищу
+        resolve_quiz_snapshots([instance])
+        return super().to_representation(instance)
 
 
 class TaskSnapshotSerializer(serializers.ModelSerializer):
@@ -272,6 +336,14 @@ class TaskSnapshotSerializer(serializers.ModelSerializer):
         ]
 
 
+class UserStepProgressListSerializer(serializers.ListSerializer):
+    """Снапшоты квизов всех прогрессов списка загружаются одним проходом"""
+    
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return super().to_representation(resolve_progress_snapshots(iterable))
+
+
 class UserStepProgressSerializer(serializers.ModelSerializer):
     """
     Сериализатор прогресса по этапу
@@ -284,6 +356,7 @@ class UserStepProgressSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = UserStepProgress
+        list_serializer_class = UserStepProgressListSerializer
         fields = [
             'id', 'flow_step', 'status', 'is_accessible',
             'article_read_at', 'task_completed_at', 'quiz_completed_at',
@@ -377,7 +450,7 @@ class UserFlowDetailSerializer(UserFlowSerializer):
         
         # Для обычного пользователя - показываем все этапы, но с ограничениями
         if user == obj.user:
-            step_progress = obj.step_progress.all().order_by('flow_step__order')
+            step_progress = resolve_progress_snapshots(obj.step_progress.all().order_by('flow_step__order'))
             
             serialized_steps = []
             for progress in step_progress:
@@ -468,6 +541,7 @@ class UserFlowStartSerializer(serializers.Serializer):
 
         # Если срок выполнения не указан, рассчитываем его автоматически
         expected_completion_date = validated_data.get('expected_completion_date')
+        deadline_is_manual = bool(expected_completion_date)
         if not expected_completion_date:
             expected_completion_date = flow.calculate_expected_completion_date()
 
@@ -476,6 +550,7 @@ class UserFlowStartSerializer(serializers.Serializer):
             user=user,
             flow=flow,
             expected_completion_date=expected_completion_date,
+            deadline_is_manual=deadline_is_manual,
             status=UserFlow.FlowStatus.IN_PROGRESS
         )
 
@@ -574,7 +649,90 @@ class QuizSubmissionSerializer(serializers.Serializer):
             )
 
         return data
-        
+
+
+class QuizBatchAnswerSerializer(serializers.Serializer):
+    """Ответ на один вопрос в пакете."""
+    question_id = serializers.IntegerField(label="ID вопроса")
+    answer_id = serializers.IntegerField(label="ID ответа")
+
+
+class QuizBatchSubmissionSerializer(serializers.Serializer):
+    """
+    Пакет ответов на квиз
+
+    Проверяется по квизу из контекста (вопросы и варианты уже загружены),
+    validated_data['answers'] — список пар (вопрос, выбранный вариант).
+    """
+    answers = QuizBatchAnswerSerializer(many=True, allow_empty=False, label="Ответы")
+
+    def validate_answers(self, value):
+        questions = {question.id: question for question in self.context['quiz'].questions.all()}
+        pairs = []
+        for item in value:
+            question = questions.get(item['question_id'])
+            if question is None:
+                raise serializers.ValidationError(
+                    f"Вопрос {item['question_id']} не относится к квизу."
+                )
+            if any(seen.id == question.id for seen, _ in pairs):
+                raise serializers.ValidationError(f"Повторный ответ на вопрос {question.id}.")
+            answer = next(
+                (option for option in question.answers.all() if option.id == item['answer_id']), None
+            )
+            if answer is None:
+                raise serializers.ValidationError(
+                    f"Выбранный ответ не принадлежит вопросу {question.id}."
+                )
+            pairs.append((question, answer))
+        return pairs
+
+
+class BulkJobSerializer(serializers.ModelSerializer):
+    """
+    Состояние массовой операции
+    """
+    created_by = UserListSerializer(read_only=True)
+    progress_percentage = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = BulkJob
+        fields = [
+            'id', 'operation', 'model_label', 'params', 'status', 'total', 'processed',
+            'failed', 'progress_percentage', 'errors', 'created_by',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class UserFlowBulkJobSerializer(serializers.Serializer):
+    """
+    Массовая операция над прохождениями: список ids или фильтры flow/status
+    """
+    operation = serializers.ChoiceField(choices=[
+        'pause', 'resume', 'extend_deadline', 'reassign_buddy', 'renotify'
+    ])
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    flow = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=UserFlow.FlowStatus.choices, required=False)
+    params = serializers.DictField(required=False, default=dict)
+    
+    def validate(self, data):
+        if not any(key in data for key in ('ids', 'flow', 'status')):
+            raise serializers.ValidationError('Укажите ids или фильтры flow/status')
+        return data
+    
+    def get_queryset(self):
+        """Набор прохождений по ids и фильтрам"""
+        queryset = UserFlow.objects.all()
+        if 'ids' in self.validated_data:
+            queryset = queryset.filter(pk__in=self.validated_data['ids'])
+        if 'flow' in self.validated_data:
+            queryset = queryset.filter(flow_id=self.validated_data['flow'])
+        if 'status' in self.validated_data:
+            queryset = queryset.filter(status=self.validated_data['status'])
+        return queryset
+
 
 class MyFlowProgressSerializer(serializers.ModelSerializer):
     """
@@ -3,12 +3,22 @@
 """
 from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 from django.utils import timezone
+from functools import partial
 
 from .models import (
-    UserFlow, FlowBuddy, UserStepProgress, UserQuizAnswer, 
-    FlowStep, FlowAction
+    Flow, UserFlow, FlowBuddy, UserStepProgress, UserQuizAnswer, 
+    FlowStep, FlowAction, Task, Quiz, QuizQuestion, QuizAnswer, FlowDepartmentRule
 )
+from apps.common.cache import invalidate_tags
+from apps.users.models import User
+from .bot_card import schedule_rebuild
+from .reminders import reset_schedule
+from .deadlines import schedule_recalculation
+from apps.common.models import WorkingCalendar
+from apps.guides.models import Article
+from .tasks import rebuild_bot_cards_for_flow
 
 
 def _create_initial_step_progress(user_flow):
@@ -140,7 +150,11 @@ def step_progress_updated_handler(sender, instance, created, **kwargs):
 def quiz_answer_submitted_handler(sender, instance, created, **kwargs):
     """
     Обработчик отправки ответа на квиз
+
+    Ответы из API завершают квиз сами (apps.flows.quiz_submission).
     """
+    if getattr(instance, 'completion_handled', False):
+        return
     if created:
         # Проверяем, завершен ли квиз
         quiz = instance.question.quiz
@@ -294,4 +308,151 @@ def flow_step_created_handler(sender, instance, created, **kwargs):
                 user_flow=user_flow,
                 flow_step=instance,
                 defaults={'status': status}
-            )
\ No newline at end of file
+            )
+
+
+# ========== Инвалидация кэша ==========
+
+FLOW_CONTENT_MODELS = (Flow, FlowStep, Task, Quiz, QuizQuestion, QuizAnswer)
+
+
+def flow_content_changed_handler(sender, **kwargs):
+    """
+    Сбрасывает кэш содержимого потоков при изменении структуры
+    """
+    invalidate_tags('flow_content')
+
+
+for _model in FLOW_CONTENT_MODELS:
+    post_save.connect(flow_content_changed_handler, sender=_model,
+                      dispatch_uid=f'flow_content_cache_save_{_model.__name__}')
+    post_delete.connect(flow_content_changed_handler, sender=_model,
+                        dispatch_uid=f'flow_content_cache_delete_{_model.__name__}')
+
+
+@receiver(post_save, sender=Flow)
+@receiver(post_delete, sender=Flow)
+@receiver(post_save, sender=FlowDepartmentRule)
+@receiver(post_delete, sender=FlowDepartmentRule)
+def flow_routing_cache_handler(sender, **kwargs):
+    """
+    Сбрасывает карту маршрутизации (обязательность, активность, отделы)
+    """
+    invalidate_tags('flow_routing')
+
+
+@receiver(post_save, sender=UserFlow)
+@receiver(post_delete, sender=UserFlow)
+def user_flow_cache_handler(sender, **kwargs):
+    """
+    Сбрасывает кэш агрегатов по назначениям потоков
+    """
+    invalidate_tags('user_flows')
+
+
+# ========== Карточка пользователя для бота ==========
+
+def _user_flow_owner_id(sender, instance):
+    """ID владельца прохождения без запроса, если user_flow уже загружен"""
+    if sender.user_flow.is_cached(instance):
+        return instance.user_flow.user_id
+    return UserFlow.objects.filter(pk=instance.user_flow_id).values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender=UserFlow)
+@receiver(post_delete, sender=UserFlow)
+def user_flow_bot_card_handler(sender, instance, **kwargs):
+    """
+    Назначение, смена статуса или удаление потока меняют карточку
+    """
+    schedule_rebuild(instance.user_id)
+
+
+@receiver(post_save, sender=UserStepProgress)
+def step_progress_bot_card_handler(sender, instance, **kwargs):
+    """
+    Прогресс по этапу меняет процент и текущий этап
+    """
+    user_id = _user_flow_owner_id(sender, instance)
+    if user_id:
+        schedule_rebuild(user_id)
+
+
+@receiver(post_save, sender=FlowBuddy)
+@receiver(post_delete, sender=FlowBuddy)
+def flow_buddy_bot_card_handler(sender, instance, **kwargs):
+    """
+    Назначение и снятие бадди отображаются в карточке подопечного
+    """
+    user_id = _user_flow_owner_id(sender, instance)
+    if user_id:
+        schedule_rebuild(user_id)
+
+
+@receiver(post_save, sender=User)
+def user_profile_bot_card_handler(sender, instance, created, **kwargs):
+    """
+    Изменение профиля пользователя (имя, отдел, должность)
+    """
+    if not created:
+        schedule_rebuild(instance.pk)
+
+
+@receiver(post_save, sender=Flow)
+@receiver(post_save, sender=FlowStep)
+def flow_structure_bot_card_handler(sender, instance, created, **kwargs):
+    """
+    Название потока и набор этапов влияют на карточки всех его участников
+    """
+    if sender is FlowStep and created:
+        # Новый этап уже вызовет пересборку через создание UserStepProgress
+        return
+    flow_id = instance.pk if sender is Flow else instance.flow_id
+    transaction.on_commit(partial(rebuild_bot_cards_for_flow.delay, flow_id))
+
+
+# ========== Пересчет дедлайнов ==========
+
+@receiver(post_save, sender=WorkingCalendar)
+@receiver(post_delete, sender=WorkingCalendar)
+def working_calendar_deadlines_handler(sender, instance, **kwargs):
+    """
+    Праздники и переносы сдвигают дедлайны всех незавершенных прохождений
+    """
+    schedule_recalculation()
+
+
+@receiver(post_save, sender=FlowStep)
+@receiver(post_delete, sender=FlowStep)
+def flow_step_deadlines_handler(sender, instance, **kwargs):
+    """
+    Состав этапов меняет трудоемкость потока
+    """
+    schedule_recalculation(instance.flow_id)
+
+
+@receiver(post_save, sender=Article)
+def article_deadlines_handler(sender, instance, update_fields=None, **kwargs):
+    """
+    Время чтения статьи этапа входит в оценку трудоемкости
+    """
+    if not instance.flow_step_id:
+        return
+    if update_fields is not None and not {'reading_time_minutes', 'flow_step'} & set(update_fields):
+        return
+    schedule_recalculation(instance.flow_step.flow_id)
+
+
+# ========== Расписание напоминаний ==========
+
+@receiver(post_save, sender=UserStepProgress)
+@receiver(post_save, sender=UserQuizAnswer)
+def learner_activity_reminder_handler(sender, instance, **kwargs):
+    """
+    Активность обучающегося откладывает напоминание на первый интервал
+    """
+    next_at = reset_schedule(instance.user_flow_id)
+    if next_at and sender.user_flow.is_cached(instance):
+        # Чтобы последующий save() загруженного потока не вернул старый срок
+        instance.user_flow.next_reminder_at = next_at
+        instance.user_flow.reminders_sent = 0
@@ -4,6 +4,38 @@
 from django.db import models
 from django.utils import timezone
 from apps.common.models import BaseModel
+from .blobs import BlobTextsMixin, blob_text
+
+
+class ContentBlob(models.Model):
+    """
+    Текст снапшота, хранящийся один раз (адресация по SHA-256)
+    """
+    hash = models.CharField('SHA-256', max_length=64, primary_key=True)
+    data = models.BinaryField('Данные')
+    is_compressed = models.BooleanField('Сжато zlib', default=True)
+    size = models.PositiveIntegerField('Длина текста', default=0)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    
+    class Meta:
+        db_table = 'content_blobs'
+        verbose_name = 'Текст снапшота'
+        verbose_name_plural = 'Тексты снапшотов'
+    
+    def __str__(self):
+        return self.hash
+
+
+def blob_reference(verbose_name):
+    """Ссылка снапшота на текст; пустому тексту соответствует NULL"""
+    return models.ForeignKey(
+        ContentBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=verbose_name
+    )
 
 
 class BaseSnapshotModel(BaseModel):
@@ -91,7 +123,7 @@ class QuizSnapshot(BaseSnapshotModel):
         return f"Снапшот: {self.quiz_title} - {self.user_step_progress.user_flow.user.name}"
 
 
-class QuizQuestionSnapshot(BaseSnapshotModel):
+class QuizQuestionSnapshot(BlobTextsMixin, BaseSnapshotModel):
     """
     Снапшот вопроса квиза на момент прохождения
     """
@@ -104,9 +136,13 @@ class QuizQuestionSnapshot(BaseSnapshotModel):
     
     # Снапшот данных вопроса (на момент прохождения)
     original_question_id = models.PositiveIntegerField('ID оригинального вопроса')
-    question_text = models.TextField('Текст вопроса')
+    question_text_blob = blob_reference('Текст вопроса')
     question_order = models.PositiveIntegerField('Порядок вопроса')
-    explanation = models.TextField('Объяснение', blank=True)
+    explanation_blob = blob_reference('Объяснение')
+    
+    blob_fields = {'question_text': 'question_text_blob_id', 'explanation': 'explanation_blob_id'}
+    question_text = blob_text('question_text', 'question_text_blob_id')
+    explanation = blob_text('explanation', 'explanation_blob_id')
     
     class Meta:
         db_table = 'quiz_question_snapshots'
@@ -118,7 +154,7 @@ class QuizQuestionSnapshot(BaseSnapshotModel):
         return f"Вопрос {self.question_order}: {self.question_text[:50]}..."
 
 
-class QuizAnswerSnapshot(BaseSnapshotModel):
+class QuizAnswerSnapshot(BlobTextsMixin, BaseSnapshotModel):
     """
     Снапшот варианта ответа на момент прохождения
     """
@@ -131,10 +167,14 @@ class QuizAnswerSnapshot(BaseSnapshotModel):
     
     # Снапшот данных ответа (на момент прохождения)
     original_answer_id = models.PositiveIntegerField('ID оригинального ответа')
-    answer_text = models.TextField('Текст ответа')
+    answer_text_blob = blob_reference('Текст ответа')
     is_correct = models.BooleanField('Правильный ответ')
     answer_order = models.PositiveIntegerField('Порядок ответа')
-    explanation = models.TextField('Объяснение ответа', blank=True)
+    explanation_blob = blob_reference('Объяснение ответа')
+    
+    blob_fields = {'answer_text': 'answer_text_blob_id', 'explanation': 'explanation_blob_id'}
+    answer_text = blob_text('answer_text', 'answer_text_blob_id')
+    explanation = blob_text('explanation', 'explanation_blob_id')
     
     class Meta:
         db_table = 'quiz_answer_snapshots'
@@ -183,7 +223,7 @@ class UserQuizAnswerSnapshot(BaseSnapshotModel):
         return f"{self.quiz_snapshot.user_step_progress.user_flow.user.name} - {self.question_snapshot.question_text[:30]}..."
 
 
-class ArticleSnapshot(BaseSnapshotModel):
+class ArticleSnapshot(BlobTextsMixin, BaseSnapshotModel):
     """
     Снапшот статьи на момент прочтения пользователем
     """
@@ -196,9 +236,12 @@ class ArticleSnapshot(BaseSnapshotModel):
     
     # Снапшот данных статьи
     article_title = models.CharField('Название статьи', max_length=255)
-    article_content = models.TextField('Содержание статьи')
+    article_content_blob = blob_reference('Содержание статьи')
     article_summary = models.TextField('Краткое описание', blank=True)
     
+    blob_fields = {'article_content': 'article_content_blob_id'}
+    article_content = blob_text('article_content', 'article_content_blob_id')
+    
     # Время чтения
     reading_started_at = models.DateTimeField('Начало чтения', default=timezone.now)
     reading_time_seconds = models.PositiveIntegerField('Время чтения (сек)', default=0)
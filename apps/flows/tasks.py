@@ -7,6 +7,8 @@ from django.db.models import Count, Q
 from datetime import timedelta, datetime
 import logging
 
+from apps.common.db_router import use_replica
+
 logger = logging.getLogger('apps.flows.tasks')
 
 
@@ -94,50 +96,80 @@ def check_overdue_flows(self):
 
 
 @shared_task(bind=True, max_retries=3)
-def send_flow_reminders(self):
+def send_flow_reminders(self, batch_size=500):
     """
     Отправляет напоминания о незавершенных потоках
+    
+    Берет только потоки с наступившим next_reminder_at; после отправки
+    срок сдвигается с нарастающим интервалом (reminders.py), поэтому
+    повторный запуск не напоминает тем же пользователям.
     """
     try:
-        from .models import UserFlow
-        from apps.users.tasks import send_telegram_notification
-        
-        # Находим потоки в работе без активности более 3 дней
-        stale_flows = UserFlow.objects.filter(
-            status='in_progress',
-            updated_at__lt=timezone.now() - timedelta(days=3)
-        ).select_related('user', 'flow', 'current_step')
+        from django.db import transaction
+        from functools import partial
+        from .models import UserFlow, UserStepProgress
+        from .reminders import next_reminder_time
+        from apps.users.tasks import send_telegram_batch
         
+        now = timezone.now()
         reminders_sent = 0
         
-        for user_flow in stale_flows:
-            try:
-                current_step_info = ""
-                if user_flow.current_step:
-                    current_step_info = f"\nТекущий этап: {user_flow.current_step.title}"
-                
-                message = (
-                    f"📚 Напоминание о потоке обучения '{user_flow.flow.title}'\n"
-                    f"Прогресс: {user_flow.progress_percentage:.1f}%"
-                    f"{current_step_info}\n"
-                    f"Продолжите обучение, чтобы не отстать от графика!"
-                )
-                
-                send_telegram_notification.delay(
-                    user_id=user_flow.user.id,
-                    message=message,
-                    notification_type='flow_reminder'
+        while True:
+            with transaction.atomic():
+                # Блокируем пачку отдельно: FOR UPDATE несовместим с GROUP BY
+                due_ids = list(
+                    UserFlow.objects.due_for_reminder(now)
+                    .select_for_update(skip_locked=True)
+                    .values_list('id', flat=True)[:batch_size]
                 )
+                due_flows = list(
+                    UserFlow.objects.filter(id__in=due_ids)
+                    .select_related('user', 'flow', 'current_step')
+                    .annotate(
+                        completed_steps=Count(
+                            'step_progress',
+                            filter=Q(step_progress__status=UserStepProgress.StepStatus.COMPLETED),
+                            distinct=True
+                        ),
+                        total_steps=Count(
+                            'flow__flow_steps',
+                            filter=Q(flow__flow_steps__is_active=True),
+                            distinct=True
+                        )
+                    )
+                ) if due_ids else []
+                if not due_flows:
+                    break
                 
-                reminders_sent += 1
+                messages = []
+                for user_flow in due_flows:
+                    total = user_flow.total_steps
+                    progress = 100 if total == 0 else (user_flow.completed_steps / total) * 100
+                    current_step_info = ""
+                    if user_flow.current_step:
+                        current_step_info = f"\nТекущий этап: {user_flow.current_step.title}"
+                    
+                    # Без привязки к Telegram напоминание не отправить, но срок все равно сдвигается
+                    if user_flow.user.is_active and user_flow.user.telegram_id:
+                        messages.append((
+                            user_flow.user_id,
+                            user_flow.user.telegram_id,
+                            f"📚 Напоминание о потоке обучения '{user_flow.flow.title}'\n"
+                            f"Прогресс: {progress:.1f}%"
+                            f"{current_step_info}\n"
+                            f"Продолжите обучение, чтобы не отстать от графика!"
+                        ))
+                    
+                    user_flow.reminders_sent += 1
+                    user_flow.next_reminder_at = next_reminder_time(user_flow.reminders_sent, now)
                 
-            except Exception as e:
-                logger.error(f"Ошибка отправки напоминания для потока {user_flow.id}: {str(e)}")
-                continue
+                UserFlow.objects.bulk_update(due_flows, ['next_reminder_at', 'reminders_sent'])
+                if messages:
+                    transaction.on_commit(partial(send_telegram_batch.delay, messages, 'flow_reminder'))
+                reminders_sent += len(messages)
         
         logger.info(f"Отправлено напоминаний: {reminders_sent}")
         return {
-            'stale_flows_count': stale_flows.count(),
             'reminders_sent': reminders_sent
         }
         
@@ -147,6 +179,7 @@ def send_flow_reminders(self):
 
 
 @shared_task(bind=True)
+@use_replica()
 def generate_daily_statistics(self):
     """
     Генерирует ежедневную статистику системы
@@ -295,46 +328,22 @@ def notify_step_completion(self, user_flow_id, step_id):
 @shared_task(bind=True)
 def auto_assign_flows_to_new_user(self, user_id):
     """
-    Автоматически назначает обязательные потоки новому пользователю
+    Автоматически назначает обязательные потоки и потоки отдела пользователю
+    
+    Безопасно при повторном запуске: назначаются только недостающие потоки.
     """
+    from apps.users.models import User
+    
     try:
-        from apps.users.models import User
-        from .models import Flow, UserFlow
+        from .assignment import assign_to_user
         
         user = User.objects.get(id=user_id)
+        result = assign_to_user(user)
         
-        # Находим обязательные потоки
-        mandatory_flows = Flow.objects.mandatory()
-        
-        # Находим потоки для отдела пользователя
-        department_flows = Flow.objects.none()
-        if user.department:
-            department_flows = Flow.objects.filter(
-                auto_assign_departments__contains=[user.department]
-            )
-
-        # Объединяем ID потоков, чтобы избежать проблем с .union() в SQLite
-        mandatory_ids = list(mandatory_flows.values_list('id', flat=True))
-        department_ids = list(department_flows.values_list('id', flat=True))
-        
-        # Убираем дубликаты и получаем уникальные ID
-        flow_ids_to_assign = set(mandatory_ids + department_ids)
-        
-        assigned_count = 0
-        for flow_id in flow_ids_to_assign:
-            # Проверяем, не назначен ли уже поток
-            if not UserFlow.objects.filter(user=user, flow_id=flow_id).exists():
-                UserFlow.objects.create_with_steps(
-                    user=user,
-                    flow_id=flow_id,
-                    expected_completion_date=timezone.now().date() + timedelta(days=30)
-                )
-                assigned_count += 1
-        
-        logger.info(f"Пользователю {user.name} автоматически назначено потоков: {assigned_count}")
+        logger.info(f"Пользователю {user.name} автоматически назначено потоков: {result['assigned']}")
         return {
             'user_id': user_id,
-            'assigned_flows': assigned_count
+            'assigned_flows': result['assigned']
         }
         
     except User.DoesNotExist:
@@ -345,35 +354,160 @@ def auto_assign_flows_to_new_user(self, user_id):
         raise
 
 
+@shared_task(bind=True)
+def sync_department_flows(self, department):
+    """
+    Досоздает автоназначаемые потоки всем сотрудникам отдела
+    """
+    try:
+        from .assignment import sync_department
+        
+        result = sync_department(department)
+        return {'department': department, **result}
+    except Exception as exc:
+        logger.error(f"Ошибка синхронизации потоков отдела {department}: {str(exc)}")
+        raise
+
+
 @shared_task(bind=True)
 def cleanup_old_flow_data(self):
     """
     Очищает старые данные потоков
     """
     try:
-        from .models import FlowAction, UserQuizAnswer
+        from apps.common.retention import run_policy
+        from .partitions import apply_retention
         
-        # Удаляем старые действия (старше года)
-        old_actions = FlowAction.objects.filter(
-            performed_at__lt=timezone.now() - timedelta(days=365)
-        )
-        deleted_actions = old_actions.count()
-        old_actions.delete()
+        # Журнал действий: удаляем целые секции (PostgreSQL) или пачками
+        actions = apply_retention()
+        # Ответы на квизы завершенных потоков (старше 6 месяцев)
+        answers = run_policy('quiz_answers')
         
-        # Удаляем старые ответы на квизы завершенных потоков (старше 6 месяцев)
-        old_answers = UserQuizAnswer.objects.filter(
-            answered_at__lt=timezone.now() - timedelta(days=180),
-            user_flow__status='completed'
+        logger.info(
+            f"Очистка данных: удалено {actions['deleted']} действий, {answers['deleted']} ответов"
         )
-        deleted_answers = old_answers.count()
-        old_answers.delete()
-        
-        logger.info(f"Очистка данных: удалено {deleted_actions} действий, {deleted_answers} ответов")
         return {
-            'deleted_actions': deleted_actions,
-            'deleted_answers': deleted_answers
+            'deleted_actions': actions['deleted'],
+            'dropped_partitions': actions.get('dropped_partitions', []),
+            'deleted_answers': answers['deleted'],
+            'finished': actions.get('finished', True) and answers['finished']
         }
         
     except Exception as exc:
         logger.error(f"Ошибка очистки данных: {str(exc)}")
-        raise
\ No newline at end of file
+        raise
+
+
+@shared_task(bind=True)
+def maintain_flow_action_partitions(self):
+    """
+    Заранее создает месячные секции журнала действий
+    """
+    try:
+        from .partitions import ensure_partitions
+        
+        partitions = ensure_partitions()
+        return {'partitions': partitions}
+        
+    except Exception as exc:
+        logger.error(f"Ошибка обслуживания секций журнала: {str(exc)}")
+        raise
+
+
+@shared_task(bind=True, max_retries=3)
+def rebuild_bot_card(self, user_id):
+    """
+    Пересобирает карточку пользователя для бота
+    """
+    try:
+        from .bot_card import rebuild_card, clear_pending
+        
+        # Снимаем флаг до сборки: события во время сборки запланируют новую
+        clear_pending(user_id)
+        rebuild_card(user_id)
+        return {'user_id': user_id}
+        
+    except Exception as exc:
+        logger.error(f"Ошибка сборки карточки пользователя {user_id}: {str(exc)}")
+        raise self.retry(exc=exc, countdown=30 * (self.request.retries + 1))
+
+
+@shared_task(bind=True)
+def recalculate_deadlines(self, flow_id=None):
+    """
+    Пересчитывает дедлайны прохождений потока (или всех потоков)
+    после изменения рабочего календаря или состава этапов
+    """
+    try:
+        from .deadlines import clear_pending, recalculate
+        
+        clear_pending(flow_id)
+        result = recalculate(flow_ids=[flow_id] if flow_id else None)
+        return {'flow_id': flow_id, **result}
+    except Exception as exc:
+        logger.error(f"Ошибка пересчета дедлайнов: {str(exc)}")
+        raise
+
+
+@shared_task(bind=True)
+def rebuild_bot_cards_for_flow(self, flow_id, after_user_id=0):
+    """
+    Пересобирает карточки пользователей с активным прохождением потока
+
+    Одна задача — одна пачка по user_id; следующая пачка ставится
+    отдельной задачей.
+    """
+    from .bot_card import FLOW_REBUILD_BATCH_SIZE, participant_batch, rebuild_card
+    
+    user_ids = participant_batch(flow_id, after_user_id)
+    for user_id in user_ids:
+        rebuild_card(user_id)
+    
+    if len(user_ids) == FLOW_REBUILD_BATCH_SIZE:
+        rebuild_bot_cards_for_flow.delay(flow_id, user_ids[-1])
+    
+    logger.info(f"Пересобрано карточек для потока {flow_id}: {len(user_ids)} (после {after_user_id})")
+    return {'flow_id': flow_id, 'rebuilt_cards': len(user_ids)}
+
+
+@shared_task(bind=True)
+def export_dataset(self, name, file_format='csv', filters=None, user_id=None):
+    """
+    Выгружает набор данных в файл и уведомляет пользователя
+    
+    Args:
+        name (str): Набор из exports.DATASETS
+        file_format (str): csv или xlsx
+        filters (dict): flow_id, date_from, date_to
+        user_id (int): Кого уведомить о готовности
+    """
+    from django.conf import settings
+    from .exports import download_url, export_to_storage
+    from apps.users.tasks import send_telegram_notification
+    
+    with use_replica():
+        stored, rows = export_to_storage(name, file_format, **(filters or {}))
+    url = download_url(stored)
+    
+    if user_id:
+        hours = max(settings.EXPORT_LINK_TTL // 3600, 1)
+        send_telegram_notification.delay(
+            user_id=user_id,
+            message=f"📁 Выгрузка готова ({rows} строк), ссылка действует {hours} ч: {url}",
+            notification_type='export_ready'
+        )
+    
+    logger.info(f"Выгрузка {name} ({file_format}): {rows} строк в {stored}")
+    return {'file': stored, 'url': url, 'rows': rows}
+
+
+@shared_task(bind=True)
+def cleanup_exports(self):
+    """
+    Удаляет устаревшие файлы выгрузок
+    """
+    from .exports import cleanup_exports as remove_old_exports
+    
+    deleted = remove_old_exports()
+    logger.info(f"Удалено файлов выгрузок: {deleted}")
+    return {'deleted': deleted}
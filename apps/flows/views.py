@@ -1,10 +1,14 @@
 """
 Представления для системы потоков обучения
 """
+import copy
+
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
@@ -14,22 +18,28 @@ from rest_framework.exceptions import PermissionDenied
 
 from .models import (
     Flow, FlowStep, Task, Quiz, QuizQuestion, QuizAnswer,
-    UserFlow, FlowBuddy, UserStepProgress, UserQuizAnswer, FlowAction,
-    TaskSnapshot, QuizSnapshot, QuizQuestionSnapshot
+    UserFlow, FlowBuddy, UserStepProgress, FlowAction,
+    TaskSnapshot
 )
-from .snapshot_models import QuizAnswerSnapshot, UserQuizAnswerSnapshot
 from .serializers import (
     FlowSerializer, FlowDetailSerializer, FlowStepSerializer,
     TaskSerializer, TaskAnswerSerializer, QuizSerializer,
     UserFlowSerializer, UserFlowDetailSerializer, UserFlowStartSerializer,
     UserStepProgressSerializer, FlowPauseSerializer, QuizSubmissionSerializer,
-    MyFlowProgressSerializer, FlowActionSerializer
+    QuizBatchSubmissionSerializer, shuffle_quiz,
+    MyFlowProgressSerializer, FlowActionSerializer,
+    BulkJobSerializer, UserFlowBulkJobSerializer
 )
 from apps.common.permissions import (
     IsActiveUser, IsModerator, IsBuddyOrModerator, CanManageFlow,
     CanViewUserProgress, CanAccessFlowStep
 )
+from apps.common.cache import cache_page_data
+from apps.common.db_router import read_alias, replica_reads
+from apps.common.mixins import CacheMixin, ReplicaReadMixin
 from .services import FlowService, FlowProgressService
+from .quiz_stats import quiz_item_stats
+from .quiz_submission import load_quiz, submit_answer, submit_answers
 
 
 # ========== Представления для обычных пользователей (API /my/) ==========
@@ -108,13 +118,26 @@ class MyFlowProgressView(APIView):
 
 # ========== Публичные представления для потоков ==========
 
-class FlowDetailView(generics.RetrieveAPIView):
+class FlowDetailView(CacheMixin, generics.RetrieveAPIView):
     """
     Детали потока обучения
     """
     queryset = Flow.objects.active()
     serializer_class = FlowDetailSerializer
     permission_classes = [IsActiveUser]
+    # Кодовое слово задания видно только модераторам, поэтому кэш по пользователю
+    cache_key_prefix = 'flows'
+    cache_tags = ('flow_content', 'articles')
+    
+    def get(self, request, *args, **kwargs):
+        """Квизы перемешиваются после чтения из кэша, на копии закэшированных данных"""
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.data = copy.deepcopy(response.data)
+            for step in response.data['flow_steps']:
+                if step.get('quiz'):
+                    shuffle_quiz(step['quiz'])
+        return response
 
 
 class FlowStepListView(generics.ListAPIView):
@@ -363,168 +386,45 @@ class QuizQuestionAnswerView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         answer = serializer.validated_data['answer_id']
-        
-        # Сохраняем ответ пользователя
-        user_answer, created = UserQuizAnswer.objects.update_or_create(
-            user_flow=user_flow,
-            question=question,
-            defaults={
-                'selected_answer': answer,
-                'is_correct': answer.is_correct,
-                'answered_at': timezone.now()
-            }
+        response_data = submit_answer(
+            user_flow, step, question, answer,
+            idempotency_key=request.headers.get('Idempotency-Key')
         )
-        
-        response_data = {
-            'message': 'Ответ сохранен',
-            'is_correct': answer.is_correct,
-        }
+        return Response(response_data)
 
-        if not answer.is_correct:
-            correct = question.answers.filter(is_correct=True).first()
-            if correct:
-                response_data['correct_answer'] = {
-                    'id': correct.id,
-                    'text': correct.answer_text,
-                    'explanation': correct.explanation,
-                }
 
-        # Проверяем завершение квиза
-        is_completed = self._check_quiz_completion(user_flow, step, step.quiz)
-        response_data['is_completed'] = is_completed
+class QuizSubmitView(APIView):
+    """
+    Отправка ответов на все вопросы квиза одним запросом
+    """
+    permission_classes = [IsActiveUser]
 
-        return Response(response_data)
-    
-    def _check_quiz_completion(self, user_flow, step, quiz):
+    def post(self, request, flow_id, step_id):
         """
-        Проверяет завершение квиза и создает снапшоты
+        Сохраняет ответы и возвращает результат по каждому вопросу
         """
-        # Получаем все ответы пользователя на вопросы квиза
-        user_answers = UserQuizAnswer.objects.filter(
-            user_flow=user_flow,
-            question__quiz=quiz
+        step = get_object_or_404(
+            FlowStep.objects.select_related('quiz'), id=step_id, flow_id=flow_id, is_active=True
         )
-        
-        # Проверяем, что ответил на все вопросы
-        total_questions = quiz.questions.count()
-        if user_answers.count() < total_questions:
-            return False
-        
-        # Создаем снапшоты и завершаем квиз
-        is_passed = self.complete_quiz_step(user_flow, step, user_answers)
-        return is_passed
-    
-    def complete_quiz_step(self, user_flow, step, user_quiz_answers):
-        """
-        Завершение этапа с квизом с созданием полного снапшота
-        """
-        quiz = step.quiz
-        
-        # Получаем прогресс по этапу
-        step_progress, created = UserStepProgress.objects.get_or_create(
-            user_flow=user_flow,
-            flow_step=step
+        user_flow = get_object_or_404(UserFlow, flow_id=flow_id, user=request.user)
+
+        if not hasattr(step, 'quiz'):
+            return Response({
+                'error': 'Квиз не найден'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        quiz = load_quiz(step.quiz.pk)
+        serializer = QuizBatchSubmissionSerializer(
+            data=request.data, context={'request': request, 'quiz': quiz}
         )
-        
-        # Создаем снапшот квиза, если его ещё нет
-        QuizSnapshot.objects.filter(user_step_progress=step_progress).delete()
-        quiz_snapshot = QuizSnapshot.objects.create(
-            user_step_progress=step_progress,
-            quiz_title=quiz.title,
-            quiz_description=quiz.description or '',
-            passing_score_percentage=quiz.passing_score_percentage,
-            total_questions=quiz.questions.count(),
-            correct_answers=0,  # Пока 0, пересчитаем ниже
-            score_percentage=0,  # Пока 0, пересчитаем ниже
-            is_passed=False  # Пока False, пересчитаем ниже
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        response_data = submit_answers(
+            user_flow, step, quiz, serializer.validated_data['answers'],
+            idempotency_key=request.headers.get('Idempotency-Key')
         )
-        
-        correct_count = 0
-        
-        # Создаем снапшоты для каждого вопроса
-        for question in quiz.questions.all().order_by('order'):
-            # Снапшот вопроса
-            question_snapshot = QuizQuestionSnapshot.objects.create(
-                quiz_snapshot=quiz_snapshot,
-                original_question_id=question.id,
-                question_text=question.question,
-                question_order=question.order,
-                explanation=question.explanation or ''
-            )
-            
-            # Снапшоты всех вариантов ответов для этого вопроса
-            answer_snapshots = {}
-            for answer in question.answers.all().order_by('order'):
-                answer_snapshot = QuizAnswerSnapshot.objects.create(
-                    question_snapshot=question_snapshot,
-                    original_answer_id=answer.id,
-                    answer_text=answer.answer_text,
-                    is_correct=answer.is_correct,
-                    answer_order=answer.order,
-                    explanation=answer.explanation or ''
-                )
-                answer_snapshots[answer.id] = answer_snapshot
-            
-            # Ищем ответ пользователя на этот вопрос
-            user_answer = user_quiz_answers.filter(question=question).first()
-            if user_answer:
-                selected_answer_snapshot = answer_snapshots[user_answer.selected_answer.id]
-                
-                # Создаем снапшот ответа пользователя
-                UserQuizAnswerSnapshot.objects.create(
-                    quiz_snapshot=quiz_snapshot,
-                    question_snapshot=question_snapshot,
-                    selected_answer_snapshot=selected_answer_snapshot,
-                    is_correct=user_answer.is_correct,
-                    answered_at=user_answer.answered_at
-                )
-                
-                if user_answer.is_correct:
-                    correct_count += 1
-        
-        # Обновляем результаты в снапшоте квиза
-        total_questions = quiz.questions.count()
-        score_percentage = (correct_count / total_questions * 100) if total_questions > 0 else 0
-        is_passed = score_percentage >= quiz.passing_score_percentage
-        
-        quiz_snapshot.correct_answers = correct_count
-        quiz_snapshot.score_percentage = int(score_percentage)
-        quiz_snapshot.is_passed = is_passed
-        quiz_snapshot.save()
-        
-        # Обновляем прогресс по этапу
-        step_progress.quiz_completed_at = timezone.now()
-        step_progress.quiz_correct_answers = correct_count
-        step_progress.quiz_total_questions = total_questions
-        
-        if is_passed:
-            step_progress.status = UserStepProgress.StepStatus.COMPLETED
-            step_progress.completed_at = step_progress.quiz_completed_at
-            
-            # Разблокируем следующий этап
-            self._unlock_next_step(user_flow, step)
-        
-        step_progress.save()
-        return is_passed
-    
-    def _unlock_next_step(self, user_flow, current_step):
-        """Разблокирует следующий этап"""
-        next_step = FlowStep.objects.filter(
-            flow=current_step.flow,
-            order=current_step.order + 1,
-            is_active=True
-        ).first()
-        
-        if next_step:
-            next_progress, created = UserStepProgress.objects.get_or_create(
-                user_flow=user_flow,
-                flow_step=next_step,
-                defaults={'status': UserStepProgress.StepStatus.AVAILABLE}
-            )
-            
-            if next_progress.status == UserStepProgress.StepStatus.LOCKED:
-                next_progress.status = UserStepProgress.StepStatus.AVAILABLE
-                next_progress.save()
+        return Response(response_data)
 
 
 # ========== Представления для Buddy ==========
@@ -544,11 +444,12 @@ class BuddyUserListView(generics.ListAPIView):
     """
     Список пользователей для назначения потоков (только для buddy)
     """
-    from apps.users.serializers import UserListSerializer
-    
-    serializer_class = UserListSerializer
     permission_classes = [IsBuddyOrModerator]
     
+    def get_serializer_class(self):
+        from apps.users.serializers import UserListSerializer
+        return UserListSerializer
+    
     def get_queryset(self):
         from apps.users.models import User
         return User.objects.active_users().order_by('name')
@@ -691,11 +592,11 @@ class BuddyFlowResumeView(APIView):
 
 # ========== Представления для модераторов ==========
 
-class AdminFlowListView(generics.ListCreateAPIView):
+class AdminFlowListView(ReplicaReadMixin, generics.ListCreateAPIView):
     """
     Управление потоками (только модераторы)
     """
-    queryset = Flow.objects.active().order_by('title')
+    queryset = Flow.objects.active().prefetch_related('department_rules').order_by('title')
     serializer_class = FlowSerializer
     permission_classes = [IsModerator]
 
@@ -704,7 +605,7 @@ class AdminFlowDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     Детальное управление потоком (только модераторы)
     """
-    queryset = Flow.objects.active()
+    queryset = Flow.objects.active().prefetch_related('department_rules')
     serializer_class = FlowDetailSerializer
     permission_classes = [IsModerator]
     
@@ -757,6 +658,8 @@ class AdminAnalyticsOverviewView(APIView):
     """
     permission_classes = [IsModerator]
     
+    @cache_page_data(timeout=60, tags=('flow_content', 'user_flows'), vary_on_user=False)
+    @replica_reads
     def get(self, request):
         """
         Возвращает общую статистику системы
@@ -800,8 +703,209 @@ class AdminAnalyticsOverviewView(APIView):
         return FlowActionSerializer(recent_actions, many=True).data
 
 
+class AdminQuizStatsView(APIView):
+    """
+    Анализ вопросов квиза: ответы, доля правильных, выборы вариантов
+    """
+    permission_classes = [IsModerator]
+    
+    @replica_reads
+    def get(self, request, quiz_id):
+        quiz = get_object_or_404(Quiz, pk=quiz_id)
+        return Response(quiz_item_stats(quiz))
+
+
+class AdminExportView(APIView):
+    """
+    Выгрузка данных: GET — потоковый CSV, POST — файл в фоне с уведомлением
+    
+    Наборы: user_flows, step_progress, quiz_results, flow_actions.
+    Фильтры: flow, date_from, date_to (YYYY-MM-DD).
+    """
+    permission_classes = [IsModerator]
+    
+    def get(self, request, dataset):
+        from .exports import DATASETS, iter_csv
+        
+        if dataset not in DATASETS:
+            return Response({'error': 'Неизвестный набор данных'}, status=status.HTTP_404_NOT_FOUND)
+        filters, error = self._get_filters(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        response = StreamingHttpResponse(
+            iter_csv(DATASETS[dataset], using=read_alias(request.user.pk), **filters),
+            content_type='text/csv; charset=utf-8'
+        )
+        stamp = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+        response['Content-Disposition'] = f'attachment; filename="{dataset}-{stamp}.csv"'
+        return response
+    
+    def post(self, request, dataset):
+        from .exports import DATASETS, EXPORT_FORMATS
+        from .tasks import export_dataset
+        
+        if dataset not in DATASETS:
+            return Response({'error': 'Неизвестный набор данных'}, status=status.HTTP_404_NOT_FOUND)
+        filters, error = self._get_filters(request.data)
+        file_format = request.data.get('file_format', 'xlsx')
+        if file_format not in EXPORT_FORMATS:
+            error = f"file_format должен быть одним из: {', '.join(EXPORT_FORMATS)}"
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = export_dataset.delay(dataset, file_format, filters, request.user.id)
+        return Response({
+            'message': 'Выгрузка поставлена в очередь, ссылка придет в Telegram',
+            'task_id': result.id
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    def _get_filters(self, params):
+        """Проверяет фильтры; даты остаются строками, чтобы передаваться в задачу"""
+        filters = {}
+        flow_id = params.get('flow')
+        if flow_id:
+            try:
+                filters['flow_id'] = int(flow_id)
+            except (TypeError, ValueError):
+                return None, 'flow должен быть числом'
+        for name in ('date_from', 'date_to'):
+            value = params.get(name)
+            if value:
+                try:
+                    valid = parse_date(value) is not None
+                except ValueError:
+                    valid = False
+                if not valid:
+                    return None, f'{name} должен быть в формате YYYY-MM-DD'
+                filters[name] = value
+        return filters, None
+
+
+class AdminExportDownloadView(APIView):
+    """
+    Скачивание файла фоновой выгрузки по подписанной ссылке
+
+    Ссылка приходит модератору в Telegram, поэтому доступ дает сама подпись
+    (срок EXPORT_LINK_TTL), а не токен API.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    
+    def get(self, request, token):
+        from django.core import signing
+        from django.http import FileResponse, Http404
+        from .exports import get_export_storage, resolve_download
+        
+        try:
+            name = resolve_download(token)
+        except signing.BadSignature:
+            raise Http404('Ссылка недействительна или истекла')
+        storage = get_export_storage()
+        if not storage.exists(name):
+            raise Http404('Файл выгрузки удален')
+        response = FileResponse(storage.open(name, 'rb'), as_attachment=True, filename=name)
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+
+# ========== Массовые операции ==========
+
+class AdminBulkJobListView(APIView):
+    """
+    GET — последние массовые операции, POST — новая операция над прохождениями
+    
+    Операция выполняется в фоне пачками, прогресс — в bulk-jobs/<id>/.
+    """
+    permission_classes = [IsModerator]
+    
+    def get(self, request):
+        from apps.common.models import BulkJob
+        
+        jobs = BulkJob.objects.select_related('created_by')[:50]
+        return Response(BulkJobSerializer(jobs, many=True).data)
+    
+    def post(self, request):
+        from apps.common.bulk_jobs import submit
+        
+        serializer = UserFlowBulkJobSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            job = submit(
+                serializer.validated_data['operation'],
+                serializer.get_queryset(),
+                serializer.validated_data['params'],
+                request.user
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(BulkJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class AdminBulkJobDetailView(generics.RetrieveAPIView):
+    """
+    Прогресс и ошибки массовой операции
+    """
+    serializer_class = BulkJobSerializer
+    permission_classes = [IsModerator]
+    
+    def get_queryset(self):
+        from apps.common.models import BulkJob
+        return BulkJob.objects.select_related('created_by')
+
+
+class AdminBulkJobCancelView(APIView):
+    """
+    Отмена массовой операции: обработка остановится после текущей пачки
+    """
+    permission_classes = [IsModerator]
+    
+    def post(self, request, pk):
+        from apps.common.models import BulkJob
+        
+        job = get_object_or_404(BulkJob, pk=pk)
+        if not job.cancel():
+            return Response({
+                'error': f'Операция уже завершена ({job.get_status_display()})'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        job.refresh_from_db()
+        return Response(BulkJobSerializer(job).data)
+
+
+class FlowCohortAnalyticsView(APIView):
+    """
+    Когортная аналитика по потоку: воронка, время этапов, отток, квизы
+    
+    Параметры запроса: department, hire_month (YYYY-MM).
+    """
+    permission_classes = [IsBuddyOrModerator]
+    
+    @replica_reads
+    def get(self, request, flow_id):
+        from .analytics import get_cohort_report, parse_hire_month
+        
+        get_object_or_404(Flow, pk=flow_id)
+        
+        hire_month = request.query_params.get('hire_month')
+        if hire_month:
+            try:
+                hire_month = parse_hire_month(hire_month)
+            except ValueError:
+                return Response({
+                    'error': 'hire_month должен быть в формате YYYY-MM'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        report = get_cohort_report(
+            flow_id,
+            department=request.query_params.get('department') or None,
+            hire_month=hire_month or None
+        )
+        return Response(report)
+
+
 @api_view(['GET'])
 @permission_classes([IsModerator])
+@replica_reads
 def flow_statistics(request):
     """
     Статистика по потокам
@@ -812,16 +916,19 @@ def flow_statistics(request):
 
 @api_view(['GET'])
 @permission_classes([IsModerator])
+@replica_reads
 def problem_users_report(request):
     """
     Отчет по проблемным пользователям
     """
-    problem_flows = UserFlow.objects.requiring_attention().select_related(
-        'user', 'flow'
-    )
+    # Счетчики этапов подзапросами, чтобы не делать запросов на каждую строку
+    problem_flows = UserFlow.objects.with_step_counts().filter(
+        id__in=UserFlow.objects.requiring_attention().values('id')
+    ).select_related('user', 'flow')
     
     data = []
     for user_flow in problem_flows:
+        total_steps = user_flow.total_steps
         data.append({
             'user': {
                 'id': user_flow.user.id,
@@ -834,7 +941,9 @@ def problem_users_report(request):
             },
             'status': user_flow.status,
             'is_overdue': user_flow.is_overdue,
-            'progress_percentage': user_flow.progress_percentage,
+            'progress_percentage': (
+                (user_flow.completed_steps / total_steps) * 100 if total_steps else 100
+            ),
             'expected_completion_date': user_flow.expected_completion_date,
             'last_activity': user_flow.updated_at
         })
@@ -0,0 +1,19 @@
+"""
+Сигналы для приложения статей и гайдов
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.common.cache import invalidate_tags
+from .models import Article, ArticleCategory
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@receiver(post_save, sender=ArticleCategory)
+@receiver(post_delete, sender=ArticleCategory)
+def article_cache_handler(sender, **kwargs):
+    """
+    Сбрасывает кэш списков и статистики статей
+    """
+    invalidate_tags('articles')
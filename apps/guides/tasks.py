@@ -0,0 +1,26 @@
+"""
+Celery задачи для базы знаний
+"""
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def cleanup_article_views(self):
+    """
+    Удаляет просмотры статей старше срока хранения
+    """
+    try:
+        from apps.common.retention import run_policy
+        
+        report = run_policy('article_views')
+        return {
+            'deleted_views': report['deleted'],
+            'finished': report['finished']
+        }
+        
+    except Exception as exc:
+        logger.error(f"Ошибка очистки просмотров статей: {str(exc)}")
+        raise
@@ -23,6 +23,9 @@ from apps.common.permissions import (
     IsActiveUser, IsModerator, CanEditArticle, CanPublishArticle,
     IsAuthorOrReadOnly
 )
+from apps.common.cache import cache_page_data
+from apps.common.db_router import replica_reads
+from apps.common.mixins import CacheMixin, ReplicaReadMixin
 
 
 class ArticleCategoryListView(generics.ListCreateAPIView):
@@ -233,23 +236,29 @@ class ArticleBookmarkDetailView(generics.RetrieveUpdateDestroyAPIView):
         return ArticleBookmark.objects.filter(user=self.request.user)
 
 
-class PopularArticlesView(generics.ListAPIView):
+class PopularArticlesView(CacheMixin, generics.ListAPIView):
     """
     Популярные статьи
     """
     serializer_class = ArticleBasicSerializer
     permission_classes = [IsActiveUser]
+    cache_key_prefix = 'articles'
+    cache_tags = ('articles',)
+    cache_vary_on_user = False
     
     def get_queryset(self):
         return Article.objects.popular(limit=20)
 
 
-class RecentArticlesView(generics.ListAPIView):
+class RecentArticlesView(CacheMixin, generics.ListAPIView):
     """
     Недавние статьи
     """
     serializer_class = ArticleBasicSerializer
     permission_classes = [IsActiveUser]
+    cache_key_prefix = 'articles'
+    cache_tags = ('articles',)
+    cache_vary_on_user = False
     
     def get_queryset(self):
         return Article.objects.recent(limit=20)
@@ -270,7 +279,7 @@ class RelatedArticlesView(generics.ListAPIView):
 
 # ========== Административные представления ==========
 
-class AdminArticleListView(generics.ListAPIView):
+class AdminArticleListView(ReplicaReadMixin, generics.ListAPIView):
     """
     Все статьи для модераторов
     """
@@ -359,6 +368,9 @@ class ArticleStatisticsView(APIView):
     """
     permission_classes = [IsModerator]
     
+    # Просмотры учитываются с задержкой до минуты
+    @cache_page_data(timeout=60, tags=('articles',), vary_on_user=False)
+    @replica_reads
     def get(self, request):
         """
         Возвращает статистику по статьям
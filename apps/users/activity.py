@@ -0,0 +1,151 @@
+"""
+Буфер активности пользователей
+
+Отметки времени складываются в sorted set Redis (член — пользователь,
+score — время) и периодически записываются в users.last_login_at одним
+UPDATE ... FROM (VALUES ...) на пачку.
+"""
+import logging
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.common.redis_client import get_redis
+from .models import User
+
+logger = logging.getLogger('apps.users.activity')
+
+ACTIVITY_KEY = 'onboarding:user_activity'
+FLUSH_BATCH_SIZE = 1000
+
+USER_PREFIX = 'u:'
+TELEGRAM_PREFIX = 't:'
+
+
+def record_activity(user_id=None, telegram_id=None, at=None):
+    """
+    Отмечает активность пользователя по id или Telegram ID
+
+    Запись в БД откладывается до flush_activity; при USER_ACTIVITY_BUFFERED=False
+    или недоступном Redis активность пишется сразу.
+    """
+    if user_id is None and telegram_id is None:
+        return
+    member = f"{USER_PREFIX}{user_id}" if user_id is not None else f"{TELEGRAM_PREFIX}{telegram_id}"
+    timestamp = (at or timezone.now()).timestamp()
+
+    if not getattr(settings, 'USER_ACTIVITY_BUFFERED', True):
+        write_activity({member: timestamp})
+        return
+
+    try:
+        # GT: более ранняя отметка не перетирает более позднюю
+        get_redis().zadd(ACTIVITY_KEY, {member: timestamp}, gt=True)
+    except Exception as exc:
+        logger.warning(f"Буфер активности недоступен, пишем напрямую: {exc}")
+        write_activity({member: timestamp})
+
+
+def flush_activity():
+    """
+    Переносит накопленную активность в БД
+
+    Returns:
+        int: Количество обновленных пользователей
+    """
+    import redis
+
+    client = get_redis()
+    flushing_key = f"{ACTIVITY_KEY}:flushing:{uuid.uuid4().hex}"
+    try:
+        # Новые отметки продолжают копиться в основном ключе
+        client.rename(ACTIVITY_KEY, flushing_key)
+    except redis.ResponseError:
+        return 0
+
+    entries = client.zrange(flushing_key, 0, -1, withscores=True)
+    try:
+        updated = write_activity({member.decode(): score for member, score in entries})
+    except Exception:
+        # Возвращаем отметки в буфер, чтобы не потерять их
+        client.zunionstore(ACTIVITY_KEY, [ACTIVITY_KEY, flushing_key], aggregate='MAX')
+        client.delete(flushing_key)
+        raise
+
+    client.delete(flushing_key)
+    return updated
+
+
+def write_activity(entries):
+    """
+    Записывает last_login_at для пачки отметок {член: unix-время}
+
+    Значение только увеличивается: более старые отметки игнорируются.
+    """
+    by_id = {}
+    by_telegram_id = {}
+    for member, timestamp in entries.items():
+        seen_at = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+        if member.startswith(USER_PREFIX):
+            by_id[int(member[len(USER_PREFIX):])] = seen_at
+        elif member.startswith(TELEGRAM_PREFIX):
+            by_telegram_id[member[len(TELEGRAM_PREFIX):]] = seen_at
+
+    updated = 0
+    with transaction.atomic():
+        updated += _bulk_update_last_seen('id', by_id)
+        updated += _bulk_update_last_seen('telegram_id', by_telegram_id)
+    return updated
+
+
+def _bulk_update_last_seen(field_name, values):
+    """UPDATE ... FROM (VALUES ...) пачками по FLUSH_BATCH_SIZE"""
+    if not values:
+        return 0
+
+    qn = connection.ops.quote_name
+    table = qn(User._meta.db_table)
+    key_column = qn(User._meta.get_field(field_name).column)
+    seen_column = qn(User._meta.get_field('last_login_at').column)
+    items = sorted(values.items())
+    updated = 0
+
+    for start in range(0, len(items), FLUSH_BATCH_SIZE):
+        chunk = items[start:start + FLUSH_BATCH_SIZE]
+        params = []
+        for key, seen_at in chunk:
+            params.extend([key, connection.ops.adapt_datetimefield_value(seen_at)])
+
+        if connection.vendor == 'postgresql':
+            key_cast = '::bigint' if field_name == 'id' else '::varchar'
+            rows = ', '.join([f'(%s{key_cast}, %s::timestamptz)'] * len(chunk))
+            sql = (
+                f'UPDATE {table} AS u SET {seen_column} = v.seen_at '
+                f'FROM (VALUES {rows}) AS v(key, seen_at) '
+                f'WHERE u.{key_column} = v.key '
+                f'AND (u.{seen_column} IS NULL OR u.{seen_column} < v.seen_at)'
+            )
+        elif connection.vendor == 'sqlite':
+            # SQLite не поддерживает имена колонок у VALUES: column1, column2
+            rows = ', '.join(['(%s, %s)'] * len(chunk))
+            sql = (
+                f'UPDATE {table} SET {seen_column} = v.column2 '
+                f'FROM (VALUES {rows}) AS v '
+                f'WHERE {table}.{key_column} = v.column1 '
+                f'AND ({table}.{seen_column} IS NULL OR {table}.{seen_column} < v.column2)'
+            )
+        else:
+            for key, seen_at in chunk:
+                updated += User.objects.filter(**{field_name: key}).exclude(
+                    last_login_at__gte=seen_at
+                ).update(last_login_at=seen_at)
+            continue
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            updated += cursor.rowcount
+
+    return updated
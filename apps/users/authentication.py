@@ -0,0 +1,76 @@
+"""
+Аутентификация пользователей API
+"""
+import copy
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from apps.common.cache import get_or_set, invalidate_tags
+
+
+USER_CACHE_TIMEOUT = 60  # секунд
+
+
+def user_cache_tag(user_id):
+    """Тег кэша пользователя; его версия служит версией токена"""
+    return f"auth_user:{user_id}"
+
+
+def invalidate_user_cache(user_id):
+    """Сбрасывает закэшированного пользователя и его роли"""
+    invalidate_tags(user_cache_tag(user_id))
+
+
+def _load_user(user_model, user_id):
+    """Загружает пользователя вместе с именами активных ролей"""
+    user = user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+    user._cached_role_names = frozenset(
+        user.roles.filter(is_active=True).values_list('name', flat=True)
+    )
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация с кэшированием пользователя
+
+    Пользователь и его активные роли хранятся в кэше по id и версии тега
+    пользователя. На теплом пути аутентификация и проверки ролей не
+    выполняют запросов к БД. Кэш сбрасывается сигналами User/UserRole/Role.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = get_or_set(
+                f"auth:user:{user_id}",
+                lambda: _load_user(self.user_model, user_id),
+                timeout=USER_CACHE_TIMEOUT,
+                tags=[user_cache_tag(user_id), 'auth_roles'],
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        # Копия, чтобы изменения в рамках запроса не попадали в общий кэш процесса
+        user = copy.copy(user)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,139 @@
+"""
+Ежедневная сводка по потокам обучения
+
+Пользователи выбираются keyset-пагинацией по id, потоки и прогресс пачки
+загружаются одним запросом, сообщения формируются в памяти и уходят
+в send_telegram_batch чанками. Число запросов и задач растет с числом
+чанков, а не пользователей.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from apps.common.utils import is_business_hours
+from apps.flows.models import UserFlow, UserStepProgress
+from .models import User
+
+DIGEST_BATCH_SIZE = getattr(settings, 'DIGEST_BATCH_SIZE', 500)
+
+
+def iter_recipient_batches(batch_size=DIGEST_BATCH_SIZE):
+    """
+    Пачки получателей [{'id', 'telegram_id'}] с потоками в процессе
+
+    Keyset-пагинация: каждая пачка — один запрос с WHERE id > последний id.
+    """
+    has_active_flow = UserFlow.objects.filter(
+        user=OuterRef('pk'),
+        status=UserFlow.FlowStatus.IN_PROGRESS
+    )
+    recipients = User.objects.filter(
+        Exists(has_active_flow),
+        is_active=True,
+        telegram_id__isnull=False
+    ).exclude(telegram_id='').order_by('id')
+
+    last_id = 0
+    while True:
+        batch = list(recipients.filter(id__gt=last_id).values('id', 'telegram_id')[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]['id']
+
+
+def load_active_flows(user_ids):
+    """Потоки в процессе с прогрессом для пачки пользователей (один запрос)"""
+    flows = {}
+    rows = UserFlow.objects.filter(
+        user_id__in=user_ids,
+        status=UserFlow.FlowStatus.IN_PROGRESS
+    ).annotate(
+        completed_steps=Count(
+            'step_progress',
+            filter=Q(step_progress__status=UserStepProgress.StepStatus.COMPLETED),
+            distinct=True
+        ),
+        total_steps=Count(
+            'flow__flow_steps',
+            filter=Q(flow__flow_steps__is_active=True),
+            distinct=True
+        )
+    ).values(
+        'user_id', 'flow__title', 'current_step__title',
+        'expected_completion_date', 'completed_steps', 'total_steps'
+    ).order_by('user_id', 'id')
+
+    for row in rows:
+        total = row['total_steps']
+        flows.setdefault(row['user_id'], []).append({
+            'title': row['flow__title'],
+            'current_step': row['current_step__title'],
+            'deadline': row['expected_completion_date'],
+            'progress': 100 if total == 0 else (row['completed_steps'] / total) * 100,
+        })
+    return flows
+
+
+def render_digest(flows, today=None):
+    """Текст сводки по списку потоков пользователя"""
+    today = today or timezone.localdate()
+    message_parts = [f"📊 Ваша сводка на {today.strftime('%d.%m.%Y')}:"]
+
+    for flow in flows:
+        progress = flow['progress']
+        current_step = flow['current_step'] or "Завершено"
+        status_emoji = "🟢" if progress > 70 else "🟡" if progress > 30 else "🔴"
+
+        message_parts.append(
+            f"\n{status_emoji} {flow['title']}\n"
+            f"   Прогресс: {progress:.1f}%\n"
+            f"   Текущий этап: {current_step}"
+        )
+
+        # Добавляем информацию о дедлайне если есть
+        if flow['deadline']:
+            days_left = (flow['deadline'] - today).days
+            if days_left <= 7:
+                message_parts.append(f"   ⏰ Осталось дней: {days_left}")
+
+    message_parts.append("\n💪 Продолжайте обучение!")
+    return '\n'.join(message_parts)
+
+
+def build_digest_batches(batch_size=DIGEST_BATCH_SIZE):
+    """
+    Генератор готовых пачек сообщений [(user_id, chat_id, text), ...]
+    """
+    today = timezone.localdate()
+    for recipients in iter_recipient_batches(batch_size):
+        flows = load_active_flows([r['id'] for r in recipients])
+        messages = [
+            (r['id'], r['telegram_id'], render_digest(flows[r['id']], today))
+            for r in recipients
+            if r['id'] in flows
+        ]
+        if messages:
+            yield messages
+
+
+def seconds_until_business_hours(now=None):
+    """
+    Сколько ждать до начала рабочего времени (0, если оно уже идет)
+
+    Используется, чтобы не будить пользователей вне рабочих часов.
+    """
+    now = timezone.localtime(now)
+    if is_business_hours(now):
+        return 0
+
+    if now.weekday() < 5 and now.hour < 9:
+        day = now.date()
+    else:
+        day = now.date() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    candidate = timezone.make_aware(datetime.combine(day, time(9, 0)), now.tzinfo)
+    return int((candidate - now).total_seconds())
@@ -0,0 +1,50 @@
+"""
+Команда-потребитель потока обновлений Telegram
+"""
+import socket
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.users.telegram_updates import consume_batch, ensure_consumer_group
+
+
+class Command(BaseCommand):
+    """
+    Читает обновления Telegram из Redis Stream в составе группы потребителей
+    """
+    help = 'Обрабатывает обновления Telegram из Redis Stream пачками'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consumer',
+            default=socket.gethostname(),
+            help='Имя потребителя в группе (по умолчанию имя хоста)'
+        )
+        parser.add_argument('--batch', type=int, default=100, help='Размер пачки')
+        parser.add_argument('--block', type=int, default=5000, help='Ожидание новых записей, мс')
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать одну пачку и выйти'
+        )
+    
+    def handle(self, *args, **options):
+        """Запускает цикл чтения"""
+        # Обновления, принятые webhook до первого запуска, тоже обрабатываются
+        ensure_consumer_group(id='0')
+        consumer = options['consumer']
+        self.stdout.write(self.style.SUCCESS(f'📥 Потребитель {consumer} запущен'))
+        
+        total = 0
+        try:
+            while True:
+                close_old_connections()
+                processed = consume_batch(consumer, count=options['batch'], block_ms=options['block'])
+                total += processed
+                if options['once']:
+                    break
+        except KeyboardInterrupt:
+            pass
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ Обработано обновлений: {total}'))
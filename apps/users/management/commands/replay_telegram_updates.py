@@ -0,0 +1,33 @@
+"""
+Команда повторной обработки обновлений Telegram из потока
+"""
+from django.core.management.base import BaseCommand
+
+from apps.users.telegram_updates import replay
+
+
+class Command(BaseCommand):
+    """
+    Прогоняет сохраненные в Redis Stream обновления через обработчики
+    """
+    help = 'Повторно обрабатывает обновления Telegram из Redis Stream'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--start', default='-', help='Начальный ID записи потока')
+        parser.add_argument('--end', default='+', help='Конечный ID записи потока')
+        parser.add_argument('--count', type=int, default=None, help='Максимум записей')
+        parser.add_argument(
+            '--dedupe',
+            action='store_true',
+            help='Пропускать уже обработанные update_id'
+        )
+    
+    def handle(self, *args, **options):
+        """Выполняет повтор"""
+        replayed = replay(
+            start=options['start'],
+            end=options['end'],
+            count=options['count'],
+            dedupe=options['dedupe']
+        )
+        self.stdout.write(self.style.SUCCESS(f'🔁 Повторно обработано записей: {replayed}'))
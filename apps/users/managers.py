@@ -3,6 +3,7 @@
 """
 from django.contrib.auth.base_user import BaseUserManager
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
 
@@ -75,4 +76,38 @@ class UserManager(BaseUserManager):
     
     def by_telegram_id(self, telegram_id):
         """Поиск пользователя по Telegram ID"""
-        return self.filter(telegram_id=str(telegram_id).strip()).first()
\ No newline at end of file
+        return self.filter(telegram_id=str(telegram_id).strip()).first()
+    
+    def get_by_telegram_id(self, telegram_id):
+        """Поиск пользователя по Telegram ID (None, если не найден)"""
+        return self.by_telegram_id(telegram_id)
+    
+    def create_telegram_user(self, telegram_id, name, telegram_username='', **extra_fields):
+        """Создание пользователя, пришедшего из Telegram (без пароля)"""
+        return self.create_user(
+            name=name,
+            telegram_id=telegram_id,
+            telegram_username=telegram_username,
+            **extra_fields
+        )
+    
+    def get_or_create_telegram_user(self, telegram_id, name, telegram_username=''):
+        """
+        Возвращает (user, created) для входа через Telegram.
+        
+        Существующий пользователь читается одним запросом и не сохраняется.
+        Параллельный вход нового пользователя разрешается по уникальному telegram_id.
+        """
+        user = self.by_telegram_id(telegram_id)
+        if user:
+            return user, False
+        
+        try:
+            with transaction.atomic():
+                return self.create_telegram_user(
+                    telegram_id=telegram_id,
+                    name=name,
+                    telegram_username=telegram_username
+                ), True
+        except IntegrityError:
+            return self.get(telegram_id=str(telegram_id).strip()), False
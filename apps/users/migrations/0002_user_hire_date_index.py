@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(fields=["hire_date"], name="users_hire_da_9fba7a_idx"),
+        ),
+    ]
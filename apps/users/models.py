@@ -105,6 +105,7 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
             models.Index(fields=['telegram_id']),
             models.Index(fields=['email']),
             models.Index(fields=['department']),
+            models.Index(fields=['hire_date']),
         ]
     
     def __str__(self):
@@ -127,10 +128,17 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
     
     def has_role(self, role_name):
         """Проверяет, имеет ли пользователь определенную роль"""
+        # Роли, загруженные CachedJWTAuthentication, проверяются без запроса
+        cached_roles = getattr(self, '_cached_role_names', None)
+        if cached_roles is not None:
+            return role_name in cached_roles
         return self.roles.filter(name=role_name, is_active=True).exists()
     
     def has_any_role(self, role_names):
         """Проверяет, имеет ли пользователь хотя бы одну из указанных ролей"""
+        cached_roles = getattr(self, '_cached_role_names', None)
+        if cached_roles is not None:
+            return not cached_roles.isdisjoint(role_names)
         return self.roles.filter(name__in=role_names, is_active=True).exists()
     
     def get_active_roles(self):
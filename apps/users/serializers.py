@@ -4,11 +4,13 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.utils import timezone
-from datetime import timedelta
 import hashlib
 import hmac
 
-from .models import User, Role, UserRole, TelegramSession
+from apps.common.utils import get_telegram_secret_key
+from .models import User, Role, UserRole
+from .tasks import record_telegram_login
+from .activity import record_activity
 
 
 class RoleSerializer(serializers.ModelSerializer):
@@ -136,12 +138,9 @@ class TelegramAuthSerializer(serializers.Serializer):
         received_hash = data.pop('hash')
         data_check_string = '\n'.join([f"{k}={v}" for k, v in sorted(data.items()) if v])
         
-        # Создаем секретный ключ
-        secret_key = hashlib.sha256(bot_token.encode()).digest()
-        
         # Вычисляем ожидаемый хеш
         expected_hash = hmac.new(
-            secret_key,
+            get_telegram_secret_key(bot_token),
             data_check_string.encode(),
             hashlib.sha256
         ).hexdigest()
@@ -163,60 +162,32 @@ class TelegramAuthSerializer(serializers.Serializer):
     
     def create_or_update_user(self, validated_data):
         """
-        Создает или обновляет пользователя на основе данных Telegram
-        """
-        telegram_id = validated_data['id']
+        Создает или находит пользователя на основе данных Telegram
         
+        Запрос выполняет только чтение (или вставку для нового пользователя).
+        Сессия и синхронизация профиля пишутся фоновой задачей,
+        время входа — буфером активности.
+        """
         # Формируем полное имя
         full_name = validated_data['first_name']
         if validated_data.get('last_name'):
             full_name += f" {validated_data['last_name']}"
+        username = validated_data.get('username', '')
         
-        # Пытаемся найти существующего пользователя
-        user = User.objects.get_by_telegram_id(telegram_id)
-        
-        if user:
-            # Обновляем данные существующего пользователя
-            user.name = full_name
-            user.telegram_username = validated_data.get('username', '')
-            user.last_login_at = timezone.now()
-            user.save()
-        else:
-            # Создаем нового пользователя
-            user = User.objects.create_telegram_user(
-                telegram_id=telegram_id,
-                name=full_name,
-                telegram_username=validated_data.get('username', '')
-            )
-            
-            # Назначаем базовую роль "user"
-            try:
-                user_role = Role.objects.get(name='user')
-                UserRole.objects.create(
-                    user=user,
-                    role=user_role,
-                    assigned_by=None
-                )
-            except Role.DoesNotExist:
-                pass
-        
-        # Создаем или обновляем Telegram сессию
-        auth_date = timezone.datetime.fromtimestamp(
-            int(validated_data['auth_date']),
-            tz=timezone.get_current_timezone()
+        user, created = User.objects.get_or_create_telegram_user(
+            telegram_id=validated_data['id'],
+            name=full_name,
+            telegram_username=username
         )
         
-        TelegramSession.objects.update_or_create(
-            user=user,
-            defaults={
-                'telegram_data': validated_data,
-                'auth_date': auth_date,
-                'hash_value': validated_data['hash'],
-                'is_valid': True,
-                'expires_at': timezone.now() + timedelta(days=7)
-            }
+        profile_changed = not created and (
+            user.name != full_name or (user.telegram_username or '') != username
         )
+        record_telegram_login.delay(user.id, dict(validated_data), sync_profile=profile_changed)
         
+        # Значение для ответа; в БД его запишет буфер активности
+        user.last_login_at = timezone.now()
+        record_activity(user_id=user.id, at=user.last_login_at)
         return user
 
 
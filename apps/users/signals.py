@@ -1,13 +1,15 @@
 """
 Сигналы для приложения пользователей
 """
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, post_init, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.signals import user_logged_in
 from django.utils import timezone
 
 from .models import User, UserRole, Role
-from .tasks import welcome_new_user, update_user_activity
+from .tasks import welcome_new_user
+from .activity import record_activity
+from apps.common.cache import invalidate_tags
 
 
 @receiver(post_save, sender=User)
@@ -44,9 +46,9 @@ def user_created_handler(sender, instance, created, **kwargs):
 @receiver(user_logged_in)
 def update_last_login(sender, request, user, **kwargs):
     """
-    Обновляет время последнего входа пользователя
+    Обновляет время последнего входа пользователя (через буфер активности)
     """
-    update_user_activity.delay(user.id)
+    record_activity(user_id=user.id)
 
 
 @receiver(post_save, sender=UserRole)
@@ -105,6 +107,11 @@ def user_profile_updated_handler(sender, instance, created, **kwargs):
     """
     Обработчик обновления профиля пользователя
     """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'is_active', 'department'} & set(update_fields):
+        # Отслеживаемые поля не сохранялись
+        return
+    
     if not created:
         # Проверяем, изменились ли важные поля
         if hasattr(instance, '_state') and instance._state.adding is False:
@@ -133,15 +140,69 @@ def user_profile_updated_handler(sender, instance, created, **kwargs):
 
 
 # Для отслеживания изменений значений полей
-@receiver(post_save, sender=User)
+@receiver(post_init, sender=User)
 def store_user_original_values(sender, instance, **kwargs):
     """
-    Сохраняет оригинальные значения полей для отслеживания изменений
+    Запоминает исходные значения полей без дополнительного запроса к БД
     """
-    if instance.pk:
-        try:
-            original = User.objects.get(pk=instance.pk)
-            instance._original_is_active = original.is_active
-            instance._original_department = original.department
-        except User.DoesNotExist:
-            pass
\ No newline at end of file
+    # Отложенные поля (.only/.defer) не читаем, чтобы не вызвать запрос
+    values = instance.__dict__
+    if 'is_active' in values:
+        instance._original_is_active = values['is_active']
+    if 'department' in values:
+        instance._original_department = values['department']
+
+
+@receiver(post_save, sender=User)
+def refresh_user_original_values(sender, instance, **kwargs):
+    """
+    После сохранения текущие значения становятся исходными
+    """
+    store_user_original_values(sender, instance)
+
+
+# ========== Инвалидация кэша аутентификации ==========
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_auth_cache_handler(sender, instance, **kwargs):
+    """
+    Сбрасывает закэшированного пользователя при изменении профиля
+    """
+    # authentication тянет DRF и simplejwt, воркерам они при старте не нужны
+    from .authentication import invalidate_user_cache
+    invalidate_user_cache(instance.pk)
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def user_role_auth_cache_handler(sender, instance, **kwargs):
+    """
+    Сбрасывает кэш пользователя при изменении назначения роли
+    """
+    from .authentication import invalidate_user_cache
+    invalidate_user_cache(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def user_roles_m2m_cache_handler(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Сбрасывает кэш при изменении M2M поля roles
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from .authentication import invalidate_user_cache
+    if not reverse:
+        invalidate_user_cache(instance.pk)
+    else:
+        # Изменение со стороны роли затрагивает произвольный набор пользователей
+        invalidate_tags('auth_roles')
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def role_auth_cache_handler(sender, instance, **kwargs):
+    """
+    Сбрасывает кэш ролей всех пользователей
+    """
+    invalidate_tags('auth_roles')
@@ -6,10 +6,23 @@ from django.utils import timezone
 from django.conf import settings
 from datetime import timedelta
 import logging
-import requests
+import time
+
+from apps.common.db_router import use_replica
 
 logger = logging.getLogger('apps.users.tasks')
 
+_http_session = None
+
+
+def _get_http_session():
+    """Общая HTTP-сессия процесса для пакетной отправки (keep-alive к Bot API)"""
+    global _http_session
+    if _http_session is None:
+        import requests
+        _http_session = requests.Session()
+    return _http_session
+
 
 @shared_task(bind=True, max_retries=3)
 def send_telegram_notification(self, user_id, message, notification_type='general', **kwargs):
@@ -22,6 +35,9 @@ def send_telegram_notification(self, user_id, message, notification_type='genera
         notification_type (str): Тип уведомления
         **kwargs: Дополнительные параметры (кнопки, форматирование и т.д.)
     """
+    # requests импортируется в задаче, а не при старте воркера и веб-процесса
+    import requests
+    
     try:
         from .models import User
         
@@ -126,20 +142,86 @@ def send_bulk_telegram_notifications(self, user_ids, message, notification_type=
         raise self.retry(exc=exc, countdown=60 * (self.request.retries + 1))
 
 
+@shared_task(bind=True, max_retries=3)
+def send_telegram_batch(self, messages, notification_type='bulk', quiet_hours=False):
+    """
+    Отправляет пачку готовых сообщений через одну HTTP-сессию
+    
+    Args:
+        messages (list): [(user_id, chat_id, text), ...]
+        notification_type (str): Тип уведомления
+        quiet_hours (bool): Не отправлять вне рабочего времени (перенос на его начало)
+    """
+    import requests
+    from .digest import seconds_until_business_hours
+    
+    if quiet_hours:
+        wait = seconds_until_business_hours()
+        if wait:
+            send_telegram_batch.apply_async(
+                args=[messages, notification_type, quiet_hours], countdown=wait
+            )
+            logger.info(f"Пачка '{notification_type}' перенесена на {wait} с (нерабочее время)")
+            return {'deferred': len(messages)}
+    
+    bot_token = settings.TELEGRAM_BOT_TOKEN
+    if not bot_token:
+        logger.error("TELEGRAM_BOT_TOKEN не настроен")
+        return False
+    
+    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    session = _get_http_session()
+    interval = 1.0 / getattr(settings, 'TELEGRAM_BROADCAST_RATE', 25)
+    sent_count = 0
+    failed = []
+    
+    for user_id, chat_id, text in messages:
+        data = {
+            'chat_id': chat_id,
+            'text': text,
+            'parse_mode': 'HTML',
+            'disable_web_page_preview': True
+        }
+        try:
+            response = session.post(url, json=data, timeout=10)
+            if response.status_code == 429:
+                # Лимит Bot API: ждем указанное время и повторяем один раз
+                retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+                time.sleep(retry_after)
+                response = session.post(url, json=data, timeout=10)
+            
+            if response.status_code == 200:
+                sent_count += 1
+            else:
+                failed.append(user_id)
+                logger.error(f"Ошибка отправки пользователю {user_id}: {response.status_code} - {response.text}")
+        except requests.RequestException as e:
+            failed.append(user_id)
+            logger.error(f"Ошибка сети при отправке пользователю {user_id}: {str(e)}")
+        
+        time.sleep(interval)
+    
+    logger.info(
+        f"Пачка '{notification_type}': отправлено {sent_count}, ошибок {len(failed)}"
+    )
+    return {
+        'sent_count': sent_count,
+        'failed_count': len(failed),
+        'failed_user_ids': failed
+    }
+
+
 @shared_task(bind=True)
 def cleanup_expired_sessions(self):
     """
     Очищает истекшие Telegram сессии
     """
     try:
+        from apps.common.retention import run_policy
         from .models import TelegramSession
         
-        # Удаляем истекшие сессии
-        expired_sessions = TelegramSession.objects.filter(
-            expires_at__lt=timezone.now()
-        )
-        deleted_count = expired_sessions.count()
-        expired_sessions.delete()
+        # Удаляем истекшие сессии пачками
+        deleted_count = run_policy('telegram_sessions')['deleted']
         
         # Помечаем как невалидные сессии старше недели
         old_sessions = TelegramSession.objects.filter(
@@ -207,6 +289,7 @@ def sync_user_with_telegram(self, user_id, telegram_data):
 
 
 @shared_task(bind=True)
+@use_replica()
 def generate_user_statistics(self):
     """
     Генерирует статистику пользователей
@@ -316,11 +399,10 @@ def update_user_activity(self, user_id):
         user_id (int): ID пользователя
     """
     try:
-        from .models import User
+        from .activity import record_activity
         
-        User.objects.filter(id=user_id).update(
-            last_login_at=timezone.now()
-        )
+        # Запись в БД выполнит flush_user_activity
+        record_activity(user_id=user_id)
         
         return True
         
@@ -329,6 +411,66 @@ def update_user_activity(self, user_id):
         return False
 
 
+@shared_task(bind=True, max_retries=3)
+def record_telegram_login(self, user_id, telegram_data, sync_profile=False):
+    """
+    Отложенная запись входа через Telegram
+    
+    Сохраняет Telegram сессию и, если данные профиля изменились,
+    синхронизирует их. Время входа пишет буфер активности.
+    
+    Args:
+        user_id (int): ID пользователя
+        telegram_data (dict): Проверенные данные Telegram
+        sync_profile (bool): Нужна ли синхронизация имени и username
+    """
+    try:
+        from .models import TelegramSession
+        
+        now = timezone.now()
+        auth_date = timezone.datetime.fromtimestamp(
+            int(telegram_data['auth_date']),
+            tz=timezone.get_current_timezone()
+        )
+        TelegramSession.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                'telegram_data': telegram_data,
+                'auth_date': auth_date,
+                'hash_value': telegram_data.get('hash', ''),
+                'is_valid': True,
+                'expires_at': now + timedelta(days=7)
+            }
+        )
+        
+        if sync_profile:
+            sync_user_with_telegram(user_id, telegram_data)
+        
+        return True
+        
+    except Exception as exc:
+        logger.error(f"Ошибка записи входа пользователя {user_id}: {str(exc)}")
+        raise self.retry(exc=exc, countdown=30 * (self.request.retries + 1))
+
+
+@shared_task(bind=True)
+def flush_user_activity(self):
+    """
+    Переносит буфер активности из Redis в users.last_login_at
+    """
+    try:
+        from .activity import flush_activity
+        
+        updated = flush_activity()
+        if updated:
+            logger.info(f"Обновлена активность пользователей: {updated}")
+        return {'updated_users': updated}
+        
+    except Exception as exc:
+        logger.error(f"Ошибка сброса буфера активности: {str(exc)}")
+        raise
+
+
 @shared_task(bind=True, max_retries=3)
 def notify_buddy_assignment(self, buddy_user_id, mentee_user_id, flow_title):
     """
@@ -403,46 +545,18 @@ def send_daily_digest(self, user_id):
     """
     try:
         from .models import User
-        from apps.flows.models import UserFlow
+        from .digest import load_active_flows, render_digest
         
         user = User.objects.get(id=user_id, is_active=True)
         
         if not user.telegram_id:
             return False
         
-        # Собираем информацию о потоках пользователя
-        active_flows = UserFlow.objects.filter(
-            user=user,
-            status='in_progress'
-        ).select_related('flow', 'current_step')
-        
-        if not active_flows.exists():
+        flows = load_active_flows([user_id]).get(user_id)
+        if not flows:
             return False  # Нет активных потоков
         
-        # Формируем сообщение
-        message_parts = [f"📊 Ваша сводка на {timezone.now().strftime('%d.%m.%Y')}:"]
-        
-        for user_flow in active_flows:
-            progress = user_flow.progress_percentage
-            current_step = user_flow.current_step.title if user_flow.current_step else "Завершено"
-            
-            status_emoji = "🟢" if progress > 70 else "🟡" if progress > 30 else "🔴"
-            
-            message_parts.append(
-                f"\n{status_emoji} {user_flow.flow.title}\n"
-                f"   Прогресс: {progress:.1f}%\n"
-                f"   Текущий этап: {current_step}"
-            )
-            
-            # Добавляем информацию о дедлайне если есть
-            if user_flow.expected_completion_date:
-                days_left = (user_flow.expected_completion_date - timezone.now().date()).days
-                if days_left <= 7:
-                    message_parts.append(f"   ⏰ Осталось дней: {days_left}")
-        
-        message_parts.append("\n💪 Продолжайте обучение!")
-        
-        message = '\n'.join(message_parts)
+        message = render_digest(flows)
         
         send_telegram_notification.delay(
             user_id=user_id,
@@ -457,4 +571,31 @@ def send_daily_digest(self, user_id):
         return False
     except Exception as exc:
         logger.error(f"Ошибка отправки дайджеста: {str(exc)}")
-        raise
\ No newline at end of file
+        raise
+
+
+@shared_task(bind=True)
+def send_daily_digests(self, batch_size=None):
+    """
+    Ежедневная сводка всем пользователям с потоками в процессе
+    
+    Пользователи обрабатываются пачками; на каждую пачку — два запроса
+    и одна задача send_telegram_batch.
+    """
+    from .digest import build_digest_batches, seconds_until_business_hours, DIGEST_BATCH_SIZE
+    
+    wait = seconds_until_business_hours()
+    if wait:
+        send_daily_digests.apply_async(kwargs={'batch_size': batch_size}, countdown=wait)
+        logger.info(f"Сводка перенесена на {wait} с (нерабочее время)")
+        return {'deferred': True}
+    
+    batches = 0
+    recipients = 0
+    for messages in build_digest_batches(batch_size or DIGEST_BATCH_SIZE):
+        send_telegram_batch.delay(messages, 'daily_digest', True)
+        batches += 1
+        recipients += len(messages)
+    
+    logger.info(f"Сводка поставлена в очередь: пользователей {recipients}, пачек {batches}")
+    return {'recipients': recipients, 'batches': batches}
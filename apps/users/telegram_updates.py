@@ -0,0 +1,310 @@
+"""
+Прием обновлений Telegram через Redis Stream
+
+Webhook только кладет сырое обновление в поток и сразу отвечает 200;
+это единственный вход обновлений (бот не использует getUpdates).
+Группа потребителей читает поток пачками, отбрасывает повторы по update_id
+и передает обновления обработчикам сообщений, callback-запросов и команд.
+Обновление запоминается обработанным только после обработчиков; на время
+обработки ставится короткий маркер, который после падения процесса истекает
+сам, и повторная доставка снова доходит до обработчиков.
+Бот на aiogram читает тот же поток в своей группе (apps.bot.runtime)
+и отвечает на команды.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.common.redis_client import get_redis
+from .activity import record_activity
+
+logger = logging.getLogger('apps.users.telegram_updates')
+
+STREAM_KEY = 'onboarding:telegram:updates'
+CONSUMER_GROUP = 'telegram-workers'
+DEDUP_TIMEOUT = 60 * 60 * 24  # Telegram повторяет доставку не дольше суток
+PROCESSING_TIMEOUT = 60 * 5  # маркер обработки; после падения процесса истекает сам
+MAX_ATTEMPTS = 5  # после стольких ошибок обработчиков запись подтверждается без обработки
+
+_message_handlers = []
+_callback_handlers = []
+_command_handlers = {}
+
+
+class UpdateInProgress(Exception):
+    """Обновление сейчас обрабатывает другой потребитель"""
+
+
+# ========== Регистрация обработчиков ==========
+
+def message_handler(func):
+    """Регистрирует обработчик обычных сообщений"""
+    _message_handlers.append(func)
+    return func
+
+
+def callback_query_handler(func):
+    """Регистрирует обработчик callback-запросов"""
+    _callback_handlers.append(func)
+    return func
+
+
+def command_handler(command):
+    """Регистрирует обработчик команды вида /start"""
+    def decorator(func):
+        _command_handlers[command.lstrip('/')] = func
+        return func
+    return decorator
+
+
+# ========== Запись в поток ==========
+
+def enqueue_update(raw_update):
+    """
+    Добавляет сырое обновление (bytes/str) в поток
+
+    Returns:
+        str: ID записи в потоке
+    """
+    maxlen = getattr(settings, 'TELEGRAM_UPDATES_STREAM_MAXLEN', 100000)
+    entry_id = get_redis().xadd(
+        STREAM_KEY, {'update': raw_update}, maxlen=maxlen, approximate=True
+    )
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+
+def ensure_consumer_group(group=CONSUMER_GROUP, id='$'):
+    """
+    Создает группу потребителей, если ее еще нет
+
+    Args:
+        id (str): С какой записи читает новая группа: '$' — только новые,
+            '0' — весь хранимый поток
+    """
+    import redis
+
+    try:
+        get_redis().xgroup_create(STREAM_KEY, group, id=id, mkstream=True)
+    except redis.ResponseError as exc:
+        if 'BUSYGROUP' not in str(exc):
+            raise
+
+
+# ========== Чтение из потока ==========
+
+def read_batch(consumer, group=CONSUMER_GROUP, count=100, block_ms=5000, min_idle_ms=60000):
+    """
+    Читает пачку записей группы
+
+    Сначала забирает зависшие записи упавших потребителей (XAUTOCLAIM),
+    затем читает новые.
+
+    Returns:
+        list: [(ID записи, сырое обновление), ...]
+    """
+    client = get_redis()
+
+    claimed = client.xautoclaim(
+        STREAM_KEY, group, consumer, min_idle_time=min_idle_ms, count=count
+    )
+    entries = list(claimed[1]) if claimed else []
+
+    if len(entries) < count:
+        response = client.xreadgroup(
+            group, consumer, {STREAM_KEY: '>'},
+            count=count - len(entries), block=block_ms
+        )
+        for _stream, stream_entries in response or []:
+            entries.extend(stream_entries)
+
+    return [
+        (entry_id, fields.get(b'update') or fields.get('update'))
+        for entry_id, fields in entries
+    ]
+
+
+def acknowledge(entry_ids, group=CONSUMER_GROUP):
+    """Подтверждает обработку записей группы (XACK)"""
+    if entry_ids:
+        get_redis().xack(STREAM_KEY, group, *entry_ids)
+
+
+def consume_batch(consumer, count=100, block_ms=5000, min_idle_ms=60000):
+    """
+    Обрабатывает одну пачку обновлений из потока
+
+    Запись подтверждается (XACK) после обработки. Если обработчик упал,
+    запись остается в ожидании и через min_idle_ms достается потребителю
+    повторно (XAUTOCLAIM), пока не исчерпаны MAX_ATTEMPTS; нечитаемые
+    записи подтверждаются сразу.
+
+    Returns:
+        int: Количество подтвержденных записей
+    """
+    entries = read_batch(consumer, count=count, block_ms=block_ms, min_idle_ms=min_idle_ms)
+
+    processed = []
+    for entry_id, raw_update in entries:
+        try:
+            update = parse_update(raw_update)
+        except ValueError as exc:
+            logger.error(f"Нечитаемое обновление {entry_id}: {exc}")
+            processed.append(entry_id)
+            continue
+        try:
+            dispatch_update(update)
+        except UpdateInProgress:
+            # Остается в ожидании, повторная доставка после снятия маркера
+            continue
+        except Exception as exc:
+            if not give_up(entry_id):
+                logger.warning(f"Ошибка обработки обновления {entry_id}, будет повтор: {exc}")
+                continue
+            logger.error(f"Обновление {entry_id} отброшено после {MAX_ATTEMPTS} ошибок: {exc}")
+        processed.append(entry_id)
+
+    acknowledge(processed)
+    return len(processed)
+
+
+def give_up(entry_id, group=CONSUMER_GROUP):
+    """Учитывает ошибку обработки записи; True — попытки исчерпаны"""
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    key = f"telegram:update:attempts:{group}:{entry_id}"
+    cache.add(key, 0, DEDUP_TIMEOUT)
+    try:
+        return cache.incr(key) >= MAX_ATTEMPTS
+    except ValueError:
+        return False
+
+
+def replay(start='-', end='+', count=None, dedupe=False):
+    """
+    Повторно обрабатывает записи потока в диапазоне ID
+
+    По умолчанию защита от повторов отключена, чтобы обновления
+    действительно прошли через обработчики еще раз.
+    """
+    entries = get_redis().xrange(STREAM_KEY, min=start, max=end, count=count)
+    for entry_id, fields in entries:
+        raw_update = fields.get(b'update') or fields.get('update')
+        try:
+            process_raw_update(raw_update, dedupe=dedupe)
+        except Exception as exc:
+            logger.error(f"Ошибка повторной обработки {entry_id}: {exc}")
+    return len(entries)
+
+
+# ========== Обработка ==========
+
+def parse_update(raw_update):
+    """Разбирает JSON обновления (ValueError для нечитаемых)"""
+    if isinstance(raw_update, bytes):
+        raw_update = raw_update.decode()
+    update = json.loads(raw_update) if isinstance(raw_update, str) else raw_update
+    if not isinstance(update, dict):
+        raise ValueError('Обновление должно быть объектом JSON')
+    return update
+
+
+def process_raw_update(raw_update, dedupe=True):
+    """Разбирает JSON обновления и передает его dispatch_update"""
+    return dispatch_update(parse_update(raw_update), dedupe=dedupe)
+
+
+def claim_update(update_id, scope=None):
+    """
+    Ставит маркер обработки обновления
+
+    Args:
+        scope (str): Отдельное пространство ключей (например, для бота)
+
+    Returns:
+        str: Ключ обновления или None, если оно уже обработано
+
+    Raises:
+        UpdateInProgress: Маркер обработки уже стоит
+    """
+    key = f"telegram:update:{scope}:{update_id}" if scope else f"telegram:update:{update_id}"
+    if not cache.add(f"{key}:processing", 1, PROCESSING_TIMEOUT):
+        raise UpdateInProgress(update_id)
+    if cache.get(key):
+        cache.delete(f"{key}:processing")
+        return None
+    return key
+
+
+def release_update(key, processed):
+    """Снимает маркер обработки; processed — запомнить обновление обработанным"""
+    if processed:
+        cache.set(key, 1, DEDUP_TIMEOUT)
+    cache.delete(f"{key}:processing")
+
+
+def dispatch_update(update, dedupe=True):
+    """
+    Передает обновление подходящим обработчикам
+
+    Returns:
+        bool: False, если обновление уже обрабатывалось
+
+    Raises:
+        UpdateInProgress: Обновление обрабатывается другим потребителем
+    """
+    update_id = update.get('update_id')
+    key = None
+    if dedupe and update_id is not None:
+        key = claim_update(update_id)
+        if key is None:
+            return False
+
+    try:
+        _route(update)
+    except Exception:
+        # Повторная доставка записи должна снова дойти до обработчиков
+        if key:
+            release_update(key, processed=False)
+        raise
+    if key:
+        release_update(key, processed=True)
+    return True
+
+
+def _route(update):
+    if 'message' in update:
+        message = update['message']
+        text = message.get('text') or ''
+        if text.startswith('/'):
+            # /start@bot_name payload -> start
+            command = text[1:].split(maxsplit=1)[0].split('@', 1)[0]
+            handler = _command_handlers.get(command)
+            if handler:
+                handler(message)
+                return
+        for handler in _message_handlers:
+            handler(message)
+    elif 'callback_query' in update:
+        for handler in _callback_handlers:
+            handler(update['callback_query'])
+
+
+# ========== Обработчики по умолчанию ==========
+
+@message_handler
+def track_message_activity(message):
+    """Отмечает активность автора сообщения"""
+    from_id = message.get('from', {}).get('id')
+    if from_id:
+        record_activity(telegram_id=str(from_id))
+
+
+@callback_query_handler
+def track_callback_activity(callback_query):
+    """Отмечает активность пользователя, нажавшего кнопку"""
+    from_id = callback_query.get('from', {}).get('id')
+    if from_id:
+        record_activity(telegram_id=str(from_id))
+
@@ -9,7 +9,9 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.utils import timezone
 from django.db import transaction
+from django.conf import settings
 from rest_framework_simplejwt.authentication import JWTAuthentication
+import hmac
 import logging
 
 from .models import User, Role, UserRole
@@ -18,10 +20,13 @@ from .serializers import (
     TelegramAuthSerializer, UserRoleAssignSerializer, ProfileSerializer,
     PasswordChangeSerializer, UserListSerializer
 )
+from .tasks import record_telegram_login
+from .telegram_updates import enqueue_update, process_raw_update
 from apps.common.permissions import (
     IsModerator, IsActiveUser, CanManageUserRoles,
     TelegramBotPermission
 )
+from apps.common.mixins import ReplicaReadMixin
 
 logger = logging.getLogger(__name__)
 
@@ -50,17 +55,13 @@ class TelegramAuthView(APIView):
         
         if serializer.is_valid():
             try:
-                # Создаем или обновляем пользователя
+                # Находим или создаем пользователя; запись входа выполняется в фоне
                 user = serializer.create_or_update_user(serializer.validated_data)
                 
                 # Генерируем JWT токены
                 refresh = RefreshToken.for_user(user)
                 access_token = refresh.access_token
                 
-                # Обновляем время последнего входа
-                user.last_login_at = timezone.now()
-                user.save(update_fields=['last_login_at'])
-                
                 return Response({
                     'user': UserSerializer(user).data,
                     'tokens': {
@@ -138,7 +139,7 @@ class PasswordChangeView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserListView(generics.ListCreateAPIView):
+class UserListView(ReplicaReadMixin, generics.ListCreateAPIView):
     """
     Список пользователей и создание новых (только для модераторов)
     """
@@ -292,32 +293,38 @@ class BuddyListView(generics.ListAPIView):
 class TelegramWebhookView(APIView):
     """
     Обработка webhook от Telegram бота
+    
+    Обновление кладется в Redis Stream и обрабатывается потребителями
+    (manage.py consume_telegram_updates), поэтому ответ не зависит
+    от скорости обработчиков.
     """
-    permission_classes = [permissions.AllowAny]  # Валидация внутри
+    permission_classes = [permissions.AllowAny]  # Валидация по секретному заголовку
+    authentication_classes = []
     
     def post(self, request):
         """
-        Обработка обновлений от Telegram
+        Прием обновлений от Telegram
         """
-        # Здесь должна быть валидация webhook от Telegram
-        # и обработка различных типов обновлений
+        secret = settings.TELEGRAM_WEBHOOK_SECRET
+        if not secret:
+            # Без секрета любой мог бы отправлять обновления от имени Telegram
+            logger.error("TELEGRAM_WEBHOOK_SECRET не настроен, webhook отклонен")
+            return Response({'ok': False}, status=status.HTTP_403_FORBIDDEN)
+        received_secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(secret, received_secret):
+            return Response({'ok': False}, status=status.HTTP_403_FORBIDDEN)
         
-        update_data = request.data
+        if settings.TELEGRAM_UPDATES_STREAM_ENABLED:
+            try:
+                enqueue_update(request.body)
+                return Response({'ok': True}, status=status.HTTP_200_OK)
+            except Exception as exc:
+                logger.error(f"Поток обновлений недоступен, обрабатываем сразу: {exc}")
         
-        # Базовая обработка (расширить при необходимости)
-        if 'message' in update_data:
-            message = update_data['message']
-            user_id = message.get('from', {}).get('id')
-            
-            if user_id:
-                # Обновляем информацию о последней активности пользователя
-                try:
-                    user = User.objects.get_by_telegram_id(str(user_id))
-                    if user:
-                        user.last_login_at = timezone.now()
-                        user.save(update_fields=['last_login_at'])
-                except Exception:
-                    pass  # Пользователь не найден в системе
+        try:
+            process_raw_update(request.body)
+        except ValueError:
+            return Response({'ok': False}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({'ok': True}, status=status.HTTP_200_OK)
 
@@ -333,38 +340,21 @@ class BotUserInfoView(APIView):
         Получение информации о пользователе по Telegram ID
         """
         try:
-            user = User.objects.get_by_telegram_id(telegram_id)
-            if not user:
+            from apps.flows.bot_card import get_card
+            
+            # Карточка собирается заранее по событиям; здесь — один поиск
+            card = get_card(telegram_id)
+            if card is None:
                 return Response({
                     'error': 'Пользователь не найден'
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Получаем активные потоки пользователя
-            from apps.flows.models import UserFlow
-            active_flows = UserFlow.objects.filter(
-                user=user,
-                status__in=['not_started', 'in_progress']
-            ).select_related('flow')
+            today = timezone.now().date().isoformat()
+            for flow in card['active_flows']:
+                deadline = flow['expected_completion_date']
+                flow['is_overdue'] = bool(deadline and today > deadline)
             
-            return Response({
-                'user': {
-                    'id': user.id,
-                    'name': user.name,
-                    'email': user.email,
-                    'position': user.position,
-                    'department': user.department
-                },
-                'active_flows': [
-                    {
-                        'id': uf.id,
-                        'flow_title': uf.flow.title,
-                        'status': uf.status,
-                        'progress_percentage': uf.progress_percentage,
-                        'expected_completion_date': uf.expected_completion_date
-                    }
-                    for uf in active_flows
-                ]
-            }, status=status.HTTP_200_OK)
+            return Response(card, status=status.HTTP_200_OK)
             
         except Exception as e:
             return Response({
@@ -398,22 +388,17 @@ def telegram_mini_app_auth(request):
         if 'last_name' in telegram_data:
             name += f" {telegram_data['last_name']}"
         
-        # Ищем или создаем пользователя
-        user = User.objects.get_by_telegram_id(telegram_id)
-        
-        if not user:
-            user = User.objects.create_telegram_user(
-                telegram_id=telegram_id,
-                name=name,
-                telegram_username=telegram_data.get('username', '')
-            )
-            
-            # Назначаем базовую роль, если она ещё не присвоена
-            try:
-                user_role = Role.objects.get(name='user')
-                UserRole.objects.get_or_create(user=user, role=user_role)
-            except Role.DoesNotExist:
-                pass
+        # Ищем или создаем пользователя (базовую роль назначает сигнал)
+        username = telegram_data.get('username', '')
+        user, created = User.objects.get_or_create_telegram_user(
+            telegram_id=telegram_id,
+            name=name,
+            telegram_username=username
+        )
+        profile_changed = not created and (
+            user.name != name or (user.telegram_username or '') != username
+        )
+        record_telegram_login.delay(user.id, dict(telegram_data), sync_profile=profile_changed)
         
         # Генерируем токены
         refresh = RefreshToken.for_user(user)
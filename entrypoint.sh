@@ -100,6 +100,7 @@ wait_for_redis() {
 # Запуск Django веб-сервера
 run_web_server() {
     log "Запуск Django веб-сервера..."
+    export PROCESS_ROLE=${PROCESS_ROLE:-web}
     
     # Определяем режим (разработка/продакшн)
     if [ "$DEBUG" = "True" ]; then
@@ -112,15 +113,35 @@ run_web_server() {
 # Запуск Celery worker
 run_celery_worker() {
     log "Запуск Celery worker..."
-    celery -A onboarding worker --loglevel=info
+    # Отдельный воркер уведомлений: PROCESS_ROLE=celery-notifications CELERY_QUEUES=notifications
+    export PROCESS_ROLE=${PROCESS_ROLE:-celery-default}
+    # Проверки Django уже выполнил веб-сервис; без них воркер не импортирует URL и представления
+    export CELERY_SKIP_CHECKS=${CELERY_SKIP_CHECKS:-1}
+    celery -A onboarding worker --loglevel=info ${CELERY_QUEUES:+-Q "$CELERY_QUEUES"}
 }
 
 # Запуск Celery beat
 run_celery_beat() {
     log "Запуск Celery beat..."
+    export PROCESS_ROLE=${PROCESS_ROLE:-beat}
+    export CELERY_SKIP_CHECKS=${CELERY_SKIP_CHECKS:-1}
     celery -A onboarding beat --loglevel=info
 }
 
+# Запуск потребителя обновлений Telegram
+run_telegram_consumer() {
+    log "Запуск потребителя обновлений Telegram..."
+    export PROCESS_ROLE=${PROCESS_ROLE:-bot}
+    python manage.py consume_telegram_updates --skip-checks
+}
+
+# Запуск асинхронного Telegram-бота
+run_bot() {
+    log "Запуск Telegram-бота..."
+    export PROCESS_ROLE=${PROCESS_ROLE:-bot}
+    python manage.py run_bot --skip-checks
+}
+
 # Запуск установки системы
 run_system_setup() {
     log "Запуск установки системы..."
@@ -157,6 +178,14 @@ case "$SERVICE_TYPE" in
         # Запуск Celery beat
         run_celery_beat
         ;;
+    "telegram-consumer")
+        # Обработка потока обновлений Telegram
+        run_telegram_consumer
+        ;;
+    "bot")
+        # Асинхронный бот на aiogram
+        run_bot
+        ;;
     *)
         # Для неизвестных команд просто пытаемся выполнить
         log "Выполнение неизвестной команды: $SERVICE_TYPE"
@@ -3,6 +3,7 @@
 """
 import os
 from celery import Celery
+from celery.schedules import crontab
 from django.conf import settings
 from django.utils import timezone
 
@@ -14,8 +15,9 @@ app = Celery('onboarding')
 # должны начинаться с CELERY_, например, CELERY_BROKER_URL
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
-# Автоматически обнаруживаем файлы tasks.py в приложениях Django
-app.autodiscover_tasks()
+# Автоматически обнаруживаем файлы tasks.py только в приложениях проекта:
+# сторонние пакеты задач не содержат, а их перебор удлиняет старт воркера
+app.autodiscover_tasks(lambda: settings.LOCAL_APPS)
 
 # Конфигурация периодических задач
 app.conf.beat_schedule = {
@@ -40,6 +42,44 @@ app.conf.beat_schedule = {
         'options': {'queue': 'maintenance'}
     },
     
+    # Очистка устаревших данных потоков и просмотров статей
+    'cleanup-old-flow-data': {
+        'task': 'apps.flows.tasks.cleanup_old_flow_data',
+        'schedule': 60.0 * 60.0 * 24.0,  # раз в день
+        'options': {'queue': 'maintenance'}
+    },
+    'cleanup-article-views': {
+        'task': 'apps.guides.tasks.cleanup_article_views',
+        'schedule': 60.0 * 60.0 * 24.0 * 7.0,  # раз в неделю
+        'options': {'queue': 'maintenance'}
+    },
+    'cleanup-exports': {
+        'task': 'apps.flows.tasks.cleanup_exports',
+        'schedule': 60.0 * 60.0,  # каждый час
+        'options': {'queue': 'maintenance'}
+    },
+    
+    # Сброс буфера активности пользователей в БД
+    'flush-user-activity': {
+        'task': 'apps.users.tasks.flush_user_activity',
+        'schedule': float(getattr(settings, 'USER_ACTIVITY_FLUSH_INTERVAL', 30)),
+        'options': {'queue': 'default'}
+    },
+    
+    # Ежедневная сводка по будням в 10:00
+    'send-daily-digest': {
+        'task': 'apps.users.tasks.send_daily_digests',
+        'schedule': crontab(hour=10, minute=0, day_of_week='mon-fri'),
+        'options': {'queue': 'notifications'}
+    },
+    
+    # Секции журнала действий на несколько месяцев вперед
+    'maintain-flow-action-partitions': {
+        'task': 'apps.flows.tasks.maintain_flow_action_partitions',
+        'schedule': 60.0 * 60.0 * 24.0,  # раз в день
+        'options': {'queue': 'maintenance'}
+    },
+    
     # Генерация статистики каждую ночь в 2:00
     'generate-statistics': {
         'task': 'apps.flows.tasks.generate_daily_statistics',
@@ -55,14 +95,20 @@ app.conf.timezone = settings.TIME_ZONE
 app.conf.task_routes = {
     # Уведомления Telegram
     'apps.users.tasks.send_telegram_notification': {'queue': 'notifications'},
+    'apps.users.tasks.send_telegram_batch': {'queue': 'notifications'},
+    'apps.users.tasks.send_daily_digests': {'queue': 'notifications'},
     'apps.flows.tasks.send_flow_*': {'queue': 'notifications'},
     
     # Аналитика и отчеты
     'apps.flows.tasks.generate_*': {'queue': 'analytics'},
     'apps.guides.tasks.update_*': {'queue': 'analytics'},
+    'apps.flows.tasks.export_*': {'queue': 'analytics'},
     
     # Обслуживание системы
     'apps.*.tasks.cleanup_*': {'queue': 'maintenance'},
+    'apps.flows.tasks.maintain_*': {'queue': 'maintenance'},
+    'apps.flows.tasks.recalculate_*': {'queue': 'maintenance'},
+    'apps.common.tasks.run_bulk_job': {'queue': 'maintenance'},
     'apps.*.tasks.backup_*': {'queue': 'maintenance'},
     
     # Всё остальное в основную очередь
@@ -1,9 +1,8 @@
 """
 Настройки Django для системы онбординга
 """
-import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 
 # Базовая директория проекта
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,6 +43,7 @@ LOCAL_APPS = [
     'apps.flows', 
     'apps.guides',
     'apps.common',
+    'apps.bot',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -56,6 +56,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.common.db_router.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,6 +81,21 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'onboarding.wsgi.application'
 
+# Роль процесса: web, celery-default, celery-notifications, beat или bot (задает entrypoint.sh).
+# От роли зависит время жизни соединения, имя в pg_stat_activity — onboarding-<роль>
+PROCESS_ROLE = config('PROCESS_ROLE', default='web')
+# Время жизни соединения по ролям, с: воркеры prefork с редкими долгими задачами
+# закрывают соединение после задачи, beat держит одно соединение планировщика
+DB_ROLE_CONN_MAX_AGE = {
+    'web': 60,
+    'celery-default': 0,
+    'celery-notifications': 60,
+    'beat': 0,
+    'bot': 60,
+}
+# Режим пула PgBouncer перед БД: session или transaction (без серверных курсоров)
+DB_POOL_MODE = config('DB_POOL_MODE', default='session')
+
 # База данных - исправляем конфигурацию PostgreSQL
 DATABASES = {
     'default': {
@@ -89,12 +105,31 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='postgres'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
-        'CONN_MAX_AGE': 600,
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=DB_ROLE_CONN_MAX_AGE.get(PROCESS_ROLE, 0), cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL_MODE == 'transaction',
         'OPTIONS': {
             'client_encoding': 'UTF8',  # Правильная опция для PostgreSQL
+            'application_name': f'onboarding-{PROCESS_ROLE}',
         },
     }
 }
+# Предупреждать в db_pool_status, когда занято больше этой доли max_connections, %
+DB_POOL_WARN_PERCENT = config('DB_POOL_WARN_PERCENT', default=80, cast=int)
+
+# Реплика для чтения (apps.common.db_router): без DB_REPLICA_HOST все запросы идут в default
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+if DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['apps.common.db_router.ReplicaRouter']
+DB_REPLICA_READS = config('DB_REPLICA_READS', default=True, cast=bool)
+# Сколько секунд после записи пользователь читает из основной БД
+DB_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=10, cast=int)
 
 # Кастомная модель пользователя
 AUTH_USER_MODEL = 'users.User'
@@ -118,7 +153,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # Настройки REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -183,10 +218,12 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 # Кэширование (Redis)
+REDIS_URL = config('REDIS_URL', default='redis://redis:6379/1')
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': config('REDIS_URL', default='redis://redis:6379/1'),
+        'LOCATION': REDIS_URL,
         'KEY_PREFIX': 'onboarding',
         'TIMEOUT': 300,
     }
@@ -205,14 +242,20 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 CELERY_TASK_ROUTES = {
     # Уведомления Telegram
     'apps.users.tasks.send_telegram_notification': {'queue': 'notifications'},
+    'apps.users.tasks.send_telegram_batch': {'queue': 'notifications'},
+    'apps.users.tasks.send_daily_digests': {'queue': 'notifications'},
     'apps.flows.tasks.send_flow_*': {'queue': 'notifications'},
     
     # Аналитика и отчеты
     'apps.flows.tasks.generate_*': {'queue': 'analytics'},
     'apps.guides.tasks.update_*': {'queue': 'analytics'},
+    'apps.flows.tasks.export_*': {'queue': 'analytics'},
     
     # Обслуживание системы
     'apps.*.tasks.cleanup_*': {'queue': 'maintenance'},
+    'apps.flows.tasks.maintain_*': {'queue': 'maintenance'},
+    'apps.flows.tasks.recalculate_*': {'queue': 'maintenance'},
+    'apps.common.tasks.run_bulk_job': {'queue': 'maintenance'},
     
     # Всё остальное в основную очередь
     '*': {'queue': 'default'}
@@ -222,6 +265,68 @@ CELERY_TASK_ROUTES = {
 TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='')
 TELEGRAM_WEBHOOK_URL = config('TELEGRAM_WEBHOOK_URL', default='')
 TELEGRAM_MINI_APP_URL = config('TELEGRAM_MINI_APP_URL', default='')
+# Секрет, переданный в setWebhook(secret_token=...); без него webhook отклоняет все обновления
+TELEGRAM_WEBHOOK_SECRET = config('TELEGRAM_WEBHOOK_SECRET', default='')
+
+# Очередь обновлений Telegram (Redis Stream)
+TELEGRAM_UPDATES_STREAM_ENABLED = config('TELEGRAM_UPDATES_STREAM_ENABLED', default=True, cast=bool)
+TELEGRAM_UPDATES_STREAM_MAXLEN = config('TELEGRAM_UPDATES_STREAM_MAXLEN', default=100000, cast=int)
+
+# Асинхронный бот (manage.py run_bot): читает поток обновлений в своей группе
+BOT_DB_THREADS = config('BOT_DB_THREADS', default=8, cast=int)
+BOT_SEND_CONCURRENCY = config('BOT_SEND_CONCURRENCY', default=20, cast=int)
+
+# Буфер активности пользователей (Redis sorted set, сбрасывается пачкой)
+USER_ACTIVITY_BUFFERED = config('USER_ACTIVITY_BUFFERED', default=True, cast=bool)
+USER_ACTIVITY_FLUSH_INTERVAL = config('USER_ACTIVITY_FLUSH_INTERVAL', default=30, cast=int)
+
+# Интервалы напоминаний о потоке в днях: от последней активности, затем между напоминаниями
+FLOW_REMINDER_BACKOFF_DAYS = config('FLOW_REMINDER_BACKOFF_DAYS', default='3,5,10', cast=Csv(int))
+
+# Выгрузки: строк на чанк серверного курсора
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Файлы фоновых выгрузок: закрытый каталог вне MEDIA_ROOT, срок ссылки (с) и хранения (ч)
+EXPORT_ROOT = config('EXPORT_ROOT', default=str(BASE_DIR / 'exports'))
+EXPORT_LINK_TTL = config('EXPORT_LINK_TTL', default=60 * 60, cast=int)
+EXPORT_TTL_HOURS = config('EXPORT_TTL_HOURS', default=24, cast=int)
+# Внешний адрес API для ссылок в уведомлениях (пусто — относительные ссылки)
+SITE_URL = config('SITE_URL', default='')
+
+# Очистка устаревших данных (apps.common.retention): размер пачки и пауза между пачками, с
+RETENTION_BATCH_SIZE = config('RETENTION_BATCH_SIZE', default=5000, cast=int)
+RETENTION_BATCH_PAUSE = config('RETENTION_BATCH_PAUSE', default=0.1, cast=float)
+QUIZ_ANSWER_RETENTION_DAYS = config('QUIZ_ANSWER_RETENTION_DAYS', default=180, cast=int)
+ARTICLE_VIEW_RETENTION_DAYS = config('ARTICLE_VIEW_RETENTION_DAYS', default=730, cast=int)
+
+# Журнал действий: срок хранения и число месячных секций, создаваемых заранее
+FLOW_ACTION_RETENTION_DAYS = config('FLOW_ACTION_RETENTION_DAYS', default=365, cast=int)
+FLOW_ACTION_PARTITIONS_AHEAD = config('FLOW_ACTION_PARTITIONS_AHEAD', default=3, cast=int)
+
+# Массовые операции (apps.common.bulk_jobs): объектов в пачке и секунд на один запуск задачи
+BULK_JOB_CHUNK_SIZE = config('BULK_JOB_CHUNK_SIZE', default=200, cast=int)
+BULK_JOB_TIME_SLICE = config('BULK_JOB_TIME_SLICE', default=60, cast=int)
+
+# Дедлайны (apps.flows.deadlines): минут обучения в рабочий день и оценка этапа без истории
+DEADLINE_MINUTES_PER_DAY = config('DEADLINE_MINUTES_PER_DAY', default=120, cast=int)
+DEADLINE_DEFAULT_STEP_MINUTES = config('DEADLINE_DEFAULT_STEP_MINUTES', default=60, cast=int)
+DEADLINE_STEP_EXTRA_MINUTES = config('DEADLINE_STEP_EXTRA_MINUTES', default=30, cast=int)
+# История: минимум завершений этапа и потолок среднего времени этапа, мин
+DEADLINE_HISTORY_MIN_SAMPLES = config('DEADLINE_HISTORY_MIN_SAMPLES', default=5, cast=int)
+DEADLINE_STEP_MAX_MINUTES = config('DEADLINE_STEP_MAX_MINUTES', default=240, cast=int)
+# Пересчет: задержка после изменения календаря или потока, с, и размер пачки bulk_update
+DEADLINE_RECALC_DELAY = config('DEADLINE_RECALC_DELAY', default=60, cast=int)
+DEADLINE_RECALC_BATCH_SIZE = config('DEADLINE_RECALC_BATCH_SIZE', default=1000, cast=int)
+
+# Автоназначение потоков (apps.flows.assignment): пользователей на одну вставку
+AUTO_ASSIGN_BATCH_SIZE = config('AUTO_ASSIGN_BATCH_SIZE', default=1000, cast=int)
+
+# Ответы на квизы (apps.flows.quiz_submission): сколько хранить ответ по Idempotency-Key, с
+QUIZ_IDEMPOTENCY_TTL = config('QUIZ_IDEMPOTENCY_TTL', default=600, cast=int)
+
+# Пакетная рассылка (ежедневная сводка)
+DIGEST_BATCH_SIZE = config('DIGEST_BATCH_SIZE', default=500, cast=int)
+# Сообщений в секунду из одной задачи send_telegram_batch (лимит Bot API ~30)
+TELEGRAM_BROADCAST_RATE = config('TELEGRAM_BROADCAST_RATE', default=25, cast=int)
 
 # Email настройки
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
@@ -253,7 +358,7 @@ LOGGING = {
         },
         'file': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            'class': 'apps.common.log_handlers.LazyFileHandler',
             'filename': BASE_DIR / 'logs/django.log',
             'formatter': 'verbose',
         },
@@ -281,6 +386,13 @@ LOGGING = {
     },
 }
 
+# Бюджет времени старта процессов для import_audit --benchmark, мс (медиана запусков)
+STARTUP_BUDGET_MS = {
+    'web': config('STARTUP_BUDGET_WEB_MS', default=3000, cast=int),
+    'celery': config('STARTUP_BUDGET_CELERY_MS', default=2500, cast=int),
+    'bot': config('STARTUP_BUDGET_BOT_MS', default=8000, cast=int),
+}
+
 # Безопасность
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
@@ -292,7 +404,3 @@ if not DEBUG:
     CSRF_COOKIE_SECURE = True
     X_FRAME_OPTIONS = 'DENY'
 
-# Создаем необходимые директории
-os.makedirs(BASE_DIR / 'logs', exist_ok=True)
-os.makedirs(BASE_DIR / 'static', exist_ok=True)
-os.makedirs(BASE_DIR / 'media', exist_ok=True)
\ No newline at end of file
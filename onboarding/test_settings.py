@@ -2,6 +2,8 @@
 Настройки Django для тестового окружения.
 Импортируют все основные настройки и переопределяют их для тестов.
 """
+import tempfile
+
 from .settings import *
 
 # Используем быструю базу данных в памяти SQLite3 для тестов
@@ -9,8 +11,31 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
-    }
+    },
+    # Реплика — второй файл SQLite (тестовая база создается в памяти отдельно
+    # от default); тесты роутера включают чтение с нее через DB_REPLICA_READS
+    # и django_db(databases=['default', 'replica'])
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': Path(tempfile.gettempdir()) / 'onboarding-replica.sqlite3',
+    },
 }
+DB_REPLICA_READS = False
+
+# PostgreSQL для тестов секционирования flow_actions (tests/test_partitions.py);
+# без TEST_POSTGRES_HOST эти тесты пропускаются
+TEST_POSTGRES_HOST = config('TEST_POSTGRES_HOST', default='')
+if TEST_POSTGRES_HOST:
+    DATABASES['postgres'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('TEST_POSTGRES_NAME', default='onboarding'),
+        'USER': config('TEST_POSTGRES_USER', default='postgres'),
+        'PASSWORD': config('TEST_POSTGRES_PASSWORD', default='postgres'),
+        'HOST': TEST_POSTGRES_HOST,
+        'PORT': config('TEST_POSTGRES_PORT', default='5432'),
+        # Тесты работают во временной схеме, история миграций не нужна
+        'TEST': {'MIGRATE': False},
+    }
 
 # Используем более быстрый хешер паролей для тестов
 PASSWORD_HASHERS = [
@@ -42,4 +67,20 @@ LOGGING = {
 }
 
 # Все "отправленные" письма складываются в память, а не уходят наружу
-EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend' 
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend' 
+# Локальный кэш вместо Redis
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'onboarding-tests',
+    }
+}
+
+# Активность пишется сразу, без Redis
+USER_ACTIVITY_BUFFERED = False
+
+# Обновления Telegram обрабатываются прямо в запросе
+TELEGRAM_UPDATES_STREAM_ENABLED = False
+
+# Очистка без пауз между пачками
+RETENTION_BATCH_PAUSE = 0
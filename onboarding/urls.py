@@ -5,15 +5,37 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from django.utils.module_loading import import_string
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """
+    Представление, класс которого импортируется при первом запросе
+
+    drf_spectacular тянет за собой генератор схемы; веб-процессу и
+    воркерам он не нужен, пока никто не открыл документацию API.
+    """
+    view = None
+
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+    return dispatch
+
 
 urlpatterns = [
     # Админка Django
     path('django-admin/', admin.site.urls),
     
     # API документация
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    path('api/schema/', lazy_view('drf_spectacular.views.SpectacularAPIView'), name='schema'),
+    path(
+        'api/docs/',
+        lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'),
+        name='swagger-ui'
+    ),
     
     # API эндпоинты
     path('api/', include([
@@ -266,6 +266,7 @@ def setup_telegram_webhook():
     
     token = os.environ.get('TELEGRAM_BOT_TOKEN')
     webhook_url = os.environ.get('TELEGRAM_WEBHOOK_URL')
+    webhook_secret = os.environ.get('TELEGRAM_WEBHOOK_SECRET')
     
     if not token:
         logger.error(f"{RED}✗ Не установлен TELEGRAM_BOT_TOKEN{RESET}")
@@ -275,12 +276,16 @@ def setup_telegram_webhook():
         logger.error(f"{RED}✗ Не установлен TELEGRAM_WEBHOOK_URL{RESET}")
         return False
     
+    if not webhook_secret:
+        logger.error(f"{RED}✗ Не установлен TELEGRAM_WEBHOOK_SECRET (без него webhook отклоняет обновления){RESET}")
+        return False
+    
     import requests
     try:
         url = f"https://api.telegram.org/bot{token}/setWebhook"
         response = requests.post(
             url,
-            json={'url': webhook_url}
+            json={'url': webhook_url, 'secret_token': webhook_secret}
         )
         response_data = response.json()
         
@@ -268,5 +268,23 @@ def mock_telegram_request(mocker):
     mock_response.json.return_value = {'ok': True, 'result': {}}
     mock_response.text = '{"ok": true, "result": {}}'
 
-    # Мокаем метод post в модуле, где он используется (в задачах Celery)
-    return mocker.patch('apps.users.tasks.requests.post', return_value=mock_response) 
\ No newline at end of file
+    # Пакетная рассылка использует общую сессию
+    session = MagicMock()
+    session.post.return_value = mock_response
+    mocker.patch('apps.users.tasks._get_http_session', return_value=session)
+
+    # Задачи импортируют requests лениво, поэтому мокаем сам requests.post
+    return mocker.patch('requests.post', return_value=mock_response)
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Очищает кэш между тестами: откат транзакции не вызывает сигналы инвалидации.
+    """
+    from django.core.cache import cache
+    from apps.common.cache import clear_local_cache, reset_cache_stats
+
+    cache.clear()
+    clear_local_cache()
+    reset_cache_stats()
+    yield
@@ -0,0 +1,75 @@
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from apps.common.admin import EstimatedCountPaginator
+from apps.flows.models import FlowAction, UserFlow
+from apps.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def superuser_client():
+    superuser = User.objects.create_superuser(name='Root', password='pass', telegram_id='999')
+    client = Client()
+    client.force_login(superuser)
+    return client
+
+
+@pytest.fixture
+def user_flows(user_factory, user_flow_factory, flow_with_steps):
+    return [
+        user_flow_factory(user=user_factory(telegram_id=f'80{i}'), flow=flow_with_steps, status='in_progress')
+        for i in range(3)
+    ]
+
+
+class TestChangelists:
+
+    def test_user_flow_queries_do_not_grow_with_rows(
+        self, superuser_client, user_flows, user_factory, user_flow_factory, flow_with_steps
+    ):
+        url = '/django-admin/flows/userflow/'
+        with CaptureQueriesContext(connection) as before:
+            superuser_client.get(url)
+        user_flow_factory(user=user_factory(telegram_id='899'), flow=flow_with_steps)
+
+        with CaptureQueriesContext(connection) as after:
+            response = superuser_client.get(url)
+
+        assert len(after.captured_queries) == len(before.captured_queries)
+        assert response.context['cl'].result_count == len(user_flows) + 1
+        assert '0.0%' in response.content.decode()
+
+    def test_flow_changelist_counts(self, superuser_client, user_flows, flow_with_steps):
+        response = superuser_client.get('/django-admin/flows/flow/')
+
+        flow = next(obj for obj in response.context['cl'].result_list if obj.pk == flow_with_steps.pk)
+        assert (flow.steps_count, flow.user_flows_count) == (3, len(user_flows))
+
+    def test_autocomplete_filter(self, superuser_client, user_flows, simple_flow):
+        url = '/django-admin/flows/userflow/'
+
+        response = superuser_client.get(url, {'flow__id__exact': simple_flow.id})
+
+        assert response.context['cl'].result_count == 0
+        content = response.content.decode()
+        assert 'admin-autocomplete' in content
+        assert 'data-field-name="flow"' in content
+
+    def test_flow_action_changelist(self, superuser_client, user_flows):
+        response = superuser_client.get('/django-admin/flows/flowaction/', {
+            'user_flow__flow__id__exact': user_flows[0].flow_id
+        })
+
+        assert response.status_code == 200
+        assert response.context['cl'].result_count == FlowAction.objects.count()
+        assert response.context['cl'].full_result_count is None
+
+
+def test_paginator_falls_back_to_exact_count(user_flows):
+    paginator = EstimatedCountPaginator(UserFlow.objects.order_by('pk'), 2)
+    assert paginator.count == len(user_flows)
+    assert paginator.num_pages == 2
@@ -0,0 +1,160 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.flows.assignment import assign_flows, auto_flow_ids, sync_department
+from apps.flows.models import Flow, FlowAction, FlowDepartmentRule, UserFlow, UserStepProgress
+from apps.flows.tasks import auto_assign_flows_to_new_user
+from apps.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def department_users(user_factory):
+    users = [user_factory(telegram_id=f'90{i}') for i in range(4)]
+    User.objects.filter(pk__in=[u.pk for u in users]).update(department='IT')
+    return users
+
+
+@pytest.fixture
+def it_flow(flow_factory, flow_step_factory):
+    flow = flow_factory(title='IT Onboarding', auto_assign_departments=['IT', 'Ops'])
+    flow_step_factory(flow=flow, title='Step 1')
+    flow_step_factory(flow=flow, title='Step 2')
+    return flow
+
+
+@pytest.fixture
+def mandatory_flow(flow_factory):
+    return flow_factory(title='Security Basics', is_mandatory=True)
+
+
+class TestAutoAssign:
+
+    def test_department_and_mandatory_flows(self, it_flow, mandatory_flow, flow_factory):
+        flow_factory(title='Sales Flow', auto_assign_departments=['Sales'])
+
+        assert Flow.objects.for_department('IT').get() == it_flow
+        assert auto_flow_ids('IT') == {it_flow.pk, mandatory_flow.pk}
+        assert auto_flow_ids(None) == {mandatory_flow.pk}
+
+    def test_new_user_gets_flows_with_progress(self, user_factory, it_flow, mandatory_flow):
+        user = user_factory(telegram_id='901', department='IT')
+
+        user_flow = UserFlow.objects.get(user=user, flow=it_flow)
+        assert user_flow.status == UserFlow.FlowStatus.NOT_STARTED
+        assert user_flow.expected_completion_date == it_flow.calculate_expected_completion_date()
+        assert user_flow.current_step.order == 1
+        statuses = list(user_flow.step_progress.order_by('flow_step__order').values_list('status', flat=True))
+        assert statuses == [UserStepProgress.StepStatus.AVAILABLE, UserStepProgress.StepStatus.LOCKED]
+        assert UserFlow.objects.filter(user=user, flow=mandatory_flow).exists()
+        assert FlowAction.objects.filter(
+            user_flow=user_flow, action_type=FlowAction.ActionType.STARTED
+        ).get().metadata == {'auto_assigned': True}
+
+    def test_rerun_is_idempotent(self, user_factory, it_flow, mandatory_flow):
+        user = user_factory(telegram_id='902', department='IT')
+        actions = FlowAction.objects.count()
+
+        result = auto_assign_flows_to_new_user(user.id)
+
+        assert result['assigned_flows'] == 0
+        assert UserFlow.objects.filter(user=user).count() == 2
+        assert FlowAction.objects.count() == actions
+
+
+class TestDepartmentSync:
+
+    def test_sync_creates_missing_pairs_once(
+        self, mocker, department_users, it_flow, user_flow_factory, django_capture_on_commit_callbacks
+    ):
+        send = mocker.patch('apps.users.tasks.send_telegram_batch.delay')
+        user_flow_factory(user=department_users[0], flow=it_flow)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            result = sync_department('IT')
+
+        assert result == {'assigned': 3, 'users': 3}
+        assert UserFlow.objects.filter(flow=it_flow).count() == 4
+        assert UserStepProgress.objects.filter(user_flow__flow=it_flow).count() == 6
+        send.assert_called_once()
+        assert len(send.call_args.args[0]) == 3
+        assert sync_department('IT') == {'assigned': 0, 'users': 0}
+
+    def test_pairs_created_meanwhile_are_not_reported(self, mocker, department_users, it_flow, user_flow_factory):
+        # Пара появилась после поиска недостающих (параллельный запуск)
+        mocker.patch(
+            'apps.flows.assignment._missing_user_ids',
+            return_value=[user.pk for user in department_users]
+        )
+        existing = user_flow_factory(user=department_users[0], flow=it_flow)
+
+        result = assign_flows(User.objects.filter(department='IT'), [it_flow.pk], notify=False)
+
+        assert result == {'assigned': 3, 'users': 3}
+        assert not FlowAction.objects.filter(user_flow=existing, metadata={'auto_assigned': True}).exists()
+        assert UserStepProgress.objects.filter(user_flow__flow=it_flow).count() == 6
+
+    def test_queries_do_not_grow_with_users(self, user_factory, it_flow, mandatory_flow):
+        few = User.objects.filter(pk__in=[user_factory(telegram_id=f'91{i}').pk for i in range(2)])
+        many = User.objects.filter(pk__in=[user_factory(telegram_id=f'92{i}').pk for i in range(8)])
+        flow_ids = [it_flow.pk, mandatory_flow.pk]
+
+        with CaptureQueriesContext(connection) as small:
+            assign_flows(few, flow_ids, notify=False)
+        with CaptureQueriesContext(connection) as large:
+            assign_flows(many, flow_ids, notify=False)
+
+        assert UserFlow.objects.filter(flow=it_flow).count() == 10
+        assert len(large.captured_queries) == len(small.captured_queries)
+
+
+class TestDepartmentRouting:
+
+    def test_rules_replace_json_list(self, it_flow):
+        assert set(FlowDepartmentRule.objects.filter(flow=it_flow).values_list('department', flat=True)) == {'IT', 'Ops'}
+
+        it_flow.auto_assign_departments = ['Ops', ' QA ', 'QA', '']
+        it_flow.save()
+
+        assert Flow.objects.get(pk=it_flow.pk).auto_assign_departments == ['Ops', 'QA']
+        assert list(Flow.objects.for_department('QA')) == [it_flow]
+
+    def test_routes_are_cached_and_invalidated(self, it_flow, mandatory_flow):
+        assert auto_flow_ids('IT') == {it_flow.pk, mandatory_flow.pk}
+        with CaptureQueriesContext(connection) as queries:
+            assert auto_flow_ids('Ops') == {it_flow.pk, mandatory_flow.pk}
+        assert not queries.captured_queries
+
+        FlowDepartmentRule.objects.create(flow=mandatory_flow, department='Sales')
+        it_flow.is_active = False
+        it_flow.save()
+
+        assert auto_flow_ids('IT') == {mandatory_flow.pk}
+        assert auto_flow_ids('Sales') == {mandatory_flow.pk}
+
+    def test_available_for_user(self, department_users, it_flow, mandatory_flow, user_flow_factory):
+        user = User.objects.get(pk=department_users[0].pk)
+        user_flow_factory(user=user, flow=mandatory_flow)
+
+        assert list(Flow.objects.available_for_user(user)) == [it_flow]
+
+    def test_api_writes_rules(self, api_client, admin_user):
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.post('/api/admin/flows/', {
+            'title': 'Ops Flow', 'description': 'Ops', 'auto_assign_departments': ['Ops']
+        }, format='json')
+
+        assert response.status_code == 201
+        assert response.data['auto_assign_departments'] == ['Ops']
+        assert auto_flow_ids('Ops') == {response.data['id']}
+
+    def test_sync_command(self, department_users, it_flow):
+        call_command('sync_department_flows', 'IT', stdout=io.StringIO())
+
+        assert UserFlow.objects.filter(flow=it_flow).count() == len(department_users)
@@ -0,0 +1,59 @@
+import pytest
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.users.authentication import CachedJWTAuthentication
+from apps.users.models import Role, UserRole
+
+pytestmark = pytest.mark.django_db
+
+
+def _request_for(user):
+    token = RefreshToken.for_user(user).access_token
+    return APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+
+class TestCachedJWTAuthentication:
+
+    def test_warm_path_makes_no_queries(self, buddy_user, django_assert_num_queries):
+        auth = CachedJWTAuthentication()
+        request = _request_for(buddy_user)
+        auth.authenticate(request)
+
+        with django_assert_num_queries(0):
+            user, _ = auth.authenticate(request)
+            assert user.has_role('buddy')
+            assert user.has_any_role(['moderator', 'buddy'])
+            assert not user.has_role('moderator')
+
+    def test_role_assignment_invalidates_cache(self, user):
+        auth = CachedJWTAuthentication()
+        request = _request_for(user)
+        cached, _ = auth.authenticate(request)
+        assert not cached.has_role('moderator')
+
+        role, _ = Role.objects.get_or_create(
+            name=Role.RoleChoices.MODERATOR, defaults={'display_name': 'Модератор'}
+        )
+        UserRole.objects.create(user=user, role=role)
+
+        refreshed, _ = auth.authenticate(request)
+        assert refreshed.has_role('moderator')
+
+    def test_deactivated_user_is_rejected(self, user):
+        auth = CachedJWTAuthentication()
+        request = _request_for(user)
+        auth.authenticate(request)
+
+        user.is_active = False
+        user.save()
+
+        with pytest.raises(AuthenticationFailed):
+            auth.authenticate(request)
+
+    def test_api_request_with_token(self, api_client, user):
+        token = RefreshToken.for_user(user).access_token
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        assert api_client.get('/api/my/flows/').status_code == 200
+        assert api_client.get('/api/my/flows/').status_code == 200
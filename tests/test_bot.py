@@ -0,0 +1,152 @@
+import asyncio
+import json
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from apps.bot import handlers, queries, runtime
+from apps.bot.sender import MessageSender
+from apps.flows.models import FlowBuddy, UserStepProgress
+
+pytestmark = pytest.mark.django_db
+
+
+def _patch_run_db(mocker, *query_calls):
+    """
+    Выполняет запросы заранее в потоке теста и подменяет run_db их результатами:
+    соединение тестовой транзакции недоступно внутри asyncio.run
+    """
+    results = {func: func(*args) for func, *args in query_calls}
+
+    async def fake_run_db(func, *args, **kwargs):
+        return results[func]
+
+    mocker.patch.object(handlers, 'run_db', fake_run_db)
+
+
+@pytest.fixture
+def started_flow(user, flow_with_steps, user_flow_factory):
+    return user_flow_factory(user=user, flow=flow_with_steps, status='in_progress')
+
+
+class TestBotQueries:
+
+    def test_progress_in_single_query(self, user, started_flow, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            flows = queries.get_progress(user.id)
+        assert flows[0]['title'] == started_flow.flow.title
+        assert flows[0]['progress'] == 0
+
+    def test_next_step_is_first_available(self, user, started_flow):
+        steps = queries.get_next_steps(user.id)
+        first = UserStepProgress.objects.filter(
+            user_flow=started_flow, status=UserStepProgress.StepStatus.AVAILABLE
+        ).select_related('flow_step').first()
+        assert steps == [{
+            'flow_title': started_flow.flow.title,
+            'step_title': first.flow_step.title,
+            'order': first.flow_step.order,
+        }]
+
+    def test_mentees(self, buddy_user, started_flow):
+        FlowBuddy.objects.create(user_flow=started_flow, buddy_user=buddy_user)
+        mentees = queries.get_mentees(buddy_user.id)
+        assert [m['name'] for m in mentees] == [started_flow.user.name]
+
+
+class TestBotHandlers:
+
+    def _message(self, telegram_id):
+        message = MagicMock()
+        message.from_user.id = int(telegram_id)
+        message.chat.id = int(telegram_id)
+        return message
+
+    def test_progress_command_replies_through_sender(self, user, started_flow, mocker):
+        _patch_run_db(
+            mocker,
+            (queries.get_user, int(user.telegram_id)),
+            (queries.get_progress, user.id),
+        )
+        sender = MagicMock(send_message=AsyncMock())
+
+        asyncio.run(handlers.progress_command(self._message(user.telegram_id), sender))
+
+        chat_id, text = sender.send_message.call_args.args
+        assert chat_id == int(user.telegram_id)
+        assert started_flow.flow.title in text
+
+    def test_unknown_user(self, mocker):
+        _patch_run_db(mocker, (queries.get_user, 424242))
+        sender = MagicMock(send_message=AsyncMock())
+
+        asyncio.run(handlers.next_step_command(self._message('424242'), sender))
+
+        assert sender.send_message.call_args.args[1] == handlers.NOT_REGISTERED
+
+    def test_format_progress_deadline(self):
+        text = handlers.format_progress([
+            {'title': 'Онбординг', 'status': 'in_progress', 'deadline': date(2024, 1, 9), 'progress': 50}
+        ])
+        assert '50%' in text and '09.01.2024' in text
+
+
+def test_sender_limits_concurrency():
+    active = 0
+    peak = 0
+
+    async def send_message(chat_id, text, **kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    async def run():
+        sender = MessageSender(MagicMock(send_message=send_message), concurrency=3)
+        return await sender.broadcast([(i, 'hi') for i in range(10)])
+
+    assert asyncio.run(run()) == 10
+    assert peak == 3
+
+
+def test_bot_reads_update_stream(mocker):
+    update = {'update_id': 1, 'message': {'text': '/progress'}}
+    calls = []
+
+    async def fake_run_db(func, *args, **kwargs):
+        calls.append((func.__name__, args))
+        if func.__name__ == 'read_batch':
+            # Повторная доставка того же update_id — отдельная запись потока
+            return [
+                (b'1-0', json.dumps(update).encode()),
+                (b'1-1', b'not json'),
+                (b'1-2', json.dumps(update).encode()),
+            ]
+        if func.__name__ in ('claim_update', 'release_update'):
+            return func(*args, **kwargs)
+
+    mocker.patch.object(runtime, 'run_db', fake_run_db)
+    dispatcher = MagicMock(feed_raw_update=AsyncMock())
+    bot = MagicMock()
+
+    assert asyncio.run(runtime.consume_stream(dispatcher, bot, 'bot-1', block_ms=0)) == 2
+
+    dispatcher.feed_raw_update.assert_awaited_once_with(bot, update)
+    assert calls[0] == ('read_batch', ('bot-1', runtime.BOT_CONSUMER_GROUP, 100, 0))
+    assert calls[-1] == ('acknowledge', ([b'1-1', b'1-0'], runtime.BOT_CONSUMER_GROUP))
+
+    # Следующая доставка уже обработанного обновления подтверждается без ответа
+    assert asyncio.run(runtime.consume_stream(dispatcher, bot, 'bot-1', block_ms=0)) == 3
+    dispatcher.feed_raw_update.assert_awaited_once()
+
+
+def test_bot_group_starts_at_stream_end(mocker):
+    client = MagicMock()
+    mocker.patch('apps.users.telegram_updates.get_redis', return_value=client)
+
+    from apps.users.telegram_updates import STREAM_KEY, ensure_consumer_group
+    ensure_consumer_group(runtime.BOT_CONSUMER_GROUP)
+
+    client.xgroup_create.assert_called_once_with(STREAM_KEY, runtime.BOT_CONSUMER_GROUP, id='$', mkstream=True)
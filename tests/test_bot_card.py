@@ -0,0 +1,105 @@
+import pytest
+from django.core.cache import cache
+
+from apps.flows.bot_card import get_card
+from apps.flows.models import FlowBuddy, UserBotCard, UserStepProgress
+
+pytestmark = pytest.mark.django_db
+
+BOT_TOKEN = 'bot-card-token'
+
+
+@pytest.fixture
+def bot_client(api_client, settings):
+    settings.TELEGRAM_BOT_TOKEN = BOT_TOKEN
+    api_client.credentials(HTTP_X_TELEGRAM_BOT_TOKEN=BOT_TOKEN)
+    return api_client
+
+
+@pytest.fixture
+def assigned_flow(user, flow_with_steps, user_flow_factory, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        return user_flow_factory(user=user, flow=flow_with_steps, status='in_progress')
+
+
+class TestBotCard:
+
+    def test_card_built_on_assignment(self, user, assigned_flow):
+        card = UserBotCard.objects.get(user=user).data
+        flow = card['active_flows'][0]
+
+        assert flow['flow_title'] == assigned_flow.flow.title
+        assert flow['progress_percentage'] == 0
+        assert flow['current_step']['order'] == 1
+
+    def test_progress_event_updates_card(self, user, assigned_flow, django_capture_on_commit_callbacks):
+        progress = UserStepProgress.objects.filter(user_flow=assigned_flow).order_by('flow_step__order').first()
+        with django_capture_on_commit_callbacks(execute=True):
+            progress.status = UserStepProgress.StepStatus.COMPLETED
+            progress.save()
+
+        flow = get_card(user.telegram_id)['active_flows'][0]
+        assert flow['completed_steps'] == 1
+        assert round(flow['progress_percentage']) == 33
+
+    def test_buddy_event_updates_card(self, user, buddy_user, assigned_flow, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            FlowBuddy.objects.create(user_flow=assigned_flow, buddy_user=buddy_user)
+
+        buddies = get_card(user.telegram_id)['active_flows'][0]['buddies']
+        assert [b['id'] for b in buddies] == [buddy_user.id]
+
+    def test_paused_flow_not_in_card(self, user, assigned_flow, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            assigned_flow.status = 'paused'
+            assigned_flow.save()
+
+        assert get_card(user.telegram_id)['active_flows'] == []
+
+    def test_flow_change_rebuilds_cards_in_batches(
+        self, user_factory, flow_with_steps, user_flow_factory, mocker, django_capture_on_commit_callbacks
+    ):
+        mocker.patch('apps.flows.bot_card.FLOW_REBUILD_BATCH_SIZE', 1)
+        users = [user_factory(telegram_id=f'93{i}') for i in range(3)]
+        for member in users:
+            user_flow_factory(user=member, flow=flow_with_steps, status='in_progress')
+        rebuild = mocker.patch('apps.flows.bot_card.rebuild_card')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            flow_with_steps.title = 'Renamed'
+            flow_with_steps.save()
+
+        assert [c.args[0] for c in rebuild.call_args_list] == [member.pk for member in users]
+
+    def test_db_fallback_when_cache_is_empty(self, user, assigned_flow, django_assert_num_queries):
+        cache.clear()
+        with django_assert_num_queries(1):
+            card = get_card(user.telegram_id)
+        assert card['user']['id'] == user.id
+
+
+class TestBotUserInfoView:
+
+    def test_served_from_cache_without_queries(self, bot_client, user, assigned_flow, django_assert_max_num_queries):
+        url = f'/api/auth/bot/user/{user.telegram_id}/'
+        bot_client.get(url)
+
+        with django_assert_max_num_queries(0):
+            response = bot_client.get(url)
+
+        assert response.status_code == 200
+        assert response.data['active_flows'][0]['is_overdue'] is False
+
+    def test_deactivated_user_not_found(self, bot_client, user, assigned_flow, django_capture_on_commit_callbacks):
+        url = f'/api/auth/bot/user/{user.telegram_id}/'
+        assert bot_client.get(url).status_code == 200
+
+        with django_capture_on_commit_callbacks(execute=True):
+            user.is_active = False
+            user.save()
+
+        assert bot_client.get(url).status_code == 404
+
+    def test_unknown_user(self, bot_client):
+        response = bot_client.get('/api/auth/bot/user/000000/')
+        assert response.status_code == 404
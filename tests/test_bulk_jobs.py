@@ -0,0 +1,174 @@
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from apps.common import bulk_jobs
+from apps.common.models import BulkJob
+from apps.flows.models import FlowAction, FlowBuddy, UserFlow
+from apps.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user_flows(user_factory, user_flow_factory, flow_with_steps):
+    return [
+        user_flow_factory(user=user_factory(telegram_id=f'70{i}'), flow=flow_with_steps, status='in_progress')
+        for i in range(5)
+    ]
+
+
+def submit(name, queryset, params=None, user=None):
+    """Создает операцию без постановки задачи (её запускает тест)"""
+    job = bulk_jobs.submit(name, queryset, params, user)
+    return BulkJob.objects.get(pk=job.pk)
+
+
+class TestBulkJobRunner:
+
+    def test_pause_in_chunks(self, settings, admin_user, user_flows, django_capture_on_commit_callbacks):
+        settings.BULK_JOB_CHUNK_SIZE = 2
+        user_flows[0].pause(paused_by=admin_user)
+        paused_before = FlowAction.objects.filter(action_type=FlowAction.ActionType.PAUSED).count()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            job = bulk_jobs.submit('pause', UserFlow.objects.all(), {'reason': 'Отпуск'}, admin_user)
+
+        job.refresh_from_db()
+        assert job.status == BulkJob.Status.COMPLETED
+        assert (job.total, job.processed, job.failed) == (5, 5, 1)
+        assert job.errors[0]['pk'] == user_flows[0].pk
+        assert UserFlow.objects.filter(status='paused').count() == 5
+        assert FlowAction.objects.filter(
+            action_type=FlowAction.ActionType.PAUSED
+        ).count() == paused_before + 4
+
+    def test_time_slice_resumes_from_last_pk(self, settings, admin_user, user_flows):
+        settings.BULK_JOB_CHUNK_SIZE = 2
+        job = submit('pause', UserFlow.objects.all(), user=admin_user)
+
+        assert bulk_jobs.run(job.pk, time_slice=0) == BulkJob.Status.RUNNING
+        job.refresh_from_db()
+        assert job.processed == 2
+        assert job.last_pk == sorted(uf.pk for uf in user_flows)[1]
+
+        assert bulk_jobs.run(job.pk) == BulkJob.Status.COMPLETED
+        job.refresh_from_db()
+        assert (job.processed, job.failed) == (5, 0)
+
+    def test_cancel_stops_processing(self, settings, admin_user, user_flows):
+        settings.BULK_JOB_CHUNK_SIZE = 2
+        job = submit('pause', UserFlow.objects.all(), user=admin_user)
+        bulk_jobs.run(job.pk, time_slice=0)
+
+        assert job.cancel()
+        assert bulk_jobs.run(job.pk) is None
+        assert UserFlow.objects.filter(status='paused').count() == 2
+        assert not job.cancel()
+
+    def test_extend_deadline_and_reassign_buddy(self, admin_user, buddy_user, user_flows):
+        UserFlow.objects.update(expected_completion_date='2026-01-10')
+        job = submit('extend_deadline', UserFlow.objects.all(), {'days': '5'}, admin_user)
+        bulk_jobs.run(job.pk)
+
+        dates = set(UserFlow.objects.values_list('expected_completion_date', flat=True))
+        assert {str(date) for date in dates} == {'2026-01-15'}
+
+        job = submit('reassign_buddy', UserFlow.objects.all(), {'buddy_id': buddy_user.pk}, admin_user)
+        bulk_jobs.run(job.pk)
+        assert FlowBuddy.objects.filter(buddy_user=buddy_user, is_active=True).count() == 5
+
+    def test_validation(self, admin_user, user, user_flows):
+        with pytest.raises(ValueError):
+            bulk_jobs.submit('extend_deadline', UserFlow.objects.all(), {'days': 0})
+        with pytest.raises(ValueError):
+            bulk_jobs.submit('reassign_buddy', UserFlow.objects.all(), {'buddy_id': user.pk})
+        with pytest.raises(ValueError):
+            bulk_jobs.submit('pause', User.objects.all())
+        assert not BulkJob.objects.exists()
+
+    def test_renotify_sends_one_batch(self, mocker, admin_user, user_flows, django_capture_on_commit_callbacks):
+        send = mocker.patch('apps.users.tasks.send_telegram_batch.delay')
+        User.objects.filter(pk=user_flows[0].user_id).update(telegram_id='')
+        job = submit('renotify', UserFlow.objects.all(), {'message': 'Не забудьте!'}, admin_user)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            bulk_jobs.run(job.pk)
+
+        send.assert_called_once()
+        messages = send.call_args.args[0]
+        assert len(messages) == 4
+        assert all(chat_id for _, chat_id, _ in messages)
+        assert 'Не забудьте!' in messages[0][2]
+        job.refresh_from_db()
+        assert job.errors == [{'pk': user_flows[0].pk, 'error': 'Пользователь не привязан к Telegram'}]
+
+    def test_selection_is_fixed_at_submit(self, admin_user, user_flows):
+        job = submit('pause', UserFlow.objects.filter(pk__in=[uf.pk for uf in user_flows[:3]]), user=admin_user)
+        assert job.object_ids == sorted(uf.pk for uf in user_flows[:3])
+        deleted_pk = user_flows[1].pk
+        user_flows[1].delete()
+
+        assert bulk_jobs.run(job.pk) == BulkJob.Status.COMPLETED
+        job.refresh_from_db()
+        assert (job.total, job.processed, job.failed) == (3, 3, 1)
+        assert job.errors == [{'pk': deleted_pk, 'error': 'Объект удален'}]
+        assert UserFlow.objects.filter(status='paused').count() == 2
+
+
+class TestBulkJobApi:
+
+    def test_submit_and_cancel(self, api_client, admin_user, user_flows, mocker):
+        mocker.patch('apps.common.tasks.run_bulk_job.delay')
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.post(reverse('admin-bulk-jobs'), {
+            'operation': 'pause', 'ids': [uf.pk for uf in user_flows[:3]], 'params': {'reason': 'x'}
+        }, format='json')
+
+        assert response.status_code == 202
+        assert response.data['total'] == 3
+        job_id = response.data['id']
+        response = api_client.get(reverse('admin-bulk-job-detail', args=[job_id]))
+        assert response.data['status'] == BulkJob.Status.PENDING
+
+        response = api_client.post(reverse('admin-bulk-job-cancel', args=[job_id]))
+        assert response.data['status'] == BulkJob.Status.CANCELLED
+        response = api_client.post(reverse('admin-bulk-job-cancel', args=[job_id]))
+        assert response.status_code == 400
+
+    def test_submit_validation(self, api_client, admin_user, user, user_flows):
+        api_client.force_authenticate(user=admin_user)
+        url = reverse('admin-bulk-jobs')
+
+        assert api_client.post(url, {'operation': 'pause'}, format='json').status_code == 400
+        response = api_client.post(url, {
+            'operation': 'extend_deadline', 'status': 'in_progress', 'params': {'days': 1000}
+        }, format='json')
+        assert response.status_code == 400
+
+        api_client.force_authenticate(user=user)
+        assert api_client.get(url).status_code == 403
+
+
+class TestBulkJobAdmin:
+
+    def test_admin_action_submits_job(self, user_flows, django_capture_on_commit_callbacks):
+        superuser = User.objects.create_superuser(name='Root', password='pass', telegram_id='999')
+        client = Client()
+        client.force_login(superuser)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post('/django-admin/flows/userflow/', {
+                'action': 'bulk_extend_deadline',
+                '_selected_action': [user_flows[0].pk],
+                'days': '7',
+            }, follow=True)
+
+        job = BulkJob.objects.get()
+        assert (job.operation, job.params, job.created_by) == ('extend_deadline', {'days': 7}, superuser)
+        assert job.status == BulkJob.Status.COMPLETED
+        assert f'/django-admin/common/bulkjob/{job.pk}/' in response.content.decode()
+
+        response = client.get('/django-admin/common/bulkjob/')
+        assert response.status_code == 200
@@ -0,0 +1,115 @@
+import pytest
+
+from apps.common.cache import (
+    make_key, get_or_set, invalidate_tags, cache_result, get_cache_stats,
+    clear_local_cache, LocalLRUCache
+)
+from apps.flows.models import Flow, Quiz
+
+pytestmark = pytest.mark.django_db
+
+
+class TestCacheKeys:
+
+    def test_model_instances_produce_stable_keys(self, flow_factory):
+        flow = flow_factory()
+        same = Flow.objects.get(pk=flow.pk)
+        assert make_key('ns', flow) == make_key('ns', same)
+
+    def test_querysets_keyed_by_sql(self):
+        first = make_key('ns', Flow.objects.filter(is_active=True))
+        second = make_key('ns', Flow.objects.filter(is_active=False))
+        assert first != second
+        assert first == make_key('ns', Flow.objects.filter(is_active=True))
+
+    def test_kwargs_order_does_not_matter(self):
+        assert make_key('ns', {'a': 1, 'b': 2}) == make_key('ns', {'b': 2, 'a': 1})
+
+
+class TestGetOrSet:
+
+    def test_tag_invalidation(self):
+        calls = []
+
+        def produce():
+            calls.append(1)
+            return len(calls)
+
+        assert get_or_set('t:key', produce, tags=['tag-a']) == 1
+        assert get_or_set('t:key', produce, tags=['tag-a']) == 1
+        invalidate_tags('tag-a')
+        assert get_or_set('t:key', produce, tags=['tag-a']) == 2
+
+    def test_none_is_cached_and_stats_recorded(self):
+        calls = []
+
+        def produce():
+            calls.append(1)
+
+        get_or_set('stats:key', produce)
+        get_or_set('stats:key', produce)
+        clear_local_cache()
+        get_or_set('stats:key', produce)
+
+        assert len(calls) == 1
+        assert get_cache_stats()['stats'] == {'misses': 1, 'local_hits': 1, 'hits': 1}
+
+    def test_cache_result_accepts_models_and_invalidates(self, flow_factory):
+        flow, other = flow_factory(), flow_factory()
+        calls = []
+
+        class Titles:
+            @cache_result(timeout=60, key_prefix='title')
+            def title(self, obj):
+                calls.append(obj.pk)
+                return obj.title
+
+        # Ключ не зависит от экземпляра (self), только от аргументов
+        assert Titles().title(flow) == Titles().title(flow)
+        assert len(calls) == 1
+        assert Titles().title(other) == other.title
+        Titles.title.invalidate()
+        Titles().title(flow)
+        assert len(calls) == 3
+
+    def test_local_lru_evicts_oldest(self):
+        lru = LocalLRUCache(maxsize=2)
+        lru.set('a', 1, 60)
+        lru.set('b', 2, 60)
+        lru.get('a')
+        lru.set('c', 3, 60)
+        assert lru.get('b') is None
+        assert lru.get('a') == 1
+
+
+class TestCachedEndpoints:
+
+    def test_flow_detail_invalidated_on_change(self, api_client, user, flow_factory):
+        flow = flow_factory(title='Old')
+        api_client.force_authenticate(user=user)
+        url = f'/api/flows/{flow.id}/'
+
+        assert api_client.get(url).data['title'] == 'Old'
+        Flow.objects.filter(pk=flow.pk).update(title='Silent')
+        assert api_client.get(url).data['title'] == 'Old'
+
+        flow.title = 'New'
+        flow.save()
+        assert api_client.get(url).data['title'] == 'New'
+
+    def test_flow_detail_shuffles_cached_quiz(self, api_client, user, flow_with_steps, mocker):
+        Quiz.objects.filter(flow_step__flow=flow_with_steps).update(shuffle_answers=True)
+        api_client.force_authenticate(user=user)
+        url = f'/api/flows/{flow_with_steps.id}/'
+        api_client.get(url)
+
+        shuffle = mocker.patch('apps.flows.serializers.random.shuffle')
+        response = api_client.get(url)
+
+        assert response.status_code == 200
+        assert shuffle.call_count == 1
+
+    def test_not_found_is_not_cached(self, api_client, user):
+        api_client.force_authenticate(user=user)
+        assert api_client.get('/api/flows/999999/').status_code == 404
+        assert api_client.get('/api/flows/999999/').status_code == 404
@@ -0,0 +1,122 @@
+from datetime import date, timedelta
+
+import pytest
+from django.utils import timezone
+
+from apps.flows.analytics import build_cohort_report, get_cohort_report
+from apps.flows.models import QuizQuestion, UserQuizAnswer, UserStepProgress
+from apps.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def cohort(user_factory, user_flow_factory, flow_with_steps):
+    """
+    Три сотрудника отдела IT, нанятые в январе 2024:
+    все завершили этап 1 (за 1, 2 и 3 часа), один — еще и этап 2
+    """
+    now = timezone.now()
+    user_flows = []
+    for i in range(3):
+        user = user_factory(telegram_id=f'70{i}', hire_date=date(2024, 1, 10 + i))
+        User.objects.filter(pk=user.pk).update(department='IT')
+        user_flows.append(user_flow_factory(user=user, flow=flow_with_steps, status='in_progress'))
+
+    steps = list(flow_with_steps.flow_steps.order_by('order'))
+    for hours, user_flow in enumerate(user_flows, start=1):
+        UserStepProgress.objects.filter(user_flow=user_flow, flow_step=steps[0]).update(
+            status=UserStepProgress.StepStatus.COMPLETED,
+            started_at=now - timedelta(hours=hours),
+            completed_at=now,
+        )
+        UserStepProgress.objects.filter(user_flow=user_flow, flow_step=steps[1]).update(
+            status=UserStepProgress.StepStatus.AVAILABLE
+        )
+    UserStepProgress.objects.filter(user_flow=user_flows[0], flow_step=steps[1]).update(
+        status=UserStepProgress.StepStatus.COMPLETED,
+        started_at=now - timedelta(minutes=30),
+        completed_at=now,
+    )
+
+    question = QuizQuestion.objects.get(quiz__flow_step=steps[2])
+    correct = question.answers.get(is_correct=True)
+    UserQuizAnswer.objects.bulk_create([
+        UserQuizAnswer(user_flow=user_flows[0], question=question, selected_answer=correct, is_correct=True),
+        UserQuizAnswer(user_flow=user_flows[1], question=question, selected_answer=correct, is_correct=False),
+    ])
+
+    # Другая когорта того же потока
+    other = user_factory(telegram_id='799', hire_date=date(2024, 3, 1))
+    User.objects.filter(pk=other.pk).update(department='Sales')
+    user_flow_factory(user=other, flow=flow_with_steps, status='in_progress')
+    return flow_with_steps
+
+
+class TestCohortReport:
+
+    def test_funnel_and_drop_off(self, cohort):
+        report = build_cohort_report(cohort.id, department='IT')
+        first, second, third = report['steps']
+
+        assert report['participants'] == 3
+        assert (first['reached'], first['completed'], first['drop_off']) == (3, 3, 0)
+        assert (second['reached'], second['completed'], second['drop_off']) == (3, 1, 2)
+        assert third['drop_off'] == 1
+        assert report['drop_off_points'][0] == third['step_id']
+
+    def test_step_durations(self, cohort):
+        first = build_cohort_report(cohort.id, department='IT')['steps'][0]
+
+        assert first['median_seconds'] == pytest.approx(2 * 3600, abs=1)
+        assert first['p90_seconds'] == pytest.approx(2.8 * 3600, abs=1)
+
+    def test_question_pass_rates(self, cohort):
+        questions = build_cohort_report(cohort.id, department='IT')['questions']
+
+        assert len(questions) == 1
+        assert (questions[0]['answers'], questions[0]['pass_rate']) == (2, 50.0)
+
+    def test_cohort_breakdown(self, cohort):
+        cohorts = build_cohort_report(cohort.id)['cohorts']
+
+        assert [(c['department'], c['hire_month'], c['participants']) for c in cohorts] == [
+            ('IT', '2024-01', 3), ('Sales', '2024-03', 1)
+        ]
+
+    def test_hire_month_filter(self, cohort):
+        report = build_cohort_report(cohort.id, hire_month=date(2024, 3, 1))
+        assert report['participants'] == 1
+
+    def test_cached_per_day(self, cohort, django_assert_num_queries):
+        get_cohort_report(cohort.id, department='IT')
+        with django_assert_num_queries(0):
+            get_cohort_report(cohort.id, department='IT')
+
+
+class TestCohortAnalyticsView:
+
+    def test_moderator_gets_report(self, api_client, admin_user, cohort):
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(
+            f'/api/admin/analytics/flows/{cohort.id}/cohorts/', {'department': 'IT', 'hire_month': '2024-01'}
+        )
+
+        assert response.status_code == 200
+        assert response.data['participants'] == 3
+        assert response.data['cohort'] == {'department': 'IT', 'hire_month': '2024-01'}
+
+    def test_buddy_route(self, api_client, buddy_user, cohort):
+        api_client.force_authenticate(user=buddy_user)
+        response = api_client.get(f'/api/buddy/analytics/flows/{cohort.id}/cohorts/')
+        assert response.status_code == 200
+
+    def test_invalid_hire_month(self, api_client, admin_user, cohort):
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(f'/api/admin/analytics/flows/{cohort.id}/cohorts/', {'hire_month': 'jan'})
+        assert response.status_code == 400
+
+    def test_regular_user_forbidden(self, api_client, user, cohort):
+        api_client.force_authenticate(user=user)
+        response = api_client.get(f'/api/admin/analytics/flows/{cohort.id}/cohorts/')
+        assert response.status_code == 403
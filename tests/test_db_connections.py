@@ -0,0 +1,86 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from apps.common import db_connections
+from apps.common.db_connections import connection_counters
+
+pytestmark = pytest.mark.django_db
+
+
+class FakeCursor:
+
+    def __init__(self):
+        self.results = [
+            [(100, 3)],
+            [
+                ('onboarding-web', 'active', 40),
+                ('onboarding-web', 'idle', 30),
+                ('onboarding-celery-default', 'idle in transaction', 12),
+                ('psql', 'active', 1),
+            ],
+        ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params=None):
+        self.rows = self.results.pop(0)
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    vendor = 'postgresql'
+
+    def cursor(self):
+        return FakeCursor()
+
+
+class TestConnectionCounters:
+
+    def test_new_connection_counts_for_role(self, settings):
+        settings.PROCESS_ROLE = 'celery-notifications'
+
+        connection_created.send(sender=connection.__class__, connection=connection)
+        connection_created.send(sender=connection.__class__, connection=connection)
+
+        counters = connection_counters()
+        assert counters['celery-notifications'] == 2
+        assert set(counters) == {'web', 'celery-default', 'celery-notifications', 'beat', 'bot'}
+
+
+class TestPoolStatusCommand:
+
+    def test_groups_roles_and_warns(self, mocker):
+        mocker.patch.object(db_connections, 'connections', {'default': FakeConnection()})
+
+        status = db_connections.pool_status()
+        assert status['used'] == 83
+        assert status['roles']['web'] == {'active': 40, 'idle': 30}
+        assert status['roles']['other'] == {'active': 1}
+
+        mocker.patch.object(db_connections, 'connections', {'default': FakeConnection()})
+        out = io.StringIO()
+        call_command('db_pool_status', stdout=out)
+
+        output = out.getvalue()
+        assert 'Занято 83 из 97 (86%)' in output
+        assert 'celery-default: 12 соединений простаивают в транзакции' in output
+        assert 'Пул близок к исчерпанию' in output
+
+    def test_sqlite_reports_counters_only(self):
+        out = io.StringIO()
+        call_command('db_pool_status', '--reset', stdout=out)
+
+        assert 'только для PostgreSQL' in out.getvalue()
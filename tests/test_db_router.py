@@ -0,0 +1,56 @@
+import pytest
+
+from apps.common.db_router import mark_sticky, read_alias, use_replica
+from apps.flows.models import Flow
+
+pytestmark = pytest.mark.django_db(databases=['default', 'replica'])
+
+
+@pytest.fixture
+def replica(settings):
+    settings.DB_REPLICA_READS = True
+
+
+class TestReplicaRouter:
+
+    def test_reads_go_to_replica_only_inside_block(self, replica, flow_factory):
+        flow = flow_factory(title='Primary Only')
+
+        with use_replica():
+            assert not Flow.objects.filter(pk=flow.pk).exists()
+        assert Flow.objects.filter(pk=flow.pk).exists()
+
+    def test_write_switches_reads_to_primary(self, replica, flow_factory):
+        flow = flow_factory(title='Primary Only')
+
+        with use_replica():
+            Flow.objects.filter(pk=flow.pk).update(title='Renamed')
+            assert Flow.objects.get(pk=flow.pk).title == 'Renamed'
+
+    def test_disabled_reads_from_primary(self, settings, flow_factory):
+        settings.DB_REPLICA_READS = False
+        flow = flow_factory(title='Primary Only')
+
+        with use_replica():
+            assert Flow.objects.filter(pk=flow.pk).exists()
+        assert read_alias() == 'default'
+
+    def test_sticky_user_reads_primary(self, replica, admin_user):
+        assert read_alias(admin_user.pk) == 'replica'
+        mark_sticky(admin_user.pk)
+        assert read_alias(admin_user.pk) == 'default'
+
+
+class TestReplicaViews:
+
+    def test_list_after_write_sees_own_changes(self, replica, api_client, admin_user, flow_factory):
+        flow_factory(title='Created Elsewhere')
+        api_client.force_authenticate(user=admin_user)
+
+        assert api_client.get('/api/admin/flows/').data['results'] == []
+
+        response = api_client.post('/api/admin/flows/', {'title': 'Ops Flow', 'description': 'Ops'}, format='json')
+        assert response.status_code == 201
+
+        titles = {flow['title'] for flow in api_client.get('/api/admin/flows/').data['results']}
+        assert titles == {'Created Elsewhere', 'Ops Flow'}
@@ -0,0 +1,168 @@
+import pytest
+from datetime import date, datetime, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.common.models import WorkingCalendar
+from apps.common.utils import add_working_days
+from apps.flows import deadlines
+from apps.flows.models import UserFlow, UserStepProgress
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def holidays():
+    WorkingCalendar.objects.create(date=date(2024, 1, 8), is_working_day=False)
+    WorkingCalendar.objects.create(date=date(2024, 1, 13), is_working_day=True)
+
+
+@pytest.fixture
+def two_step_flow(flow_factory, flow_step_factory):
+    """Два шага без статей и истории: 120 минут = 1 рабочий день"""
+    flow = flow_factory(title='Deadline Flow')
+    flow_step_factory(flow=flow, title='Step 1')
+    flow_step_factory(flow=flow, title='Step 2')
+    return flow
+
+
+def started(user_flow, day):
+    UserFlow.objects.filter(pk=user_flow.pk).update(
+        started_at=timezone.make_aware(datetime.combine(day, datetime.min.time().replace(hour=10)))
+    )
+    user_flow.refresh_from_db()
+    return user_flow
+
+
+class TestWorkingDays:
+
+    def test_matches_add_working_days(self, holidays):
+        calendar = deadlines.WorkingDays(date(2024, 1, 1), date(2024, 1, 3))
+
+        for start in (date(2024, 1, 1), date(2024, 1, 5), date(2024, 1, 6)):
+            for days in (0, 1, 3, 6, 40):
+                assert calendar.add(start, days) == add_working_days(start, days)
+
+    def test_count(self, holidays):
+        calendar = deadlines.WorkingDays(date(2024, 1, 1), date(2024, 1, 31))
+
+        # 8-е выходной, 13-е (суббота) рабочий
+        assert calendar.count(date(2024, 1, 8), date(2024, 1, 14)) == 5
+        assert calendar.count(date(2024, 1, 10), date(2024, 1, 9)) == 0
+
+
+class TestEffortEstimate:
+
+    def test_reading_time_and_default(self, flow_with_steps, settings):
+        settings.DEADLINE_STEP_EXTRA_MINUTES = 30
+        settings.DEADLINE_DEFAULT_STEP_MINUTES = 60
+
+        steps = deadlines.estimate_step_minutes([flow_with_steps.pk])[flow_with_steps.pk]
+
+        assert sorted(steps.values()) == [31, 60, 60]
+        assert deadlines.effort_working_days(steps) == 2
+
+    def test_history_overrides_estimate(
+        self, settings, user_factory, user_flow_factory, two_step_flow
+    ):
+        settings.DEADLINE_HISTORY_MIN_SAMPLES = 3
+        step = two_step_flow.flow_steps.get(order=1)
+        now = timezone.now()
+        UserStepProgress.objects.bulk_create([
+            UserStepProgress(
+                user_flow=user_flow_factory(user=user_factory(telegram_id=f'60{i}'), flow=two_step_flow),
+                flow_step=step,
+                status=UserStepProgress.StepStatus.COMPLETED,
+                started_at=now - timedelta(minutes=200),
+                completed_at=now,
+            )
+            for i in range(3)
+        ])
+
+        steps = deadlines.estimate_step_minutes([two_step_flow.pk])[two_step_flow.pk]
+
+        assert steps[step.pk] == pytest.approx(200)
+        assert deadlines.effort_working_days(steps) == 3
+
+
+class TestPauses:
+
+    def test_resume_shifts_deadline_by_paused_working_days(self, mocker, user, buddy_user, two_step_flow):
+        user_flow = UserFlow.objects.create(
+            user=user, flow=two_step_flow, status='in_progress',
+            expected_completion_date=date(2024, 1, 12)
+        )
+        user_flow.pause(paused_by=buddy_user)
+        UserFlow.objects.filter(pk=user_flow.pk).update(
+            paused_at=timezone.make_aware(datetime(2024, 1, 4, 12))
+        )
+        user_flow.refresh_from_db()
+        localdate = timezone.localdate
+        mocker.patch(
+            'django.utils.timezone.localdate',
+            side_effect=lambda value=None: localdate(value) if value else date(2024, 1, 9)
+        )
+
+        user_flow.resume()
+
+        # Пауза 4-8 января: чт, пт, пн — рабочие
+        user_flow.refresh_from_db()
+        assert user_flow.paused_intervals == [['2024-01-04', '2024-01-09']]
+        assert user_flow.expected_completion_date == date(2024, 1, 17)
+
+
+class TestRecalculate:
+
+    def test_calendar_change_shifts_deadlines(
+        self, user_factory, user_flow_factory, two_step_flow, django_capture_on_commit_callbacks
+    ):
+        user_flows = [
+            started(user_flow_factory(
+                user=user_factory(telegram_id=f'50{i}'), flow=two_step_flow, status='in_progress'
+            ), date(2024, 1, 5))
+            for i in range(3)
+        ]
+        deadlines.recalculate()
+        assert UserFlow.objects.get(pk=user_flows[0].pk).expected_completion_date == date(2024, 1, 8)
+
+        manual = user_flows[1]
+        UserFlow.objects.filter(pk=manual.pk).update(
+            deadline_is_manual=True, expected_completion_date=date(2024, 2, 1)
+        )
+        UserFlow.objects.filter(pk=user_flows[2].pk).update(status='completed')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            WorkingCalendar.objects.create(date=date(2024, 1, 8), is_working_day=False)
+
+        dates = dict(UserFlow.objects.values_list('pk', 'expected_completion_date'))
+        assert dates[user_flows[0].pk] == date(2024, 1, 9)
+        assert dates[manual.pk] == date(2024, 2, 1)
+        assert dates[user_flows[2].pk] == date(2024, 1, 8)
+
+    def test_queries_do_not_grow_with_rows(self, user_factory, user_flow_factory, two_step_flow, flow_with_steps):
+        for i in range(2):
+            user_flow_factory(user=user_factory(telegram_id=f'40{i}'), flow=two_step_flow)
+        with CaptureQueriesContext(connection) as few:
+            deadlines.recalculate(batch_size=100)
+
+        for i in range(2, 8):
+            user_flow_factory(user=user_factory(telegram_id=f'40{i}'), flow=flow_with_steps)
+        with CaptureQueriesContext(connection) as many:
+            result = deadlines.recalculate(batch_size=100)
+
+        assert result['checked'] == 8
+        # Плюс оценка второго потока; bulk_update — один UPDATE на пачку
+        assert len(many.captured_queries) <= len(few.captured_queries) + 2
+
+    def test_paused_flow_uses_pause_intervals(self, user, two_step_flow):
+        user_flow = started(UserFlow.objects.create(
+            user=user, flow=two_step_flow, status='in_progress',
+            paused_intervals=[['2024-01-02', '2024-01-04']]
+        ), date(2024, 1, 1))
+
+        deadlines.recalculate()
+
+        # 1 день трудоемкости + 2 рабочих дня паузы
+        user_flow.refresh_from_db()
+        assert user_flow.expected_completion_date == date(2024, 1, 4)
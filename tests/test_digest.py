@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pytest
+from django.utils import timezone
+
+from apps.users import tasks
+from apps.users.digest import (
+    build_digest_batches,
+    iter_recipient_batches,
+    load_active_flows,
+    render_digest,
+    seconds_until_business_hours,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipients(user_factory, user_flow_factory, flow_with_steps):
+    users = [user_factory(telegram_id=f'90{i}') for i in range(5)]
+    for user in users:
+        user_flow_factory(user=user, flow=flow_with_steps, status='in_progress')
+    # Без активного потока — в сводку не попадает
+    user_factory(telegram_id='999')
+    return users
+
+
+class TestDigestBatches:
+
+    def test_keyset_batches_cover_all_recipients(self, recipients):
+        batches = list(iter_recipient_batches(batch_size=2))
+
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        ids = [row['id'] for batch in batches for row in batch]
+        assert ids == sorted(user.id for user in recipients)
+
+    def test_queries_per_batch_are_constant(self, recipients, django_assert_num_queries):
+        # Пачка: выбор получателей + загрузка потоков; в конце — пустая выборка
+        with django_assert_num_queries(2 * 3 + 1):
+            batches = list(build_digest_batches(batch_size=2))
+
+        assert sum(len(batch) for batch in batches) == len(recipients)
+
+    def test_render_matches_progress(self, recipients, flow_with_steps):
+        flows = load_active_flows([recipients[0].id])[recipients[0].id]
+        text = render_digest(flows, today=timezone.localdate())
+
+        assert flow_with_steps.title in text
+        assert 'Прогресс: 0.0%' in text
+        assert '🔴' in text
+
+
+class TestSendDailyDigests:
+
+    def test_enqueues_one_task_per_batch(self, recipients, mocker):
+        mocker.patch('apps.users.digest.is_business_hours', return_value=True)
+        delay = mocker.patch.object(tasks.send_telegram_batch, 'delay')
+
+        result = tasks.send_daily_digests(batch_size=2)
+
+        assert result == {'recipients': 5, 'batches': 3}
+        assert delay.call_count == 3
+        messages, notification_type, quiet_hours = delay.call_args_list[0].args
+        assert notification_type == 'daily_digest' and quiet_hours is True
+        assert messages[0][1] == recipients[0].telegram_id
+
+    def test_deferred_outside_business_hours(self, recipients, mocker):
+        mocker.patch('apps.users.digest.is_business_hours', return_value=False)
+        apply_async = mocker.patch.object(tasks.send_daily_digests, 'apply_async')
+        delay = mocker.patch.object(tasks.send_telegram_batch, 'delay')
+
+        assert tasks.send_daily_digests() == {'deferred': True}
+        assert apply_async.call_args.kwargs['countdown'] > 0
+        delay.assert_not_called()
+
+    def test_batch_uses_shared_session(self, settings, mocker):
+        settings.TELEGRAM_BOT_TOKEN = 'digest-token'
+        settings.TELEGRAM_BROADCAST_RATE = 1000
+        session = tasks._get_http_session()
+
+        result = tasks.send_telegram_batch([(1, '901', 'a'), (2, '902', 'b')], 'daily_digest')
+
+        assert result['sent_count'] == 2
+        assert session.post.call_count == 2
+
+
+class TestQuietHours:
+
+    def test_zero_inside_business_hours(self):
+        now = timezone.make_aware(datetime(2024, 1, 10, 12, 0))  # среда
+        assert seconds_until_business_hours(now) == 0
+
+    def test_friday_evening_waits_until_monday(self):
+        now = timezone.make_aware(datetime(2024, 1, 12, 20, 0))  # пятница
+        assert seconds_until_business_hours(now) == (48 + 13) * 3600
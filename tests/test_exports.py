@@ -0,0 +1,136 @@
+import csv
+import io
+import os
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.flows.exports import DATASETS, _cell, cleanup_exports, iter_csv
+from apps.flows.tasks import export_dataset
+from apps.users.tasks import send_telegram_notification
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user_flows(user_factory, user_flow_factory, flow_with_steps):
+    return [
+        user_flow_factory(user=user_factory(telegram_id=f'60{i}'), flow=flow_with_steps, status='in_progress')
+        for i in range(3)
+    ]
+
+
+def _read_csv(content):
+    return list(csv.reader(io.StringIO(content.lstrip('\ufeff'))))
+
+
+class TestStreamingExport:
+
+    def test_user_flows_csv(self, api_client, admin_user, user_flows):
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.get('/api/admin/exports/user_flows/')
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert 'attachment' in response['Content-Disposition']
+        rows = _read_csv(b''.join(response.streaming_content).decode())
+        assert rows[0] == DATASETS['user_flows'].headers
+        assert len(rows) == 1 + len(user_flows)
+        # Этапов завершено / всего / прогресс
+        assert rows[1][-3:] == ['0', '3', '0.0']
+
+    def test_single_query_for_all_rows(self, user_flows):
+        with CaptureQueriesContext(connection) as ctx:
+            lines = list(iter_csv(DATASETS['step_progress']))
+
+        assert len(lines) == 1 + 3 * len(user_flows)
+        assert len(ctx.captured_queries) == 1
+
+    def test_flow_actions_filtered_by_flow(self, api_client, admin_user, user_flows, simple_flow):
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.get('/api/admin/exports/flow_actions/', {'flow': simple_flow.id})
+
+        rows = _read_csv(b''.join(response.streaming_content).decode())
+        assert len(rows) == 1
+
+    def test_validation(self, api_client, admin_user):
+        api_client.force_authenticate(user=admin_user)
+
+        assert api_client.get('/api/admin/exports/unknown/').status_code == 404
+        assert api_client.get('/api/admin/exports/user_flows/', {'date_from': '2024-13-01'}).status_code == 400
+
+    def test_regular_user_forbidden(self, api_client, user):
+        api_client.force_authenticate(user=user)
+        assert api_client.get('/api/admin/exports/user_flows/').status_code == 403
+
+
+class TestAsyncExport:
+
+    def test_post_enqueues_task(self, api_client, admin_user, mocker):
+        delay = mocker.patch.object(export_dataset, 'delay')
+        delay.return_value.id = 'task-1'
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.post(
+            '/api/admin/exports/quiz_results/', {'file_format': 'csv', 'flow': '5'}, format='json'
+        )
+
+        assert response.status_code == 202
+        assert response.data['task_id'] == 'task-1'
+        delay.assert_called_once_with('quiz_results', 'csv', {'flow_id': 5}, admin_user.id)
+
+    def test_task_writes_file_and_notifies(self, settings, tmp_path, user_flows, admin_user, mocker):
+        settings.EXPORT_ROOT = str(tmp_path)
+        notify = mocker.patch.object(send_telegram_notification, 'delay')
+
+        result = export_dataset('user_flows', 'csv', {}, admin_user.id)
+
+        assert result['rows'] == len(user_flows)
+        content = (tmp_path / result['file']).read_text(encoding='utf-8')
+        assert len(_read_csv(content)) == 1 + len(user_flows)
+        assert notify.call_args.kwargs['user_id'] == admin_user.id
+        assert result['url'] in notify.call_args.kwargs['message']
+        assert '/media/' not in result['url']
+
+    def test_signed_download(self, settings, tmp_path, client, user_flows):
+        settings.EXPORT_ROOT = str(tmp_path)
+        result = export_dataset('user_flows', 'csv')
+
+        response = client.get(result['url'])
+
+        assert response.status_code == 200
+        assert response['Cache-Control'] == 'private, no-store'
+        assert len(_read_csv(b''.join(response.streaming_content).decode())) == 1 + len(user_flows)
+        assert client.get(result['url'].replace('/download/', '/download/x')).status_code == 404
+
+        settings.EXPORT_LINK_TTL = -1
+        assert client.get(result['url']).status_code == 404
+
+    def test_cleanup_removes_old_files(self, settings, tmp_path):
+        settings.EXPORT_ROOT = str(tmp_path)
+        (tmp_path / 'old.csv').write_text('x')
+        (tmp_path / 'fresh.csv').write_text('x')
+        old = time.time() - 3 * 3600
+        os.utime(tmp_path / 'old.csv', (old, old))
+
+        assert cleanup_exports(max_age_hours=2) == 1
+        assert [path.name for path in tmp_path.iterdir()] == ['fresh.csv']
+
+    def test_xlsx(self, settings, tmp_path, user_flows):
+        openpyxl = pytest.importorskip('openpyxl')
+        settings.EXPORT_ROOT = str(tmp_path)
+
+        result = export_dataset('user_flows', 'xlsx')
+
+        sheet = openpyxl.load_workbook(tmp_path / result['file']).active
+        assert sheet.max_row == 1 + len(user_flows)
+
+
+def test_formula_cells_escaped():
+    assert _cell('=HYPERLINK("http://evil")') == '\'=HYPERLINK("http://evil")'
+    assert [_cell(value) for value in ('+1', '-2', '@SUM(A1)', 'Иван')] == ["'+1", "'-2", "'@SUM(A1)", 'Иван']
+    assert _cell(-5) == -5
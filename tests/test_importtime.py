@@ -0,0 +1,74 @@
+import logging
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from apps.common.importtime import audit, find_module, heaviest, parse_importtime
+from apps.common.log_handlers import LazyFileHandler
+
+OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     urllib3
+import time:        50 |         50 |       requests.compat
+import time:       200 |        350 |     requests
+import time:       300 |        650 |   rest_framework.compat
+import time:        10 |        660 | apps.users.signals
+import time:        40 |         40 | onboarding.celery
+"""
+
+
+class TestParseImporttime:
+
+    def test_records_with_importer_chain(self):
+        records = {record.name: record for record in parse_importtime(OUTPUT)}
+
+        assert len(records) == 6
+        assert records['requests'].chain == ('apps.users.signals', 'rest_framework.compat')
+        assert records['requests.compat'].chain == ('apps.users.signals', 'rest_framework.compat', 'requests')
+        assert records['urllib3'].chain == ('apps.users.signals', 'rest_framework.compat')
+        assert records['onboarding.celery'].chain == ()
+        assert (records['rest_framework.compat'].self_ms, records['rest_framework.compat'].cumulative_ms) == (0.3, 0.65)
+
+    def test_heaviest_and_find_module(self):
+        records = parse_importtime(OUTPUT)
+
+        assert [record.name for record in heaviest(records, 2)] == ['apps.users.signals', 'rest_framework.compat']
+        assert [record.name for record in find_module(records, 'requests')] == ['requests', 'requests.compat']
+        assert find_module(records, 'aiogram') == []
+
+
+class TestImportAuditCommand:
+
+    def test_budget_exceeded(self, mocker, settings):
+        settings.STARTUP_BUDGET_MS = {'celery': 1000}
+        mocker.patch('apps.common.management.commands.import_audit.benchmark', return_value=1500.0)
+
+        with pytest.raises(CommandError, match='1500 мс > 1000 мс'):
+            call_command('import_audit', 'celery', '--benchmark')
+
+    def test_within_budget(self, mocker, settings, capsys):
+        settings.STARTUP_BUDGET_MS = {'celery': 1000}
+        mocker.patch('apps.common.management.commands.import_audit.benchmark', return_value=800.0)
+
+        call_command('import_audit', 'celery', '--benchmark', '--max-ms', '900')
+
+        assert 'В пределах бюджета 900 мс' in capsys.readouterr().out
+
+    def test_worker_start_skips_api_stack(self):
+        records = audit('celery')
+
+        assert find_module(records, 'apps.flows.tasks')
+        for module in ('requests', 'markdown', 'rest_framework.compat', 'drf_spectacular.views', 'aiogram'):
+            assert not find_module(records, module), module
+
+
+def test_lazy_file_handler_creates_log_dir_on_first_write(tmp_path):
+    path = tmp_path / 'logs' / 'app.log'
+    handler = LazyFileHandler(path)
+
+    assert not path.parent.exists()
+    handler.emit(logging.makeLogRecord({'msg': 'started'}))
+    handler.close()
+
+    assert path.read_text() == 'started\n'
@@ -0,0 +1,155 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from django.conf import settings
+from django.db import connection, connections
+from django.utils import timezone
+
+from apps.flows.models import FlowAction
+from apps.flows.partitions import (
+    BRIN_INDEX, BTREE_INDEX, DEFAULT_PARTITION, add_months, apply_retention,
+    convert_to_partitioned, ensure_partitions, is_partitioned, list_partitions, month_start,
+    partition_name
+)
+from apps.flows.tasks import cleanup_old_flow_data
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def actions(user, simple_flow, user_flow_factory):
+    user_flow = user_flow_factory(user=user, flow=simple_flow)
+    now = timezone.now()
+    FlowAction.objects.bulk_create([
+        FlowAction(user_flow=user_flow, action_type='started', performed_by=user,
+                   performed_at=now - timedelta(days=days))
+        for days in (1, 30, 400, 500, 800)
+    ])
+    return user_flow
+
+
+def test_partition_naming():
+    assert partition_name(date(2026, 3, 1)) == 'flow_actions_y2026m03'
+    assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+
+def test_fallback_index_created():
+    with connection.cursor() as cursor:
+        indexes = connection.introspection.get_constraints(cursor, 'flow_actions')
+    assert BTREE_INDEX in indexes
+
+
+def test_plain_table_without_partitions(actions):
+    assert ensure_partitions() == []
+    report = apply_retention()
+    assert (report['policy'], report['deleted']) == ('flow_actions', 3)
+
+
+def test_cleanup_task_uses_retention(actions):
+    total = FlowAction.objects.count()
+
+    result = cleanup_old_flow_data()
+
+    assert result['deleted_actions'] == 3
+    assert result['dropped_partitions'] == []
+    assert FlowAction.objects.count() == total - 3
+
+
+# ========== PostgreSQL ==========
+
+requires_postgres = pytest.mark.skipif(
+    'postgres' not in settings.DATABASES, reason='TEST_POSTGRES_HOST не задан'
+)
+
+
+def _rows(cursor, table):
+    cursor.execute(f'SELECT count(*) FROM "{table}"')
+    return cursor.fetchone()[0]
+
+
+@pytest.fixture
+def pg():
+    """
+    Временная схема с несекционированной flow_actions, как до миграции 0007
+
+    Внешний ключ добавляется после вставки строк и, как у Django, отложенный.
+    """
+    conn = connections['postgres']
+    now = timezone.now()
+    with conn.cursor() as cursor:
+        cursor.execute('CREATE SCHEMA partitions_test')
+        cursor.execute('SET LOCAL search_path TO partitions_test')
+        cursor.execute('CREATE TABLE user_flows (id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY)')
+        cursor.execute(
+            'CREATE TABLE flow_actions ('
+            'id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, '
+            'user_flow_id bigint NOT NULL, '
+            'action_type varchar(20) NOT NULL, '
+            'performed_at timestamptz NOT NULL)'
+        )
+        cursor.execute('CREATE INDEX flow_actions_user_flow_id ON flow_actions (user_flow_id)')
+        cursor.execute('INSERT INTO user_flows DEFAULT VALUES')
+        for days in (0, 40, 400):
+            cursor.execute(
+                "INSERT INTO flow_actions (user_flow_id, action_type, performed_at) VALUES (1, 'started', %s)",
+                [now - timedelta(days=days)]
+            )
+        cursor.execute(
+            'ALTER TABLE flow_actions ADD CONSTRAINT flow_actions_user_flow_id_fk '
+            'FOREIGN KEY (user_flow_id) REFERENCES user_flows (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+    return conn
+
+
+@requires_postgres
+@pytest.mark.django_db(databases=['default', 'postgres'])
+class TestPostgresPartitions:
+
+    def test_convert_keeps_rows_and_constraints(self, pg):
+        assert convert_to_partitioned(pg) is True
+        assert is_partitioned(pg)
+
+        this_month = month_start(timezone.localdate())
+        oldest = month_start(timezone.localtime(timezone.now() - timedelta(days=400)))
+        assert min(list_partitions(pg)) == oldest
+        assert max(list_partitions(pg)) == add_months(this_month, 3)
+
+        with pg.cursor() as cursor:
+            assert _rows(cursor, 'flow_actions') == 3
+            assert _rows(cursor, DEFAULT_PARTITION) == 0
+            constraints = pg.introspection.get_constraints(cursor, 'flow_actions')
+            cursor.execute(
+                "INSERT INTO flow_actions (user_flow_id, action_type, performed_at) "
+                "VALUES (1, 'started', now()) RETURNING id"
+            )
+            assert cursor.fetchone()[0] == 4
+
+        assert {'flow_actions_user_flow_id', 'flow_actions_user_flow_id_fk', BRIN_INDEX} <= set(constraints)
+        assert constraints['flow_actions_pkey']['columns'] == ['id', 'performed_at']
+        assert convert_to_partitioned(pg) is False
+
+    def test_ensure_partitions_moves_default_rows(self, pg):
+        convert_to_partitioned(pg)
+        month = add_months(month_start(timezone.localdate()), 5)
+        with pg.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO flow_actions (user_flow_id, action_type, performed_at) VALUES (1, 'started', %s)",
+                [timezone.make_aware(datetime.combine(month, time(12)))]
+            )
+            # Как у строк, записанных раньше: отложенная проверка уже выполнена
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+            assert _rows(cursor, DEFAULT_PARTITION) == 1
+
+        names = ensure_partitions(months_ahead=5, conn=pg)
+
+        assert names[-1] == partition_name(month)
+        with pg.cursor() as cursor:
+            assert _rows(cursor, partition_name(month)) == 1
+            assert _rows(cursor, DEFAULT_PARTITION) == 0
+            cursor.execute(
+                "SELECT 1 FROM pg_inherits WHERE inhparent = to_regclass('flow_actions') "
+                "AND inhrelid = to_regclass(%s)", [DEFAULT_PARTITION]
+            )
+            assert cursor.fetchone() is not None
@@ -0,0 +1,90 @@
+import pytest
+from django.core.management import call_command
+
+from apps.flows.models import (
+    QuizAnswer, QuizAnswerStats, QuizQuestion, QuizQuestionStats, UserQuizAnswer
+)
+from apps.flows.quiz_stats import quiz_item_stats
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def quiz_setup(user, flow_with_steps, user_flow_factory):
+    user_flow = user_flow_factory(user=user, flow=flow_with_steps, status='in_progress')
+    question = QuizQuestion.objects.get(quiz__flow_step__flow=flow_with_steps)
+    correct = question.answers.get(is_correct=True)
+    wrong = QuizAnswer.objects.create(question=question, answer_text='3', is_correct=False, order=5)
+    return user_flow, question, correct, wrong
+
+
+def _answer(api_client, question, answer):
+    step = question.quiz.flow_step
+    return api_client.post(
+        f'/api/flows/{step.flow_id}/steps/{step.id}/quiz/{question.id}/',
+        {'answer_id': answer.id}, format='json'
+    )
+
+
+class TestIncrementalCounters:
+
+    def test_answer_updates_counters(self, api_client, user, quiz_setup):
+        _, question, correct, wrong = quiz_setup
+        api_client.force_authenticate(user=user)
+
+        assert _answer(api_client, question, wrong).status_code == 200
+
+        stats = QuizQuestionStats.objects.get(question=question)
+        assert (stats.attempts, stats.correct) == (1, 0)
+        assert QuizAnswerStats.objects.get(answer=wrong).picks == 1
+
+    def test_changed_answer_moves_pick(self, api_client, user, quiz_setup):
+        _, question, correct, wrong = quiz_setup
+        api_client.force_authenticate(user=user)
+
+        _answer(api_client, question, wrong)
+        _answer(api_client, question, correct)
+
+        stats = QuizQuestionStats.objects.get(question=question)
+        assert (stats.attempts, stats.correct) == (1, 1)
+        assert QuizAnswerStats.objects.get(answer=wrong).picks == 0
+        assert QuizAnswerStats.objects.get(answer=correct).picks == 1
+
+
+class TestRebuildAndRead:
+
+    def test_rebuild_command_matches_answers(self, quiz_setup):
+        user_flow, question, correct, wrong = quiz_setup
+        UserQuizAnswer.objects.bulk_create([
+            UserQuizAnswer(user_flow=user_flow, question=question, selected_answer=wrong, is_correct=False)
+        ])
+
+        call_command('rebuild_quiz_stats', quiz_ids=[question.quiz_id])
+
+        stats = QuizQuestionStats.objects.get(question=question)
+        assert (stats.attempts, stats.correct) == (1, 0)
+        assert QuizAnswerStats.objects.get(answer=correct).picks == 0
+        assert QuizAnswerStats.objects.get(answer=wrong).picks == 1
+
+    def test_item_stats_do_not_touch_answer_table(self, quiz_setup, django_assert_num_queries):
+        _, question, correct, wrong = quiz_setup
+        QuizQuestionStats.objects.create(question=question, attempts=4, correct=3)
+        QuizAnswerStats.objects.create(answer=wrong, picks=1)
+        quiz = question.quiz
+
+        with django_assert_num_queries(2):
+            item = quiz_item_stats(quiz)['questions'][0]
+
+        assert (item['correct_rate'], item['distractor_picks']) == (75.0, 1)
+        options = {o['answer_id']: o for o in item['options']}
+        assert (options[wrong.id]['picks'], options[wrong.id]['pick_rate']) == (1, 25.0)
+        assert options[correct.id]['pick_rate'] == 0.0
+
+    def test_admin_api(self, api_client, admin_user, quiz_setup):
+        _, question, _, _ = quiz_setup
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.get(f'/api/admin/quizzes/{question.quiz_id}/stats/')
+
+        assert response.status_code == 200
+        assert response.data['questions'][0]['question_id'] == question.id
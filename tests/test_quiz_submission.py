@@ -0,0 +1,154 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.flows.models import QuizAnswer, QuizQuestion, QuizSnapshot, UserQuizAnswer, UserStepProgress
+from apps.flows.quiz_submission import quiz_result
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def quiz_setup(user, flow_with_steps, user_flow_factory):
+    user_flow = user_flow_factory(user=user, flow=flow_with_steps, status='in_progress')
+    question = QuizQuestion.objects.get(quiz__flow_step__flow=flow_with_steps)
+    correct = question.answers.get(is_correct=True)
+    wrong = QuizAnswer.objects.create(question=question, answer_text='3', is_correct=False, order=5)
+    return user_flow, question, correct, wrong
+
+
+def _answer(api_client, question, answer, **headers):
+    step = question.quiz.flow_step
+    return api_client.post(
+        f'/api/flows/{step.flow_id}/steps/{step.id}/quiz/{question.id}/',
+        {'answer_id': answer.id}, format='json', headers=headers
+    )
+
+
+class TestQuizSubmission:
+
+    def test_duplicate_tap_keeps_snapshot(self, api_client, user, quiz_setup):
+        user_flow, question, correct, _ = quiz_setup
+        api_client.force_authenticate(user=user)
+
+        first = _answer(api_client, question, correct)
+        snapshot = QuizSnapshot.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            second = _answer(api_client, question, correct)
+
+        assert first.data == second.data
+        assert second.data['is_completed'] is True
+        assert QuizSnapshot.objects.get().pk == snapshot.pk
+        assert not [q for q in queries.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+
+    def test_changed_answer_rebuilds_snapshot(self, api_client, user, quiz_setup):
+        user_flow, question, correct, wrong = quiz_setup
+        api_client.force_authenticate(user=user)
+
+        assert _answer(api_client, question, wrong).data['is_completed'] is False
+        response = _answer(api_client, question, correct)
+
+        assert response.data['is_completed'] is True
+        snapshot = QuizSnapshot.objects.get()
+        assert (snapshot.correct_answers, snapshot.is_passed) == (1, True)
+        progress = UserStepProgress.objects.get(user_flow=user_flow, flow_step=question.quiz.flow_step)
+        assert progress.status == UserStepProgress.StepStatus.COMPLETED
+
+    def test_idempotency_key_replays_response(
+        self, api_client, user, quiz_setup, django_capture_on_commit_callbacks
+    ):
+        user_flow, question, correct, wrong = quiz_setup
+        api_client.force_authenticate(user=user)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            first = _answer(api_client, question, wrong, **{'Idempotency-Key': 'tap-1'})
+        replay = _answer(api_client, question, correct, **{'Idempotency-Key': 'tap-1'})
+
+        assert replay.data == first.data
+        assert UserQuizAnswer.objects.get(user_flow=user_flow).selected_answer == wrong
+
+    def test_idempotency_key_scoped_to_question(
+        self, api_client, user, quiz_setup, django_capture_on_commit_callbacks
+    ):
+        user_flow, question, correct, wrong = quiz_setup
+        second = QuizQuestion.objects.create(quiz=question.quiz, question='3 + 3?', order=2)
+        right = QuizAnswer.objects.create(question=second, answer_text='6', is_correct=True, order=1)
+        api_client.force_authenticate(user=user)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            _answer(api_client, question, correct, **{'Idempotency-Key': 'tap-1'})
+        response = _answer(api_client, second, right, **{'Idempotency-Key': 'tap-1'})
+
+        assert response.data['is_completed'] is True
+        assert UserQuizAnswer.objects.filter(user_flow=user_flow).count() == 2
+
+    def test_result_is_one_query(self, quiz_setup):
+        user_flow, question, correct, _ = quiz_setup
+        UserQuizAnswer.objects.create(
+            user_flow=user_flow, question=question, selected_answer=correct, is_correct=True
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            result = quiz_result(user_flow, question.quiz)
+
+        assert result == {'total': 1, 'answered': 1, 'correct': 1}
+        assert len(queries.captured_queries) == 1
+
+
+class TestBatchSubmission:
+
+    @pytest.fixture
+    def two_questions(self, quiz_setup):
+        user_flow, question, correct, wrong = quiz_setup
+        second = QuizQuestion.objects.create(quiz=question.quiz, question='3 + 3?', order=2)
+        right = QuizAnswer.objects.create(question=second, answer_text='6', is_correct=True, order=1)
+        QuizAnswer.objects.create(question=second, answer_text='7', is_correct=False, order=2)
+        return user_flow, question, correct, wrong, second, right
+
+    def _submit(self, api_client, step, answers):
+        return api_client.post(
+            f'/api/flows/{step.flow_id}/steps/{step.id}/quiz/submit/',
+            {'answers': [{'question_id': q.id, 'answer_id': a.id} for q, a in answers]}, format='json'
+        )
+
+    def test_submit_all_answers(self, api_client, user, two_questions):
+        user_flow, question, correct, wrong, second, right = two_questions
+        step = question.quiz.flow_step
+        api_client.force_authenticate(user=user)
+
+        response = self._submit(api_client, step, [(question, wrong), (second, right)])
+
+        assert response.status_code == 200
+        assert response.data['is_completed'] is False
+        first, last = response.data['results']
+        assert (first['is_correct'], first['correct_answer']['id']) == (False, correct.id)
+        assert last == {'question_id': second.id, 'answer_id': right.id, 'is_correct': True}
+        snapshot = QuizSnapshot.objects.get()
+        assert (snapshot.total_questions, snapshot.correct_answers) == (2, 1)
+
+        response = self._submit(api_client, step, [(question, correct), (second, right)])
+
+        assert response.data['is_completed'] is True
+        assert set(UserQuizAnswer.objects.filter(user_flow=user_flow).values_list('is_correct', flat=True)) == {True}
+        assert QuizSnapshot.objects.get().correct_answers == 2
+
+    def test_answers_inserted_in_one_statement(self, api_client, user, two_questions):
+        _, question, correct, _, second, right = two_questions
+        step = question.quiz.flow_step
+        api_client.force_authenticate(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            self._submit(api_client, step, [(question, correct), (second, right)])
+
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "user_quiz_answers"')]
+        assert len(inserts) == 1
+
+    def test_validation(self, api_client, user, two_questions):
+        _, question, correct, wrong, second, right = two_questions
+        step = question.quiz.flow_step
+        api_client.force_authenticate(user=user)
+
+        assert self._submit(api_client, step, []).status_code == 400
+        assert self._submit(api_client, step, [(question, right)]).status_code == 400
+        assert self._submit(api_client, step, [(question, correct), (question, wrong)]).status_code == 400
+        assert not UserQuizAnswer.objects.exists()
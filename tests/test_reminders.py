@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.flows.models import UserFlow, UserStepProgress
+from apps.flows.reminders import next_reminder_time
+from apps.flows.tasks import send_flow_reminders
+from apps.users.tasks import send_telegram_batch
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user_flow(user, flow_with_steps, user_flow_factory):
+    return user_flow_factory(user=user, flow=flow_with_steps, status='in_progress')
+
+
+@pytest.fixture
+def batch_delay(mocker):
+    return mocker.patch.object(send_telegram_batch, 'delay')
+
+
+def _make_due(user_flow):
+    UserFlow.objects.filter(pk=user_flow.pk).update(next_reminder_at=timezone.now() - timedelta(minutes=1))
+
+
+def _run_reminders(capture):
+    with capture(execute=True):
+        return send_flow_reminders()
+
+
+class TestReminderSchedule:
+
+    def test_scheduled_when_in_progress(self, user_flow):
+        user_flow.refresh_from_db()
+        expected = timezone.now() + timedelta(days=3)
+        assert abs(user_flow.next_reminder_at - expected) < timedelta(minutes=1)
+
+    def test_cleared_on_pause_and_restored_on_resume(self, user_flow, admin_user):
+        user_flow.pause(paused_by=admin_user)
+        assert UserFlow.objects.get(pk=user_flow.pk).next_reminder_at is None
+
+        user_flow.resume()
+        assert UserFlow.objects.get(pk=user_flow.pk).next_reminder_at is not None
+
+    def test_backoff_is_exhausted(self, settings):
+        settings.FLOW_REMINDER_BACKOFF_DAYS = [3, 5]
+        now = timezone.now()
+
+        assert next_reminder_time(1, now) == now + timedelta(days=5)
+        assert next_reminder_time(2, now) is None
+
+
+class TestSendFlowReminders:
+
+    def test_only_due_flows_are_reminded_once(
+        self, user_flow, another_user, flow_with_steps, user_flow_factory,
+        batch_delay, django_capture_on_commit_callbacks
+    ):
+        user_flow_factory(user=another_user, flow=flow_with_steps, status='in_progress')
+        _make_due(user_flow)
+
+        assert _run_reminders(django_capture_on_commit_callbacks) == {'reminders_sent': 1}
+        messages, notification_type = batch_delay.call_args.args
+        assert notification_type == 'flow_reminder'
+        assert [m[0] for m in messages] == [user_flow.user_id]
+        assert 'Прогресс: 0.0%' in messages[0][2]
+
+        user_flow.refresh_from_db()
+        assert user_flow.reminders_sent == 1
+        assert user_flow.next_reminder_at > timezone.now() + timedelta(days=4)
+
+        # Повторный запуск не напоминает снова
+        assert _run_reminders(django_capture_on_commit_callbacks) == {'reminders_sent': 0}
+
+    def test_progress_counts_only_active_steps(
+        self, user_flow, flow_with_steps, batch_delay, django_capture_on_commit_callbacks
+    ):
+        steps = list(flow_with_steps.flow_steps.order_by('order'))
+        UserStepProgress.objects.filter(user_flow=user_flow, flow_step=steps[0]).update(
+            status=UserStepProgress.StepStatus.COMPLETED
+        )
+        type(steps[-1]).objects.filter(pk=steps[-1].pk).update(is_active=False)
+        _make_due(user_flow)
+
+        _run_reminders(django_capture_on_commit_callbacks)
+
+        assert 'Прогресс: 50.0%' in batch_delay.call_args.args[0][0][2]
+
+    def test_user_without_telegram_skipped_but_rescheduled(
+        self, user_flow, batch_delay, django_capture_on_commit_callbacks
+    ):
+        type(user_flow.user).objects.filter(pk=user_flow.user_id).update(telegram_id='')
+        _make_due(user_flow)
+
+        assert _run_reminders(django_capture_on_commit_callbacks) == {'reminders_sent': 0}
+        batch_delay.assert_not_called()
+        user_flow.refresh_from_db()
+        assert user_flow.reminders_sent == 1
+        assert user_flow.next_reminder_at > timezone.now()
+
+    def test_learner_activity_resets_schedule(
+        self, user_flow, batch_delay, django_capture_on_commit_callbacks
+    ):
+        _make_due(user_flow)
+        _run_reminders(django_capture_on_commit_callbacks)
+
+        progress = UserStepProgress.objects.filter(user_flow=user_flow).order_by('flow_step__order').first()
+        progress.status = UserStepProgress.StepStatus.IN_PROGRESS
+        progress.save()
+
+        user_flow.refresh_from_db()
+        assert user_flow.reminders_sent == 0
+        assert user_flow.next_reminder_at < timezone.now() + timedelta(days=3, minutes=1)
+
+    def test_due_query_count_does_not_grow_with_flows(
+        self, user_flow, another_user, buddy_user, flow_with_steps, user_flow_factory,
+        batch_delay, django_capture_on_commit_callbacks
+    ):
+        flows = [user_flow] + [
+            user_flow_factory(user=u, flow=flow_with_steps, status='in_progress')
+            for u in (another_user, buddy_user)
+        ]
+        for flow in flows:
+            _make_due(flow)
+
+        # Пачка: блокировка id, выборка с прогрессом, bulk_update; затем пустая выборка
+        with CaptureQueriesContext(connection) as ctx:
+            _run_reminders(django_capture_on_commit_callbacks)
+        queries = [q['sql'] for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]
+        assert len(queries) == 4
+
+        assert len(batch_delay.call_args.args[0]) == 3
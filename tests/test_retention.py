@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.common.retention import POLICIES, checkpoint_key, run_policy
+from apps.flows.models import FlowAction, UserQuizAnswer
+from apps.guides.models import ArticleView
+from apps.guides.tasks import cleanup_article_views
+from apps.users.models import TelegramSession
+from apps.users.tasks import cleanup_expired_sessions
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def old_actions(user, simple_flow, user_flow_factory):
+    user_flow = user_flow_factory(user=user, flow=simple_flow)
+    FlowAction.objects.bulk_create([
+        FlowAction(user_flow=user_flow, action_type='started', performed_by=user,
+                   performed_at=timezone.now() - timedelta(days=400))
+        for _ in range(5)
+    ])
+    return user_flow
+
+
+def _session(user, expires_in_days):
+    now = timezone.now()
+    return TelegramSession.objects.create(
+        user=user, telegram_data={}, auth_date=now, hash_value='x',
+        expires_at=now + timedelta(days=expires_in_days)
+    )
+
+
+class TestRunPolicy:
+
+    def test_deletes_in_pk_batches(self, old_actions):
+        total = FlowAction.objects.count()
+
+        report = run_policy('flow_actions', batch_size=2)
+
+        assert (report['deleted'], report['batches'], report['finished']) == (5, 3, True)
+        assert FlowAction.objects.count() == total - 5
+        assert cache.get(checkpoint_key('flow_actions')) is None
+
+    def test_resumes_from_checkpoint(self, old_actions, mocker):
+        ticks = iter([0.0, 10.0, 10.0, 20.0, 20.0, 20.0, 20.0])
+        mocker.patch('apps.common.retention.time.monotonic', side_effect=lambda: next(ticks))
+
+        first = run_policy('flow_actions', batch_size=2, max_seconds=5)
+
+        assert (first['deleted'], first['finished']) == (2, False)
+        assert cache.get(checkpoint_key('flow_actions')) is not None
+
+        second = run_policy('flow_actions', batch_size=10)
+
+        assert (second['deleted'], second['finished']) == (3, True)
+
+    def test_extra_filter_keeps_active_answers(self, user, user_flow_factory, flow_with_steps):
+        from apps.flows.models import QuizQuestion
+
+        question = QuizQuestion.objects.get(quiz__flow_step__flow=flow_with_steps)
+        answer = question.answers.first()
+        user_flow = user_flow_factory(user=user, flow=flow_with_steps, status='in_progress')
+        UserQuizAnswer.objects.create(
+            user_flow=user_flow, question=question, selected_answer=answer, is_correct=True
+        )
+        UserQuizAnswer.objects.filter(user_flow=user_flow).update(
+            answered_at=timezone.now() - timedelta(days=365)
+        )
+
+        assert run_policy('quiz_answers')['deleted'] == 0
+
+        user_flow.__class__.objects.filter(pk=user_flow.pk).update(status='completed')
+        assert run_policy('quiz_answers')['deleted'] == 1
+
+    def test_quiz_answers_decrement_stats(self, user, user_flow_factory, flow_with_steps):
+        from apps.flows.models import QuizAnswerStats, QuizQuestion, QuizQuestionStats
+        from apps.flows.quiz_stats import record_answer
+
+        question = QuizQuestion.objects.get(quiz__flow_step__flow=flow_with_steps)
+        answer = question.answers.get(is_correct=True)
+        old_flow = user_flow_factory(user=user, flow=flow_with_steps, status='completed')
+        UserQuizAnswer.objects.create(
+            user_flow=old_flow, question=question, selected_answer=answer, is_correct=True
+        )
+        UserQuizAnswer.objects.filter(user_flow=old_flow).update(
+            answered_at=timezone.now() - timedelta(days=365)
+        )
+        record_answer(question.id, answer.id, True)
+        record_answer(question.id, answer.id, True)
+
+        assert run_policy('quiz_answers')['deleted'] == 1
+
+        stats = QuizQuestionStats.objects.get(question=question)
+        assert (stats.attempts, stats.correct) == (1, 1)
+        assert QuizAnswerStats.objects.get(answer=answer).picks == 1
+
+    def test_days_from_settings(self, settings):
+        settings.ARTICLE_VIEW_RETENTION_DAYS = 30
+        assert POLICIES['article_views'].get_days() == 30
+
+
+class TestCleanupTasks:
+
+    def test_expired_sessions(self, user):
+        _session(user, -1)
+        alive = _session(user, 1)
+
+        result = cleanup_expired_sessions()
+
+        assert result['deleted_sessions'] == 1
+        assert list(TelegramSession.objects.values_list('id', flat=True)) == [alive.id]
+
+    def test_article_views(self, user, article_factory):
+        article = article_factory()
+        ArticleView.objects.create(article=article, user=user)
+        ArticleView.objects.create(article=article, user=user)
+        ArticleView.objects.filter(pk=ArticleView.objects.first().pk).update(
+            viewed_at=timezone.now() - timedelta(days=800)
+        )
+
+        assert cleanup_article_views()['deleted_views'] == 1
+        assert ArticleView.objects.count() == 1
@@ -0,0 +1,100 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.flows import blobs
+from apps.flows.models import QuizQuestion, UserStepProgress
+from apps.flows.serializers import QuizSnapshotSerializer, UserStepProgressSerializer
+from apps.flows.snapshot_models import ArticleSnapshot, ContentBlob, QuizSnapshot
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_local_blobs():
+    blobs._local.clear()
+    yield
+    blobs._local.clear()
+
+
+def _progress(user_flow):
+    step = user_flow.flow.flow_steps.order_by('order').first()
+    return UserStepProgress.objects.get_or_create(user_flow=user_flow, flow_step=step)[0]
+
+
+class TestContentStore:
+
+    def test_identical_texts_stored_once(self, user_factory, user_flow_factory, flow_with_steps):
+        content = 'Длинный текст статьи. ' * 500
+        for i in range(3):
+            user_flow = user_flow_factory(user=user_factory(telegram_id=f'70{i}'), flow=flow_with_steps)
+            ArticleSnapshot.objects.create(
+                user_step_progress=_progress(user_flow), article_title='A', article_content=content
+            )
+
+        blob = ContentBlob.objects.get()
+        assert blob.is_compressed and len(bytes(blob.data)) < len(content) / 10
+        assert ArticleSnapshot.objects.values('article_content_blob').distinct().count() == 1
+
+        blobs._local.clear()
+        assert ArticleSnapshot.objects.first().article_content == content
+
+    def test_empty_text_is_null(self, user, user_flow_factory, flow_with_steps):
+        snapshot = ArticleSnapshot.objects.create(
+            user_step_progress=_progress(user_flow_factory(user=user, flow=flow_with_steps)),
+            article_title='A', article_content=''
+        )
+
+        assert snapshot.article_content_blob_id is None
+        assert ArticleSnapshot.objects.get(pk=snapshot.pk).article_content == ''
+
+
+class TestQuizSnapshots:
+
+    @pytest.fixture
+    def quiz_snapshot(self, api_client, user, user_flow_factory, flow_with_steps):
+        user_flow_factory(user=user, flow=flow_with_steps, status='in_progress')
+        question = QuizQuestion.objects.get(quiz__flow_step__flow=flow_with_steps)
+        step = question.quiz.flow_step
+        api_client.force_authenticate(user=user)
+        response = api_client.post(
+            f'/api/flows/{step.flow_id}/steps/{step.id}/quiz/{question.id}/',
+            {'answer_id': question.answers.get(is_correct=True).id}, format='json'
+        )
+        assert response.data['is_completed']
+        return QuizSnapshot.objects.get(user_step_progress__flow_step=step)
+
+    def test_serializer_resolves_texts_in_one_query(self, quiz_snapshot):
+        blobs._local.clear()
+        snapshot = QuizSnapshot.objects.get(pk=quiz_snapshot.pk)
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = QuizSnapshotSerializer(snapshot).data
+
+        blob_queries = [q for q in ctx.captured_queries if 'content_blobs' in q['sql']]
+        assert len(blob_queries) == 1
+        question = data['questions'][0]
+        assert question['question_text'] == QuizQuestion.objects.get(pk=snapshot.questions.get().original_question_id).question
+        assert question['user_answers'][0]['selected_answer']['answer_text'] == '2'
+        assert {option['answer_text'] for option in question['answer_options']} >= {'2', '3'}
+
+    def test_list_resolves_texts_once(self, quiz_snapshot, user_factory, user_flow_factory, flow_with_steps):
+        other = QuizSnapshot.objects.get(pk=quiz_snapshot.pk)
+        other.pk = None
+        other.user_step_progress = _progress(
+            user_flow_factory(user=user_factory(telegram_id='7100'), flow=flow_with_steps)
+        )
+        other.save()
+        for question in quiz_snapshot.questions.all():
+            question.pk = None
+            question.quiz_snapshot = other
+            question.save()
+        blobs._local.clear()
+        progresses = UserStepProgress.objects.filter(quiz_snapshot__isnull=False).order_by('pk')
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = UserStepProgressSerializer(progresses, many=True).data
+
+        blob_queries = [q for q in ctx.captured_queries if 'content_blobs' in q['sql']]
+        assert len(blob_queries) == 1
+        assert [len(item['quiz_snapshot']['questions']) for item in data] == [1, 1]
@@ -0,0 +1,87 @@
+import hashlib
+import hmac
+import time
+
+import pytest
+
+from apps.users.models import User, TelegramSession
+
+pytestmark = pytest.mark.django_db
+
+BOT_TOKEN = '123456:test-token'
+
+
+def _signed_payload(**fields):
+    data = {
+        'id': '777000',
+        'first_name': 'Иван',
+        'auth_date': str(int(time.time())),
+        **fields,
+    }
+    check_string = '\n'.join(f"{k}={v}" for k, v in sorted(data.items()) if v)
+    secret = hashlib.sha256(BOT_TOKEN.encode()).digest()
+    data['hash'] = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    return data
+
+
+@pytest.fixture(autouse=True)
+def bot_token(settings):
+    settings.TELEGRAM_BOT_TOKEN = BOT_TOKEN
+
+
+class TestTelegramLogin:
+
+    def test_first_login_creates_user_and_session(self, api_client):
+        response = api_client.post('/api/auth/telegram/', _signed_payload(), format='json')
+
+        assert response.status_code == 200
+        user = User.objects.get(telegram_id='777000')
+        assert user.has_role('user')
+        assert user.last_login_at is not None
+        assert TelegramSession.objects.filter(user=user, is_valid=True).exists()
+
+    def test_repeat_login_does_not_save_user(self, api_client, mocker):
+        api_client.post('/api/auth/telegram/', _signed_payload(), format='json')
+        save = mocker.patch.object(User, 'save')
+
+        response = api_client.post('/api/auth/telegram/', _signed_payload(), format='json')
+
+        assert response.status_code == 200
+        assert 'access' in response.data['tokens']
+        save.assert_not_called()
+
+    def test_changed_profile_is_synced(self, api_client):
+        api_client.post('/api/auth/telegram/', _signed_payload(), format='json')
+        api_client.post(
+            '/api/auth/telegram/',
+            _signed_payload(first_name='Пётр', username='petr'),
+            format='json'
+        )
+
+        user = User.objects.get(telegram_id='777000')
+        assert user.name == 'Пётр'
+        assert user.telegram_username == 'petr'
+
+    def test_invalid_hash_rejected(self, api_client):
+        payload = _signed_payload()
+        payload['hash'] = '0' * 64
+        response = api_client.post('/api/auth/telegram/', payload, format='json')
+        assert response.status_code == 400
+
+
+class TestTelegramMiniAppLogin:
+
+    def test_changed_profile_is_synced(self):
+        from rest_framework.test import APIRequestFactory
+        from apps.users.views import telegram_mini_app_auth
+
+        factory = APIRequestFactory()
+        telegram_mini_app_auth(factory.post('/', _signed_payload(), format='json'))
+        response = telegram_mini_app_auth(factory.post(
+            '/', _signed_payload(first_name='Пётр', username='petr'), format='json'
+        ))
+
+        assert response.status_code == 200
+        user = User.objects.get(telegram_id='777000')
+        assert user.name == 'Пётр'
+        assert user.telegram_username == 'petr'
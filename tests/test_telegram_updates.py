@@ -0,0 +1,136 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from django.core.cache import cache
+
+from apps.users import telegram_updates
+from apps.users.telegram_updates import consume_batch, dispatch_update, replay
+
+pytestmark = pytest.mark.django_db
+
+WEBHOOK_URL = '/api/auth/webhook/telegram/'
+
+
+def _message_update(update_id, text='hello', from_id=9200):
+    return {'update_id': update_id, 'message': {'from': {'id': from_id}, 'text': text}}
+
+
+class TestWebhookView:
+
+    def test_wrong_secret_rejected(self, api_client, settings):
+        settings.TELEGRAM_WEBHOOK_SECRET = 'secret'
+        response = api_client.post(
+            WEBHOOK_URL, _message_update(1), format='json',
+            HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN='wrong'
+        )
+        assert response.status_code == 403
+
+    def test_missing_secret_rejected(self, api_client, settings, mocker):
+        settings.TELEGRAM_WEBHOOK_SECRET = ''
+        dispatch = mocker.patch.object(telegram_updates, 'dispatch_update')
+
+        response = api_client.post(WEBHOOK_URL, _message_update(1), format='json')
+
+        assert response.status_code == 403
+        dispatch.assert_not_called()
+
+    def test_update_pushed_to_stream(self, api_client, settings, mocker):
+        settings.TELEGRAM_WEBHOOK_SECRET = 'secret'
+        settings.TELEGRAM_UPDATES_STREAM_ENABLED = True
+        client = MagicMock()
+        mocker.patch.object(telegram_updates, 'get_redis', return_value=client)
+        dispatch = mocker.patch.object(telegram_updates, 'dispatch_update')
+
+        response = api_client.post(
+            WEBHOOK_URL, _message_update(2), format='json',
+            HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN='secret'
+        )
+
+        assert response.status_code == 200
+        stream, fields = client.xadd.call_args.args
+        assert stream == telegram_updates.STREAM_KEY
+        assert json.loads(fields['update'])['update_id'] == 2
+        dispatch.assert_not_called()
+
+
+class TestDispatch:
+
+    def test_duplicate_update_ignored(self):
+        assert dispatch_update(_message_update(10)) is True
+        assert dispatch_update(_message_update(10)) is False
+
+    def test_interrupted_update_processed_again(self, mocker):
+        # Процесс упал посреди обработки: маркер истек, обновление не отмечено
+        mocker.patch.object(telegram_updates, '_route', side_effect=SystemExit)
+        with pytest.raises(SystemExit):
+            dispatch_update(_message_update(13))
+        with pytest.raises(telegram_updates.UpdateInProgress):
+            dispatch_update(_message_update(13))
+        cache.delete('telegram:update:13:processing')
+        mocker.patch.object(telegram_updates, '_route')
+
+        assert dispatch_update(_message_update(13)) is True
+        assert dispatch_update(_message_update(13)) is False
+
+    def test_command_routed_to_handler(self, mocker):
+        command = MagicMock()
+        mocker.patch.dict(telegram_updates._command_handlers, {'help': command})
+        message = mocker.patch.object(telegram_updates, '_message_handlers', [MagicMock()])
+
+        dispatch_update(_message_update(11, text='/help@buddy_bot', from_id=9300))
+
+        command.assert_called_once()
+        message[0].assert_not_called()
+
+    def test_start_left_to_bot(self, mocker):
+        notify = mocker.patch('apps.users.tasks.send_telegram_notification.delay')
+        activity = mocker.patch.object(telegram_updates, 'record_activity')
+
+        dispatch_update(_message_update(12, text='/start', from_id=9300))
+
+        notify.assert_not_called()
+        activity.assert_called_once_with(telegram_id='9300')
+
+    def test_consume_batch_acks_entries(self, mocker):
+        client = MagicMock()
+        client.xautoclaim.return_value = [b'0-0', [], []]
+        client.xreadgroup.return_value = [
+            (telegram_updates.STREAM_KEY.encode(), [
+                (b'1-0', {b'update': json.dumps(_message_update(20)).encode()}),
+                (b'1-1', {b'update': b'not json'}),
+            ])
+        ]
+        mocker.patch.object(telegram_updates, 'get_redis', return_value=client)
+
+        assert consume_batch('worker-1', count=10, block_ms=0) == 2
+        client.xack.assert_called_once_with(
+            telegram_updates.STREAM_KEY, telegram_updates.CONSUMER_GROUP, b'1-0', b'1-1'
+        )
+
+    def test_failed_update_redelivered(self, mocker):
+        client = MagicMock()
+        client.xautoclaim.return_value = [b'0-0', [], []]
+        client.xreadgroup.return_value = [
+            (telegram_updates.STREAM_KEY.encode(), [(b'2-0', {b'update': json.dumps(_message_update(40)).encode()})])
+        ]
+        mocker.patch.object(telegram_updates, 'get_redis', return_value=client)
+        handler = MagicMock(side_effect=[RuntimeError('db down'), None])
+        mocker.patch.object(telegram_updates, '_message_handlers', [handler])
+
+        assert consume_batch('worker-1', count=10, block_ms=0) == 0
+        client.xack.assert_not_called()
+
+        assert consume_batch('worker-1', count=10, block_ms=0) == 1
+        assert handler.call_count == 2
+        client.xack.assert_called_once_with(telegram_updates.STREAM_KEY, telegram_updates.CONSUMER_GROUP, b'2-0')
+
+    def test_replay_bypasses_dedupe(self, mocker):
+        dispatch_update(_message_update(30))
+        client = MagicMock()
+        client.xrange.return_value = [(b'1-0', {b'update': json.dumps(_message_update(30)).encode()})]
+        mocker.patch.object(telegram_updates, 'get_redis', return_value=client)
+        handler = mocker.patch.object(telegram_updates, '_message_handlers', [MagicMock()])
+
+        assert replay() == 1
+        handler[0].assert_called_once()
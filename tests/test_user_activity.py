@@ -0,0 +1,76 @@
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from django.utils import timezone
+
+from apps.users import activity
+from apps.users.activity import flush_activity, record_activity, write_activity
+
+pytestmark = pytest.mark.django_db
+
+
+class TestActivityWriter:
+
+    def test_bulk_update_by_id_and_telegram_id(self, user_factory):
+        first = user_factory(telegram_id='9001')
+        second = user_factory(telegram_id='9002')
+        seen_at = timezone.now().replace(microsecond=0)
+
+        updated = write_activity({
+            f'u:{first.id}': seen_at.timestamp(),
+            't:9002': seen_at.timestamp(),
+            't:missing': seen_at.timestamp(),
+        })
+
+        assert updated == 2
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert first.last_login_at == seen_at
+        assert second.last_login_at == seen_at
+
+    def test_older_timestamp_does_not_overwrite(self, user):
+        now = timezone.now().replace(microsecond=0)
+        write_activity({f'u:{user.id}': now.timestamp()})
+        write_activity({f'u:{user.id}': (now - timedelta(hours=1)).timestamp()})
+
+        user.refresh_from_db()
+        assert user.last_login_at == now
+
+    def test_buffered_record_goes_to_sorted_set(self, user, settings, mocker):
+        settings.USER_ACTIVITY_BUFFERED = True
+        client = MagicMock()
+        mocker.patch.object(activity, 'get_redis', return_value=client)
+
+        record_activity(user_id=user.id)
+
+        key, mapping = client.zadd.call_args.args
+        assert key == activity.ACTIVITY_KEY
+        assert list(mapping) == [f'u:{user.id}']
+        user.refresh_from_db()
+        assert user.last_login_at is None
+
+    def test_flush_writes_buffer_and_drops_key(self, user, mocker):
+        seen_at = timezone.now().replace(microsecond=0)
+        client = MagicMock()
+        client.zrange.return_value = [(f'u:{user.id}'.encode(), seen_at.timestamp())]
+        mocker.patch.object(activity, 'get_redis', return_value=client)
+
+        assert flush_activity() == 1
+        client.delete.assert_called_once()
+        user.refresh_from_db()
+        assert user.last_login_at == seen_at
+
+    def test_webhook_message_records_activity(self, api_client, user_factory, settings):
+        settings.TELEGRAM_WEBHOOK_SECRET = 'secret'
+        member = user_factory(telegram_id='9100')
+        payload = {'update_id': 1, 'message': {'from': {'id': 9100}, 'text': 'hi'}}
+
+        response = api_client.post(
+            '/api/auth/webhook/telegram/', payload, format='json',
+            HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN='secret'
+        )
+
+        assert response.status_code == 200
+        member.refresh_from_db()
+        assert member.last_login_at is not None